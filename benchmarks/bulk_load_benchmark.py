@@ -0,0 +1,121 @@
+"""
+Bulk Load Benchmark
+Compares DataLoader bulk-load engines on a synthetic FactVentas frame
+
+Usage (from the repository root):
+    python -m benchmarks.bulk_load_benchmark --rows 10000000
+    python -m benchmarks.bulk_load_benchmark --rows 1000000 --engines to_sql sqlite_transaction
+    python -m benchmarks.bulk_load_benchmark --env    # target from DB_* environment variables
+"""
+
+import argparse
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List
+from src.etl.load import DataLoader
+
+
+# Engines compared by default against a local SQLite file
+DEFAULT_ENGINES = ['to_sql', 'multirow_insert', 'sqlite_transaction']
+
+
+def generate_fact_ventas(rows: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Generate a synthetic FactVentas frame with the DW column layout
+
+    Args:
+        rows: Number of fact rows
+        seed: Random seed for reproducible frames
+
+    Returns:
+        DataFrame with the FactVentas columns
+    """
+    rng = np.random.default_rng(seed)
+    lines_per_sale = 3
+
+    cantidad = rng.integers(1, 5, rows, dtype=np.int32)
+    precio_unitario = np.round(rng.uniform(150000, 2500000, rows), 2)
+    costo_unitario = np.round(precio_unitario * rng.uniform(0.55, 0.85, rows), 2)
+    importe = np.round(cantidad * precio_unitario, 2)
+    margen = np.round(cantidad * (precio_unitario - costo_unitario), 2)
+
+    return pd.DataFrame({
+        'id_venta': np.arange(rows, dtype=np.int64) // lines_per_sale + 1,
+        'id_detalle': np.arange(rows, dtype=np.int64) + 1,
+        'sk_fecha': rng.integers(1, 4018, rows, dtype=np.int32),
+        'sk_cliente': rng.integers(1, 50001, rows, dtype=np.int32),
+        'sk_producto': rng.integers(1, 501, rows, dtype=np.int32),
+        'sk_local': rng.integers(1, 41, rows, dtype=np.int32),
+        'sk_vendedor': rng.integers(1, 201, rows, dtype=np.int32),
+        'sk_forma_pago': rng.integers(1, 6, rows, dtype=np.int32),
+        'sk_canal': rng.integers(1, 3, rows, dtype=np.int32),
+        'sk_moneda': np.ones(rows, dtype=np.int32),
+        'cantidad': cantidad,
+        'precio_unitario': precio_unitario,
+        'costo_unitario': costo_unitario,
+        'importe': importe,
+        'margen': margen,
+        'margen_porcentaje': np.round((precio_unitario - costo_unitario) / precio_unitario * 100, 2),
+        'tipo_cambio': np.ones(rows),
+    })
+
+
+def run_benchmark(df: pd.DataFrame, engines: List[str], connection_params: Dict[str, Any],
+                  table_name: str = 'fact_ventas_benchmark') -> List[Dict[str, Any]]:
+    """
+    Load the same frame once per engine and collect the load_log entries
+
+    Args:
+        df: Frame to load
+        engines: Engine names to compare
+        connection_params: Target database connection parameters
+        table_name: Scratch table (replaced on every run)
+
+    Returns:
+        One load_log entry per engine
+    """
+    results = []
+    for engine_name in engines:
+        loader = DataLoader(connection_params, bulk_engine=engine_name)
+        try:
+            loader.load_to_database(df, table_name, if_exists='replace')
+            results.append(loader.get_load_log()[-1])
+        finally:
+            loader.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DataLoader bulk-load engines")
+    parser.add_argument('--rows', type=int, default=10000000, help="Synthetic FactVentas rows")
+    parser.add_argument('--engines', nargs='+', default=DEFAULT_ENGINES, help="Engines to compare")
+    parser.add_argument('--database', default=None, help="SQLite file (default: temporary file)")
+    parser.add_argument('--env', action='store_true', help="Use DB_* environment variables as target")
+    args = parser.parse_args()
+
+    if args.env:
+        connection_params = None
+    else:
+        database = args.database or os.path.join(tempfile.mkdtemp(), 'bulk_load_benchmark.db')
+        connection_params = {'db_type': 'sqlite', 'database': database,
+                             'host': '', 'port': '', 'username': '', 'password': ''}
+
+    print(f"Generating {args.rows:,} synthetic FactVentas rows...")
+    df = generate_fact_ventas(args.rows)
+
+    results = run_benchmark(df, args.engines, connection_params)
+
+    print("\n" + "=" * 64)
+    print(f"{'Engine':<22}{'Status':<10}{'Seconds':>12}{'Rows/sec':>20}")
+    print("-" * 64)
+    for entry in results:
+        print(f"{entry['engine']:<22}{entry['status']:<10}"
+              f"{entry.get('duration_seconds', float('nan')):>12.2f}"
+              f"{entry.get('rows_per_second', 0):>20,.0f}")
+    print("=" * 64)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""
+ETL Benchmark
+Runs the extract -> transform -> load path on synthetic OLTP data and records
+throughput, latency and memory per stage into comparable JSON result files
+
+Usage (from the repository root):
+    python -m benchmarks.etl_benchmark --scale 100k
+    python -m benchmarks.etl_benchmark --scale 10k 100k 1m --output-dir benchmarks/results
+    python -m benchmarks.etl_benchmark --scale 1m --compare benchmarks/results/etl_1m_<rev>.json
+    python -m benchmarks.etl_benchmark --scale 10m --env    # PostgreSQL stand-in from DB_* variables
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy import inspect, text
+from benchmarks.oltp_generator import OLTPGenerator, SCALE_FACTORS, parse_scale
+from src.etl.dim_generators import DateDimensionLoader
+from src.etl.dimension_sync import sync_dimensions
+from src.etl.incremental import IncrementalFactLoader
+from src.etl.load import DataLoader
+from src.utils.metrics import current_rss_mb, get_registry
+from src.utils.streaming import DEFAULT_CHUNKSIZE
+
+
+# Schema version of the result files (bump when the layout changes)
+RESULT_FORMAT = 1
+
+# Portable (SQLite / PostgreSQL) stand-in of sql/ddl/03_ddl_dw.sql; surrogate
+# keys are plain integers generated by the loaders instead of IDENTITY
+DW_STANDIN_DDL = {
+    'DimFecha': """
+        CREATE TABLE DimFecha (
+            sk_fecha INTEGER PRIMARY KEY, fecha DATE NOT NULL UNIQUE, anio INTEGER NOT NULL,
+            mes INTEGER NOT NULL, trimestre INTEGER NOT NULL, dia_semana VARCHAR(20) NOT NULL,
+            nombre_mes VARCHAR(20) NOT NULL, es_fin_semana SMALLINT NOT NULL, numero_semana INTEGER NOT NULL,
+            dia_mes INTEGER NOT NULL, dia_anio INTEGER NOT NULL
+        )""",
+    'DimCliente': """
+        CREATE TABLE DimCliente (
+            sk_cliente INTEGER PRIMARY KEY, id_cliente_fuente INTEGER NOT NULL UNIQUE,
+            nombre VARCHAR(100), apellido VARCHAR(100), genero CHAR(1)
+        )""",
+    'DimProducto': """
+        CREATE TABLE DimProducto (
+            sk_producto INTEGER PRIMARY KEY, id_modelo_fuente INTEGER NOT NULL UNIQUE, marca VARCHAR(100),
+            modelo VARCHAR(150), almacenamiento_gb INTEGER, ram_gb INTEGER
+        )""",
+    'DimLocal': """
+        CREATE TABLE DimLocal (
+            sk_local INTEGER PRIMARY KEY, id_local_fuente INTEGER NOT NULL UNIQUE,
+            provincia VARCHAR(100), ciudad VARCHAR(100), local VARCHAR(150)
+        )""",
+    'DimVendedor': """
+        CREATE TABLE DimVendedor (
+            sk_vendedor INTEGER PRIMARY KEY, id_vendedor_fuente INTEGER NOT NULL, nombre VARCHAR(100),
+            apellido VARCHAR(100), legajo VARCHAR(50), fecha_inicio DATE NOT NULL, fecha_fin DATE NULL,
+            es_actual SMALLINT NOT NULL, version INTEGER NOT NULL, categoria_vendedor VARCHAR(20) NOT NULL
+        )""",
+    'DimFormaPago': """
+        CREATE TABLE DimFormaPago (
+            sk_forma_pago INTEGER PRIMARY KEY, id_forma_pago_fuente INTEGER NOT NULL UNIQUE,
+            forma_pago VARCHAR(100)
+        )""",
+    'DimCanal': """
+        CREATE TABLE DimCanal (
+            sk_canal INTEGER PRIMARY KEY, canal VARCHAR(30) NOT NULL UNIQUE, descripcion VARCHAR(200)
+        )""",
+    'DimMoneda': """
+        CREATE TABLE DimMoneda (
+            sk_moneda INTEGER PRIMARY KEY, codigo_moneda VARCHAR(3) NOT NULL UNIQUE, nombre VARCHAR(100) NOT NULL,
+            simbolo VARCHAR(10) NOT NULL, es_moneda_base SMALLINT NOT NULL
+        )""",
+    'FactVentas': """
+        CREATE TABLE FactVentas (
+            id_venta INTEGER NOT NULL, id_detalle INTEGER NOT NULL, sk_fecha INTEGER NOT NULL,
+            sk_cliente INTEGER NOT NULL, sk_producto INTEGER NOT NULL, sk_local INTEGER NOT NULL,
+            sk_vendedor INTEGER NOT NULL, sk_forma_pago INTEGER NOT NULL, sk_canal INTEGER NOT NULL,
+            sk_moneda INTEGER NOT NULL, cantidad INTEGER NOT NULL, precio_unitario DECIMAL(12,2) NOT NULL,
+            costo_unitario DECIMAL(12,2) NOT NULL, importe DECIMAL(14,2) NOT NULL, margen DECIMAL(14,2) NOT NULL,
+            margen_porcentaje DECIMAL(5,2) NOT NULL, tipo_cambio DECIMAL(10,4) NOT NULL,
+            PRIMARY KEY (id_venta, id_detalle)
+        )""",
+}
+
+# Control tables of the ETL dropped before every run
+DW_CONTROL_TABLES = ['etl_watermark']
+
+# Same base currencies as 04_etl_dw_inicial.sql
+DIM_MONEDA_ROWS = pd.DataFrame({
+    'sk_moneda': [1, 2],
+    'codigo_moneda': ['ARS', 'USD'],
+    'nombre': ['Peso Argentino', 'Dólar Estadounidense'],
+    'simbolo': ['$', 'US$'],
+    'es_moneda_base': [1, 0],
+})
+
+# Relative slowdown of a stage reported as a regression
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+# Stages faster than this (seconds) are too noisy to compare
+MIN_COMPARABLE_SECONDS = 0.05
+
+
+def git_revision() -> Optional[str]:
+    """Short commit hash of the working tree (None outside a git checkout)"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        return revision.stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment_info() -> Dict[str, Any]:
+    """Interpreter, library and machine versions stored with every result"""
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sqlalchemy': sqlalchemy.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+class ETLBenchmark:
+    """
+    Builds a synthetic OLTP, loads the DW from it and collects the metrics
+    recorded by the instrumented ETL classes
+    """
+
+    def __init__(self, oltp_params: Dict[str, Any], dw_params: Dict[str, Any], detail_rows: int,
+                 seed: int = 42, chunksize: int = DEFAULT_CHUNKSIZE, optimize_dtypes: bool = False):
+        """
+        Initialize the benchmark
+
+        Args:
+            oltp_params: Connection parameters of the OLTP stand-in
+            dw_params: Connection parameters of the DW stand-in
+            detail_rows: DetalleVenta rows generated
+            seed: Random seed of the generator
+            chunksize: Rows per chunk of the generator and of the fact load
+            optimize_dtypes: Run the fact load with compact dtypes
+        """
+        self.oltp_params = oltp_params
+        self.dw_params = dw_params
+        self.detail_rows = detail_rows
+        self.seed = seed
+        self.chunksize = chunksize
+        self.optimize_dtypes = optimize_dtypes
+        self.generator = OLTPGenerator(detail_rows, seed=seed, chunksize=chunksize)
+        self.registry = get_registry()
+        self.phases = []
+        self.target = None
+
+    def _phase(self, name: str, func, *args, **kwargs):
+        """Run one benchmark phase as a stage of the 'benchmark' component"""
+        rss_before = current_rss_mb()
+        with self.registry.stage(name, 'benchmark') as timer:
+            result = func(*args, **kwargs)
+            rows = result.get('rows') if isinstance(result, dict) else None
+            timer.rows_out = sum(rows.values()) if isinstance(rows, dict) else rows
+        event = dict(self.registry.stage_events[-1])
+        event['rss_before_mb'] = rss_before
+        event['rss_after_mb'] = current_rss_mb()
+        self.phases.append(event)
+        print(f"[{name}] {event['seconds']:.2f}s")
+        return result
+
+    def create_dw_schema(self) -> Dict[str, Any]:
+        """Drop and recreate the DW stand-in tables"""
+        loader = DataLoader(self.dw_params)
+        try:
+            engine = loader.db_connection.get_engine()
+            self.target = engine.dialect.name
+            existing = set(inspect(engine).get_table_names())
+            with engine.begin() as connection:
+                for table_name in list(DW_STANDIN_DDL)[::-1] + DW_CONTROL_TABLES:
+                    if table_name in existing:
+                        connection.execute(text(f"DROP TABLE {table_name}"))
+                for ddl in DW_STANDIN_DDL.values():
+                    connection.execute(text(ddl))
+        finally:
+            loader.close()
+        return {'rows': 0}
+
+    def load_static_dimensions(self) -> Dict[str, Any]:
+        """DimFecha over the generated date range, DimMoneda and the first DimVendedor versions"""
+        loader = DataLoader(self.dw_params)
+        try:
+            fechas = self.generator.fechas
+            fecha = DateDimensionLoader(loader).load_dim_fecha(fechas[0], fechas[-1], generate_keys=True)
+            loader.load_to_database(DIM_MONEDA_ROWS, 'DimMoneda')
+
+            vendedores = self.generator.catalogs()['Vendedores']
+            dim_vendedor = pd.DataFrame({
+                'sk_vendedor': vendedores['id_vendedor'],
+                'id_vendedor_fuente': vendedores['id_vendedor'],
+                'nombre': vendedores['nombre'],
+                'apellido': vendedores['apellido'],
+                'legajo': vendedores['legajo'],
+                'fecha_inicio': date(1900, 1, 1),
+                'fecha_fin': None,
+                'es_actual': 1,
+                'version': 1,
+                'categoria_vendedor': 'Inicial',
+            })
+            loader.load_to_database(dim_vendedor, 'DimVendedor')
+        finally:
+            loader.close()
+        return {'rows': {'DimFecha': fecha['inserted'], 'DimMoneda': len(DIM_MONEDA_ROWS),
+                         'DimVendedor': len(dim_vendedor)}}
+
+    def sync_dimensions(self) -> Dict[str, Any]:
+        """SCD Type 1 dimensions from the OLTP catalogs"""
+        source, target = DataLoader(self.oltp_params), DataLoader(self.dw_params)
+        try:
+            summaries = sync_dimensions(source.db_connection, target.db_connection, generate_keys=True,
+                                        bulk_engine=target.bulk_engine)
+        finally:
+            source.close()
+            target.close()
+        return {'rows': {name: summary['inserted'] for name, summary in summaries.items()}}
+
+    def load_facts(self) -> Dict[str, Any]:
+        """FactVentas through the incremental (extract -> transform -> upsert) path"""
+        fact_loader = IncrementalFactLoader(self.oltp_params, self.dw_params, chunksize=self.chunksize,
+                                            optimize_dtypes=self.optimize_dtypes)
+        try:
+            return fact_loader.run_incremental()
+        finally:
+            fact_loader.loader.close()
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Run every phase and assemble the result document
+
+        Returns:
+            Result with the phases, ETL stages, query latencies and totals
+        """
+        self.registry.reset()
+        self.phases = []
+        started = datetime.now()
+
+        oltp_loader = DataLoader(self.oltp_params)
+        try:
+            self._phase('generate_oltp', self.generator.write, oltp_loader)
+        finally:
+            oltp_loader.close()
+        # Keep the stage and query metrics of the ETL only
+        self.registry.reset()
+        self._phase('create_dw_schema', self.create_dw_schema)
+        self._phase('static_dimensions', self.load_static_dimensions)
+        self._phase('sync_dimensions', self.sync_dimensions)
+        facts = self._phase('load_facts', self.load_facts)
+
+        etl_phases = [phase for phase in self.phases if phase['stage'] != 'generate_oltp']
+        etl_seconds = sum(phase['seconds'] for phase in etl_phases)
+        return {
+            'format': RESULT_FORMAT,
+            'benchmark': 'etl',
+            'revision': git_revision(),
+            'started_at': started.isoformat(timespec='seconds'),
+            'environment': environment_info(),
+            'config': {
+                'detail_rows': self.detail_rows,
+                'seed': self.seed,
+                'chunksize': self.chunksize,
+                'optimize_dtypes': self.optimize_dtypes,
+                'target': self.target,
+            },
+            'phases': self.phases,
+            'stages': self.stage_metrics(),
+            'queries': self.query_metrics(),
+            'totals': {
+                'fact_rows': facts['rows'],
+                'etl_seconds': round(etl_seconds, 4),
+                'etl_rows_per_second': round(facts['rows'] / etl_seconds, 1) if etl_seconds else None,
+                'peak_rss_mb': max((p['peak_rss_mb'] for p in self.phases if p['peak_rss_mb'] is not None),
+                                   default=None),
+            },
+        }
+
+    def stage_metrics(self) -> List[Dict[str, Any]]:
+        """Per ETL stage: calls, wall time, latency percentiles, rows, throughput and memory"""
+        events = pd.DataFrame([event for event in self.registry.stage_events if event['component'] != 'benchmark'])
+        if events.empty:
+            return []
+        numeric = ['rows_in', 'rows_out', 'bytes_in', 'bytes_out', 'peak_rss_mb']
+        events[numeric] = events[numeric].astype('float64')
+        stages = []
+        for (component, stage), group in events.groupby(['component', 'stage'], sort=True):
+            seconds = group['seconds']
+            rows = group['rows_out'].sum() if group['rows_out'].notna().any() else group['rows_in'].sum()
+            total = float(seconds.sum())
+            stages.append({
+                'component': component,
+                'stage': stage,
+                'calls': int(len(group)),
+                'seconds': round(total, 6),
+                'p50_seconds': round(float(seconds.quantile(0.5)), 6),
+                'p95_seconds': round(float(seconds.quantile(0.95)), 6),
+                'max_seconds': round(float(seconds.max()), 6),
+                'rows': int(rows),
+                'rows_per_second': round(rows / total, 1) if total > 0 and rows else None,
+                'bytes': int(group['bytes_out'].fillna(group['bytes_in']).fillna(0).sum()),
+                'peak_rss_mb': float(group['peak_rss_mb'].max()) if group['peak_rss_mb'].notna().any() else None,
+                'failed': int((group['status'] == 'failed').sum()),
+            })
+        return stages
+
+    def query_metrics(self) -> Dict[str, Any]:
+        """Statement latency histograms recorded by the shared engines"""
+        histograms = self.registry.snapshot()['histograms']
+        return {name: summary for name, summary in histograms.items() if name.startswith('etl_query_seconds')}
+
+
+def _stage_key(entry: Dict[str, Any]) -> str:
+    return f"{entry['component']}.{entry['stage']}"
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any],
+                    threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> pd.DataFrame:
+    """
+    Compare the wall time of every phase and stage against a baseline result
+
+    Args:
+        current: Result of this run
+        baseline: Result of a previous run (same scale for a fair comparison)
+        threshold: Relative slowdown flagged as a regression
+
+    Returns:
+        DataFrame with the baseline/current seconds, change and regression flag
+    """
+    rows = []
+    for section in ('phases', 'stages'):
+        before = {_stage_key(entry): entry for entry in baseline.get(section, [])}
+        for entry in current.get(section, []):
+            key = _stage_key(entry)
+            if key not in before:
+                continue
+            old, new = before[key]['seconds'], entry['seconds']
+            change = (new - old) / old if old > 0 else None
+            rows.append({
+                'stage': key,
+                'baseline_seconds': old,
+                'current_seconds': new,
+                'change_pct': round(change * 100, 1) if change is not None else None,
+                'regression': bool(change is not None and change > threshold
+                                   and max(old, new) >= MIN_COMPARABLE_SECONDS),
+            })
+    return pd.DataFrame(rows, columns=['stage', 'baseline_seconds', 'current_seconds', 'change_pct', 'regression'])
+
+
+def write_result(result: Dict[str, Any], output_dir: str, scale: str) -> str:
+    """
+    Write a result file named after the scale, revision and start time
+
+    Args:
+        result: Result document
+        output_dir: Results directory
+        scale: Scale label used in the file name
+
+    Returns:
+        Path of the written file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = result['started_at'].replace(':', '').replace('-', '')
+    path = os.path.join(output_dir, f"etl_{scale}_{result['revision'] or 'norev'}_{stamp}.json")
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(result, handle, indent=2, default=str, ensure_ascii=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL on synthetic OLTP data")
+    parser.add_argument('--scale', nargs='+', default=['100k'],
+                        help=f"Scale factors ({', '.join(SCALE_FACTORS)} or detail rows)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed of the generator")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    parser.add_argument('--optimize-dtypes', action='store_true', help="Load facts with compact dtypes")
+    parser.add_argument('--workdir', default=None, help="Directory of the SQLite files (default: temporary)")
+    parser.add_argument('--env', action='store_true', help="Use DB_* environment variables as OLTP and DW")
+    parser.add_argument('--output-dir', default='benchmarks/results', help="Directory of the result files")
+    parser.add_argument('--compare', default=None, help="Baseline result file to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="Relative slowdown reported as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit with status 1 on regressions")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+
+    regressions = False
+    for scale in args.scale:
+        detail_rows = parse_scale(scale)
+        if args.env:
+            oltp_params = dw_params = None
+        else:
+            workdir = args.workdir or tempfile.mkdtemp(prefix='etl_benchmark_')
+            os.makedirs(workdir, exist_ok=True)
+            oltp_params, dw_params = (
+                {'db_type': 'sqlite', 'database': os.path.join(workdir, f"{name}_{scale}.db"),
+                 'host': '', 'port': '', 'username': '', 'password': ''}
+                for name in ('oltp', 'dw')
+            )
+
+        print(f"\n=== ETL benchmark: {detail_rows:,} detail rows ===")
+        result = ETLBenchmark(oltp_params, dw_params, detail_rows, seed=args.seed, chunksize=args.chunksize,
+                              optimize_dtypes=args.optimize_dtypes).run()
+        path = write_result(result, args.output_dir, str(scale).lower())
+
+        totals = result['totals']
+        print("\n" + "=" * 72)
+        print(f"{'Stage':<44}{'Seconds':>10}{'Rows/sec':>18}")
+        print("-" * 72)
+        for entry in result['phases'] + result['stages']:
+            throughput = entry.get('rows_per_second')
+            print(f"{_stage_key(entry):<44}{entry['seconds']:>10.2f}"
+                  f"{f'{throughput:,.0f}' if throughput else '-':>18}")
+        print("-" * 72)
+        print(f"ETL: {totals['fact_rows']:,} fact rows in {totals['etl_seconds']:.2f}s, "
+              f"peak RSS {totals['peak_rss_mb']} MB")
+        print(f"Result written to {path}")
+
+        if baseline is not None:
+            comparison = compare_results(result, baseline, args.threshold)
+            print("\nComparison against", args.compare)
+            print(comparison.to_string(index=False))
+            regressions = regressions or bool(comparison['regression'].any())
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
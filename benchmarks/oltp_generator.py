@@ -0,0 +1,308 @@
+"""
+Synthetic OLTP Generator
+Reproducible OLTP_Celulares data (sql/ddl/01_ddl_oltp.sql) at configurable scale factors
+
+Usage (from the repository root):
+    python -m benchmarks.oltp_generator --scale 100k --database data/oltp_100k.db
+    python -m benchmarks.oltp_generator --scale 10m --env    # target from DB_* environment variables
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Iterator, Tuple
+from sqlalchemy import text
+from src.etl.load import DataLoader
+from src.utils.streaming import DEFAULT_CHUNKSIZE
+
+
+# Detail rows (DetalleVenta) of the named scale factors
+SCALE_FACTORS = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+    '100m': 100_000_000,
+}
+
+# Catalog values of sql/dml/02_carga_oltp.sql
+CIUDADES = [
+    ('Buenos Aires', 'Buenos Aires'), ('Córdoba', 'Córdoba'), ('Rosario', 'Santa Fe'),
+    ('Mendoza', 'Mendoza'), ('San Luis', 'San Luis'), ('La Plata', 'Buenos Aires'),
+]
+
+MARCAS = ['Samsung', 'Apple', 'Xiaomi', 'Motorola', 'Huawei', 'TCL']
+
+MODELOS = [
+    (1, 'Galaxy A34', 128, 6), (1, 'Galaxy S23', 256, 8), (1, 'Galaxy S24', 256, 12),
+    (2, 'iPhone 13', 128, 4), (2, 'iPhone 14', 128, 6), (2, 'iPhone 15', 256, 6),
+    (3, 'Redmi Note 12', 128, 6), (3, 'Poco X6', 256, 8), (4, 'Moto G54', 128, 8),
+    (4, 'Edge 40', 256, 8), (5, 'P60', 256, 8), (6, 'TCL 40 SE', 128, 6),
+]
+
+NOMBRES = ['Nicolás', 'Lucía', 'Sofía', 'Agustina', 'Mateo', 'Julián', 'Tomás', 'Camila', 'Bruno',
+           'Rocío', 'Pablo', 'Ezequiel', 'Florencia', 'Soledad', 'Cintia', 'Ana', 'Eliana', 'Diego',
+           'Pedro', 'Lautaro', 'Noelia', 'Sergio', 'Carla', 'Hernán', 'Patricia']
+
+APELLIDOS = ['Rodríguez', 'Pérez', 'Martínez', 'Díaz', 'Álvarez', 'Gómez', 'González', 'Sánchez',
+             'López', 'Fernández']
+
+FORMAS_PAGO = ['Efectivo', 'Tarjeta Crédito', 'Tarjeta Débito', 'Transferencia', 'Mercado Pago']
+
+CANALES = ['Salón', 'Online']
+
+# Indexes standing in for the primary keys (the delta query joins and filters on them)
+OLTP_INDEXES = {
+    'Ventas': ['id_venta'],
+    'DetalleVenta': ['id_venta', 'id_detalle'],
+}
+
+
+def parse_scale(value) -> int:
+    """
+    Number of detail rows of a scale factor
+
+    Args:
+        value: Named scale ('10k', '1m', ...) or a row count
+
+    Returns:
+        Detail rows
+    """
+    key = str(value).strip().lower()
+    if key in SCALE_FACTORS:
+        return SCALE_FACTORS[key]
+    try:
+        rows = int(float(key))
+    except ValueError:
+        raise ValueError(f"Unknown scale factor '{value}'. Available: {', '.join(SCALE_FACTORS)} or a row count")
+    if rows <= 0:
+        raise ValueError("The scale factor must be a positive number of rows")
+    return rows
+
+
+class OLTPGenerator:
+    """
+    Generates the OLTP_Celulares tables for a number of DetalleVenta rows
+
+    Catalog sizes grow with the scale (customers, stores, sellers and
+    models). Sales are produced in chunks with ids and dates increasing
+    together, like the OLTP the incremental load reads, so the biggest
+    scales never need to fit in memory. The same seed and chunksize always
+    produce the same data.
+    """
+
+    def __init__(self, detail_rows: int, seed: int = 42, fecha_desde: str = '2024-01-01',
+                 fecha_hasta: str = '2025-12-31', chunksize: int = DEFAULT_CHUNKSIZE):
+        """
+        Initialize the generator
+
+        Args:
+            detail_rows: DetalleVenta rows (see SCALE_FACTORS)
+            seed: Random seed
+            fecha_desde: First sale date
+            fecha_hasta: Last sale date
+            chunksize: Detail rows per generated chunk
+        """
+        self.detail_rows = int(detail_rows)
+        self.seed = seed
+        self.fechas = pd.date_range(fecha_desde, fecha_hasta, freq='D').to_numpy(dtype='datetime64[D]')
+        self.chunksize = chunksize
+
+        self.num_clientes = max(200, self.detail_rows // 50)
+        self.num_locales = max(12, min(2000, self.detail_rows // 50_000))
+        self.num_vendedores = max(15, min(20_000, self.detail_rows // 5_000))
+        self.num_modelos = max(len(MODELOS), min(5000, self.detail_rows // 20_000))
+
+    def catalogs(self) -> Dict[str, pd.DataFrame]:
+        """
+        Generate the catalog tables
+
+        Returns:
+            Dictionary of OLTP table name -> DataFrame
+        """
+        rng = np.random.default_rng([self.seed, 0])
+
+        ciudades = pd.DataFrame({
+            'id_ciudad': np.arange(1, len(CIUDADES) + 1),
+            'ciudad': [ciudad for ciudad, _ in CIUDADES],
+            'provincia': [provincia for _, provincia in CIUDADES],
+        })
+
+        id_local = np.arange(1, self.num_locales + 1)
+        id_ciudad = (id_local - 1) // 2 % len(CIUDADES) + 1
+        locales = pd.DataFrame({
+            'id_local': id_local,
+            'id_ciudad': id_ciudad,
+            'nombre_local': [f"Sucursal {'Centro' if i % 2 else 'Norte'} {ciudades['ciudad'].iat[c - 1][:3].upper()} {i}"
+                             for i, c in zip(id_local, id_ciudad)],
+            'direccion': [f"Av. Principal {100 + i}" for i in id_local],
+        })
+
+        marcas = pd.DataFrame({'id_marca': np.arange(1, len(MARCAS) + 1), 'marca': MARCAS})
+
+        base = np.arange(self.num_modelos) % len(MODELOS)
+        serie = np.arange(self.num_modelos) // len(MODELOS)
+        modelos = pd.DataFrame({
+            'id_modelo': np.arange(1, self.num_modelos + 1),
+            'id_marca': [MODELOS[b][0] for b in base],
+            'modelo': [MODELOS[b][1] if s == 0 else f"{MODELOS[b][1]} v{s + 1}" for b, s in zip(base, serie)],
+            'almacenamiento_gb': [MODELOS[b][2] for b in base],
+            'ram_gb': [MODELOS[b][3] for b in base],
+        })
+
+        id_vendedor = np.arange(1, self.num_vendedores + 1)
+        vendedores = pd.DataFrame({
+            'id_vendedor': id_vendedor,
+            'nombre': rng.choice(NOMBRES, self.num_vendedores),
+            'apellido': rng.choice(APELLIDOS, self.num_vendedores),
+            'legajo': [f"VEN-{1000 + i}" for i in id_vendedor],
+        })
+
+        id_cliente = np.arange(1, self.num_clientes + 1)
+        nacimiento = np.datetime64('1960-01-01') + rng.integers(0, 16000, self.num_clientes).astype('timedelta64[D]')
+        clientes = pd.DataFrame({
+            'id_cliente': id_cliente,
+            'nombre': rng.choice(NOMBRES, self.num_clientes),
+            'apellido': rng.choice(APELLIDOS, self.num_clientes),
+            'dni': 20_000_000 + id_cliente * 17,
+            'genero': rng.choice(['M', 'F', 'X'], self.num_clientes),
+            'fecha_nacimiento': pd.to_datetime(nacimiento).date,
+        })
+
+        formas_pago = pd.DataFrame({
+            'id_forma_pago': np.arange(1, len(FORMAS_PAGO) + 1),
+            'descripcion': FORMAS_PAGO,
+        })
+
+        return {
+            'Ciudades': ciudades,
+            'Locales': locales,
+            'Marcas': marcas,
+            'Modelos': modelos,
+            'Vendedores': vendedores,
+            'Clientes': clientes,
+            'FormasPago': formas_pago,
+        }
+
+    def _model_prices(self) -> np.ndarray:
+        """List price of every model (index = id_modelo - 1)"""
+        rng = np.random.default_rng([self.seed, 1])
+        return np.round(rng.uniform(300, 1500, self.num_modelos), 2)
+
+    def iter_sales(self) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Generate Ventas and DetalleVenta in chunks
+
+        Returns:
+            Iterator of (ventas, detalle) chunk pairs
+        """
+        prices = self._model_prices()
+        days = len(self.fechas)
+        next_venta = next_detalle = 1
+        produced = 0
+        index = 0
+
+        while produced < self.detail_rows:
+            rng = np.random.default_rng([self.seed, 2, index])
+            wanted = min(self.chunksize, self.detail_rows - produced)
+
+            # 1-3 lines per sale; drop the sales that would overflow the chunk
+            lines = rng.integers(1, 4, wanted)
+            ends = np.cumsum(lines)
+            n_sales = int(np.searchsorted(ends, wanted, side='left')) + 1
+            lines = lines[:n_sales]
+            lines[-1] -= int(ends[n_sales - 1] - wanted)
+            n_lines = int(lines.sum())
+
+            id_venta = np.arange(next_venta, next_venta + n_sales, dtype='int64')
+            first_line = produced + np.concatenate(([0], np.cumsum(lines)[:-1]))
+            fecha = self.fechas[np.minimum(first_line * days // self.detail_rows, days - 1)]
+
+            ventas = pd.DataFrame({
+                'id_venta': id_venta,
+                'fecha_venta': pd.to_datetime(fecha).date,
+                'id_local': rng.integers(1, self.num_locales + 1, n_sales),
+                'id_cliente': rng.integers(1, self.num_clientes + 1, n_sales),
+                'id_vendedor': rng.integers(1, self.num_vendedores + 1, n_sales),
+                'id_forma_pago': rng.integers(1, len(FORMAS_PAGO) + 1, n_sales),
+                'canal': rng.choice(CANALES, n_sales, p=[0.6, 0.4]),
+            })
+
+            id_modelo = rng.integers(1, self.num_modelos + 1, n_lines)
+            precio = np.round(prices[id_modelo - 1] * rng.uniform(0.9, 1.1, n_lines), 2)
+            detalle = pd.DataFrame({
+                'id_detalle': np.arange(next_detalle, next_detalle + n_lines, dtype='int64'),
+                'id_venta': np.repeat(id_venta, lines),
+                'id_modelo': id_modelo,
+                'cantidad': rng.integers(1, 4, n_lines),
+                'precio_unitario': precio,
+                'costo_unitario': np.round(precio * rng.uniform(0.6, 0.8, n_lines), 2),
+            })
+
+            next_venta += n_sales
+            next_detalle += n_lines
+            produced += n_lines
+            index += 1
+            yield ventas, detalle
+
+    def write(self, loader: DataLoader, create_indexes: bool = True) -> Dict[str, Any]:
+        """
+        Write every OLTP table (replacing existing ones) through a DataLoader
+
+        Args:
+            loader: DataLoader of the OLTP stand-in database
+            create_indexes: Index the sales keys read by the delta query
+
+        Returns:
+            Summary with the rows per table and the duration
+        """
+        started = time.perf_counter()
+        rows = {}
+        for table_name, df in self.catalogs().items():
+            if not loader.load_to_database(df, table_name, if_exists='replace'):
+                raise RuntimeError(f"Could not write {table_name}")
+            rows[table_name] = len(df)
+
+        rows['Ventas'] = rows['DetalleVenta'] = 0
+        for index, (ventas, detalle) in enumerate(self.iter_sales()):
+            if_exists = 'replace' if index == 0 else 'append'
+            for table_name, df in (('Ventas', ventas), ('DetalleVenta', detalle)):
+                if not loader.load_to_database(df, table_name, if_exists=if_exists):
+                    raise RuntimeError(f"Could not write {table_name}")
+                rows[table_name] += len(df)
+
+        if create_indexes:
+            engine = loader.db_connection.get_engine()
+            with engine.begin() as connection:
+                for table_name, columns in OLTP_INDEXES.items():
+                    connection.execute(text(
+                        f"CREATE INDEX ix_{table_name}_{'_'.join(columns)} ON {table_name} ({', '.join(columns)})"
+                    ))
+
+        duration = time.perf_counter() - started
+        print(f"Generated {rows['DetalleVenta']:,} detail rows in {rows['Ventas']:,} sales "
+              f"({self.num_clientes:,} customers, {self.num_modelos} models) in {duration:.2f}s")
+        return {'rows': rows, 'duration_seconds': round(duration, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic OLTP_Celulares database")
+    parser.add_argument('--scale', default='100k', help=f"Scale factor ({', '.join(SCALE_FACTORS)} or rows)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Detail rows per chunk")
+    parser.add_argument('--database', default='data/oltp_synthetic.db', help="SQLite file")
+    parser.add_argument('--env', action='store_true', help="Use DB_* environment variables as target")
+    args = parser.parse_args()
+
+    connection_params = None if args.env else {'db_type': 'sqlite', 'database': args.database,
+                                                'host': '', 'port': '', 'username': '', 'password': ''}
+    loader = DataLoader(connection_params)
+    try:
+        OLTPGenerator(parse_scale(args.scale), seed=args.seed, chunksize=args.chunksize).write(loader)
+    finally:
+        loader.close()
+
+
+if __name__ == "__main__":
+    main()
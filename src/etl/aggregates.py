@@ -0,0 +1,407 @@
+"""
+Aggregates Module - ETL Pipeline
+Materialized rollups of fact_sales with partition-level incremental refresh
+"""
+
+import time
+import uuid
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, text
+from src.etl.load import DataLoader
+
+
+# Control table listing the materialized aggregates
+AGGREGATE_REGISTRY_TABLE = 'etl_aggregate_registry'
+
+# Measures that can be re-aggregated with SUM from any finer grain
+ADDITIVE_MEASURES = {
+    'transactions': 'COUNT(f.sale_id)',
+    'units_sold': 'SUM(f.quantity)',
+    'revenue': 'SUM(f.total_amount)',
+    'discounts': 'SUM(f.discount_amount)',
+    'net_revenue': 'SUM(f.net_amount)',
+    'profit': 'SUM(f.profit)',
+    'profit_margin_sum': 'SUM(f.profit_margin)',
+    'profit_margin_count': 'COUNT(f.profit_margin)',
+}
+
+# Distinct counts are only exact at the grain they were materialized at
+DISTINCT_MEASURES = {
+    'unique_customers': 'COUNT(DISTINCT f.customer_key)',
+    'unique_products': 'COUNT(DISTINCT f.product_key)',
+}
+
+# Averages of the views, derived from stored measures (numerator, denominator)
+DERIVED_MEASURES = {
+    'avg_order_value': ('revenue', 'transactions'),
+    'avg_profit_margin': ('profit_margin_sum', 'profit_margin_count'),
+    'revenue_per_customer': ('revenue', 'unique_customers'),
+}
+
+
+class AggregateDefinition:
+    """
+    One materialized rollup: grain columns, measures and partition mapping
+    """
+
+    def __init__(self, name: str, table_name: str, columns: Dict[str, str], joins: List[str],
+                 key_columns: List[str], partition_key: str, partition_columns: List[str] = None,
+                 partition_lookup: str = None, measures: List[str] = None, description: str = ''):
+        """
+        Initialize the definition
+
+        Args:
+            name: Aggregate name
+            table_name: Summary table holding the rollup
+            columns: Grain columns of the summary table -> SQL over the fact (f) and its joins
+            joins: JOIN clauses from the fact table to the dimensions
+            key_columns: Grain columns identifying a row (distinct counts are
+                only served to queries grouping by all of them)
+            partition_key: Fact column whose loaded values mark touched partitions
+            partition_columns: Summary columns identifying a partition (default: partition_key)
+            partition_lookup: SELECT mapping the staged partition_key values to
+                partition_columns ({staging} is replaced by the staging table)
+            measures: Measure names (default: every additive and distinct measure)
+            description: View the aggregate replaces
+        """
+        self.name = name
+        self.table_name = table_name
+        self.columns = columns
+        self.joins = joins
+        self.key_columns = key_columns
+        self.partition_key = partition_key
+        self.partition_columns = partition_columns or [partition_key]
+        self.partition_lookup = partition_lookup or f"SELECT DISTINCT {partition_key} FROM {{staging}}"
+        self.measures = measures or list(ADDITIVE_MEASURES) + list(DISTINCT_MEASURES)
+        self.description = description
+
+    def select_sql(self, fact_table: str, where: str = '') -> str:
+        """SELECT computing the rollup from the fact table"""
+        all_measures = {**ADDITIVE_MEASURES, **DISTINCT_MEASURES}
+        select = [f"{expr} AS {column}" for column, expr in self.columns.items()]
+        select += [f"{all_measures[measure]} AS {measure}" for measure in self.measures]
+        return (f"SELECT {', '.join(select)} FROM {fact_table} f {' '.join(self.joins)} "
+                f"{'WHERE ' + where if where else ''} "
+                f"GROUP BY {', '.join(self.columns.values())}")
+
+    def output_columns(self) -> List[str]:
+        """Columns of the summary table"""
+        return list(self.columns) + self.measures
+
+    def can_serve(self, dimensions: List[str], measures: List[str]) -> bool:
+        """Whether a query grouped by dimensions can be answered from this rollup"""
+        if not set(dimensions) <= set(self.columns):
+            return False
+        for measure in measures:
+            if measure in DERIVED_MEASURES:
+                if not self.can_serve(dimensions, list(DERIVED_MEASURES[measure])):
+                    return False
+            elif measure in DISTINCT_MEASURES:
+                if measure not in self.measures or not set(self.key_columns) <= set(dimensions):
+                    return False
+            elif measure not in self.measures:
+                return False
+        return True
+
+
+_DATE_JOIN = 'INNER JOIN dim_date d ON f.date_key = d.date_key'
+
+# Staged date_key values -> touched months
+_MONTH_PARTITIONS = ("SELECT DISTINCT year, month_number FROM dim_date "
+                     "WHERE date_key IN (SELECT date_key FROM {staging})")
+
+# Rollups behind view_sales_summary, view_daily_dashboard,
+# view_monthly_sales_trend, view_product_performance and view_store_performance
+DEFAULT_AGGREGATES = [
+    AggregateDefinition(
+        name='sales_summary', table_name='agg_sales_summary',
+        columns={'year': 'd.year', 'quarter': 'd.quarter', 'month_number': 'd.month_number',
+                 'month_name': 'd.month_name', 'category': 'p.category', 'subcategory': 'p.subcategory',
+                 'customer_segment': 'c.customer_segment', 'store_name': 's.store_name',
+                 'store_type': 's.store_type'},
+        joins=[_DATE_JOIN, 'INNER JOIN dim_product p ON f.product_key = p.product_key',
+               'INNER JOIN dim_customer c ON f.customer_key = c.customer_key',
+               'INNER JOIN dim_store s ON f.store_key = s.store_key'],
+        key_columns=['year', 'month_number', 'category', 'subcategory', 'customer_segment',
+                     'store_name', 'store_type'],
+        partition_key='date_key', partition_columns=['year', 'month_number'],
+        partition_lookup=_MONTH_PARTITIONS, description='view_sales_summary',
+    ),
+    AggregateDefinition(
+        name='daily', table_name='agg_sales_daily',
+        columns={'date_key': 'f.date_key', 'date': 'd.date', 'day_of_week': 'd.day_of_week',
+                 'is_weekend': 'd.is_weekend', 'year': 'd.year', 'quarter': 'd.quarter',
+                 'month_number': 'd.month_number', 'month_name': 'd.month_name'},
+        joins=[_DATE_JOIN], key_columns=['date'], partition_key='date_key',
+        description='view_daily_dashboard',
+    ),
+    AggregateDefinition(
+        name='monthly', table_name='agg_sales_monthly',
+        columns={'year': 'd.year', 'quarter': 'd.quarter', 'month_number': 'd.month_number',
+                 'month_name': 'd.month_name'},
+        joins=[_DATE_JOIN], key_columns=['year', 'month_number'], partition_key='date_key',
+        partition_columns=['year', 'month_number'], partition_lookup=_MONTH_PARTITIONS,
+        description='view_monthly_sales_trend',
+    ),
+    AggregateDefinition(
+        name='product', table_name='agg_sales_product',
+        columns={'product_key': 'f.product_key', 'product_name': 'p.product_name',
+                 'category': 'p.category', 'subcategory': 'p.subcategory', 'brand': 'p.brand',
+                 'is_current': 'p.is_current'},
+        joins=['INNER JOIN dim_product p ON f.product_key = p.product_key'],
+        key_columns=['product_key'], partition_key='product_key',
+        description='view_product_performance',
+    ),
+    AggregateDefinition(
+        name='store', table_name='agg_sales_store',
+        columns={'store_key': 'f.store_key', 'store_name': 's.store_name', 'store_type': 's.store_type',
+                 'city': 's.city', 'state': 's.state', 'region': 's.region', 'is_active': 's.is_active'},
+        joins=['INNER JOIN dim_store s ON f.store_key = s.store_key'],
+        key_columns=['store_key'], partition_key='store_key',
+        description='view_store_performance',
+    ),
+]
+
+
+class AggregateManager:
+    """
+    Materializes the fact_sales rollups and keeps them current
+
+    After every DataLoader.load_fact only the partitions (days, months,
+    products, stores) touched by the loaded rows are deleted and recomputed
+    from the fact table, in one transaction. A registry table records which
+    rollups exist so queries are routed to the smallest one able to answer.
+    """
+
+    def __init__(self, loader: DataLoader, fact_table: str = 'fact_sales',
+                 definitions: List[AggregateDefinition] = None,
+                 registry_table: str = AGGREGATE_REGISTRY_TABLE):
+        """
+        Initialize the manager and register its post-load hook
+
+        Args:
+            loader: DataLoader writing the fact table
+            fact_table: Fact table the rollups are computed from
+            definitions: Aggregate definitions (default: DEFAULT_AGGREGATES)
+            registry_table: Control table listing the materialized rollups
+        """
+        self.loader = loader
+        self.db_connection = loader.db_connection
+        self.fact_table = fact_table
+        self.definitions = {d.name: d for d in (definitions or DEFAULT_AGGREGATES)}
+        self.registry = Table(
+            registry_table, MetaData(),
+            Column('aggregate_name', String(100), primary_key=True),
+            Column('table_name', String(200), nullable=False),
+            Column('grain', String(500), nullable=False),
+            Column('row_count', Integer, nullable=False),
+            Column('refreshed_at', DateTime, nullable=False),
+        )
+        self.registry.create(self.db_connection.get_engine(), checkfirst=True)
+        self.refresh_log = []
+        self.last_source = None
+        loader.add_post_load_hook(self.on_fact_loaded)
+
+    def materialized(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the registry entries of the materialized rollups
+
+        Returns:
+            Dictionary of registry rows by aggregate name
+        """
+        with self.db_connection.checkout() as connection:
+            rows = connection.execute(self.registry.select()).mappings().all()
+        return {row['aggregate_name']: dict(row) for row in rows if row['aggregate_name'] in self.definitions}
+
+    def _register(self, connection, definition: AggregateDefinition):
+        """Record a (re)built rollup and its size in the registry"""
+        row_count = connection.execute(text(f"SELECT COUNT(*) FROM {definition.table_name}")).scalar()
+        connection.execute(self.registry.delete().where(self.registry.c.aggregate_name == definition.name))
+        connection.execute(self.registry.insert().values(
+            aggregate_name=definition.name,
+            table_name=definition.table_name,
+            grain=', '.join(definition.columns),
+            row_count=int(row_count),
+            refreshed_at=datetime.now(),
+        ))
+
+    def materialize(self, names: List[str] = None) -> Dict[str, int]:
+        """
+        Fully rebuild rollups from the fact table
+
+        Args:
+            names: Aggregates to build (default: all)
+
+        Returns:
+            Rows per rebuilt summary table
+        """
+        rows = {}
+        engine = self.db_connection.get_engine()
+        for name in names or list(self.definitions):
+            definition = self.definitions[name]
+            started = time.perf_counter()
+            with engine.begin() as connection:
+                df = pd.read_sql_query(text(definition.select_sql(self.fact_table)), connection)
+                self.loader.bulk_engine.load(df, definition.table_name, connection, if_exists='replace')
+                self._register(connection, definition)
+            self.db_connection.mark_table_changed(definition.table_name)
+            rows[name] = len(df)
+            print(f"Materialized {definition.table_name}: {len(df)} rows "
+                  f"({time.perf_counter() - started:.2f}s)")
+        return rows
+
+    def refresh_partitions(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Recompute the partitions of every materialized rollup touched by fact rows
+
+        Args:
+            df: Fact rows just loaded
+
+        Returns:
+            Touched partition keys per aggregate
+        """
+        started = time.perf_counter()
+        materialized = self.materialized()
+        touched = {}
+        engine = self.db_connection.get_engine()
+
+        with engine.begin() as connection:
+            for name in materialized:
+                definition = self.definitions[name]
+                if definition.partition_key not in df.columns:
+                    continue
+                keys = pd.DataFrame({definition.partition_key: pd.unique(df[definition.partition_key].dropna())})
+                if keys.empty:
+                    continue
+                self._refresh_definition(connection, definition, keys)
+                self._register(connection, definition)
+                touched[name] = len(keys)
+
+        for name in touched:
+            self.db_connection.mark_table_changed(self.definitions[name].table_name)
+
+        summary = {'touched': touched, 'duration_seconds': round(time.perf_counter() - started, 4)}
+        self.refresh_log.append(summary)
+        if touched:
+            print(f"Refreshed aggregate partitions: "
+                  f"{', '.join(f'{k}={v}' for k, v in touched.items())} ({summary['duration_seconds']}s)")
+        return summary
+
+    def _refresh_definition(self, connection, definition: AggregateDefinition, keys: pd.DataFrame):
+        """Delete and recompute the touched partitions of one rollup"""
+        staging = f"stg_{definition.table_name}_{uuid.uuid4().hex[:8]}"
+        self.loader.bulk_engine.load(keys, staging, connection, if_exists='replace')
+        partitions = definition.partition_lookup.format(staging=staging)
+
+        agg_match = ' AND '.join(f"p.{c} = {definition.table_name}.{c}" for c in definition.partition_columns)
+        connection.execute(text(
+            f"DELETE FROM {definition.table_name} "
+            f"WHERE EXISTS (SELECT 1 FROM ({partitions}) p WHERE {agg_match})"
+        ))
+
+        fact_match = ' AND '.join(f"p.{c} = {definition.columns[c]}" for c in definition.partition_columns)
+        select = definition.select_sql(self.fact_table, f"EXISTS (SELECT 1 FROM ({partitions}) p WHERE {fact_match})")
+        connection.execute(text(
+            f"INSERT INTO {definition.table_name} ({', '.join(definition.output_columns())}) {select}"
+        ))
+        connection.execute(text(f"DROP TABLE {staging}"))
+
+    def on_fact_loaded(self, table_name: str, df: pd.DataFrame):
+        """
+        DataLoader post-load hook: refresh the rollups after a fact load
+
+        Args:
+            table_name: Table just loaded
+            df: Rows loaded
+        """
+        if table_name == self.fact_table:
+            self.refresh_partitions(df)
+
+    def best_aggregate(self, dimensions: List[str], measures: List[str]) -> Optional[AggregateDefinition]:
+        """
+        Pick the smallest materialized rollup able to answer a query
+
+        Args:
+            dimensions: Columns to group by
+            measures: Measures requested (see ADDITIVE/DISTINCT/DERIVED_MEASURES)
+
+        Returns:
+            AggregateDefinition, or None if only the fact table can answer
+        """
+        candidates = [
+            (entry['row_count'], self.definitions[name])
+            for name, entry in self.materialized().items()
+            if self.definitions[name].can_serve(dimensions, measures)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda candidate: candidate[0])[1]
+
+    def query(self, dimensions: List[str], measures: List[str], where: str = '',
+              params: Dict[str, Any] = None) -> pd.DataFrame:
+        """
+        Answer a rollup query from the best materialized aggregate
+
+        Falls back to aggregating the fact table when no rollup covers the
+        requested grain and measures.
+
+        Args:
+            dimensions: Columns to group by
+            measures: Measures requested
+            where: Optional filter over the grain columns (on the fact table
+                fallback it may only use the requested dimensions)
+            params: Bind parameters of the filter
+
+        Returns:
+            DataFrame with the dimensions and measures
+        """
+        stored = [m for m in measures if m not in DERIVED_MEASURES]
+        for measure in measures:
+            for part in DERIVED_MEASURES.get(measure, ()):
+                if part not in stored:
+                    stored.append(part)
+
+        definition = self.best_aggregate(dimensions, measures)
+        if definition is not None:
+            self.last_source = definition.table_name
+            select = list(dimensions) + [
+                f"{'MAX' if m in DISTINCT_MEASURES else 'SUM'}({m}) AS {m}" for m in stored
+            ]
+            sql = (f"SELECT {', '.join(select)} FROM {definition.table_name} "
+                   f"{'WHERE ' + where if where else ''} "
+                   f"{'GROUP BY ' + ', '.join(dimensions) if dimensions else ''}")
+        else:
+            # Any definition exposing the dimensions knows how to join them
+            source = next((d for d in self.definitions.values() if set(dimensions) <= set(d.columns)), None)
+            if source is None:
+                raise ValueError(f"No aggregate definition exposes dimensions: {dimensions}")
+            self.last_source = self.fact_table
+            all_measures = {**ADDITIVE_MEASURES, **DISTINCT_MEASURES}
+            select = [f"{source.columns[c]} AS {c}" for c in dimensions]
+            select += [f"{all_measures[m]} AS {m}" for m in stored]
+            sql = (f"SELECT {', '.join(select)} FROM {self.fact_table} f {' '.join(source.joins)} "
+                   f"{'GROUP BY ' + ', '.join(source.columns[c] for c in dimensions) if dimensions else ''}")
+            if where:
+                # Grain column names only exist after grouping on the fact path
+                sql = f"SELECT * FROM ({sql}) q WHERE {where}"
+
+        df = self.db_connection.execute_query(sql, params)
+
+        for measure in measures:
+            if measure in DERIVED_MEASURES:
+                numerator, denominator = DERIVED_MEASURES[measure]
+                df[measure] = df[numerator] / df[denominator].where(df[denominator] != 0)
+        return df[list(dimensions) + list(measures)]
+
+
+if __name__ == "__main__":
+    # Example usage
+    # loader = DataLoader(connection_params)
+    # aggregates = AggregateManager(loader)
+    # aggregates.materialize()
+    # loader.load_fact(new_sales_df, 'sales')   # refreshes touched days/months/products/stores
+    # aggregates.query(['year', 'month_number'], ['revenue', 'profit'])   # served by agg_sales_monthly
+    for definition in DEFAULT_AGGREGATES:
+        print(f"{definition.name}: {definition.table_name} ({definition.description})")
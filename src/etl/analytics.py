@@ -0,0 +1,405 @@
+"""
+Analytics Module - ETL Pipeline
+Vectorized RFM segmentation and ABC (Pareto) classification over FactVentas
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+from typing import List, Tuple
+from src.etl.transform import DataTransformer
+from src.utils.db_connection import DatabaseConnection
+
+
+# FactVentas extract used by the analyses (one row per sale line)
+FACT_VENTAS_ANALYTICS_QUERY = """
+    SELECT f.id_venta, f.sk_cliente, f.sk_producto, f.sk_vendedor, f.sk_local,
+           f.cantidad, f.importe, f.margen, f.margen_porcentaje, d.fecha
+    FROM FactVentas f
+    JOIN DimFecha d ON d.sk_fecha = f.sk_fecha
+"""
+
+# Category labels of 09_analisis_abc_pareto.sql by entity
+ABC_LABELS = {
+    'productos': ('A (Top 80%)', 'B (80-95%)', 'C (95-100%)'),
+    'clientes': ('A (VIP)', 'B (Regular)', 'C (Ocasional)'),
+    'vendedores': ('A (Top performer)', 'B (Performer promedio)', 'C (Bajo desempeño)'),
+    'locales': ('A (Estratégico)', 'B (Importante)', 'C (Complementario)'),
+}
+
+# Cumulative share limits of the A and B classes
+ABC_THRESHOLDS = (0.80, 0.95)
+
+# Columns of the RFM accumulator state, per customer
+RFM_STATE_COLUMNS = ['ultima_fecha', 'num_transacciones', 'importe_total', 'margen_total',
+                     'lineas', 'ultimo_id_venta']
+
+
+def ntile(values, buckets: int, ascending: bool = True) -> np.ndarray:
+    """
+    Vectorized equivalent of SQL Server NTILE(buckets) OVER (ORDER BY values)
+
+    As in SQL Server, when the rows do not divide evenly the first groups
+    get one extra row. Ties keep their input order.
+
+    Args:
+        values: Values to order by
+        buckets: Number of groups
+        ascending: Order direction (False = ORDER BY ... DESC)
+
+    Returns:
+        int64 array with the group (1..buckets) of every row
+    """
+    values = np.asarray(values)
+    total = len(values)
+    if total == 0:
+        return np.array([], dtype='int64')
+
+    order = np.argsort(values if ascending else -values.astype('float64'), kind='stable')
+    ranks = np.empty(total, dtype='int64')
+    ranks[order] = np.arange(total)
+
+    size, remainder = divmod(total, buckets)
+    large_rows = remainder * (size + 1)
+    return np.where(
+        ranks < large_rows,
+        ranks // (size + 1),
+        remainder + (ranks - large_rows) // max(size, 1)
+    ) + 1
+
+
+def rfm_segment(r_score, f_score, m_score) -> np.ndarray:
+    """
+    Segment names of 10_analisis_rfm.sql from the three quintile scores
+
+    Args:
+        r_score: Recency scores (1-5)
+        f_score: Frequency scores (1-5)
+        m_score: Monetary scores (1-5)
+
+    Returns:
+        Array of segment names
+    """
+    r, f = np.asarray(r_score), np.asarray(f_score)
+    total = r + f + np.asarray(m_score)
+    conditions = [
+        total >= 13,
+        total >= 10,
+        (total >= 8) & (r >= 4),
+        total >= 8,
+        (total >= 6) & (f >= 3),
+        total >= 6,
+        (r <= 2) & (f >= 3),
+        (r <= 2) & (f <= 2),
+        r <= 2,
+    ]
+    choices = [
+        'Champions (RFM alto)',
+        'Loyal Customers (Leales)',
+        'Potential Loyalists (Potencial)',
+        'Recent Customers (Recientes)',
+        'Promising (Prometedores)',
+        'Customers Needing Attention (Necesitan atención)',
+        'At Risk (En riesgo)',
+        'Hibernating (Inactivos)',
+        'Lost (Perdidos)',
+    ]
+    return np.select(conditions, choices, default='About to Sleep (Por dormir)')
+
+
+def abc_classes(totals, labels: Tuple[str, str, str] = ('A', 'B', 'C'),
+                thresholds: Tuple[float, float] = ABC_THRESHOLDS) -> pd.DataFrame:
+    """
+    Pareto ranking and ABC class of each member from its total
+
+    Reproduces SUM(x) OVER (ORDER BY x DESC): tied totals share the same
+    running sum, like the default RANGE frame in SQL Server.
+
+    Args:
+        totals: Total per member (e.g. importe_total)
+        labels: Labels of the A, B and C classes
+        thresholds: Cumulative share limits of the A and B classes
+
+    Returns:
+        DataFrame aligned with totals: ranking, porcentaje_ventas,
+        porcentaje_acumulado and categoria_abc
+    """
+    totals = np.asarray(totals, dtype='float64')
+    order = np.argsort(-totals, kind='stable')
+    sorted_totals = totals[order]
+
+    running = np.cumsum(sorted_totals)
+    # Peers (equal totals) take the running sum of their last row
+    last_of_peers = np.r_[sorted_totals[1:] != sorted_totals[:-1], True] if len(totals) else np.array([], bool)
+    peer_group = np.cumsum(np.r_[0, last_of_peers[:-1]]) if len(totals) else np.array([], 'int64')
+    running = running[last_of_peers][peer_group]
+
+    grand_total = totals.sum()
+    share = running / grand_total if grand_total else np.zeros(len(totals))
+
+    result = pd.DataFrame(index=np.arange(len(totals)))
+    result.loc[order, 'ranking'] = np.arange(1, len(totals) + 1)
+    result.loc[order, 'porcentaje_ventas'] = np.round(sorted_totals / grand_total * 100, 2) if grand_total else 0.0
+    result.loc[order, 'porcentaje_acumulado'] = np.round(share * 100, 2)
+    result.loc[order, 'categoria_abc'] = np.select(
+        [share <= thresholds[0], share <= thresholds[1]], labels[:2], default=labels[2]
+    )
+    result['ranking'] = result['ranking'].astype('int64')
+    return result
+
+
+class AnalyticsTransformer(DataTransformer):
+    """
+    DataTransformer computing the RFM and ABC analyses in pandas/NumPy
+
+    Works on a FactVentas extract (see FACT_VENTAS_ANALYTICS_QUERY) instead
+    of the window-function scripts, which rescan the whole fact table.
+    """
+
+    def extract_facts(self, db_connection: DatabaseConnection,
+                      query: str = FACT_VENTAS_ANALYTICS_QUERY, optimize_dtypes: bool = False) -> pd.DataFrame:
+        """
+        Read the FactVentas lines used by the analyses
+
+        Args:
+            db_connection: Connection to the data warehouse
+            query: Extract query (must return the FACT_VENTAS_ANALYTICS_QUERY columns)
+            optimize_dtypes: Store keys as int32 and text attributes as categoricals
+
+        Returns:
+            DataFrame of fact lines with their sale date
+        """
+        facts = db_connection.execute_query(query)
+        facts['fecha'] = pd.to_datetime(facts['fecha'])
+        if optimize_dtypes:
+            facts = self.optimize_memory(facts)
+        return facts
+
+    def rfm_metrics(self, facts: pd.DataFrame, customer_column: str = 'sk_cliente') -> pd.DataFrame:
+        """
+        Recency/frequency/monetary inputs per customer
+
+        Args:
+            facts: Fact lines with id_venta, importe, margen and fecha
+            customer_column: Customer key column
+
+        Returns:
+            DataFrame indexed by customer with the RFM_STATE_COLUMNS
+        """
+        facts = facts[facts[customer_column] > 0]
+        metrics = facts.groupby(customer_column).agg(
+            ultima_fecha=('fecha', 'max'),
+            num_transacciones=('id_venta', 'nunique'),
+            importe_total=('importe', 'sum'),
+            margen_total=('margen', 'sum'),
+            lineas=('importe', 'size'),
+            ultimo_id_venta=('id_venta', 'max'),
+        )
+        return metrics[RFM_STATE_COLUMNS]
+
+    def score_rfm(self, metrics: pd.DataFrame, reference_date: date = None) -> pd.DataFrame:
+        """
+        Quintile scores and segments from per-customer RFM metrics
+
+        Args:
+            metrics: Output of rfm_metrics (or RFMAccumulator.state)
+            reference_date: Date recency is measured from (default: today)
+
+        Returns:
+            DataFrame with the columns of 10_analisis_rfm.sql
+        """
+        started = time.perf_counter()
+        reference = pd.Timestamp(reference_date or date.today())
+
+        scores = pd.DataFrame(index=metrics.index)
+        scores['dias_ultima_compra'] = (reference - pd.to_datetime(metrics['ultima_fecha'])).dt.days
+        scores['num_transacciones'] = metrics['num_transacciones'].astype('int64')
+        scores['importe_total'] = metrics['importe_total'].round(2)
+        scores['ticket_promedio'] = (metrics['importe_total'] / metrics['lineas']).round(2)
+        scores['margen_total'] = metrics['margen_total'].round(2)
+
+        scores['r_score'] = ntile(scores['dias_ultima_compra'].to_numpy(), 5, ascending=False)
+        scores['f_score'] = ntile(scores['num_transacciones'].to_numpy(), 5)
+        scores['m_score'] = ntile(metrics['importe_total'].to_numpy(), 5)
+        scores['rfm_score'] = scores['r_score'] + scores['f_score'] + scores['m_score']
+        scores['rfm_celula'] = (scores['r_score'].astype(str) + scores['f_score'].astype(str)
+                                + scores['m_score'].astype(str))
+        scores['segmento_rfm'] = rfm_segment(scores['r_score'], scores['f_score'], scores['m_score'])
+
+        scores = scores.sort_values(['rfm_score', 'importe_total'], ascending=False)
+
+        self.transformation_log.append({
+            'operation': 'score_rfm',
+            'timestamp': datetime.now(),
+            'customers': len(scores),
+            'duration_seconds': round(time.perf_counter() - started, 4)
+        })
+        print(f"Scored RFM for {len(scores)} customers")
+        return scores
+
+    def rfm_analysis(self, facts: pd.DataFrame, reference_date: date = None,
+                     customer_column: str = 'sk_cliente') -> pd.DataFrame:
+        """
+        Full RFM segmentation of a fact extract
+
+        Args:
+            facts: Fact lines with id_venta, importe, margen and fecha
+            reference_date: Date recency is measured from (default: today)
+            customer_column: Customer key column
+
+        Returns:
+            DataFrame of scores and segments per customer
+        """
+        return self.score_rfm(self.rfm_metrics(facts, customer_column), reference_date)
+
+    def abc_analysis(self, facts: pd.DataFrame, group_by: List[str], entity: str = None,
+                     value_column: str = 'importe', labels: Tuple[str, str, str] = None) -> pd.DataFrame:
+        """
+        ABC (Pareto 80/20) classification of products, customers, sellers or stores
+
+        Args:
+            facts: Fact lines (joined with the dimension attributes in group_by)
+            group_by: Member columns (e.g. ['sk_producto'] or ['marca', 'modelo'])
+            entity: Key of ABC_LABELS used for the class labels
+            value_column: Column ranked by its total
+            labels: Explicit class labels (overrides entity)
+
+        Returns:
+            DataFrame ordered by ranking with totals, shares and categoria_abc
+        """
+        labels = labels or ABC_LABELS.get(entity, ('A', 'B', 'C'))
+        key_columns = [c for c in group_by if c.startswith('sk_')]
+        members = facts[(facts[key_columns] > 0).all(axis=1)] if key_columns else facts
+
+        aggregations = {
+            'importe_total': (value_column, 'sum'),
+            'num_transacciones': ('id_venta', 'nunique'),
+        }
+        if 'margen' in members.columns:
+            aggregations['margen_total'] = ('margen', 'sum')
+        if 'cantidad' in members.columns:
+            aggregations['unidades_vendidas'] = ('cantidad', 'sum')
+        totals = members.groupby(group_by, as_index=False).agg(**aggregations)
+
+        classes = abc_classes(totals['importe_total'].to_numpy(), labels)
+        result = pd.concat([classes[['ranking']], totals, classes.drop(columns='ranking')], axis=1)
+        result = result.sort_values('ranking').reset_index(drop=True)
+
+        self.transformation_log.append({
+            'operation': 'abc_analysis',
+            'timestamp': datetime.now(),
+            'group_by': group_by,
+            'members': len(result),
+            'class_counts': result['categoria_abc'].value_counts().to_dict()
+        })
+        print(f"ABC analysis over {len(result)} members of {', '.join(group_by)}")
+        return result
+
+
+class RFMAccumulator:
+    """
+    Per-customer RFM state updated with each batch of new sales
+
+    Keeps last purchase date, distinct sales, totals and the last id_venta
+    of every customer, so segmentation only needs the new facts plus a
+    pass over the customer table instead of a rescan of the fact history.
+    Batches must contain new sales in id_venta order (as produced by
+    IncrementalFactLoader); a sale split across two batches is counted once.
+    """
+
+    def __init__(self, state: pd.DataFrame = None, customer_column: str = 'sk_cliente'):
+        """
+        Initialize the accumulator
+
+        Args:
+            state: Previous state (see RFM_STATE_COLUMNS), indexed by customer
+            customer_column: Customer key column of the fact batches
+        """
+        self.customer_column = customer_column
+        self.transformer = AnalyticsTransformer()
+        if state is None:
+            state = pd.DataFrame(columns=RFM_STATE_COLUMNS)
+            state.index.name = customer_column
+        self.state = state
+
+    def update(self, facts: pd.DataFrame) -> int:
+        """
+        Fold a batch of new fact lines into the state
+
+        Args:
+            facts: New fact lines with id_venta, importe, margen and fecha
+
+        Returns:
+            Number of customers touched by the batch
+        """
+        facts = facts.assign(fecha=pd.to_datetime(facts['fecha']))
+        batch = self.transformer.rfm_metrics(facts, self.customer_column)
+        if batch.empty:
+            return 0
+
+        # The first sale of the batch may continue the last sale of the previous one
+        first_sale = facts[facts[self.customer_column] > 0].groupby(self.customer_column)['id_venta'].min()
+        previous_last = self.state['ultimo_id_venta'].reindex(batch.index)
+        batch['num_transacciones'] -= (first_sale.reindex(batch.index) == previous_last).astype('int64')
+
+        combined = pd.concat([self.state, batch]) if len(self.state) else batch
+        self.state = combined.groupby(level=0).agg({
+            'ultima_fecha': 'max',
+            'num_transacciones': 'sum',
+            'importe_total': 'sum',
+            'margen_total': 'sum',
+            'lineas': 'sum',
+            'ultimo_id_venta': 'max',
+        })
+        self.state.index.name = self.customer_column
+        return len(batch)
+
+    def scores(self, reference_date: date = None) -> pd.DataFrame:
+        """
+        Current RFM scores and segments of every customer
+
+        Args:
+            reference_date: Date recency is measured from (default: today)
+
+        Returns:
+            DataFrame of scores and segments per customer
+        """
+        return self.transformer.score_rfm(self.state, reference_date)
+
+    def save(self, loader, table_name: str = 'etl_rfm_acumulado') -> bool:
+        """
+        Persist the state to a DW table
+
+        Args:
+            loader: DataLoader of the data warehouse
+            table_name: State table name
+
+        Returns:
+            True if successful
+        """
+        return loader.load_to_database(self.state.reset_index(), table_name, if_exists='replace')
+
+    @classmethod
+    def load(cls, db_connection: DatabaseConnection, table_name: str = 'etl_rfm_acumulado',
+             customer_column: str = 'sk_cliente') -> 'RFMAccumulator':
+        """
+        Restore an accumulator saved with save()
+
+        Args:
+            db_connection: Connection to the data warehouse
+            table_name: State table name
+            customer_column: Customer key column
+
+        Returns:
+            RFMAccumulator with the stored state
+        """
+        state = db_connection.execute_query(f"SELECT * FROM {table_name}").set_index(customer_column)
+        state['ultima_fecha'] = pd.to_datetime(state['ultima_fecha'])
+        return cls(state[RFM_STATE_COLUMNS], customer_column)
+
+
+if __name__ == "__main__":
+    # Example usage
+    print(ntile([10, 20, 30, 40, 50, 60, 70], 5))
+    print(abc_classes([500, 300, 100, 50, 50]))
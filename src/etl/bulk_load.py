@@ -0,0 +1,378 @@
+"""
+Bulk Load Engines - ETL Pipeline
+Dialect-specific fast paths used by DataLoader instead of row-wise inserts
+"""
+
+import csv
+import io
+import pandas as pd
+from contextlib import contextmanager
+from typing import List, Optional, Tuple, Union
+from sqlalchemy.engine import Connection, Engine
+
+
+# NULL marker of the COPY CSV stream (a text value equal to it loads as NULL)
+COPY_NULL = '\\N'
+
+
+@contextmanager
+def _transaction(connectable: Union[Engine, Connection]):
+    """Open a transaction on an engine, or reuse a caller-managed connection"""
+    if isinstance(connectable, Engine):
+        with connectable.begin() as connection:
+            yield connection
+    else:
+        yield connectable
+
+
+class BulkLoadEngine:
+    """
+    Base engine: plain DataFrame.to_sql with parameterized inserts
+
+    Subclasses override batch_size/method to plug in a faster insert path.
+    Every engine loads one DataFrame inside a single transaction.
+    """
+
+    name = 'to_sql'
+
+    def __init__(self, batch_size: Optional[int] = None):
+        """
+        Initialize the engine
+
+        Args:
+            batch_size: Rows per insert batch (None lets the engine decide)
+        """
+        self.batch_size = batch_size
+
+    def load(self, df: pd.DataFrame, table_name: str, engine: Union[Engine, Connection],
+             if_exists: str = 'append', chunksize: int = 1000) -> int:
+        """
+        Load a DataFrame into a table
+
+        Args:
+            df: DataFrame to load
+            table_name: Target table name
+            engine: SQLAlchemy engine of the target database (loaded in its own
+                transaction), or a connection whose transaction the caller manages
+            if_exists: How to behave if table exists ('fail', 'replace', 'append')
+            chunksize: Rows per batch when the engine has no batch size of its own
+
+        Returns:
+            Number of rows loaded
+        """
+        with _transaction(engine) as connection:
+            df.to_sql(
+                name=table_name,
+                con=connection,
+                if_exists=if_exists,
+                index=False,
+                chunksize=self._batch_rows(df, chunksize),
+                method=self._insert_method()
+            )
+        return len(df)
+
+    def _batch_rows(self, df: pd.DataFrame, chunksize: int) -> Optional[int]:
+        """Rows sent per insert batch"""
+        return self.batch_size or chunksize
+
+    def _insert_method(self):
+        """Insert method passed to DataFrame.to_sql (None = executemany)"""
+        return None
+
+
+class PostgresCopyEngine(BulkLoadEngine):
+    """
+    PostgreSQL engine streaming each batch through COPY ... FROM STDIN
+
+    Rows are serialized to an in-memory CSV buffer per batch, so memory is
+    bounded by batch_size rather than by the DataFrame size.
+    """
+
+    name = 'postgres_copy'
+
+    def __init__(self, batch_size: Optional[int] = 100000):
+        super().__init__(batch_size)
+
+    def _insert_method(self):
+        return copy_from_stdin
+
+
+class MultiRowInsertEngine(BulkLoadEngine):
+    """
+    Generic engine sending multi-row INSERT ... VALUES (...), (...) batches
+
+    The rows per statement are derived from the backend's bind parameter
+    limit so each statement carries as many rows as the driver accepts.
+    """
+
+    name = 'multirow_insert'
+
+    # Maximum bind parameters per statement by dialect (SQL Server allows
+    # 2100 per request and the driver needs one of them)
+    MAX_PARAMETERS = {
+        'mssql': 2099,
+        'sqlite': 32766,
+        'postgresql': 65535,
+        'mysql': 65535,
+    }
+    DEFAULT_MAX_PARAMETERS = 2000
+
+    # Maximum rows per VALUES constructor by dialect
+    MAX_ROWS = {
+        'mssql': 1000,
+    }
+
+    def __init__(self, batch_size: Optional[int] = None, dialect: str = None):
+        super().__init__(batch_size)
+        self.max_parameters = self.MAX_PARAMETERS.get(dialect, self.DEFAULT_MAX_PARAMETERS)
+        self.max_rows = self.MAX_ROWS.get(dialect)
+
+    def _batch_rows(self, df: pd.DataFrame, chunksize: int) -> Optional[int]:
+        return self.batch_size or 50000
+
+    def _insert_method(self):
+        max_parameters, max_rows = self.max_parameters, self.max_rows
+
+        def insert(pd_table, connection, keys, data_iter):
+            return multirow_values_insert(pd_table, connection, keys, data_iter, max_parameters, max_rows)
+
+        return insert
+
+
+class ExecuteManyEngine(BulkLoadEngine):
+    """
+    Engine calling the driver's executemany directly with large batches
+
+    Used for drivers that already rewrite executemany into multi-row
+    statements (e.g. PyMySQL) or run it natively in C (sqlite3).
+    """
+
+    name = 'executemany'
+
+    def __init__(self, batch_size: Optional[int] = 50000):
+        super().__init__(batch_size)
+
+    def _insert_method(self):
+        return executemany_insert
+
+
+class SQLiteTransactionEngine(ExecuteManyEngine):
+    """
+    SQLite engine loading the whole DataFrame in one executemany/transaction
+
+    SQLite pays a journal sync per commit, so a single transaction with a
+    single executemany is the fastest path available through the driver.
+    """
+
+    name = 'sqlite_transaction'
+
+    def __init__(self, batch_size: Optional[int] = None):
+        super().__init__(batch_size)
+
+    def _batch_rows(self, df: pd.DataFrame, chunksize: int) -> Optional[int]:
+        return self.batch_size
+
+
+# Default engine per SQLAlchemy dialect name
+DIALECT_ENGINES = {
+    'postgresql': PostgresCopyEngine,
+    'sqlite': SQLiteTransactionEngine,
+    'mysql': ExecuteManyEngine,
+}
+
+# Engines selectable by name
+BULK_LOAD_ENGINES = {
+    BulkLoadEngine.name: BulkLoadEngine,
+    PostgresCopyEngine.name: PostgresCopyEngine,
+    MultiRowInsertEngine.name: MultiRowInsertEngine,
+    ExecuteManyEngine.name: ExecuteManyEngine,
+    SQLiteTransactionEngine.name: SQLiteTransactionEngine,
+}
+
+
+def get_bulk_load_engine(dialect: str, engine_name: str = None, **kwargs) -> BulkLoadEngine:
+    """
+    Pick the bulk-load engine for a dialect
+
+    Args:
+        dialect: SQLAlchemy dialect name ('postgresql', 'sqlite', 'mysql', ...)
+        engine_name: Optional explicit engine name (see BULK_LOAD_ENGINES)
+        **kwargs: Extra arguments for the engine constructor (e.g. batch_size)
+
+    Returns:
+        BulkLoadEngine instance
+    """
+    if engine_name:
+        if engine_name not in BULK_LOAD_ENGINES:
+            raise ValueError(f"Unknown bulk load engine: {engine_name}. "
+                             f"Available: {', '.join(BULK_LOAD_ENGINES)}")
+        engine_class = BULK_LOAD_ENGINES[engine_name]
+    else:
+        engine_class = DIALECT_ENGINES.get(dialect, MultiRowInsertEngine)
+
+    if engine_class is MultiRowInsertEngine:
+        kwargs.setdefault('dialect', dialect)
+    return engine_class(**kwargs)
+
+
+def _qualified_table(pd_table, connection) -> str:
+    """Dialect-quoted (schema.)table name of a pandas SQLTable"""
+    preparer = connection.dialect.identifier_preparer
+    table = preparer.quote(pd_table.name)
+    return f"{preparer.quote_schema(pd_table.schema)}.{table}" if pd_table.schema else table
+
+
+def _positional_placeholders(connection, count: int) -> List[str]:
+    """Positional bind placeholders in the DBAPI driver's paramstyle"""
+    paramstyle = connection.dialect.dbapi.paramstyle
+    if paramstyle == 'qmark':
+        return ['?'] * count
+    if paramstyle in ('format', 'pyformat'):
+        return ['%s'] * count
+    if paramstyle == 'numeric':
+        return [f':{i}' for i in range(1, count + 1)]
+    raise ValueError(f"Unsupported DBAPI paramstyle for bulk insert: {paramstyle}")
+
+
+def executemany_insert(pd_table, connection, keys: List[str], data_iter) -> int:
+    """
+    DataFrame.to_sql insert method calling the DBAPI cursor.executemany directly
+
+    Skips SQLAlchemy's per-row parameter dictionaries, which dominate the
+    cost of plain to_sql inserts.
+
+    Args:
+        pd_table: pandas SQLTable being written
+        connection: SQLAlchemy connection
+        keys: Column names
+        data_iter: Iterable of row tuples
+
+    Returns:
+        Number of rows inserted
+    """
+    preparer = connection.dialect.identifier_preparer
+    columns = ', '.join(preparer.quote(key) for key in keys)
+    placeholders = ', '.join(_positional_placeholders(connection, len(keys)))
+    sql = f"INSERT INTO {_qualified_table(pd_table, connection)} ({columns}) VALUES ({placeholders})"
+
+    rows = list(data_iter)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.executemany(sql, rows)
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+def multirow_values_insert(pd_table, connection, keys: List[str], data_iter,
+                           max_parameters: int = 2000, max_rows: Optional[int] = None) -> int:
+    """
+    DataFrame.to_sql insert method sending multi-row VALUES statements
+
+    Rows are grouped into INSERT ... VALUES (...), (...) statements as large
+    as the bind parameter limit allows; all full-size statements go to the
+    driver in a single executemany call.
+
+    Args:
+        pd_table: pandas SQLTable being written
+        connection: SQLAlchemy connection
+        keys: Column names
+        data_iter: Iterable of row tuples
+        max_parameters: Bind parameter limit per statement
+        max_rows: Row limit per VALUES constructor (None: no limit)
+
+    Returns:
+        Number of rows inserted
+    """
+    rows = list(data_iter)
+    if not rows:
+        return 0
+
+    rows_per_statement = max(1, max_parameters // len(keys))
+    if max_rows:
+        rows_per_statement = min(rows_per_statement, max_rows)
+    preparer = connection.dialect.identifier_preparer
+    prefix = (f"INSERT INTO {_qualified_table(pd_table, connection)} "
+              f"({', '.join(preparer.quote(key) for key in keys)}) VALUES ")
+
+    def statement(row_count: int) -> str:
+        placeholders = _positional_placeholders(connection, len(keys) * row_count)
+        groups = (', '.join(placeholders[i * len(keys):(i + 1) * len(keys)]) for i in range(row_count))
+        return prefix + ', '.join(f"({group})" for group in groups)
+
+    full_statements = len(rows) // rows_per_statement
+    cursor = connection.connection.cursor()
+    try:
+        if full_statements:
+            batches = [
+                [value for row in rows[i * rows_per_statement:(i + 1) * rows_per_statement] for value in row]
+                for i in range(full_statements)
+            ]
+            cursor.executemany(statement(rows_per_statement), batches)
+        remainder = rows[full_statements * rows_per_statement:]
+        if remainder:
+            cursor.execute(statement(len(remainder)), [value for row in remainder for value in row])
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+def copy_csv_buffer(data_iter) -> Tuple[io.StringIO, int]:
+    """
+    Write rows as COPY CSV: text is quoted (so '' stays an empty string) and
+    NULLs are written as COPY_NULL
+
+    Args:
+        data_iter: Iterable of row tuples
+
+    Returns:
+        Tuple (buffer positioned at the start, number of rows)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    rows = 0
+    for row in data_iter:
+        writer.writerow([COPY_NULL if value is None else value for value in row])
+        rows += 1
+    buffer.seek(0)
+    return buffer, rows
+
+
+def copy_from_stdin(pd_table, connection, keys: List[str], data_iter) -> int:
+    """
+    DataFrame.to_sql insert method using PostgreSQL COPY FROM STDIN
+
+    Args:
+        pd_table: pandas SQLTable being written
+        connection: SQLAlchemy connection
+        keys: Column names
+        data_iter: Iterable of row tuples
+
+    Returns:
+        Number of rows copied
+    """
+    buffer, rows = copy_csv_buffer(data_iter)
+
+    preparer = connection.dialect.identifier_preparer
+    columns = ', '.join(preparer.quote(key) for key in keys)
+    # Quoted fields only match NULL through FORCE_NULL
+    copy_sql = (f"COPY {_qualified_table(pd_table, connection)} ({columns}) FROM STDIN "
+                f"WITH (FORMAT csv, NULL '{COPY_NULL}', FORCE_NULL ({columns}))")
+
+    dbapi_connection = connection.connection
+    with dbapi_connection.cursor() as cursor:
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            cursor.copy_expert(copy_sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+
+    return rows
+
+
+if __name__ == "__main__":
+    # Example usage
+    for dialect in ('postgresql', 'sqlite', 'mysql', 'mssql'):
+        print(f"{dialect}: {get_bulk_load_engine(dialect).name}")
@@ -0,0 +1,259 @@
+"""
+Dimension Generators Module - ETL Pipeline
+Vectorized DimFecha and DimExchangeRate generation and bulk loading
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Dict, Any, Union
+from src.etl.load import DataLoader
+
+
+DateLike = Union[str, date, pd.Timestamp]
+
+# Localized names used by 04_etl_dw_inicial.sql
+NOMBRES_MES = np.array(['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto',
+                        'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'], dtype=object)
+# Indexed like DATEPART(WEEKDAY) - 1 with SET DATEFIRST 7 (Sunday first)
+NOMBRES_DIA = np.array(['Domingo', 'Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado'], dtype=object)
+
+DIM_FECHA_COLUMNS = ['fecha', 'anio', 'mes', 'trimestre', 'dia_semana', 'nombre_mes', 'es_fin_semana',
+                     'numero_semana', 'dia_mes', 'dia_anio']
+
+# Base rates (ARS per unit) and monthly growth of the synthetic series of 06_completar_exchange_rate.sql
+BASE_RATES = {'ARS': 1.0, 'USD': 350.0, 'EUR': 380.0, 'BRL': 70.0, 'CNY': 50.0}
+MONTHLY_GROWTH = 0.01
+FUENTE_SINTETICA = 'Fuente sintética (demo)'
+FUENTE_ARRASTRE = 'Arrastre del último mes informado'
+
+EXCHANGE_RATE_COLUMNS = ['sk_moneda', 'fecha', 'codigo_moneda', 'tasa_ars_por_unidad', 'fuente']
+
+
+def build_dim_fecha(fecha_desde: DateLike, fecha_hasta: DateLike) -> pd.DataFrame:
+    """
+    Build every DimFecha row of a date range in one vectorized pass
+
+    Matches the WHILE loop of 04_etl_dw_inicial.sql under the default
+    SQL Server settings (DATEFIRST 7): weeks start on Sunday and week 1 is
+    the week containing January 1st (DATEPART(WEEK)).
+
+    Args:
+        fecha_desde: First date (inclusive)
+        fecha_hasta: Last date (inclusive)
+
+    Returns:
+        DataFrame with the DIM_FECHA_COLUMNS
+    """
+    fechas = pd.date_range(fecha_desde, fecha_hasta, freq='D')
+    weekday = (fechas.dayofweek.to_numpy() + 1) % 7          # Sunday = 0 ... Saturday = 6
+    dia_anio = fechas.dayofyear.to_numpy()
+    weekday_jan1 = (weekday - (dia_anio - 1)) % 7
+
+    return pd.DataFrame({
+        'fecha': fechas.date,
+        'anio': fechas.year.to_numpy(),
+        'mes': fechas.month.to_numpy(),
+        'trimestre': fechas.quarter.to_numpy(),
+        'dia_semana': NOMBRES_DIA[weekday],
+        'nombre_mes': NOMBRES_MES[fechas.month.to_numpy() - 1],
+        'es_fin_semana': ((weekday == 0) | (weekday == 6)).astype('int8'),
+        'numero_semana': (dia_anio - 1 + weekday_jan1) // 7 + 1,
+        'dia_mes': fechas.day.to_numpy(),
+        'dia_anio': dia_anio,
+    }, columns=DIM_FECHA_COLUMNS)
+
+
+def build_exchange_rates(monedas: pd.DataFrame, mes_desde: DateLike, mes_hasta: DateLike,
+                         observed: pd.DataFrame = None, base_rates: Dict[str, float] = None,
+                         monthly_growth: float = MONTHLY_GROWTH) -> pd.DataFrame:
+    """
+    Build a complete monthly DimExchangeRate grid (month x currency)
+
+    Observed rates are kept, months after an observation are forward-filled
+    with the last informed rate, and months before the first observation of
+    a currency get the synthetic series of 06_completar_exchange_rate.sql
+    (base rate x (1 + growth)^n, n = months since mes_desde).
+
+    Args:
+        monedas: DimMoneda rows with sk_moneda and codigo_moneda
+        mes_desde: First month (any date inside it)
+        mes_hasta: Last month (any date inside it)
+        observed: Known rates with codigo_moneda, fecha, tasa_ars_por_unidad
+            and optionally fuente
+        base_rates: Synthetic base rate per currency (default: BASE_RATES;
+            currencies missing here get no synthetic rate)
+        monthly_growth: Synthetic monthly growth
+
+    Returns:
+        DataFrame with the EXCHANGE_RATE_COLUMNS, one row per month and currency
+    """
+    base_rates = BASE_RATES if base_rates is None else base_rates
+    months = pd.date_range(pd.Timestamp(mes_desde).to_period('M').to_timestamp(),
+                           pd.Timestamp(mes_hasta).to_period('M').to_timestamp(), freq='MS')
+    monedas = monedas[['sk_moneda', 'codigo_moneda']].drop_duplicates('codigo_moneda').reset_index(drop=True)
+
+    grid = pd.DataFrame({
+        'sk_moneda': np.repeat(monedas['sk_moneda'].to_numpy(), len(months)),
+        'codigo_moneda': np.repeat(monedas['codigo_moneda'].to_numpy(), len(months)),
+        'fecha': np.tile(months.to_numpy(), len(monedas)),
+        'n': np.tile(np.arange(len(months)), len(monedas)),
+    })
+
+    if observed is not None and len(observed):
+        observed = observed.assign(
+            fecha=pd.to_datetime(observed['fecha']).dt.to_period('M').dt.to_timestamp(),
+            fuente=observed['fuente'] if 'fuente' in observed.columns else None,
+        ).drop_duplicates(['codigo_moneda', 'fecha'], keep='last')
+        grid = grid.merge(observed[['codigo_moneda', 'fecha', 'tasa_ars_por_unidad', 'fuente']],
+                          on=['codigo_moneda', 'fecha'], how='left')
+        # Rates informed before mes_desde seed the forward fill
+        previous = (observed[observed['fecha'] < months[0]]
+                    .sort_values('fecha').groupby('codigo_moneda')['tasa_ars_por_unidad'].last())
+    else:
+        grid['tasa_ars_por_unidad'] = np.nan
+        grid['fuente'] = None
+        previous = pd.Series(dtype='float64')
+
+    informed = grid['tasa_ars_por_unidad'].notna()
+    carried = grid.groupby('codigo_moneda', sort=False)['tasa_ars_por_unidad'].ffill()
+    carried = carried.fillna(grid['codigo_moneda'].map(previous))
+    synthetic = (grid['codigo_moneda'].map(base_rates)
+                 * np.power(1.0 + monthly_growth, grid['n'])).round(4)
+
+    grid['tasa_ars_por_unidad'] = carried.fillna(synthetic)
+    grid['fuente'] = np.where(informed, grid['fuente'].fillna('Informado'),
+                              np.where(carried.notna(), FUENTE_ARRASTRE, FUENTE_SINTETICA))
+    grid = grid[grid['tasa_ars_por_unidad'].notna()]
+    grid = grid.assign(fecha=grid['fecha'].dt.date)
+    return grid[EXCHANGE_RATE_COLUMNS].reset_index(drop=True)
+
+
+class DateDimensionLoader:
+    """
+    Extends DimFecha and DimExchangeRate with generated rows
+
+    Only rows missing from the target are shipped, through the loader's
+    bulk-load engine, so extending the calendar by decades is one range
+    query plus one bulk insert.
+    """
+
+    def __init__(self, loader: DataLoader, fecha_table: str = 'DimFecha',
+                 exchange_table: str = 'DimExchangeRate', moneda_table: str = 'DimMoneda'):
+        """
+        Initialize the loader
+
+        Args:
+            loader: DataLoader of the data warehouse
+            fecha_table: Date dimension table
+            exchange_table: Exchange rate table
+            moneda_table: Currency dimension table
+        """
+        self.loader = loader
+        self.fecha_table = fecha_table
+        self.exchange_table = exchange_table
+        self.moneda_table = moneda_table
+
+    def _quote(self, name: str) -> str:
+        return self.loader.db_connection.get_engine().dialect.identifier_preparer.quote(name)
+
+    def _next_keys(self, key_column: str, table_name: str, count: int) -> np.ndarray:
+        """MAX(key)+1.. for targets without an IDENTITY surrogate key"""
+        max_key = self.loader.db_connection.execute_query(
+            f"SELECT MAX({self._quote(key_column)}) AS max_key FROM {self._quote(table_name)}"
+        )['max_key'].iloc[0]
+        first_key = 1 if pd.isna(max_key) else int(max_key) + 1
+        return np.arange(first_key, first_key + count, dtype='int64')
+
+    def load_dim_fecha(self, fecha_desde: DateLike, fecha_hasta: DateLike,
+                       generate_keys: bool = False) -> Dict[str, Any]:
+        """
+        Insert the missing DimFecha rows of a date range
+
+        Args:
+            fecha_desde: First date (inclusive)
+            fecha_hasta: Last date (inclusive)
+            generate_keys: Assign sk_fecha (for tables without IDENTITY)
+
+        Returns:
+            Summary with generated and inserted rows
+        """
+        started = time.perf_counter()
+        calendar = build_dim_fecha(fecha_desde, fecha_hasta)
+        existing = self.loader.db_connection.execute_query(
+            f"SELECT fecha FROM {self._quote(self.fecha_table)} WHERE fecha BETWEEN :desde AND :hasta",
+            {'desde': calendar['fecha'].iloc[0], 'hasta': calendar['fecha'].iloc[-1]}
+        ) if len(calendar) else pd.DataFrame(columns=['fecha'])
+        existing_dates = set(pd.to_datetime(existing['fecha']).dt.date)
+        missing = calendar[~calendar['fecha'].isin(existing_dates)]
+
+        if len(missing) and generate_keys:
+            missing = missing.assign(sk_fecha=self._next_keys('sk_fecha', self.fecha_table, len(missing)))
+        success = self.loader.load_to_database(missing, self.fecha_table) if len(missing) else True
+
+        summary = {
+            'table': self.fecha_table,
+            'generated': len(calendar),
+            'inserted': len(missing) if success else 0,
+            'status': 'success' if success else 'failed',
+            'duration_seconds': round(time.perf_counter() - started, 4),
+        }
+        print(f"DimFecha {fecha_desde}..{fecha_hasta}: {summary['inserted']} rows inserted "
+              f"({summary['generated'] - len(missing)} already present)")
+        return summary
+
+    def load_exchange_rates(self, mes_desde: DateLike, mes_hasta: DateLike,
+                            base_rates: Dict[str, float] = None,
+                            monthly_growth: float = MONTHLY_GROWTH) -> Dict[str, Any]:
+        """
+        Complete DimExchangeRate for every month and currency of a range
+
+        The rates already stored are the observations: later missing months
+        are forward-filled from them and earlier ones get the synthetic series.
+
+        Args:
+            mes_desde: First month
+            mes_hasta: Last month
+            base_rates: Synthetic base rates (default: BASE_RATES)
+            monthly_growth: Synthetic monthly growth
+
+        Returns:
+            Summary with generated and inserted rows
+        """
+        started = time.perf_counter()
+        base_rates = BASE_RATES if base_rates is None else base_rates
+        monedas = self.loader.db_connection.execute_query(
+            f"SELECT sk_moneda, codigo_moneda FROM {self._quote(self.moneda_table)}"
+        )
+        monedas = monedas[monedas['codigo_moneda'].isin(list(base_rates))]
+        observed = self.loader.db_connection.execute_query(
+            f"SELECT codigo_moneda, fecha, tasa_ars_por_unidad, fuente FROM {self._quote(self.exchange_table)} "
+            f"WHERE fecha <= :hasta",
+            {'hasta': pd.Timestamp(mes_hasta).to_period('M').to_timestamp(how='end').date()}
+        )
+
+        rates = build_exchange_rates(monedas, mes_desde, mes_hasta, observed, base_rates, monthly_growth)
+        observed_months = pd.to_datetime(observed['fecha']).dt.to_period('M').dt.to_timestamp().dt.date
+        stored = set(zip(observed['codigo_moneda'], observed_months))
+        missing = rates[[key not in stored for key in zip(rates['codigo_moneda'], rates['fecha'])]]
+        success = self.loader.load_to_database(missing, self.exchange_table) if len(missing) else True
+
+        summary = {
+            'table': self.exchange_table,
+            'generated': len(rates),
+            'inserted': len(missing) if success else 0,
+            'status': 'success' if success else 'failed',
+            'duration_seconds': round(time.perf_counter() - started, 4),
+        }
+        print(f"DimExchangeRate {mes_desde}..{mes_hasta}: {summary['inserted']} rows inserted "
+              f"({summary['generated'] - len(missing)} already present)")
+        return summary
+
+
+if __name__ == "__main__":
+    # Example usage
+    calendar = build_dim_fecha('2020-01-01', '2030-12-31')
+    print(calendar.head())
+    monedas = pd.DataFrame({'sk_moneda': [1, 2, 3, 4, 5], 'codigo_moneda': list(BASE_RATES)})
+    print(build_exchange_rates(monedas, '2023-01-01', '2024-12-01').head(10))
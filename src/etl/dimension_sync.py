@@ -0,0 +1,312 @@
+"""
+Dimension Sync Module - ETL Pipeline
+Hash-based change detection for the SCD Type 1 dimension MERGEs
+"""
+
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from src.etl.scd import compute_row_hash
+from src.utils.db_connection import DatabaseConnection
+
+
+# Column holding the content hash of the synced attributes
+HASH_COLUMN = 'row_hash'
+
+# Dimensions synced by 05_reproceso_diario.sql with MERGE (SCD Type 1)
+DIMENSION_SYNC_SPECS = {
+    'cliente': {
+        'table': 'DimCliente',
+        'natural_key': ['id_cliente_fuente'],
+        'surrogate_key': 'sk_cliente',
+        'columns': ['nombre', 'apellido', 'genero'],
+        'source_query': """
+            SELECT c.id_cliente AS id_cliente_fuente, c.nombre, c.apellido, c.genero
+            FROM Clientes c
+        """,
+    },
+    'producto': {
+        'table': 'DimProducto',
+        'natural_key': ['id_modelo_fuente'],
+        'surrogate_key': 'sk_producto',
+        'columns': ['marca', 'modelo', 'almacenamiento_gb', 'ram_gb'],
+        'source_query': """
+            SELECT m.id_modelo AS id_modelo_fuente, ma.marca, m.modelo, m.almacenamiento_gb, m.ram_gb
+            FROM Modelos m
+            JOIN Marcas ma ON ma.id_marca = m.id_marca
+        """,
+    },
+    'local': {
+        'table': 'DimLocal',
+        'natural_key': ['id_local_fuente'],
+        'surrogate_key': 'sk_local',
+        'columns': ['provincia', 'ciudad', 'local'],
+        'source_query': """
+            SELECT l.id_local AS id_local_fuente, c.provincia, c.ciudad, l.nombre_local AS local
+            FROM Locales l
+            JOIN Ciudades c ON c.id_ciudad = l.id_ciudad
+        """,
+    },
+    'forma_pago': {
+        'table': 'DimFormaPago',
+        'natural_key': ['id_forma_pago_fuente'],
+        'surrogate_key': 'sk_forma_pago',
+        'columns': ['forma_pago'],
+        'source_query': """
+            SELECT id_forma_pago AS id_forma_pago_fuente, descripcion AS forma_pago
+            FROM FormasPago
+        """,
+    },
+    'canal': {
+        # The MERGE only inserts new channels; descripcion is filled on insert
+        'table': 'DimCanal',
+        'natural_key': ['canal'],
+        'surrogate_key': 'sk_canal',
+        'columns': [],
+        'insert_defaults': {'descripcion': 'Venta por canal {canal}'},
+        'source_query': "SELECT DISTINCT canal FROM Ventas",
+    },
+}
+
+
+def _signed_hashes(hashes: np.ndarray) -> np.ndarray:
+    """uint64 hashes reinterpreted as int64 so they fit a BIGINT column"""
+    return np.asarray(hashes, dtype='uint64').view('int64')
+
+
+class DimensionSynchronizer:
+    """
+    Keeps an SCD Type 1 dimension in sync with its source by content hash
+
+    The dimension stores a hash of the synced attributes per member. A sync
+    reads only the natural keys and hashes of the dimension, compares them
+    with the hashes of the source rows and ships just the new and changed
+    members (bulk INSERT plus one set-based UPDATE), so its cost follows the
+    churn instead of the table size.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, table_name: str, natural_key: List[str],
+                 columns: List[str], hash_column: str = HASH_COLUMN, surrogate_key: str = None,
+                 generate_keys: bool = False, insert_defaults: Dict[str, str] = None,
+                 bulk_engine=None):
+        """
+        Initialize the synchronizer
+
+        Args:
+            db_connection: Connection to the data warehouse
+            table_name: Dimension table name
+            natural_key: Columns identifying a member in the source
+            columns: Attribute columns kept in sync (overwritten on change)
+            hash_column: Dimension column storing the attribute hash
+            surrogate_key: Surrogate key column of the dimension
+            generate_keys: Assign MAX(surrogate_key)+1.. to new members
+                (for tables without an IDENTITY/serial surrogate key)
+            insert_defaults: Column -> str.format template filled from the
+                row on insert only (e.g. DimCanal.descripcion)
+            bulk_engine: Bulk-load engine used for the insert/staging batches
+        """
+        self.db_connection = db_connection
+        self.table_name = table_name
+        self.natural_key = list(natural_key)
+        self.columns = list(columns)
+        self.hash_column = hash_column
+        self.surrogate_key = surrogate_key
+        self.generate_keys = generate_keys
+        self.insert_defaults = insert_defaults or {}
+        self.bulk_engine = bulk_engine
+
+    @classmethod
+    def from_spec(cls, db_connection: DatabaseConnection, name: str, **options) -> 'DimensionSynchronizer':
+        """
+        Build a synchronizer for one of the DIMENSION_SYNC_SPECS dimensions
+
+        Args:
+            db_connection: Connection to the data warehouse
+            name: Key of DIMENSION_SYNC_SPECS ('cliente', 'producto', ...)
+            **options: Overrides of the constructor arguments
+
+        Returns:
+            DimensionSynchronizer
+        """
+        spec = DIMENSION_SYNC_SPECS[name]
+        settings = {
+            'table_name': spec['table'],
+            'natural_key': spec['natural_key'],
+            'columns': spec['columns'],
+            'surrogate_key': spec.get('surrogate_key'),
+            'insert_defaults': spec.get('insert_defaults'),
+        }
+        settings.update(options)
+        return cls(db_connection, **settings)
+
+    def read_hashes(self, connection: Connection) -> pd.DataFrame:
+        """
+        Read the natural keys and stored hashes of the dimension
+
+        Args:
+            connection: Open connection to the data warehouse
+
+        Returns:
+            DataFrame with the natural key and hash columns
+        """
+        quote = connection.dialect.identifier_preparer.quote
+        columns = ', '.join(quote(c) for c in self.natural_key + [self.hash_column])
+        return pd.read_sql_query(text(f"SELECT {columns} FROM {quote(self.table_name)}"), connection)
+
+    def diff(self, incoming: pd.DataFrame, stored: pd.DataFrame):
+        """
+        Compare source rows with the stored hashes
+
+        Members without a stored hash (rows loaded before the hash column
+        existed) count as changed, which backfills their hash.
+
+        Args:
+            incoming: Source rows with the natural key and synced columns
+            stored: Natural keys and hashes from the dimension
+
+        Returns:
+            Tuple (rows to insert, rows to update), both with the hash column
+        """
+        incoming = incoming.drop_duplicates(self.natural_key, keep='last').reset_index(drop=True)
+        incoming = incoming[self.natural_key + self.columns].assign(
+            **{self.hash_column: _signed_hashes(compute_row_hash(incoming, self.columns))}
+        )
+
+        stored = stored.rename(columns={self.hash_column: '_stored_hash'})
+        compared = incoming.merge(stored, on=self.natural_key, how='left', indicator=True)
+        is_new = (compared['_merge'] == 'left_only').to_numpy()
+        stored_hash = pd.to_numeric(compared['_stored_hash'], errors='coerce')
+        is_changed = ~is_new & ~(stored_hash == compared[self.hash_column]).to_numpy()
+
+        inserts = incoming[is_new].reset_index(drop=True)
+        updates = incoming[is_changed].reset_index(drop=True)
+        return inserts, updates
+
+    def sync(self, incoming: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Apply the source rows to the dimension in one transaction
+
+        Args:
+            incoming: Source rows with the natural key and synced columns
+
+        Returns:
+            Summary with the number of inserted, updated and unchanged rows
+        """
+        started = time.perf_counter()
+
+        with self.db_connection.get_engine().begin() as connection:
+            created = not inspect(connection).has_table(self.table_name)
+            if created:
+                stored = pd.DataFrame(columns=self.natural_key + [self.hash_column])
+            else:
+                self._ensure_hash_column(connection)
+                stored = self.read_hashes(connection)
+
+            inserts, updates = self.diff(incoming, stored)
+            if len(inserts):
+                self._insert(connection, inserts)
+            if len(updates):
+                self._update(connection, updates)
+        if created or len(inserts) or len(updates):
+            self.db_connection.mark_table_changed(self.table_name)
+
+        summary = {
+            'table': self.table_name,
+            'incoming': len(incoming),
+            'inserted': len(inserts),
+            'updated': len(updates),
+            'unchanged': len(incoming) - len(inserts) - len(updates),
+            'duration_seconds': round(time.perf_counter() - started, 4),
+        }
+        print(f"Dimension sync on {self.table_name}: {summary['inserted']} inserted, "
+              f"{summary['updated']} updated, {summary['unchanged']} unchanged")
+        return summary
+
+    def _load(self, df: pd.DataFrame, table_name: str, connection: Connection, if_exists: str = 'append'):
+        """Bulk-load a batch on the sync connection"""
+        if self.bulk_engine is not None:
+            self.bulk_engine.load(df, table_name, connection, if_exists=if_exists)
+        else:
+            df.to_sql(table_name, connection, if_exists=if_exists, index=False)
+
+    def _ensure_hash_column(self, connection: Connection):
+        """Add the hash column to dimensions created before hash-based syncs"""
+        existing = {column['name'].lower() for column in inspect(connection).get_columns(self.table_name)}
+        if self.hash_column.lower() not in existing:
+            quote = connection.dialect.identifier_preparer.quote
+            connection.execute(text(
+                f"ALTER TABLE {quote(self.table_name)} ADD {quote(self.hash_column)} BIGINT NULL"
+            ))
+            print(f"Added {self.hash_column} to {self.table_name}")
+
+    def _insert(self, connection: Connection, inserts: pd.DataFrame):
+        """Insert the new members with their hashes"""
+        for column, template in self.insert_defaults.items():
+            inserts[column] = [template.format(**row) for row in inserts.to_dict('records')]
+        if self.surrogate_key and self.generate_keys:
+            quote = connection.dialect.identifier_preparer.quote
+            max_key = connection.execute(text(
+                f"SELECT MAX({quote(self.surrogate_key)}) FROM {quote(self.table_name)}"
+            )).scalar() if inspect(connection).has_table(self.table_name) else None
+            first_key = int(max_key or 0) + 1
+            inserts.insert(0, self.surrogate_key, np.arange(first_key, first_key + len(inserts), dtype='int64'))
+        self._load(inserts, self.table_name, connection)
+
+    def _update(self, connection: Connection, updates: pd.DataFrame):
+        """Overwrite the synced columns and hash of the changed members with one UPDATE"""
+        quote = connection.dialect.identifier_preparer.quote
+        target = quote(self.table_name)
+        staging = f"stg_{self.table_name}_sync_{uuid.uuid4().hex[:8]}"
+        self._load(updates, staging, connection, if_exists='replace')
+        # Index the natural key so the correlated subqueries are lookups, not scans
+        connection.execute(text(
+            f"CREATE INDEX {quote('ix_' + staging)} ON {quote(staging)} "
+            f"({', '.join(quote(k) for k in self.natural_key)})"
+        ))
+
+        match = ' AND '.join(f"s.{quote(k)} = {target}.{quote(k)}" for k in self.natural_key)
+        assignments = ', '.join(
+            f"{quote(c)} = (SELECT s.{quote(c)} FROM {quote(staging)} s WHERE {match})"
+            for c in self.columns + [self.hash_column]
+        )
+        connection.execute(text(
+            f"UPDATE {target} SET {assignments} "
+            f"WHERE EXISTS (SELECT 1 FROM {quote(staging)} s WHERE {match})"
+        ))
+        connection.execute(text(f"DROP TABLE {quote(staging)}"))
+
+
+def sync_dimensions(source_connection: DatabaseConnection, target_connection: DatabaseConnection,
+                    names: List[str] = None, bulk_engine=None, **options) -> Dict[str, Dict[str, Any]]:
+    """
+    Daily sync of the SCD Type 1 dimensions (replaces the MERGEs of
+    05_reproceso_diario.sql for DimCliente, DimProducto, DimLocal,
+    DimFormaPago and DimCanal)
+
+    Args:
+        source_connection: Connection to the OLTP database
+        target_connection: Connection to the data warehouse
+        names: DIMENSION_SYNC_SPECS entries to sync (default: all)
+        bulk_engine: Bulk-load engine for the insert/staging batches
+        **options: Extra DimensionSynchronizer options (e.g. generate_keys)
+
+    Returns:
+        Summary per dimension
+    """
+    summaries = {}
+    for name in names or list(DIMENSION_SYNC_SPECS):
+        source = source_connection.execute_query(DIMENSION_SYNC_SPECS[name]['source_query'])
+        synchronizer = DimensionSynchronizer.from_spec(target_connection, name, bulk_engine=bulk_engine, **options)
+        summaries[name] = synchronizer.sync(source)
+    return summaries
+
+
+if __name__ == "__main__":
+    # Example usage
+    # oltp = DatabaseConnection(oltp_params); dw = DatabaseConnection(dw_params)
+    # sync_dimensions(oltp, dw, names=['cliente', 'producto'])
+    print("Dimension sync module loaded successfully")
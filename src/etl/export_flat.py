@@ -0,0 +1,371 @@
+"""
+Flat Dataset Export - ETL Pipeline
+Streams the flattened FactVentas x dimensions dataset (07_dataset_aplanado.sql)
+to Parquet, CSV or XLSX with bounded memory
+
+Usage (from the repository root, DW connection from DB_* environment variables):
+    python -m src.etl.export_flat data/processed/DW_Dataset_Aplanado.parquet
+    python -m src.etl.export_flat data/processed/DW_Dataset_Aplanado.csv --split-by-month --workers 4
+    python -m src.etl.export_flat data/processed/DW_Dataset_Aplanado.xlsx --chunksize 20000
+"""
+
+import argparse
+import os
+import time
+import pandas as pd
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
+from src.utils.db_connection import DatabaseConnection
+from src.utils.metrics import JsonLogSink, PrometheusTextSink, get_registry, peak_rss_mb, profile_run
+from src.utils.streaming import DEFAULT_CHUNKSIZE
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - optional dependency
+    Workbook = None
+
+
+# Same columns and derived ranges as sql/views/07_dataset_aplanado.sql
+FLAT_DATASET_QUERY = """
+SELECT
+  d.fecha AS fecha_venta, d.anio, d.mes, d.trimestre, d.dia_semana, d.nombre_mes,
+  d.es_fin_semana, d.numero_semana, d.dia_mes, d.dia_anio,
+  l.provincia, l.ciudad, l.local,
+  canal.canal,
+  mon.codigo_moneda, mon.nombre AS nombre_moneda, mon.simbolo AS simbolo_moneda,
+  p.marca, p.modelo, p.almacenamiento_gb, p.ram_gb,
+  v.nombre AS nombre_vendedor, v.apellido AS apellido_vendedor, v.legajo, v.categoria_vendedor,
+  fp.forma_pago,
+  c.nombre AS nombre_cliente, c.apellido AS apellido_cliente, c.genero AS genero_cliente,
+  f.cantidad, f.precio_unitario, f.costo_unitario, f.importe, f.margen, f.margen_porcentaje, f.tipo_cambio,
+  CASE WHEN f.margen > 0 THEN 'Positivo' WHEN f.margen < 0 THEN 'Negativo' ELSE 'Cero' END AS tipo_margen,
+  CASE
+    WHEN f.cantidad <= 2 THEN '1-2 unidades'
+    WHEN f.cantidad <= 5 THEN '3-5 unidades'
+    WHEN f.cantidad <= 10 THEN '6-10 unidades'
+    ELSE 'Más de 10 unidades'
+  END AS rango_cantidad,
+  CASE
+    WHEN f.importe < 100000 THEN 'Bajo (<$100k)'
+    WHEN f.importe < 500000 THEN 'Medio ($100k-$500k)'
+    WHEN f.importe < 1000000 THEN 'Alto ($500k-$1M)'
+    ELSE 'Muy Alto (>$1M)'
+  END AS rango_importe
+FROM FactVentas f
+JOIN DimFecha d      ON d.sk_fecha = f.sk_fecha
+JOIN DimProducto p   ON p.sk_producto = f.sk_producto
+JOIN DimLocal l      ON l.sk_local = f.sk_local
+JOIN DimVendedor v   ON v.sk_vendedor = f.sk_vendedor
+JOIN DimFormaPago fp ON fp.sk_forma_pago = f.sk_forma_pago
+JOIN DimCanal canal  ON canal.sk_canal = f.sk_canal
+JOIN DimMoneda mon   ON mon.sk_moneda = f.sk_moneda
+JOIN DimCliente c    ON c.sk_cliente = f.sk_cliente
+{where}
+{order_by}
+"""
+
+# Months present in the fact table, for the per-month split
+FACT_MONTHS_QUERY = """
+SELECT DISTINCT d.anio, d.mes
+FROM FactVentas f
+JOIN DimFecha d ON d.sk_fecha = f.sk_fecha
+ORDER BY d.anio, d.mes
+"""
+
+ORDER_BY = "ORDER BY d.fecha DESC, f.id_venta, f.id_detalle"
+
+# Data rows per worksheet (Excel limit of 1,048,576 minus the header)
+XLSX_MAX_ROWS = 1048575
+
+EXPORT_FORMATS = ('parquet', 'csv', 'xlsx')
+
+
+class ChunkWriter(ABC):
+    """
+    Appends DataFrame chunks to one output file
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the writer
+
+        Args:
+            path: Output file path
+        """
+        self.path = path
+        self.rows = 0
+
+    @abstractmethod
+    def write(self, chunk: pd.DataFrame):
+        """Append a chunk"""
+
+    def close(self):
+        """Finish the file"""
+
+
+class ParquetChunkWriter(ChunkWriter):
+    """
+    Parquet writer adding one row group per chunk
+
+    The file schema is fixed when the writer opens, so while some column is
+    all NULL (Arrow type null) up to lookahead chunks are buffered and their
+    schemas unified; columns still without values are stored as strings.
+    """
+
+    def __init__(self, path: str, compression: str = 'zstd', lookahead: int = 8):
+        super().__init__(path)
+        if pq is None:
+            raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+        self.compression = compression
+        self.lookahead = lookahead
+        self.writer = None
+        self.buffered = []
+
+    def write(self, chunk: pd.DataFrame):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        self.rows += len(chunk)
+        if self.writer is not None:
+            # Later chunks may infer narrower types (e.g. all-null columns)
+            self.writer.write_table(table.cast(self.writer.schema))
+            return
+        self.buffered.append(table)
+        schema = pa.unify_schemas([buffered.schema for buffered in self.buffered])
+        if len(self.buffered) >= self.lookahead or not any(pa.types.is_null(field.type) for field in schema):
+            self._open(schema)
+
+    def _open(self, schema: 'pa.Schema'):
+        """Open the file with the unified schema and flush the buffered chunks"""
+        schema = pa.schema([field.with_type(pa.large_string()) if pa.types.is_null(field.type) else field
+                            for field in schema], metadata=schema.metadata)
+        self.writer = pq.ParquetWriter(self.path, schema, compression=self.compression)
+        for table in self.buffered:
+            self.writer.write_table(table.cast(schema))
+        self.buffered = []
+
+    def close(self):
+        if self.writer is None and self.buffered:
+            self._open(pa.unify_schemas([table.schema for table in self.buffered]))
+        if self.writer is not None:
+            self.writer.close()
+
+
+class CsvChunkWriter(ChunkWriter):
+    """
+    CSV writer appending chunks under a single header
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+
+    def write(self, chunk: pd.DataFrame):
+        chunk.to_csv(self.file, index=False, header=self.rows == 0)
+        self.rows += len(chunk)
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxChunkWriter(ChunkWriter):
+    """
+    Streaming XLSX writer (openpyxl write-only mode)
+
+    Starts a new worksheet every XLSX_MAX_ROWS rows, so datasets above the
+    Excel row limit are split across sheets instead of truncated.
+    """
+
+    def __init__(self, path: str, sheet_name: str = 'Datos', max_rows: int = XLSX_MAX_ROWS):
+        super().__init__(path)
+        if Workbook is None:
+            raise ImportError("XLSX export requires openpyxl: pip install openpyxl")
+        self.workbook = Workbook(write_only=True)
+        self.sheet_name = sheet_name
+        self.max_rows = max_rows
+        self.sheet = None
+        self.sheet_rows = 0
+        self.columns = None
+
+    def _new_sheet(self):
+        number = len(self.workbook.worksheets) + 1
+        self.sheet = self.workbook.create_sheet(self.sheet_name if number == 1 else f"{self.sheet_name}_{number}")
+        self.sheet.append(self.columns)
+        self.sheet_rows = 0
+
+    def write(self, chunk: pd.DataFrame):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+        # Native Python values (openpyxl does not accept NumPy scalars or NaN)
+        values = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+        for row in values:
+            if self.sheet is None or self.sheet_rows >= self.max_rows:
+                self._new_sheet()
+            self.sheet.append(row)
+            self.sheet_rows += 1
+        self.rows += len(chunk)
+
+    def close(self):
+        if self.columns is None:
+            self.workbook.create_sheet(self.sheet_name)
+        self.workbook.save(self.path)
+
+
+WRITERS = {
+    'parquet': ParquetChunkWriter,
+    'csv': CsvChunkWriter,
+    'xlsx': XlsxChunkWriter,
+}
+
+
+class FlatDatasetExporter:
+    """
+    Exports the flattened star dataset by streaming the join in chunks
+
+    Only one chunk per worker is held in memory. With split_by_month every
+    month is written to its own file by a pool of workers, each streaming
+    its own slice of the fact table over a pooled connection.
+    """
+
+    def __init__(self, connection_params: Dict[str, Any] = None, chunksize: int = DEFAULT_CHUNKSIZE,
+                 ordered: bool = False):
+        """
+        Initialize the exporter
+
+        Args:
+            connection_params: DW connection parameters (default: DB_* environment variables)
+            chunksize: Rows fetched and written per chunk
+            ordered: Apply the ORDER BY of the original script (costs a server-side sort)
+        """
+        self.db_connection = DatabaseConnection(connection_params)
+        self.chunksize = chunksize
+        self.ordered = ordered
+        self.export_log = []
+
+    def _query(self, where: str = '') -> str:
+        """Flat dataset query with an optional filter"""
+        return FLAT_DATASET_QUERY.format(where=where, order_by=ORDER_BY if self.ordered else '')
+
+    def months(self) -> List[Tuple[int, int]]:
+        """
+        Get the (anio, mes) pairs present in FactVentas
+
+        Returns:
+            List of (anio, mes) tuples
+        """
+        df = self.db_connection.execute_query(FACT_MONTHS_QUERY)
+        return [(int(anio), int(mes)) for anio, mes in df.itertuples(index=False)]
+
+    def _export_query(self, path: str, fmt: str, where: str = '', params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Stream one query result into one file"""
+        started = time.perf_counter()
+        writer = WRITERS[fmt](path)
+        try:
+            for chunk in self.db_connection.execute_query_chunks(self._query(where), params, self.chunksize):
+                writer.write(chunk)
+        finally:
+            writer.close()
+        return {'path': path, 'rows': writer.rows, 'duration_seconds': round(time.perf_counter() - started, 4)}
+
+    def export(self, output: str, fmt: str = None, split_by_month: bool = False,
+               max_workers: int = 1) -> Dict[str, Any]:
+        """
+        Export the flat dataset
+
+        Args:
+            output: Output file; with split_by_month, files are named
+                <stem>_<anio>_<mes>.<ext> next to it
+            fmt: 'parquet', 'csv' or 'xlsx' (default: from the file extension)
+            split_by_month: Write one file per month
+            max_workers: Months exported concurrently (split_by_month only)
+
+        Returns:
+            Summary with rows, files, rows/sec and peak memory
+        """
+        fmt = fmt or os.path.splitext(output)[1].lstrip('.').lower()
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}. Available: {', '.join(EXPORT_FORMATS)}")
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        started = time.perf_counter()
+        if split_by_month:
+            stem = os.path.splitext(output)[0]
+            months = self.months()
+            print(f"Exporting {len(months)} months with {max_workers} workers...")
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                futures = [
+                    executor.submit(self._export_query, f"{stem}_{anio}_{mes:02d}.{fmt}", fmt,
+                                    "WHERE d.anio = :anio AND d.mes = :mes", {'anio': anio, 'mes': mes})
+                    for anio, mes in months
+                ]
+                files = [future.result() for future in futures]
+        else:
+            print(f"Exporting flat dataset to {output}...")
+            files = [self._export_query(output, fmt)]
+
+        duration = time.perf_counter() - started
+        rows = sum(f['rows'] for f in files)
+        summary = {
+            'output': output,
+            'format': fmt,
+            'files': len(files),
+            'rows': rows,
+            'duration_seconds': round(duration, 4),
+            'rows_per_second': round(rows / duration, 1) if duration > 0 else 0.0,
+            'peak_memory_mb': peak_rss_mb(),
+        }
+        self.export_log.append({**summary, 'file_details': files})
+        return summary
+
+    def close(self):
+        """Close the database connection"""
+        self.db_connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the flattened DW_Celulares dataset")
+    parser.add_argument('output', help="Output file (.parquet, .csv or .xlsx)")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default=None, help="Override the output format")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    parser.add_argument('--split-by-month', action='store_true', help="Write one file per month")
+    parser.add_argument('--workers', type=int, default=1, help="Months exported in parallel")
+    parser.add_argument('--ordered', action='store_true', help="Keep the ORDER BY of the original script")
+    parser.add_argument('--metrics-log', default=None, help="Append stage metrics as JSON lines to this file")
+    parser.add_argument('--metrics-prom', default=None, help="Write Prometheus text metrics to this file")
+    parser.add_argument('--profile', action='store_true', help="Run the sampling profiler during the export")
+    parser.add_argument('--profile-output', default=None, help="Collapsed-stack file of the profiler")
+    args = parser.parse_args()
+
+    registry = get_registry()
+    if args.metrics_log:
+        registry.add_sink(JsonLogSink(args.metrics_log))
+    if args.metrics_prom:
+        registry.add_sink(PrometheusTextSink(args.metrics_prom))
+
+    exporter = FlatDatasetExporter(chunksize=args.chunksize, ordered=args.ordered)
+    try:
+        with profile_run(enabled=args.profile or None, output=args.profile_output):
+            summary = exporter.export(args.output, args.format, args.split_by_month, args.workers)
+    finally:
+        exporter.close()
+        registry.flush()
+
+    print("\n" + "=" * 50)
+    print(f"Rows exported:   {summary['rows']:,}")
+    print(f"Files written:   {summary['files']}")
+    print(f"Duration:        {summary['duration_seconds']:.2f}s")
+    print(f"Throughput:      {summary['rows_per_second']:,.0f} rows/sec")
+    peak = summary['peak_memory_mb']
+    print(f"Peak memory:     {f'{peak:,.1f} MB' if peak is not None else 'n/a'}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,14 @@ Handles data extraction from various sources (CSV, databases, APIs)
 """
 
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import os
+import threading
+import time
 from src.utils.db_connection import DatabaseConnection
+from src.utils.metrics import instrument_stage
+from src.utils.streaming import DEFAULT_CHUNKSIZE
 
 
 class DataExtractor:
@@ -23,7 +28,10 @@ class DataExtractor:
         """
         self.config = config or {}
         self.db_connection = None
+        self.extraction_log = []
+        self._log_lock = threading.Lock()
         
+    @instrument_stage()
     def extract_from_csv(self, file_path: str, **kwargs) -> pd.DataFrame:
         """
         Extract data from a CSV file
@@ -44,6 +52,30 @@ class DataExtractor:
             print(f"Error extracting from CSV: {str(e)}")
             raise
     
+    @instrument_stage()
+    def extract_from_parquet(self, path: str, columns: List[str] = None,
+                             filters: List[tuple] = None) -> pd.DataFrame:
+        """
+        Extract data from a Parquet file or partitioned dataset directory
+        
+        Args:
+            path: Path to the Parquet file or dataset directory
+            columns: Columns to read (default: all)
+            filters: Optional (column, op, value) filters used to prune partitions
+            
+        Returns:
+            DataFrame with extracted data
+        """
+        try:
+            print(f"Extracting data from Parquet: {path}")
+            df = pd.read_parquet(path, columns=columns, filters=filters)
+            print(f"Successfully extracted {len(df)} rows")
+            return df
+        except Exception as e:
+            print(f"Error extracting from Parquet: {str(e)}")
+            raise
+    
+    @instrument_stage()
     def extract_from_database(self, query: str, connection_params: Dict[str, Any]) -> pd.DataFrame:
         """
         Extract data from a database using SQL query
@@ -55,44 +87,179 @@ class DataExtractor:
         Returns:
             DataFrame with query results
         """
+        # Local connection so concurrent extractions do not share state
+        db_connection = None
         try:
             print("Extracting data from database...")
-            self.db_connection = DatabaseConnection(connection_params)
-            df = self.db_connection.execute_query(query)
+            db_connection = DatabaseConnection(connection_params)
+            df = db_connection.execute_query(query)
             print(f"Successfully extracted {len(df)} rows from database")
             return df
         except Exception as e:
             print(f"Error extracting from database: {str(e)}")
             raise
         finally:
-            if self.db_connection:
-                self.db_connection.close()
+            if db_connection:
+                db_connection.close()
+
+    @instrument_stage()
+    def extract_from_csv_chunks(self, file_path: str, chunksize: int = DEFAULT_CHUNKSIZE,
+                                **kwargs) -> Iterator[pd.DataFrame]:
+        """
+        Stream data from a CSV file in fixed-size chunks
+
+        Args:
+            file_path: Path to the CSV file
+            chunksize: Number of rows per chunk
+            **kwargs: Additional arguments for pd.read_csv()
+
+        Returns:
+            Iterator of DataFrame chunks
+        """
+        print(f"Streaming data from CSV: {file_path} (chunksize={chunksize})")
+        total_rows = 0
+        try:
+            with pd.read_csv(file_path, chunksize=chunksize, **kwargs) as reader:
+                for chunk in reader:
+                    total_rows += len(chunk)
+                    yield chunk
+            print(f"Successfully streamed {total_rows} rows")
+        except Exception as e:
+            print(f"Error streaming from CSV: {str(e)}")
+            raise
+
+    @instrument_stage()
+    def extract_from_database_chunks(self, query: str, connection_params: Dict[str, Any],
+                                     chunksize: int = DEFAULT_CHUNKSIZE,
+                                     params: Dict[str, Any] = None) -> Iterator[pd.DataFrame]:
+        """
+        Stream data from a database in fixed-size chunks using a server-side cursor
+
+        Args:
+            query: SQL query to execute
+            connection_params: Database connection parameters
+            chunksize: Number of rows per chunk
+            params: Optional query parameters
+
+        Returns:
+            Iterator of DataFrame chunks
+        """
+        print(f"Streaming data from database (chunksize={chunksize})...")
+        db_connection = DatabaseConnection(connection_params)
+        total_rows = 0
+        try:
+            for chunk in db_connection.execute_query_chunks(query, params=params, chunksize=chunksize):
+                total_rows += len(chunk)
+                yield chunk
+            print(f"Successfully streamed {total_rows} rows from database")
+        except Exception as e:
+            print(f"Error streaming from database: {str(e)}")
+            raise
+        finally:
+            db_connection.close()
     
-    def extract_from_multiple_sources(self, sources: list) -> Dict[str, pd.DataFrame]:
+    @instrument_stage()
+    def extract_from_multiple_sources(self, sources: list, max_workers: int = 1,
+                                      raise_on_error: bool = True) -> Dict[str, pd.DataFrame]:
         """
         Extract data from multiple sources
         
         Args:
             sources: List of dictionaries containing source information
+            max_workers: Number of sources extracted concurrently. With 1 the
+                sources run one after another; with more, database and CSV
+                sources run on a thread pool (both are I/O bound)
+            raise_on_error: Re-raise the first source error once every other
+                source has finished. If False, failed sources are left out of
+                the result and recorded in the extraction log
             
         Returns:
             Dictionary mapping source names to DataFrames
         """
         results = {}
-        
-        for source in sources:
-            source_type = source.get('type')
-            source_name = source.get('name')
-            
+        errors = []
+        started = time.perf_counter()
+
+        if max_workers <= 1 or len(sources) <= 1:
+            outcomes = (self._extract_source(source) for source in sources)
+            for source_name, df, error in outcomes:
+                if error is None:
+                    results[source_name] = df
+                else:
+                    errors.append(error)
+        else:
+            print(f"Extracting {len(sources)} sources with {max_workers} workers...")
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extract') as executor:
+                futures = [executor.submit(self._extract_source, source) for source in sources]
+                for future in futures:
+                    source_name, df, error = future.result()
+                    if error is None:
+                        results[source_name] = df
+                    else:
+                        errors.append(error)
+
+        elapsed = time.perf_counter() - started
+        print(f"Extracted {len(results)}/{len(sources)} sources in {elapsed:.2f}s")
+
+        if errors and raise_on_error:
+            raise errors[0]
+
+        return results
+
+    def _extract_source(self, source: Dict[str, Any]) -> Tuple[str, pd.DataFrame, Exception]:
+        """
+        Extract a single source, timing it and isolating its errors
+
+        Args:
+            source: Dictionary containing source information
+
+        Returns:
+            Tuple (source name, DataFrame or None, exception or None)
+        """
+        source_type = source.get('type')
+        source_name = source.get('name')
+        started = time.perf_counter()
+        df = None
+        error = None
+
+        try:
             if source_type == 'csv':
-                results[source_name] = self.extract_from_csv(source['path'])
+                df = self.extract_from_csv(source['path'])
+            elif source_type == 'parquet':
+                df = self.extract_from_parquet(source['path'], source.get('columns'), source.get('filters'))
             elif source_type == 'database':
-                results[source_name] = self.extract_from_database(
+                df = self.extract_from_database(
                     source['query'], 
                     source['connection_params']
                 )
-        
-        return results
+            else:
+                raise ValueError(f"Unsupported source type: {source_type}")
+        except Exception as e:
+            error = e
+
+        entry = {
+            'source': source_name,
+            'type': source_type,
+            'rows_extracted': len(df) if df is not None else 0,
+            'duration_seconds': round(time.perf_counter() - started, 4),
+            'status': 'success' if error is None else 'failed'
+        }
+        if error is not None:
+            entry['error'] = str(error)
+
+        with self._log_lock:
+            self.extraction_log.append(entry)
+
+        return source_name, df, error
+
+    def get_extraction_log(self) -> List[Dict[str, Any]]:
+        """
+        Get the log of all multi-source extractions performed
+
+        Returns:
+            List of per-source extraction records (rows, duration, status)
+        """
+        return self.extraction_log
 
 
 if __name__ == "__main__":
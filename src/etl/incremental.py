@@ -0,0 +1,313 @@
+"""
+Incremental Load Module - ETL Pipeline
+Watermark-based delta extraction and upsert of FactVentas from the OLTP
+"""
+
+import time
+import pandas as pd
+from datetime import date, datetime
+from typing import Dict, Any, Optional
+from sqlalchemy import Column, Date, DateTime, Integer, MetaData, String, Table, text
+from src.etl.extract import DataExtractor
+from src.etl.transform import DataTransformer
+from src.etl.load import DataLoader
+from src.etl.key_lookup import FACT_VENTAS_LOOKUPS, SurrogateKeyCache
+from src.utils.db_connection import DatabaseConnection
+from src.utils.streaming import DEFAULT_CHUNKSIZE
+
+
+# Control table holding the high-water mark of each incremental process
+WATERMARK_TABLE = 'etl_watermark'
+
+# OLTP tables read by the delta query
+DEFAULT_SOURCE_TABLES = {
+    'ventas': 'Ventas',
+    'detalle': 'DetalleVenta',
+}
+
+# DW tables written/read by the incremental load
+DEFAULT_DW_TABLES = {
+    'fact': 'FactVentas',
+    'fecha': 'DimFecha',
+    'cliente': 'DimCliente',
+    'producto': 'DimProducto',
+    'local': 'DimLocal',
+    'vendedor': 'DimVendedor',
+    'forma_pago': 'DimFormaPago',
+    'canal': 'DimCanal',
+    'moneda': 'DimMoneda',
+}
+
+# Same measures as the MERGE in 05_reproceso_diario.sql
+FACT_VENTAS_RULES = [
+    {'type': 'calculate', 'target_column': 'importe', 'formula': 'cantidad * precio_unitario'},
+    {'type': 'calculate', 'target_column': 'margen', 'formula': 'cantidad * (precio_unitario - costo_unitario)'},
+    {'type': 'calculate', 'target_column': 'margen_porcentaje',
+     'formula': 'where(precio_unitario > 0, (precio_unitario - costo_unitario) / precio_unitario * 100, 0)'},
+]
+
+FACT_VENTAS_KEY = ['id_venta', 'id_detalle']
+
+FACT_VENTAS_COLUMNS = [
+    'id_venta', 'id_detalle', 'sk_fecha', 'sk_cliente', 'sk_producto', 'sk_local', 'sk_vendedor',
+    'sk_forma_pago', 'sk_canal', 'sk_moneda', 'cantidad', 'precio_unitario', 'costo_unitario',
+    'importe', 'margen', 'margen_porcentaje', 'tipo_cambio',
+]
+
+
+class WatermarkStore:
+    """
+    Reads and writes high-water marks in the DW control table
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, table_name: str = WATERMARK_TABLE):
+        """
+        Initialize the store, creating the control table if needed
+
+        Args:
+            db_connection: Connection to the data warehouse
+            table_name: Name of the control table
+        """
+        self.db_connection = db_connection
+        self.table = Table(
+            table_name, MetaData(),
+            Column('proceso', String(100), primary_key=True),
+            Column('ultimo_id_venta', Integer, nullable=False),
+            Column('ultima_fecha_venta', Date, nullable=True),
+            Column('filas_procesadas', Integer, nullable=False),
+            Column('actualizado_en', DateTime, nullable=False),
+        )
+        self.table.create(self.db_connection.get_engine(), checkfirst=True)
+
+    def get(self, proceso: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the watermark of a process
+
+        Args:
+            proceso: Process name
+
+        Returns:
+            Dictionary with the watermark columns, or None on first run
+        """
+        with self.db_connection.checkout() as connection:
+            row = connection.execute(
+                self.table.select().where(self.table.c.proceso == proceso)
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def update(self, proceso: str, ultimo_id_venta: int, ultima_fecha_venta: Optional[date],
+               filas_procesadas: int):
+        """
+        Store the new watermark of a process (replace in one transaction)
+
+        Args:
+            proceso: Process name
+            ultimo_id_venta: Last id_venta fully processed
+            ultima_fecha_venta: fecha_venta of that sale
+            filas_procesadas: Rows processed by the run
+        """
+        with self.db_connection.get_engine().begin() as connection:
+            connection.execute(self.table.delete().where(self.table.c.proceso == proceso))
+            connection.execute(self.table.insert().values(
+                proceso=proceso,
+                ultimo_id_venta=int(ultimo_id_venta),
+                ultima_fecha_venta=ultima_fecha_venta,
+                filas_procesadas=int(filas_procesadas),
+                actualizado_en=datetime.now(),
+            ))
+
+
+class IncrementalFactLoader:
+    """
+    Loads FactVentas incrementally from a high-water mark on id_venta
+
+    Replaces the per-day reprocessing of 05_reproceso_diario.sql: each run
+    extracts only the sales after the watermark (or an arbitrary date range
+    when backfilling), streams them through DataTransformer and upserts
+    them through DataLoader.
+    """
+
+    def __init__(self, source_params: Dict[str, Any], target_params: Dict[str, Any],
+                 proceso: str = 'FactVentas', source_tables: Dict[str, str] = None,
+                 dw_tables: Dict[str, str] = None, chunksize: int = DEFAULT_CHUNKSIZE,
+                 optimize_dtypes: bool = False):
+        """
+        Initialize the incremental loader
+
+        Args:
+            source_params: OLTP connection parameters
+            target_params: DW connection parameters
+            proceso: Name of the process in the watermark table
+            source_tables: OLTP table names (see DEFAULT_SOURCE_TABLES)
+            dw_tables: DW table names (see DEFAULT_DW_TABLES)
+            chunksize: Rows per streamed chunk
+            optimize_dtypes: Convert each extracted chunk to compact dtypes
+                (see DataTransformer.optimize_memory) before transforming it
+        """
+        self.source_params = source_params
+        self.proceso = proceso
+        self.source_tables = {**DEFAULT_SOURCE_TABLES, **(source_tables or {})}
+        self.dw_tables = {**DEFAULT_DW_TABLES, **(dw_tables or {})}
+        self.chunksize = chunksize
+        self.optimize_dtypes = optimize_dtypes
+
+        self.extractor = DataExtractor()
+        self.transformer = DataTransformer()
+        self.loader = DataLoader(target_params)
+        self.watermarks = WatermarkStore(self.loader.db_connection)
+        self.key_cache = None
+
+    def _delta_query(self, condition: str) -> str:
+        """Detail rows of the OLTP sales matching a condition, in id order"""
+        return f"""
+            SELECT d.id_venta, d.id_detalle, v.fecha_venta, v.id_cliente, d.id_modelo, v.id_local,
+                   v.id_vendedor, v.id_forma_pago, v.canal, d.cantidad, d.precio_unitario, d.costo_unitario
+            FROM {self.source_tables['ventas']} v
+            JOIN {self.source_tables['detalle']} d ON d.id_venta = v.id_venta
+            WHERE {condition}
+            ORDER BY d.id_venta, d.id_detalle
+        """
+
+    def run_incremental(self) -> Dict[str, Any]:
+        """
+        Load every sale after the stored watermark and advance it
+
+        Returns:
+            Run summary (rows, watermark, duration)
+        """
+        watermark = self.watermarks.get(self.proceso)
+        ultimo_id = watermark['ultimo_id_venta'] if watermark else 0
+        print(f"=== Incremental load of {self.dw_tables['fact']} from id_venta > {ultimo_id} ===")
+
+        summary = self._process(self._delta_query("v.id_venta > :ultimo_id_venta"),
+                                {'ultimo_id_venta': ultimo_id})
+
+        if summary['rows'] > 0:
+            self.watermarks.update(self.proceso, summary['max_id_venta'],
+                                   summary['max_fecha_venta'], summary['rows'])
+            print(f"Watermark advanced to id_venta={summary['max_id_venta']}")
+        else:
+            print("No new sales since the last run")
+        return summary
+
+    def backfill(self, fecha_desde: date, fecha_hasta: date, sync_deletes: bool = True) -> Dict[str, Any]:
+        """
+        Reload a whole date range in one pass (instead of one day at a time)
+
+        The watermark is not moved. Deleted OLTP sales are removed from the
+        fact table only inside the range, so the cost is bounded by the range
+        instead of scanning the whole fact table.
+
+        Args:
+            fecha_desde: First sale date (inclusive)
+            fecha_hasta: Last sale date (inclusive)
+            sync_deletes: Remove facts of the range whose sale no longer exists
+
+        Returns:
+            Run summary (rows, deleted rows, duration)
+        """
+        print(f"=== Backfill of {self.dw_tables['fact']} from {fecha_desde} to {fecha_hasta} ===")
+        summary = self._process(
+            self._delta_query("v.fecha_venta BETWEEN :fecha_desde AND :fecha_hasta"),
+            {'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta},
+            collect_ids=sync_deletes
+        )
+        if sync_deletes:
+            summary['deleted'] = self._delete_missing_sales(fecha_desde, fecha_hasta, summary.pop('id_ventas'))
+        return summary
+
+    def _process(self, query: str, params: Dict[str, Any], collect_ids: bool = False) -> Dict[str, Any]:
+        """Stream the delta, transform it and upsert it chunk by chunk"""
+        started = time.perf_counter()
+        key_cache = self.get_key_cache()
+        summary = {'rows': 0, 'chunks': 0, 'max_id_venta': None, 'max_fecha_venta': None}
+        id_ventas = set()
+
+        chunks = self.extractor.extract_from_database_chunks(
+            query, self.source_params, chunksize=self.chunksize, params=params
+        )
+        if self.optimize_dtypes:
+            chunks = self.transformer.optimize_memory(chunks)
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            facts = self.transform_chunk(chunk, key_cache)
+            if not self.loader.upsert_to_database(facts, self.dw_tables['fact'], FACT_VENTAS_KEY):
+                raise RuntimeError(f"Upsert into {self.dw_tables['fact']} failed; watermark not advanced")
+
+            summary['rows'] += len(facts)
+            summary['chunks'] += 1
+            last = chunk.iloc[-1]
+            summary['max_id_venta'] = int(last['id_venta'])
+            summary['max_fecha_venta'] = pd.to_datetime(last['fecha_venta']).date()
+            if collect_ids:
+                id_ventas.update(chunk['id_venta'].unique().tolist())
+
+        if collect_ids:
+            summary['id_ventas'] = id_ventas
+        summary['duration_seconds'] = round(time.perf_counter() - started, 4)
+        print(f"Processed {summary['rows']} rows in {summary['chunks']} chunks "
+              f"({summary['duration_seconds']}s)")
+        return summary
+
+    def get_key_cache(self) -> SurrogateKeyCache:
+        """
+        Get the surrogate key cache, reading it on first use and pulling only
+        the dimension members added since the previous run afterwards
+
+        Returns:
+            SurrogateKeyCache over the DW dimensions
+        """
+        if self.key_cache is None:
+            tables = {name: self.dw_tables[name] for name in FACT_VENTAS_LOOKUPS if name in self.dw_tables}
+            self.key_cache = SurrogateKeyCache(self.loader.db_connection, tables=tables)
+        else:
+            self.key_cache.refresh()
+        return self.key_cache
+
+    def transform_chunk(self, chunk: pd.DataFrame, key_cache: SurrogateKeyCache) -> pd.DataFrame:
+        """
+        Turn a chunk of OLTP detail rows into FactVentas rows
+
+        Args:
+            chunk: Delta rows from the OLTP
+            key_cache: Surrogate key cache of the DW dimensions
+
+        Returns:
+            DataFrame with the FactVentas columns
+        """
+        facts = self.transformer.apply_business_rules(chunk, FACT_VENTAS_RULES)
+        facts['margen_porcentaje'] = facts['margen_porcentaje'].round(2)
+        facts['tipo_cambio'] = 1.0
+        facts = self.transformer.resolve_dimension_keys(facts, key_cache)
+        facts['sk_moneda'] = key_cache.lookup_value('moneda', 'ARS')
+        return facts[FACT_VENTAS_COLUMNS]
+
+    def _delete_missing_sales(self, fecha_desde: date, fecha_hasta: date, id_ventas: set) -> int:
+        """Delete facts of the date range whose id_venta was not extracted"""
+        fact = self.dw_tables['fact']
+        staging = f"stg_{fact}_ids"
+        engine = self.loader.db_connection.get_engine()
+        with engine.begin() as connection:
+            self.loader.bulk_engine.load(
+                pd.DataFrame({'id_venta': sorted(id_ventas)}, dtype='int64'), staging, connection, if_exists='replace'
+            )
+            result = connection.execute(text(f"""
+                DELETE FROM {fact}
+                WHERE sk_fecha IN (SELECT sk_fecha FROM {self.dw_tables['fecha']}
+                                   WHERE fecha BETWEEN :fecha_desde AND :fecha_hasta)
+                  AND NOT EXISTS (SELECT 1 FROM {staging} s WHERE s.id_venta = {fact}.id_venta)
+            """), {'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta})
+            connection.execute(text(f"DROP TABLE {staging}"))
+        self.loader.db_connection.mark_table_changed(fact)
+        deleted = max(result.rowcount or 0, 0)
+        print(f"Removed {deleted} facts of deleted sales in the range")
+        return deleted
+
+
+if __name__ == "__main__":
+    # Example usage
+    # loader = IncrementalFactLoader(oltp_params, dw_params)
+    # loader.run_incremental()
+    # loader.backfill(date(2024, 1, 1), date(2024, 3, 31))
+    print("Incremental module loaded successfully")
@@ -0,0 +1,435 @@
+"""
+Index Management - ETL Pipeline
+Dialect-specific handling of secondary indexes and foreign keys around bulk
+loads: capture their definitions, drop/disable them for the load and rebuild
+them in one batch afterwards
+"""
+
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+
+# Statement groups of a rebuild, in the order they must run
+REBUILD_PHASES = ('indexes', 'foreign_keys', 'statistics')
+
+
+@contextmanager
+def ddl_transaction(engine: Engine):
+    """
+    engine.begin() that also covers DDL on SQLite, where pysqlite only opens
+    a transaction before DML (so CREATE/DROP INDEX would autocommit)
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+            connection.exec_driver_sql('BEGIN')
+        yield connection
+
+
+class IndexManager:
+    """
+    Generic manager: reflects secondary indexes with the SQLAlchemy inspector,
+    drops them before the load and recreates them afterwards
+
+    Unique indexes are never captured: they stay enforced during the load,
+    since rows breaking them could be committed and the index would then
+    fail to come back. Foreign keys are left untouched (most backends need
+    dialect-specific DDL to drop or disable them). Subclasses override the
+    capture/DDL methods.
+
+    concurrent_rebuilds says which rebuild statements may run at the same
+    time on separate connections: 'index' (any two), 'table' (statements of
+    different tables) or None (everything serially).
+    """
+
+    name = 'generic'
+    concurrent_rebuilds = None
+
+    def quote(self, connection: Connection, identifier: str) -> str:
+        """Quote an identifier for the connection's dialect"""
+        return connection.dialect.identifier_preparer.quote(identifier)
+
+    def capture(self, connection: Connection, table_name: str, indexes: bool = True,
+                foreign_keys: bool = True) -> Dict[str, Any]:
+        """
+        Capture the definitions needed to disable and later restore a table's
+        secondary indexes and foreign keys
+
+        Args:
+            connection: Open connection
+            table_name: Target table
+            indexes: Include the non-unique secondary indexes
+            foreign_keys: Include the foreign key constraints
+
+        Returns:
+            Dictionary with table, indexes and foreign_keys (lists of
+            dictionaries holding name, disable and restore statements)
+        """
+        return {
+            'table': table_name,
+            'indexes': self.capture_indexes(connection, table_name) if indexes else [],
+            'foreign_keys': self.capture_foreign_keys(connection, table_name) if foreign_keys else [],
+        }
+
+    def capture_indexes(self, connection: Connection, table_name: str) -> List[Dict[str, str]]:
+        """Non-unique secondary indexes of a table"""
+        table = self.quote(connection, table_name)
+        captured = []
+        for index in inspect(connection).get_indexes(table_name):
+            if (index['unique'] or index.get('duplicates_constraint') or not index.get('name')
+                    or None in index['column_names']):
+                continue
+            name = self.quote(connection, index['name'])
+            columns = ', '.join(self.quote(connection, column) for column in index['column_names'])
+            captured.append({
+                'name': index['name'],
+                'disable': f"DROP INDEX {name}",
+                'restore': f"CREATE INDEX {name} ON {table} ({columns})",
+            })
+        return captured
+
+    def capture_foreign_keys(self, connection: Connection, table_name: str) -> List[Dict[str, str]]:
+        """Foreign keys of a table that the manager knows how to disable"""
+        return []
+
+    def statistics_statement(self, connection: Connection, table_name: str) -> str:
+        """Statement refreshing the optimizer statistics of a table (None: not supported)"""
+        return None
+
+    def is_restored(self, connection: Connection, table_name: str, kind: str, name: str) -> bool:
+        """
+        Whether a captured object is back in place (e.g. after a partial rebuild)
+
+        Args:
+            connection: Open connection
+            table_name: Table of the object
+            kind: 'indexes' or 'foreign_keys'
+            name: Index or constraint name
+
+        Returns:
+            True if the object exists and is enabled
+        """
+        inspector = inspect(connection)
+        if kind == 'indexes':
+            return any(index.get('name') == name for index in inspector.get_indexes(table_name))
+        return any(key.get('name') == name for key in inspector.get_foreign_keys(table_name))
+
+    def disable(self, connection: Connection, state: Dict[str, Any]):
+        """
+        Drop/disable the captured objects (foreign keys first, they may depend
+        on the indexes)
+
+        Args:
+            connection: Connection inside a transaction
+            state: Result of capture
+        """
+        for item in state['foreign_keys'] + state['indexes']:
+            connection.execute(text(item['disable']))
+
+    def rebuild_statements(self, connection: Connection, states: List[Dict[str, Any]],
+                           refresh_statistics: bool = True) -> Dict[str, List[tuple]]:
+        """
+        Statements that restore the captured state, grouped by REBUILD_PHASES
+
+        Args:
+            connection: Open connection (for identifier quoting)
+            states: Results of capture
+            refresh_statistics: Include a statistics refresh per table
+
+        Returns:
+            Dictionary mapping phase to a list of (table, statement)
+        """
+        phases = {phase: [] for phase in REBUILD_PHASES}
+        for state in states:
+            table_name = state['table']
+            phases['indexes'] += [(table_name, item['restore']) for item in state['indexes']]
+            phases['foreign_keys'] += [(table_name, item['restore']) for item in state['foreign_keys']]
+            statistics = self.statistics_statement(connection, table_name) if refresh_statistics else None
+            if statistics:
+                phases['statistics'].append((table_name, statistics))
+        return phases
+
+    def rebuild(self, engine: Engine, states: List[Dict[str, Any]], max_workers: int = 1,
+                refresh_statistics: bool = True) -> Dict[str, int]:
+        """
+        Restore the captured indexes and foreign keys and refresh statistics
+
+        Serially everything runs in one transaction; with max_workers > 1 the
+        independent index rebuilds run concurrently on separate connections
+        (as far as concurrent_rebuilds allows), then the foreign keys and
+        statistics follow in one transaction.
+
+        Args:
+            engine: Engine of the target database
+            states: Results of capture
+            max_workers: Connections used for the index rebuilds
+            refresh_statistics: Refresh the statistics of each table
+
+        Returns:
+            Dictionary mapping phase to the number of statements executed
+        """
+        with engine.connect() as connection:
+            phases = self.rebuild_statements(connection, states, refresh_statistics)
+        counts = {phase: len(statements) for phase, statements in phases.items()}
+
+        batches = self._concurrent_batches(phases['indexes']) if max_workers > 1 else []
+        if len(batches) > 1:
+            def run(batch):
+                with ddl_transaction(engine) as connection:
+                    for _, statement in batch:
+                        connection.execute(text(statement))
+
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(batches)),
+                                    thread_name_prefix='rebuild') as executor:
+                for future in [executor.submit(run, batch) for batch in batches]:
+                    future.result()
+            remaining = phases['foreign_keys'] + phases['statistics']
+        else:
+            remaining = phases['indexes'] + phases['foreign_keys'] + phases['statistics']
+
+        with ddl_transaction(engine) as connection:
+            for _, statement in remaining:
+                connection.execute(text(statement))
+        return counts
+
+    def _concurrent_batches(self, statements: List[tuple]) -> List[List[tuple]]:
+        """Split statements into batches that may run at the same time"""
+        if self.concurrent_rebuilds == 'index':
+            return [[statement] for statement in statements]
+        if self.concurrent_rebuilds == 'table':
+            by_table = {}
+            for table_name, statement in statements:
+                by_table.setdefault(table_name, []).append((table_name, statement))
+            return list(by_table.values())
+        return [statements] if statements else []
+
+    def restore_each(self, engine: Engine, states: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        Best-effort restore: run every restore statement in its own
+        transaction, so one failure does not keep the rest from coming back.
+        Objects already in place (restored by a partial rebuild) are skipped.
+
+        Args:
+            engine: Engine of the target database
+            states: Results of capture
+
+        Returns:
+            List of the objects that could not be restored (table, name, error)
+        """
+        failures = []
+        for state in states:
+            for kind in ('indexes', 'foreign_keys'):
+                for item in state[kind]:
+                    try:
+                        with ddl_transaction(engine) as connection:
+                            if not self.is_restored(connection, state['table'], kind, item['name']):
+                                connection.execute(text(item['restore']))
+                    except Exception as e:
+                        failures.append({'table': state['table'], 'name': item['name'], 'error': str(e)})
+        return failures
+
+
+class SQLiteIndexManager(IndexManager):
+    """
+    SQLite: non-unique indexes are recreated from their stored CREATE statement.
+    Foreign keys are only enforced per connection (PRAGMA foreign_keys),
+    which a pooled load cannot rely on, so they are left as they are.
+    SQLite has a single writer, so rebuilds always run serially.
+    """
+
+    name = 'sqlite'
+
+    def capture_indexes(self, connection: Connection, table_name: str) -> List[Dict[str, str]]:
+        rows = connection.execute(text(
+            "SELECT m.name, m.sql FROM sqlite_master m JOIN pragma_index_list(:table) p ON p.name = m.name "
+            "WHERE m.type = 'index' AND m.sql IS NOT NULL AND p.\"unique\" = 0 ORDER BY m.name"
+        ), {'table': table_name}).fetchall()
+        return [{'name': name, 'disable': f"DROP INDEX {self.quote(connection, name)}", 'restore': sql}
+                for name, sql in rows]
+
+    def statistics_statement(self, connection: Connection, table_name: str) -> str:
+        return f"ANALYZE {self.quote(connection, table_name)}"
+
+
+class PostgresIndexManager(IndexManager):
+    """
+    PostgreSQL: non-unique indexes not backing a constraint are dropped and recreated
+    from pg_indexes; foreign keys are dropped and re-added from
+    pg_get_constraintdef. CREATE INDEX only takes a SHARE lock, so several
+    rebuilds can run at once, even on the same table.
+    """
+
+    name = 'postgresql'
+    concurrent_rebuilds = 'index'
+
+    def capture_indexes(self, connection: Connection, table_name: str) -> List[Dict[str, str]]:
+        rows = connection.execute(text(
+            "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+            "JOIN pg_index x "
+            "ON x.indexrelid = (quote_ident(i.schemaname) || '.' || quote_ident(i.indexname))::regclass "
+            "WHERE i.schemaname = current_schema() AND i.tablename = :table AND NOT x.indisunique "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = "
+            "(quote_ident(i.schemaname) || '.' || quote_ident(i.indexname))::regclass) "
+            "ORDER BY i.indexname"
+        ), {'table': table_name}).fetchall()
+        return [{'name': name, 'disable': f"DROP INDEX {self.quote(connection, name)}", 'restore': definition}
+                for name, definition in rows]
+
+    def capture_foreign_keys(self, connection: Connection, table_name: str) -> List[Dict[str, str]]:
+        table = self.quote(connection, table_name)
+        rows = connection.execute(text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f' ORDER BY conname"
+        ), {'table': table}).fetchall()
+        return [{
+            'name': name,
+            'disable': f"ALTER TABLE {table} DROP CONSTRAINT {self.quote(connection, name)}",
+            'restore': f"ALTER TABLE {table} ADD CONSTRAINT {self.quote(connection, name)} {definition}",
+        } for name, definition in rows]
+
+    def statistics_statement(self, connection: Connection, table_name: str) -> str:
+        return f"ANALYZE {self.quote(connection, table_name)}"
+
+
+class SQLServerIndexManager(IndexManager):
+    """
+    SQL Server: non-unique non-clustered indexes are disabled (ALTER INDEX ... DISABLE)
+    and rebuilt, foreign keys switched to NOCHECK and re-enabled WITH CHECK
+    so they stay trusted. Offline rebuilds lock the whole table, so only
+    rebuilds of different tables run concurrently.
+    """
+
+    name = 'mssql'
+    concurrent_rebuilds = 'table'
+
+    def capture_indexes(self, connection: Connection, table_name: str) -> List[Dict[str, str]]:
+        table = self.quote(connection, table_name)
+        rows = connection.execute(text(
+            "SELECT i.name FROM sys.indexes i "
+            "WHERE i.object_id = OBJECT_ID(:table) AND i.type_desc = 'NONCLUSTERED' "
+            "AND i.is_primary_key = 0 AND i.is_unique = 0 AND i.is_disabled = 0 "
+            "ORDER BY i.name"
+        ), {'table': table_name}).fetchall()
+        return [{
+            'name': name,
+            'disable': f"ALTER INDEX {self.quote(connection, name)} ON {table} DISABLE",
+            'restore': f"ALTER INDEX {self.quote(connection, name)} ON {table} REBUILD",
+        } for (name,) in rows]
+
+    def capture_foreign_keys(self, connection: Connection, table_name: str) -> List[Dict[str, str]]:
+        table = self.quote(connection, table_name)
+        rows = connection.execute(text(
+            "SELECT name FROM sys.foreign_keys "
+            "WHERE parent_object_id = OBJECT_ID(:table) AND is_disabled = 0 ORDER BY name"
+        ), {'table': table_name}).fetchall()
+        return [{
+            'name': name,
+            'disable': f"ALTER TABLE {table} NOCHECK CONSTRAINT {self.quote(connection, name)}",
+            'restore': f"ALTER TABLE {table} WITH CHECK CHECK CONSTRAINT {self.quote(connection, name)}",
+        } for (name,) in rows]
+
+    def statistics_statement(self, connection: Connection, table_name: str) -> str:
+        return f"UPDATE STATISTICS {self.quote(connection, table_name)}"
+
+    def is_restored(self, connection: Connection, table_name: str, kind: str, name: str) -> bool:
+        # Disabled indexes and NOCHECK constraints still exist, so check their flags
+        if kind == 'indexes':
+            query = ("SELECT 1 FROM sys.indexes WHERE object_id = OBJECT_ID(:table) "
+                     "AND name = :name AND is_disabled = 0")
+        else:
+            query = ("SELECT 1 FROM sys.foreign_keys WHERE parent_object_id = OBJECT_ID(:table) "
+                     "AND name = :name AND is_disabled = 0 AND is_not_trusted = 0")
+        return connection.execute(text(query), {'table': table_name, 'name': name}).first() is not None
+
+
+class MySQLIndexManager(IndexManager):
+    """
+    MySQL: secondary indexes and foreign keys are dropped and re-added with
+    ALTER TABLE (foreign_key_checks is per session, so it cannot cover a
+    pooled load). DDL locks the table, so only different tables rebuild
+    concurrently.
+    """
+
+    name = 'mysql'
+    concurrent_rebuilds = 'table'
+
+    def capture_indexes(self, connection: Connection, table_name: str) -> List[Dict[str, str]]:
+        table = self.quote(connection, table_name)
+        captured = super().capture_indexes(connection, table_name)
+        for item in captured:
+            item['disable'] = f"ALTER TABLE {table} DROP INDEX {self.quote(connection, item['name'])}"
+        return captured
+
+    def capture_foreign_keys(self, connection: Connection, table_name: str) -> List[Dict[str, str]]:
+        table = self.quote(connection, table_name)
+        captured = []
+        for key in inspect(connection).get_foreign_keys(table_name):
+            name = self.quote(connection, key['name'])
+            columns = ', '.join(self.quote(connection, column) for column in key['constrained_columns'])
+            referred = ', '.join(self.quote(connection, column) for column in key['referred_columns'])
+            captured.append({
+                'name': key['name'],
+                'disable': f"ALTER TABLE {table} DROP FOREIGN KEY {name}",
+                'restore': (f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({columns}) "
+                            f"REFERENCES {self.quote(connection, key['referred_table'])} ({referred})"),
+            })
+        return captured
+
+    def statistics_statement(self, connection: Connection, table_name: str) -> str:
+        return f"ANALYZE TABLE {self.quote(connection, table_name)}"
+
+
+# Index manager per SQLAlchemy dialect name
+DIALECT_INDEX_MANAGERS = {
+    'sqlite': SQLiteIndexManager,
+    'postgresql': PostgresIndexManager,
+    'mssql': SQLServerIndexManager,
+    'mysql': MySQLIndexManager,
+}
+
+
+def get_index_manager(dialect: str) -> IndexManager:
+    """
+    Pick the index manager for a dialect
+
+    Args:
+        dialect: SQLAlchemy dialect name ('postgresql', 'sqlite', 'mssql', ...)
+
+    Returns:
+        IndexManager instance (the generic one for unknown dialects)
+    """
+    return DIALECT_INDEX_MANAGERS.get(dialect, IndexManager)()
+
+
+def describe_states(states: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Tabulate captured states (one row per index / foreign key)
+
+    Args:
+        states: Results of IndexManager.capture
+
+    Returns:
+        DataFrame with table, kind, name, disable and restore columns
+    """
+    rows = [{'table': state['table'], 'kind': kind, **item}
+            for state in states for kind in ('indexes', 'foreign_keys') for item in state[kind]]
+    return pd.DataFrame(rows, columns=['table', 'kind', 'name', 'disable', 'restore'])
+
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+
+    engine = create_engine('sqlite://')
+    with ddl_transaction(engine) as connection:
+        connection.execute(text("CREATE TABLE fact_ventas (id INTEGER PRIMARY KEY, sk_cliente INT, importe REAL)"))
+        connection.execute(text("CREATE INDEX ix_fact_ventas_cliente ON fact_ventas (sk_cliente)"))
+
+    manager = get_index_manager(engine.dialect.name)
+    with ddl_transaction(engine) as connection:
+        states = [manager.capture(connection, 'fact_ventas')]
+        manager.disable(connection, states[0])
+    print(describe_states(states)[['table', 'kind', 'name']])
+    print(f"Rebuilt: {manager.rebuild(engine, states)}")
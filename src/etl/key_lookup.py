@@ -0,0 +1,415 @@
+"""
+Key Lookup Module - ETL Pipeline
+In-memory natural key -> surrogate key maps for resolving fact rows
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List
+from src.utils.db_connection import DatabaseConnection
+
+
+# Surrogate key used when a natural key has no dimension member
+UNKNOWN_MEMBER_KEY = -1
+
+# Lookups of FactVentas, mirroring the LEFT JOINs of the MERGE in
+# 05_reproceso_diario.sql (source column -> dimension natural key -> sk)
+FACT_VENTAS_LOOKUPS = {
+    'fecha': {'table': 'DimFecha', 'natural_key': 'fecha', 'surrogate_key': 'sk_fecha',
+              'source_column': 'fecha_venta', 'dates': True},
+    'cliente': {'table': 'DimCliente', 'natural_key': 'id_cliente_fuente', 'surrogate_key': 'sk_cliente',
+                'source_column': 'id_cliente'},
+    'producto': {'table': 'DimProducto', 'natural_key': 'id_modelo_fuente', 'surrogate_key': 'sk_producto',
+                 'source_column': 'id_modelo'},
+    'local': {'table': 'DimLocal', 'natural_key': 'id_local_fuente', 'surrogate_key': 'sk_local',
+              'source_column': 'id_local'},
+    'vendedor': {'table': 'DimVendedor', 'natural_key': 'id_vendedor_fuente', 'surrogate_key': 'sk_vendedor',
+                 'source_column': 'id_vendedor', 'valid_from': 'fecha_inicio', 'valid_to': 'fecha_fin',
+                 'as_of_column': 'fecha_venta'},
+    'forma_pago': {'table': 'DimFormaPago', 'natural_key': 'id_forma_pago_fuente',
+                   'surrogate_key': 'sk_forma_pago', 'source_column': 'id_forma_pago'},
+    'canal': {'table': 'DimCanal', 'natural_key': 'canal', 'surrogate_key': 'sk_canal',
+              'source_column': 'canal'},
+    'moneda': {'table': 'DimMoneda', 'natural_key': 'codigo_moneda', 'surrogate_key': 'sk_moneda',
+               'source_column': 'codigo_moneda'},
+}
+
+# Dates are encoded as days since 1900-01-01 in the low bits of the
+# interval composite key (22 bits cover more than 11,000 years)
+_DAY_BITS = 22
+_DAY_EPOCH = np.datetime64('1900-01-01', 'D')
+_MAX_DAY = (1 << _DAY_BITS) - 1
+
+# Natural keys per IN (...) list when refreshing interval maps
+_REFRESH_BATCH = 1000
+
+
+def _to_days(values) -> np.ndarray:
+    """Days since 1900-01-01 of date-like values (NaT -> -1)"""
+    dates = pd.to_datetime(pd.Series(values), errors='coerce')
+    days = (dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]') - _DAY_EPOCH).astype('int64')
+    return np.where(dates.isna().to_numpy(), -1, np.clip(days, 0, _MAX_DAY))
+
+
+class KeyMap:
+    """
+    Natural key -> surrogate key map for one dimension
+
+    Integer keys (and dates, as day numbers) are kept as two sorted NumPy
+    arrays resolved with searchsorted; other keys use a pandas hash Index.
+    """
+
+    def __init__(self, natural_keys, surrogate_keys, dates: bool = False):
+        """
+        Initialize the map
+
+        Args:
+            natural_keys: Natural key of every member
+            surrogate_keys: Surrogate key of every member
+            dates: Whether the natural key is a date
+        """
+        self.dates = dates
+        self.natural_keys = np.array([], dtype='int64')
+        self.surrogate_keys = np.array([], dtype='int64')
+        self.index = None
+        self.max_surrogate_key = UNKNOWN_MEMBER_KEY
+        self.add(natural_keys, surrogate_keys)
+
+    def __len__(self) -> int:
+        return len(self.surrogate_keys)
+
+    def _encode(self, values) -> np.ndarray:
+        """Turn natural keys into the stored representation"""
+        if self.dates:
+            return _to_days(values)
+        values = pd.Series(values)
+        if pd.api.types.is_integer_dtype(values):
+            return values.to_numpy(dtype='int64')
+        return values.to_numpy(dtype=object)
+
+    def add(self, natural_keys, surrogate_keys):
+        """
+        Add (or replace) members in the map
+
+        Args:
+            natural_keys: Natural keys of the new members
+            surrogate_keys: Their surrogate keys
+        """
+        new_keys = self._encode(natural_keys)
+        new_sks = pd.Series(surrogate_keys).to_numpy()
+        if len(new_keys) == 0:
+            return
+        valid = ~pd.isna(new_sks)
+        new_keys, new_sks = new_keys[valid], new_sks[valid].astype('int64')
+
+        members = pd.DataFrame({
+            'nk': np.concatenate([self.natural_keys.astype(new_keys.dtype), new_keys]) if len(self) else new_keys,
+            'sk': np.concatenate([self.surrogate_keys, new_sks]),
+        })
+        # One surrogate key per natural key: the highest (most recent) wins
+        members = members.sort_values('sk').drop_duplicates('nk', keep='last')
+
+        if not (self.dates or pd.api.types.is_integer_dtype(members['nk'])):
+            self.natural_keys = members['nk'].to_numpy(dtype=object)
+            self.surrogate_keys = members['sk'].to_numpy(dtype='int64')
+            self.index = pd.Index(self.natural_keys)
+        else:
+            members = members.sort_values('nk')
+            self.natural_keys = members['nk'].to_numpy(dtype='int64')
+            self.surrogate_keys = members['sk'].to_numpy(dtype='int64')
+            self.index = None
+        if len(self.surrogate_keys):
+            self.max_surrogate_key = int(self.surrogate_keys.max())
+
+    def lookup(self, values, default: int = UNKNOWN_MEMBER_KEY) -> np.ndarray:
+        """
+        Resolve natural keys to surrogate keys
+
+        Args:
+            values: Natural keys to resolve
+            default: Key returned for unknown members
+
+        Returns:
+            int64 array of surrogate keys
+        """
+        result = np.full(len(values), default, dtype='int64')
+        if not len(self):
+            return result
+
+        if self.index is not None:
+            positions = self.index.get_indexer(pd.Series(values).astype(object))
+            found = positions >= 0
+            result[found] = self.surrogate_keys[positions[found]]
+            return result
+
+        series = pd.Series(values)
+        if not self.dates and not pd.api.types.is_numeric_dtype(series):
+            # Integer map queried with non-numeric keys
+            series = pd.to_numeric(series, errors='coerce')
+        if not self.dates and series.isna().any():
+            known = series.notna().to_numpy()
+            result[known] = self.lookup(series[known].astype('int64').to_numpy(), default)
+            return result
+
+        keys = self._encode(series if self.dates else series.astype('int64'))
+        positions = np.searchsorted(self.natural_keys, keys)
+        positions[positions == len(self.natural_keys)] = 0
+        found = self.natural_keys[positions] == keys
+        result[found] = self.surrogate_keys[positions[found]]
+        return result
+
+
+class IntervalKeyMap:
+    """
+    Natural key + date -> surrogate key map for SCD Type 2 dimensions
+
+    Versions are sorted by a composite (natural key code << 22 | start day)
+    so a whole chunk is resolved with one searchsorted call, followed by a
+    check that the date falls before the end of the version found.
+    """
+
+    def __init__(self, natural_keys, valid_from, valid_to, surrogate_keys):
+        """
+        Initialize the map
+
+        Args:
+            natural_keys: Natural key of every version
+            valid_from: Version start dates
+            valid_to: Version end dates (NULL = open version)
+            surrogate_keys: Surrogate key of every version
+        """
+        self.versions = pd.DataFrame(columns=['nk', 'from_day', 'to_day', 'sk'])
+        self.max_surrogate_key = UNKNOWN_MEMBER_KEY
+        self.replace(natural_keys, valid_from, valid_to, surrogate_keys)
+
+    def __len__(self) -> int:
+        return len(self.versions)
+
+    def replace(self, natural_keys, valid_from, valid_to, surrogate_keys):
+        """
+        Replace every version of the given natural keys
+
+        Args:
+            natural_keys: Natural key of every version (all versions of each key)
+            valid_from: Version start dates
+            valid_to: Version end dates (NULL = open version)
+            surrogate_keys: Surrogate key of every version
+        """
+        versions = pd.DataFrame({
+            'nk': pd.Series(natural_keys).to_numpy(),
+            'from_day': _to_days(valid_from),
+            'to_day': _to_days(valid_to),
+            'sk': pd.Series(surrogate_keys).to_numpy(),
+        })
+        versions = versions[versions['sk'].notna()]
+        versions['to_day'] = versions['to_day'].where(versions['to_day'] >= 0, _MAX_DAY)
+        versions['from_day'] = versions['from_day'].clip(lower=0)
+        versions['sk'] = versions['sk'].astype('int64')
+
+        kept = self.versions[~self.versions['nk'].isin(versions['nk'])]
+        self.versions = versions if kept.empty else pd.concat([kept, versions], ignore_index=True)
+        self._build()
+
+    def _build(self):
+        """Rebuild the sorted composite arrays"""
+        self.index = pd.Index(pd.unique(self.versions['nk'].to_numpy()))
+        codes = self.index.get_indexer(self.versions['nk'].to_numpy()).astype('int64')
+        composite = (codes << _DAY_BITS) | self.versions['from_day'].to_numpy(dtype='int64')
+        order = np.argsort(composite, kind='stable')
+        self.composite = composite[order]
+        self.codes = codes[order]
+        self.to_days = self.versions['to_day'].to_numpy(dtype='int64')[order]
+        self.surrogate_keys = self.versions['sk'].to_numpy(dtype='int64')[order]
+        if len(self.surrogate_keys):
+            self.max_surrogate_key = int(self.surrogate_keys.max())
+
+    def lookup(self, values, as_of, default: int = UNKNOWN_MEMBER_KEY) -> np.ndarray:
+        """
+        Resolve natural keys to the surrogate key valid on a date
+
+        Args:
+            values: Natural keys to resolve
+            as_of: Date of every row (e.g. fecha_venta)
+            default: Key returned when no version covers the date
+
+        Returns:
+            int64 array of surrogate keys
+        """
+        result = np.full(len(values), default, dtype='int64')
+        if not len(self):
+            return result
+
+        codes = self.index.get_indexer(pd.Series(values).to_numpy()).astype('int64')
+        days = _to_days(as_of)
+        known = (codes >= 0) & (days >= 0)
+        composite = (codes << _DAY_BITS) | np.maximum(days, 0)
+
+        positions = np.searchsorted(self.composite, composite, side='right') - 1
+        candidate = np.maximum(positions, 0)
+        found = (known & (positions >= 0) & (self.codes[candidate] == codes)
+                 & (days <= self.to_days[candidate]))
+        result[found] = self.surrogate_keys[candidate[found]]
+        return result
+
+
+class SurrogateKeyCache:
+    """
+    Loads every dimension key map once and resolves whole fact chunks
+
+    Replaces the per-row dimension JOINs of the fact load: each lookup is a
+    vectorized searchsorted/hash probe over compact arrays. refresh() pulls
+    only the members inserted since the last read (surrogate key above the
+    highest cached one), so the cache can live across incremental runs.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, lookups: Dict[str, Dict[str, Any]] = None,
+                 tables: Dict[str, str] = None):
+        """
+        Initialize the cache and read every key map
+
+        Args:
+            db_connection: Connection to the data warehouse
+            lookups: Lookup definitions (see FACT_VENTAS_LOOKUPS)
+            tables: Optional table name overrides by lookup name
+        """
+        self.db_connection = db_connection
+        self.lookups = {name: dict(spec) for name, spec in (lookups or FACT_VENTAS_LOOKUPS).items()}
+        for name, table in (tables or {}).items():
+            if name in self.lookups:
+                self.lookups[name]['table'] = table
+        self.maps = {}
+        self.statistics = {name: {'lookups': 0, 'misses': 0} for name in self.lookups}
+        self.load()
+
+    def _read(self, spec: Dict[str, Any], where: str = '', params: Dict[str, Any] = None) -> pd.DataFrame:
+        """Read the key columns of a dimension"""
+        columns = [spec['natural_key'], spec['surrogate_key']]
+        if spec.get('valid_from'):
+            columns += [spec['valid_from'], spec['valid_to']]
+        query = f"SELECT {', '.join(columns)} FROM {spec['table']}"
+        if where:
+            query += f" WHERE {where}"
+        return self.db_connection.execute_query(query, params)
+
+    def _build_map(self, spec: Dict[str, Any], members: pd.DataFrame):
+        """Create the key map of a dimension"""
+        natural_keys = members[spec['natural_key']]
+        surrogate_keys = members[spec['surrogate_key']]
+        if spec.get('valid_from'):
+            return IntervalKeyMap(natural_keys, members[spec['valid_from']], members[spec['valid_to']],
+                                  surrogate_keys)
+        return KeyMap(natural_keys, surrogate_keys, dates=spec.get('dates', False))
+
+    def load(self):
+        """Read every key map from the data warehouse"""
+        started = time.perf_counter()
+        for name, spec in self.lookups.items():
+            self.maps[name] = self._build_map(spec, self._read(spec))
+        sizes = ', '.join(f"{name}={len(key_map)}" for name, key_map in self.maps.items())
+        print(f"Loaded surrogate key maps in {time.perf_counter() - started:.2f}s ({sizes})")
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Add the dimension members inserted since the maps were read
+
+        New SCD Type 2 versions also close the previous version, so every
+        version of their natural keys is read again.
+
+        Returns:
+            New members per dimension
+        """
+        added = {}
+        for name, spec in self.lookups.items():
+            key_map = self.maps[name]
+            members = self._read(spec, f"{spec['surrogate_key']} > :max_sk",
+                                 {'max_sk': key_map.max_surrogate_key})
+            added[name] = len(members)
+            if members.empty:
+                continue
+
+            if isinstance(key_map, IntervalKeyMap):
+                natural_keys = pd.unique(members[spec['natural_key']].dropna()).tolist()
+                versions = [
+                    self._read(spec, f"{spec['natural_key']} IN ({', '.join(f':k{i}' for i in range(len(batch)))})",
+                               {f'k{i}': key for i, key in enumerate(batch)})
+                    for batch in (natural_keys[i:i + _REFRESH_BATCH]
+                                  for i in range(0, len(natural_keys), _REFRESH_BATCH))
+                ]
+                versions = pd.concat(versions, ignore_index=True)
+                key_map.replace(versions[spec['natural_key']], versions[spec['valid_from']],
+                                versions[spec['valid_to']], versions[spec['surrogate_key']])
+            else:
+                key_map.add(members[spec['natural_key']], members[spec['surrogate_key']])
+
+        if any(added.values()):
+            print(f"Refreshed surrogate key maps: {', '.join(f'{k}=+{v}' for k, v in added.items() if v)}")
+        return added
+
+    def lookup(self, name: str, values, as_of=None) -> np.ndarray:
+        """
+        Resolve natural keys of one dimension
+
+        Args:
+            name: Lookup name (e.g. 'cliente')
+            values: Natural keys
+            as_of: Row dates, required for SCD Type 2 dimensions
+
+        Returns:
+            int64 array of surrogate keys (UNKNOWN_MEMBER_KEY when missing)
+        """
+        key_map = self.maps[name]
+        if isinstance(key_map, IntervalKeyMap):
+            keys = key_map.lookup(values, as_of)
+        else:
+            keys = key_map.lookup(values)
+        self.statistics[name]['lookups'] += len(keys)
+        self.statistics[name]['misses'] += int((keys == UNKNOWN_MEMBER_KEY).sum())
+        return keys
+
+    def lookup_value(self, name: str, value) -> int:
+        """Resolve a single natural key (e.g. the 'ARS' currency)"""
+        return int(self.lookup(name, [value])[0])
+
+    def resolve(self, df: pd.DataFrame, names: List[str] = None) -> pd.DataFrame:
+        """
+        Add the surrogate key columns to a fact chunk
+
+        Lookups whose source column is missing from the chunk are skipped.
+
+        Args:
+            df: Chunk with the natural keys (id_cliente, id_modelo, ...)
+            names: Lookups to apply (default: all)
+
+        Returns:
+            DataFrame with one sk_* column per lookup
+        """
+        resolved = df.copy()
+        for name in names or list(self.lookups):
+            spec = self.lookups[name]
+            if spec['source_column'] not in resolved.columns:
+                continue
+            as_of = resolved[spec['as_of_column']] if spec.get('as_of_column') else None
+            resolved[spec['surrogate_key']] = self.lookup(name, resolved[spec['source_column']], as_of)
+        return resolved
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get map sizes and lookup/miss counters per dimension
+
+        Returns:
+            Dictionary of statistics by lookup name
+        """
+        return {
+            name: {'members': len(self.maps[name]), **counters}
+            for name, counters in self.statistics.items()
+        }
+
+
+if __name__ == "__main__":
+    # Example usage
+    key_map = KeyMap([10, 20, 30], [1, 2, 3])
+    print(key_map.lookup([20, 40, 10]))
+
+    versions = IntervalKeyMap([7, 7], ['1900-01-01', '2024-04-01'], ['2024-03-31', None], [1, 2])
+    print(versions.lookup([7, 7, 8], ['2024-01-15', '2024-05-01', '2024-05-01']))
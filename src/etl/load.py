@@ -3,10 +3,26 @@ Load Module - ETL Pipeline
 Handles loading transformed data into the target data warehouse
 """
 
+import time
+import uuid
 import pandas as pd
-from typing import Dict, Any, List
-from sqlalchemy import create_engine
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Union
+from sqlalchemy import create_engine, inspect, text
+from src.etl.bulk_load import get_bulk_load_engine
+from src.etl.index_management import ddl_transaction, get_index_manager
+from src.etl.dimension_sync import DimensionSynchronizer
+from src.etl.scd import SCD2Merger
 from src.utils.db_connection import DatabaseConnection
+from src.utils.metrics import instrument_stage
+from src.utils.query_cache import written_tables
+from src.utils.streaming import is_chunk_stream
+
+
+def _rows_per_second(rows: int, seconds: float) -> float:
+    """Throughput helper that tolerates zero-length timings"""
+    return rows / seconds if seconds > 0 else 0.0
 
 
 class DataLoader:
@@ -14,52 +30,96 @@ class DataLoader:
     Class responsible for loading data into the data warehouse
     """
     
-    def __init__(self, connection_params: Dict[str, Any]):
+    def __init__(self, connection_params: Dict[str, Any], bulk_engine: str = None,
+                 publish_table_versions: bool = False):
         """
         Initialize the DataLoader
         
         Args:
             connection_params: Database connection parameters
+            bulk_engine: Optional bulk-load engine name (see bulk_load.BULK_LOAD_ENGINES).
+                By default the fastest engine for the target dialect is used
+                (COPY for PostgreSQL, single transaction for SQLite, multi-row
+                VALUES for the rest); 'to_sql' restores plain row inserts.
+            publish_table_versions: Also publish the version bumps of the loaded
+                tables to the etl_table_version control table, invalidating the
+                query caches of other processes (see utils.query_cache)
         """
         self.connection_params = connection_params
         self.db_connection = DatabaseConnection(connection_params)
+        if publish_table_versions:
+            self.db_connection.share_table_versions()
+        self.bulk_engine = get_bulk_load_engine(
+            self.db_connection.get_engine().dialect.name, bulk_engine
+        )
         self.load_log = []
+        self.post_load_hooks = []
+    
+    def add_post_load_hook(self, hook: Callable[[str, pd.DataFrame], None]):
+        """
+        Register a function called with (table_name, df) after each fact load
+        
+        Args:
+            hook: Callable receiving the table name and the rows just loaded
+        """
+        self.post_load_hooks.append(hook)
+    
+    def _run_post_load_hooks(self, table_name: str, df: pd.DataFrame):
+        """Call the post-load hooks; the load is already committed, so failures are only reported"""
+        for hook in self.post_load_hooks:
+            try:
+                hook(table_name, df)
+            except Exception as e:
+                print(f"Post-load hook {getattr(hook, '__qualname__', hook)} failed on {table_name}: {str(e)}")
+    
+    def _notify_loaded_chunks(self, chunks: Iterable[pd.DataFrame], table_name: str) -> Iterator[pd.DataFrame]:
+        """Pass chunks through, running the hooks on each one once the loader has written it"""
+        for chunk in chunks:
+            yield chunk
+            self._run_post_load_hooks(table_name, chunk)
     
-    def load_to_database(self, df: pd.DataFrame, table_name: str, 
+    @instrument_stage()
+    def load_to_database(self, df: Union[pd.DataFrame, Iterable[pd.DataFrame]], table_name: str, 
                         if_exists: str = 'append', chunksize: int = 1000) -> bool:
         """
         Load DataFrame to database table
         
         Args:
-            df: DataFrame to load
+            df: DataFrame to load, or a stream of DataFrame chunks
+                (e.g. from DataExtractor.extract_from_database_chunks)
             table_name: Target table name
-            if_exists: How to behave if table exists ('fail', 'replace', 'append')
+            if_exists: How to behave if table exists ('fail', 'replace', 'append').
+                For streams it applies to the first chunk; the rest are appended.
             chunksize: Number of rows to insert at a time
             
         Returns:
             True if successful, False otherwise
         """
+        if is_chunk_stream(df):
+            return self._load_stream_to_database(df, table_name, if_exists, chunksize)
+
         try:
-            print(f"Loading {len(df)} rows to table: {table_name}")
+            print(f"Loading {len(df)} rows to table: {table_name} ({self.bulk_engine.name})")
             
             # Create SQLAlchemy engine
             engine = self.db_connection.get_engine()
             
-            # Load data in chunks
-            df.to_sql(
-                name=table_name,
-                con=engine,
-                if_exists=if_exists,
-                index=False,
-                chunksize=chunksize
-            )
+            # Load data through the dialect's bulk-load engine
+            started = time.perf_counter()
+            rows_loaded = self.bulk_engine.load(df, table_name, engine, if_exists=if_exists, chunksize=chunksize)
+            duration = time.perf_counter() - started
+            self.db_connection.mark_table_changed(table_name)
             
-            print(f"Successfully loaded {len(df)} rows to {table_name}")
+            print(f"Successfully loaded {rows_loaded} rows to {table_name} "
+                  f"({_rows_per_second(rows_loaded, duration):,.0f} rows/sec)")
             
             self.load_log.append({
                 'table': table_name,
-                'rows_loaded': len(df),
-                'status': 'success'
+                'rows_loaded': rows_loaded,
+                'status': 'success',
+                'engine': self.bulk_engine.name,
+                'duration_seconds': round(duration, 4),
+                'rows_per_second': round(_rows_per_second(rows_loaded, duration), 1)
             })
             
             return True
@@ -70,12 +130,150 @@ class DataLoader:
                 'table': table_name,
                 'rows_loaded': 0,
                 'status': 'failed',
+                'engine': self.bulk_engine.name,
+                'error': str(e)
+            })
+            return False
+
+    def _load_stream_to_database(self, chunks: Iterable[pd.DataFrame], table_name: str,
+                                 if_exists: str, chunksize: int) -> bool:
+        """
+        Load a stream of DataFrame chunks, holding one chunk in memory at a time
+
+        Args:
+            chunks: Stream of DataFrame chunks
+            table_name: Target table name
+            if_exists: Behaviour for the first chunk ('fail', 'replace', 'append')
+            chunksize: Number of rows to insert at a time
+
+        Returns:
+            True if successful, False otherwise
+        """
+        rows_loaded = 0
+        chunks_loaded = 0
+        started = time.perf_counter()
+        try:
+            print(f"Streaming rows to table: {table_name} ({self.bulk_engine.name})")
+            engine = self.db_connection.get_engine()
+
+            for chunk in chunks:
+                rows_loaded += self.bulk_engine.load(
+                    chunk, table_name, engine,
+                    if_exists=if_exists if chunks_loaded == 0 else 'append',
+                    chunksize=chunksize
+                )
+                chunks_loaded += 1
+
+            duration = time.perf_counter() - started
+            self.db_connection.mark_table_changed(table_name)
+            print(f"Successfully loaded {rows_loaded} rows in {chunks_loaded} chunks to {table_name} "
+                  f"({_rows_per_second(rows_loaded, duration):,.0f} rows/sec)")
+
+            self.load_log.append({
+                'table': table_name,
+                'rows_loaded': rows_loaded,
+                'chunks_loaded': chunks_loaded,
+                'status': 'success',
+                'engine': self.bulk_engine.name,
+                'duration_seconds': round(duration, 4),
+                'rows_per_second': round(_rows_per_second(rows_loaded, duration), 1)
+            })
+
+            return True
+
+        except Exception as e:
+            print(f"Error loading data to {table_name}: {str(e)}")
+            if chunks_loaded:
+                # The chunks already committed are visible to readers
+                self.db_connection.mark_table_changed(table_name)
+            self.load_log.append({
+                'table': table_name,
+                'rows_loaded': rows_loaded,
+                'chunks_loaded': chunks_loaded,
+                'status': 'failed',
+                'engine': self.bulk_engine.name,
                 'error': str(e)
             })
             return False
     
+    @instrument_stage()
+    def upsert_to_database(self, df: pd.DataFrame, table_name: str, key_columns: List[str]) -> bool:
+        """
+        Insert or replace rows by key in one set-based transaction
+
+        The rows are bulk-loaded into a staging table, then the matching
+        target rows are deleted and the staged rows inserted, so the cost
+        scales with the batch and not with the target table.
+
+        Args:
+            df: DataFrame to upsert
+            table_name: Target table name
+            key_columns: Columns identifying a row (e.g. ['id_venta', 'id_detalle'])
+
+        Returns:
+            True if successful, False otherwise
+        """
+        staging_table = f"stg_{table_name}_{uuid.uuid4().hex[:8]}"
+        started = time.perf_counter()
+        try:
+            print(f"Upserting {len(df)} rows to table: {table_name}")
+            engine = self.db_connection.get_engine()
+            quote = engine.dialect.identifier_preparer.quote
+            target = quote(table_name)
+            staging = quote(staging_table)
+            columns = ', '.join(quote(column) for column in df.columns)
+            key_match = ' AND '.join(f"s.{quote(key)} = {target}.{quote(key)}" for key in key_columns)
+
+            with engine.begin() as connection:
+                if not inspect(connection).has_table(table_name):
+                    self.bulk_engine.load(df, table_name, connection)
+                else:
+                    self.bulk_engine.load(df, staging_table, connection, if_exists='replace')
+                    # Index the staged keys so the correlated DELETE probes instead of scanning
+                    connection.execute(text(
+                        f"CREATE INDEX {quote('ix_' + staging_table)} ON {staging} "
+                        f"({', '.join(quote(key) for key in key_columns)})"
+                    ))
+                    connection.execute(text(
+                        f"DELETE FROM {target} WHERE EXISTS "
+                        f"(SELECT 1 FROM {staging} s WHERE {key_match})"
+                    ))
+                    connection.execute(text(
+                        f"INSERT INTO {target} ({columns}) SELECT {columns} FROM {staging}"
+                    ))
+                    connection.execute(text(f"DROP TABLE {staging}"))
+
+            duration = time.perf_counter() - started
+            self.db_connection.mark_table_changed(table_name)
+            print(f"Successfully upserted {len(df)} rows to {table_name}")
+            self.load_log.append({
+                'table': table_name,
+                'rows_loaded': len(df),
+                'status': 'success',
+                'mode': 'upsert',
+                'engine': self.bulk_engine.name,
+                'duration_seconds': round(duration, 4),
+                'rows_per_second': round(_rows_per_second(len(df), duration), 1)
+            })
+            return True
+
+        except Exception as e:
+            print(f"Error upserting data to {table_name}: {str(e)}")
+            self.load_log.append({
+                'table': table_name,
+                'rows_loaded': 0,
+                'status': 'failed',
+                'mode': 'upsert',
+                'engine': self.bulk_engine.name,
+                'error': str(e)
+            })
+            return False
+
+    @instrument_stage()
     def load_dimension(self, df: pd.DataFrame, dimension_name: str, 
-                      scd_type: int = 1) -> bool:
+                      scd_type: int = 1, natural_key: List[str] = None,
+                      tracked_columns: List[str] = None, table_name: str = None,
+                      effective_date=None, **scd_options) -> bool:
         """
         Load data to a dimension table with SCD (Slowly Changing Dimension) handling
         
@@ -83,18 +281,87 @@ class DataLoader:
             df: DataFrame containing dimension data
             dimension_name: Name of the dimension table
             scd_type: Type of SCD (1 or 2)
+            natural_key: Source key columns. With it Type 1 ships only new and
+                changed members (hash diff, see DimensionSynchronizer) and
+                Type 2 runs a real merge; without it Type 1 rewrites the table
+                and Type 2 only stamps and appends the rows
+            tracked_columns: Columns versioned by SCD Type 2, or synced by
+                Type 1 (default: every non-key column)
+            table_name: Explicit table name (default: dim_<dimension_name>)
+            effective_date: Start date of new SCD Type 2 versions (default: today)
+            **scd_options: Extra SCD2Merger options (type1_columns,
+                valid_from_column, version_column, ... see scd.DIM_VENDEDOR_SCD2)
+                or DimensionSynchronizer options for Type 1 (hash_column,
+                surrogate_key, generate_keys, insert_defaults)
             
         Returns:
             True if successful
         """
-        table_name = f"dim_{dimension_name}"
+        table_name = table_name or f"dim_{dimension_name}"
         
-        if scd_type == 1:
-            # Type 1: Overwrite existing data
+        if scd_type == 1 and natural_key:
+            # Type 1: hash diff against the stored members, upsert only the churn
+            columns = tracked_columns or [c for c in df.columns if c not in natural_key]
+            synchronizer = DimensionSynchronizer(self.db_connection, table_name, natural_key, columns,
+                                                 bulk_engine=self.bulk_engine, **scd_options)
+            try:
+                summary = synchronizer.sync(df)
+                self.load_log.append({
+                    'table': table_name,
+                    'rows_loaded': summary['inserted'],
+                    'rows_updated': summary['updated'],
+                    'status': 'success',
+                    'mode': 'scd1_sync',
+                    'duration_seconds': summary['duration_seconds']
+                })
+                return True
+            except Exception as e:
+                print(f"Error syncing dimension {table_name}: {str(e)}")
+                self.load_log.append({
+                    'table': table_name,
+                    'rows_loaded': 0,
+                    'status': 'failed',
+                    'mode': 'scd1_sync',
+                    'error': str(e)
+                })
+                return False
+
+        elif scd_type == 1:
+            # Type 1 without a natural key: overwrite existing data
             return self.load_to_database(df, table_name, if_exists='replace')
         
+        elif scd_type == 2 and natural_key:
+            # Type 2: diff against the current versions, expire and insert
+            tracked_columns = tracked_columns or [
+                c for c in df.columns if c not in natural_key and c not in scd_options.get('type1_columns', [])
+            ]
+            merger = SCD2Merger(self.db_connection, table_name, natural_key, tracked_columns,
+                                bulk_engine=self.bulk_engine, **scd_options)
+            try:
+                summary = merger.merge(df, effective_date=effective_date)
+                self.load_log.append({
+                    'table': table_name,
+                    'rows_loaded': summary['inserted'],
+                    'rows_expired': summary['expired'],
+                    'rows_updated': summary['type1_updated'] + summary['restated'],
+                    'status': 'success',
+                    'mode': 'scd2',
+                    'duration_seconds': summary['duration_seconds']
+                })
+                return True
+            except Exception as e:
+                print(f"Error merging SCD2 dimension {table_name}: {str(e)}")
+                self.load_log.append({
+                    'table': table_name,
+                    'rows_loaded': 0,
+                    'status': 'failed',
+                    'mode': 'scd2',
+                    'error': str(e)
+                })
+                return False
+
         elif scd_type == 2:
-            # Type 2: Keep historical data (requires additional logic)
+            # Type 2 without a natural key: keep historical data by appending
             # Add versioning columns
             df['valid_from'] = pd.Timestamp.now()
             df['valid_to'] = pd.Timestamp('2999-12-31')
@@ -104,12 +371,13 @@ class DataLoader:
         
         return False
     
+    @instrument_stage()
     def load_fact(self, df: pd.DataFrame, fact_name: str) -> bool:
         """
-        Load data to a fact table
+        Load data to a fact table and run the post-load hooks on the new rows
         
         Args:
-            df: DataFrame containing fact data
+            df: DataFrame containing fact data (or a stream of chunks)
             fact_name: Name of the fact table
             
         Returns:
@@ -117,47 +385,169 @@ class DataLoader:
         """
         table_name = f"fact_{fact_name}"
         
+        if is_chunk_stream(df) and self.post_load_hooks:
+            df = self._notify_loaded_chunks(df, table_name)
+        
         # Fact tables typically use append mode
-        return self.load_to_database(df, table_name, if_exists='append')
+        success = self.load_to_database(df, table_name, if_exists='append')
+        if success and isinstance(df, pd.DataFrame):
+            self._run_post_load_hooks(table_name, df)
+        return success
     
-    def bulk_load(self, data_dict: Dict[str, pd.DataFrame], table_prefix: str = "") -> Dict[str, bool]:
+    @instrument_stage()
+    def bulk_load(self, data_dict: Dict[str, pd.DataFrame], table_prefix: str = "",
+                  max_workers: int = 1) -> Dict[str, bool]:
         """
         Load multiple DataFrames to different tables
         
         Args:
             data_dict: Dictionary mapping table names to DataFrames
             table_prefix: Optional prefix for table names
+            max_workers: Tables loaded concurrently, each on its own pooled
+                connection and transaction (for one large fact table see
+                partitioned_load.PartitionedFactLoader)
             
         Returns:
             Dictionary mapping table names to load status
         """
-        results = {}
+        def full_name(table_name: str) -> str:
+            return f"{table_prefix}{table_name}" if table_prefix else table_name
+
+        if max_workers <= 1 or len(data_dict) <= 1:
+            return {table_name: self.load_to_database(df, full_name(table_name))
+                    for table_name, df in data_dict.items()}
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='load') as executor:
+            futures = {table_name: executor.submit(self.load_to_database, df, full_name(table_name))
+                       for table_name, df in data_dict.items()}
+            return {table_name: future.result() for table_name, future in futures.items()}
+    
+    @contextmanager
+    def load_session(self, table_names: Union[str, List[str]], disable_indexes: bool = True,
+                     disable_foreign_keys: bool = True, refresh_statistics: bool = True,
+                     max_workers: int = 1) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Load-session mode: drop/disable the secondary indexes and foreign keys
+        of the target tables for the duration of a bulk load, then rebuild
+        them in one batch and refresh statistics (see etl.index_management)
+        
+        Unique indexes stay in place, so the load cannot commit duplicates
+        that would keep them from being rebuilt.
+        
+        If the load fails, the original indexes and constraints are restored
+        before the error propagates. If the rebuild itself fails (e.g. loaded
+        rows break a foreign key), it is rolled back and each object is
+        restored on its own; the ones that cannot be are reported in load_log.
+        
+        Example:
+            with loader.load_session('fact_ventas'):
+                loader.load_fact(df, 'ventas')
         
-        for table_name, df in data_dict.items():
-            full_table_name = f"{table_prefix}{table_name}" if table_prefix else table_name
-            results[table_name] = self.load_to_database(df, full_table_name)
+        Args:
+            table_names: Target table or tables
+            disable_indexes: Drop/disable the non-unique secondary indexes
+            disable_foreign_keys: Drop/disable the foreign key checks
+            refresh_statistics: Refresh optimizer statistics after the rebuild
+            max_workers: Connections used to rebuild independent indexes
+                concurrently (where the backend allows it)
+            
+        Yields:
+            Captured state of each table (indexes and foreign keys disabled)
+        """
+        if isinstance(table_names, str):
+            table_names = [table_names]
+        engine = self.db_connection.get_engine()
+        manager = get_index_manager(engine.dialect.name)
+        
+        with engine.begin() as connection:
+            states = [manager.capture(connection, table_name, disable_indexes, disable_foreign_keys)
+                      for table_name in table_names]
+        try:
+            with ddl_transaction(engine) as connection:
+                for state in states:
+                    manager.disable(connection, state)
+        except Exception as e:
+            # Backends without transactional DDL may have dropped some already
+            print(f"Error disabling indexes of {', '.join(table_names)}: {str(e)}")
+            self._restore_session(manager, engine, states, 'load session setup failed')
+            raise
         
-        return results
+        disabled = sum(len(state['indexes']) + len(state['foreign_keys']) for state in states)
+        print(f"Load session ({manager.name}): disabled {disabled} indexes/foreign keys "
+              f"on {', '.join(table_names)}")
+        
+        try:
+            yield states
+        except BaseException:
+            print("Load failed, restoring original indexes and foreign keys")
+            self._restore_session(manager, engine, states, 'load failed')
+            raise
+        
+        started = time.perf_counter()
+        try:
+            counts = manager.rebuild(engine, states, max_workers, refresh_statistics)
+        except Exception as e:
+            print(f"Error rebuilding indexes in one batch: {str(e)}")
+            self._restore_session(manager, engine, states, str(e))
+            raise
+        
+        duration = time.perf_counter() - started
+        print(f"Rebuilt {counts['indexes']} indexes and {counts['foreign_keys']} foreign keys, "
+              f"refreshed statistics of {counts['statistics']} tables in {duration:.2f}s")
+        for state in states:
+            self.load_log.append({
+                'table': state['table'],
+                'operation': 'index_rebuild',
+                'status': 'success',
+                'indexes': len(state['indexes']),
+                'foreign_keys': len(state['foreign_keys']),
+                'duration_seconds': round(duration, 4)
+            })
+    
+    def _restore_session(self, manager, engine, states: List[Dict[str, Any]], reason: str):
+        """Restore every captured object on its own, logging the ones that could not be"""
+        failures = manager.restore_each(engine, states)
+        for failure in failures:
+            print(f"Could not restore {failure['name']} on {failure['table']}: {failure['error']}")
+        for state in states:
+            table_failures = [failure['name'] for failure in failures if failure['table'] == state['table']]
+            self.load_log.append({
+                'table': state['table'],
+                'operation': 'index_restore',
+                'status': 'failed' if table_failures else 'restored',
+                'reason': reason,
+                'not_restored': table_failures
+            })
     
-    def execute_post_load_sql(self, sql_statements: List[str]) -> bool:
+    @instrument_stage()
+    def execute_post_load_sql(self, sql_statements: List[str], transactional: bool = True) -> bool:
         """
         Execute SQL statements after loading (e.g., indexes, constraints)
         
         Args:
             sql_statements: List of SQL statements to execute
+            transactional: Run them as one batch in a single transaction (all
+                or nothing); False commits each statement on its own
             
         Returns:
             True if all successful
         """
         try:
-            for sql in sql_statements:
-                self.db_connection.execute_sql(sql)
+            if transactional:
+                with ddl_transaction(self.db_connection.get_engine()) as connection:
+                    for sql in sql_statements:
+                        connection.execute(text(sql))
+                for table_name in set().union(*(written_tables(sql) for sql in sql_statements)):
+                    self.db_connection.mark_table_changed(table_name)
+            else:
+                for sql in sql_statements:
+                    self.db_connection.execute_sql(sql)
             
             print(f"Executed {len(sql_statements)} post-load SQL statements")
             return True
             
         except Exception as e:
-            print(f"Error executing post-load SQL: {str(e)}")
+            print(f"Error executing post-load SQL{' (rolled back)' if transactional else ''}: {str(e)}")
             return False
     
     def get_load_log(self) -> List[Dict[str, Any]]:
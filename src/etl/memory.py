@@ -0,0 +1,137 @@
+"""
+Memory Module - ETL Pipeline
+Compact dtype inference and memory reporting for extracted DataFrames
+"""
+
+import numpy as np
+import pandas as pd
+from typing import List
+
+
+# Low-cardinality dimension attributes stored as categoricals
+CATEGORICAL_COLUMNS = ['marca', 'modelo', 'provincia', 'ciudad', 'forma_pago', 'canal']
+
+# Key columns (surrogate/natural) are never categorized automatically
+KEY_PREFIXES = ('sk_', 'id_')
+_INT32 = np.iinfo(np.int32)
+
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    """
+    Deep memory usage of a DataFrame in MB (strings included)
+
+    Args:
+        df: DataFrame to measure
+
+    Returns:
+        Memory usage in MB
+    """
+    return round(df.memory_usage(deep=True).sum() / 1024 ** 2, 3)
+
+
+class MemoryOptimizer:
+    """
+    Infers compact dtypes for extracted DataFrames
+
+    - integer columns are downcast (surrogate/natural keys to int32 when
+      their range fits, never below int32 so arithmetic cannot overflow)
+    - low-cardinality text columns become categoricals
+
+    Amounts stay float64: every other dtype keeps its values, so frames can
+    be merged, concatenated, staged or loaded without knowing they were optimized.
+    """
+
+    def __init__(self, categorical_columns: List[str] = None, auto_categorize: bool = True,
+                 max_category_ratio: float = 0.5):
+        """
+        Initialize the optimizer
+
+        Args:
+            categorical_columns: Columns always stored as categoricals
+                (default: CATEGORICAL_COLUMNS)
+            auto_categorize: Also categorize other text columns whose
+                distinct/total ratio is below max_category_ratio
+            max_category_ratio: Cardinality limit for automatic categoricals
+        """
+        self.categorical_columns = CATEGORICAL_COLUMNS if categorical_columns is None else categorical_columns
+        self.auto_categorize = auto_categorize
+        self.max_category_ratio = max_category_ratio
+
+    def optimize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Return a copy of the frame with compact dtypes
+
+        Args:
+            df: Extracted DataFrame
+
+        Returns:
+            DataFrame with downcast integer and categorical columns
+        """
+        converted = {}
+
+        for column in df.columns:
+            series = df[column]
+            if pd.api.types.is_integer_dtype(series.dtype) and not isinstance(series.dtype, pd.CategoricalDtype):
+                downcast = self._downcast_integers(series)
+                if downcast is not None:
+                    converted[column] = downcast
+            elif self._is_categorical_candidate(column, series):
+                converted[column] = series.astype('category')
+
+        if not converted:
+            return df
+        return df.assign(**converted)
+
+    def report(self, before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+        """
+        Per-column dtype and memory comparison
+
+        Args:
+            before: Original DataFrame
+            after: Optimized DataFrame
+
+        Returns:
+            DataFrame indexed by column with dtypes and MB before/after
+        """
+        mb_before = before.memory_usage(deep=True, index=False) / 1024 ** 2
+        mb_after = after.memory_usage(deep=True, index=False) / 1024 ** 2
+        report = pd.DataFrame({
+            'dtype_before': before.dtypes.astype(str),
+            'dtype_after': after.dtypes.astype(str),
+            'mb_before': mb_before.round(3),
+            'mb_after': mb_after.round(3),
+        })
+        report['saved_pct'] = ((1 - mb_after / mb_before.replace(0, np.nan)) * 100).round(1).fillna(0)
+        return report
+
+    @staticmethod
+    def _downcast_integers(series: pd.Series):
+        """int64 -> int32 when the values fit (nullable integers keep their NA support)"""
+        if series.dtype.itemsize <= 4 or series.empty:
+            return None
+        low, high = series.min(), series.max()
+        if pd.isna(low) or low < _INT32.min or high > _INT32.max:
+            return None
+        return series.astype('Int32' if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) else 'int32')
+
+    def _is_categorical_candidate(self, column: str, series: pd.Series) -> bool:
+        """Text columns listed as categorical or with few distinct values"""
+        if not (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)):
+            return False
+        if column in self.categorical_columns:
+            return True
+        if not self.auto_categorize or column.startswith(KEY_PREFIXES) or len(series) < 2:
+            return False
+        return series.nunique(dropna=False) / len(series) <= self.max_category_ratio
+
+
+if __name__ == "__main__":
+    # Example usage
+    sample = pd.DataFrame({
+        'sk_producto': np.arange(1, 1001),
+        'marca': np.random.choice(['Samsung', 'Motorola', 'Apple'], 1000),
+        'precio_unitario': np.random.uniform(100, 2000, 1000).round(2),
+    })
+    optimizer = MemoryOptimizer()
+    optimized = optimizer.optimize(sample)
+    print(optimizer.report(sample, optimized))
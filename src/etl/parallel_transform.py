@@ -0,0 +1,516 @@
+"""
+Parallel Transform Module - ETL Pipeline
+Multi-process clean, business-rule and aggregation steps over hash partitions
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+from src.etl.rules import RuleCompiler
+from src.etl.transform import _PARTIALS_BEFORE_COMPACT, DataTransformer, FrameOrStream, StreamDeduplicator
+from src.utils.metrics import instrument_stage
+from src.utils.streaming import is_chunk_stream
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+
+# Column the rows of a fact batch are hash-partitioned on
+DEFAULT_PARTITION_KEY = 'id_venta'
+
+# Below this many rows per worker the single-process DataTransformer is used
+MIN_ROWS_PER_WORKER = 50_000
+
+# Helper columns carried through the workers
+_ROW_POSITION = '__row_position'
+_ROW_HASH = '__row_hash'
+_MISSING_BEFORE = '__missing_before'
+_MISSING_AFTER = '__missing_after'
+
+# Rule compiler of each worker process (plans are cached per rule list)
+_WORKER_RULE_COMPILER = None
+
+
+def _require_pyarrow():
+    """Fail with an actionable message when pyarrow is missing"""
+    if pa is None:
+        raise ImportError("Parallel transforms require pyarrow: pip install pyarrow")
+
+
+def partition_positions(df: pd.DataFrame, key: Union[str, List[str], None], partitions: int) -> List[np.ndarray]:
+    """
+    Split the row positions of a frame into hash partitions of a key
+
+    Rows with the same key always land in the same partition, and each
+    partition keeps the original row order.
+
+    Args:
+        df: Input DataFrame
+        key: Partition column(s); None hashes the whole row
+        partitions: Number of partitions
+
+    Returns:
+        One array of row positions per partition
+    """
+    hashed = df if key is None else df[key]
+    labels = pd.util.hash_pandas_object(hashed, index=False).to_numpy() % np.uint64(partitions)
+    order = np.argsort(labels, kind='stable')
+    counts = np.bincount(labels.astype(np.int64), minlength=partitions)
+    return np.split(order, np.cumsum(counts)[:-1])
+
+
+# -- shared-memory transport (Arrow IPC streams in SharedMemory blocks) ----
+
+def _write_shared(df: pd.DataFrame) -> Tuple[str, int]:
+    """Serialize a frame as an Arrow IPC stream into a new shared-memory block"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sizer = pa.MockOutputStream()
+    with pa.ipc.new_stream(sizer, table.schema) as writer:
+        writer.write_table(table)
+    size = sizer.size()
+
+    block = SharedMemory(create=True, size=max(size, 1))
+    buffer = pa.py_buffer(block.buf)
+    with pa.ipc.new_stream(pa.FixedSizeBufferWriter(buffer), table.schema) as writer:
+        writer.write_table(table)
+    del buffer, writer
+    block.close()
+    return block.name, size
+
+
+def _read_shared(block: SharedMemory, size: int) -> pd.DataFrame:
+    """Frame of a block without copying (columns may reference the block)"""
+    return pa.ipc.open_stream(pa.py_buffer(block.buf)[:size]).read_all().to_pandas()
+
+
+def _take_shared(name: str, size: int) -> pd.DataFrame:
+    """Copy a worker result out of its block, then free the block"""
+    block = SharedMemory(name=name)
+    try:
+        data = pa.py_buffer(bytes(block.buf[:size]))
+    finally:
+        block.close()
+        block.unlink()
+    return pa.ipc.open_stream(data).read_all().to_pandas()
+
+
+def _release(name: str):
+    """Free a block that will not be read"""
+    try:
+        block = SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+# -- worker kernels --------------------------------------------------------
+
+def _clean_kernel(df: pd.DataFrame, fill_na: Any = None, row_hashes: bool = False,
+                  dedup_columns: List[str] = None):
+    """Local dedup + fill of one partition (row_hashes: keep hashes for a cross-chunk dedup)"""
+    data_columns = [column for column in df.columns if column != _ROW_POSITION]
+    data = df[data_columns]
+    if row_hashes:
+        deduplicator = StreamDeduplicator(dedup_columns)
+        hashes = deduplicator.row_keys(data)
+        keep = deduplicator.keep_mask(hashes)
+    else:
+        keep = ~data.duplicated(subset=dedup_columns).to_numpy()
+    cleaned = df[keep]
+
+    missing_before = cleaned[data_columns].isnull().sum(axis=1).to_numpy()
+    if fill_na is not None:
+        cleaned = cleaned.fillna(fill_na)
+    missing_after = cleaned[data_columns].isnull().sum(axis=1).to_numpy()
+
+    stats = {'duplicates_removed': int(len(df) - len(cleaned)),
+             'missing_before': int(missing_before.sum()), 'missing_after': int(missing_after.sum())}
+    if row_hashes:
+        cleaned = cleaned.assign(**{_ROW_HASH: hashes[keep], _MISSING_BEFORE: missing_before,
+                                    _MISSING_AFTER: missing_after})
+    return cleaned, stats
+
+
+def _rules_kernel(df: pd.DataFrame, rules: List[Dict[str, Any]]):
+    """Business rules on one partition (rules are row-local)"""
+    global _WORKER_RULE_COMPILER
+    if _WORKER_RULE_COMPILER is None:
+        _WORKER_RULE_COMPILER = RuleCompiler()
+    return _WORKER_RULE_COMPILER.compile(rules).execute(df), {}
+
+
+def _aggregate_kernel(df: pd.DataFrame, group_by: List[str], aggregations: Dict[str, Any]):
+    """Final (partition key within group_by) or partial aggregates of one partition"""
+    grouped = df.groupby(group_by, observed=True)
+    if all(isinstance(spec, tuple) for spec in aggregations.values()):
+        result = grouped.agg(**aggregations)
+    else:
+        result = grouped.agg(aggregations)
+    return result.reset_index(), {'rows_in': len(df)}
+
+
+_KERNELS = {
+    'clean': _clean_kernel,
+    'rules': _rules_kernel,
+    'aggregate': _aggregate_kernel,
+}
+
+
+def _run_partition(operation: str, name: str, size: int, options: Dict[str, Any]):
+    """
+    Worker entry point: read a partition from shared memory, run a kernel
+    and write the result to a new block
+
+    Returns:
+        (result block name, result size, kernel statistics)
+    """
+    block = SharedMemory(name=name)
+    try:
+        df = _read_shared(block, size)
+        result, stats = _KERNELS[operation](df, **options)
+        del df
+        result_name, result_size = _write_shared(result)
+        del result
+    finally:
+        try:
+            block.close()
+        except BufferError:
+            # A lingering view of the block; the mapping goes away with the worker
+            pass
+    return result_name, result_size, stats
+
+
+class ParallelTransformer:
+    """
+    Runs DataTransformer steps on a process pool
+
+    Frames are hash-partitioned on a key (id_venta by default) and shipped
+    to the workers as Arrow IPC streams in shared memory, not pickled.
+    Results are merged so the output equals the single-process one:
+    duplicates share their key and are removed within a partition, rows
+    come back in their original order and index, and aggregations are
+    computed per partition and combined (sum/count/size/min/max/mean) or,
+    when the partition key is one of the group columns, concatenated.
+    Chunk streams are processed one chunk per task, a few chunks ahead.
+    """
+
+    def __init__(self, transformer: DataTransformer = None, workers: int = None,
+                 partition_key: Union[str, List[str]] = DEFAULT_PARTITION_KEY, partitions: int = None,
+                 min_rows_per_worker: int = MIN_ROWS_PER_WORKER, start_method: str = None):
+        """
+        Initialize the ParallelTransformer
+
+        Args:
+            transformer: DataTransformer used for small inputs and whose
+                transformation_log is extended (default: a new one)
+            workers: Worker processes (default: CPU count)
+            partition_key: Column(s) rows are hash-partitioned on; frames
+                without them are partitioned on the whole row
+            partitions: Partitions per frame (default: workers)
+            min_rows_per_worker: Rows per worker below which the step runs
+                in this process
+            start_method: multiprocessing start method ('fork', 'spawn',
+                'forkserver'; default: the platform default)
+        """
+        _require_pyarrow()
+        self.transformer = transformer or DataTransformer()
+        self.workers = workers or os.cpu_count() or 1
+        self.partition_key = partition_key
+        self.partitions = partitions or self.workers
+        self.min_rows_per_worker = min_rows_per_worker
+        self.start_method = start_method
+        self._pool = None
+
+    def __enter__(self) -> 'ParallelTransformer':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        """Process pool, started on first use and reused by every step"""
+        if self._pool is None:
+            context = get_context(self.start_method) if self.start_method else None
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    def _runs_serially(self, df: pd.DataFrame) -> bool:
+        return self.workers <= 1 or len(df) < self.min_rows_per_worker * 2
+
+    def _key_for(self, df: pd.DataFrame):
+        keys = [self.partition_key] if isinstance(self.partition_key, str) else list(self.partition_key)
+        return keys if all(key in df.columns for key in keys) else None
+
+    # -- task plumbing ------------------------------------------------------
+
+    def _map_frames(self, operation: str, frames: Iterable[pd.DataFrame], options: Dict[str, Any],
+                    in_flight: int = None) -> Iterator[Tuple[pd.DataFrame, Dict[str, Any]]]:
+        """
+        Run a kernel over frames on the pool, yielding the results in input
+        order with at most in_flight tasks submitted ahead
+
+        Frames Arrow cannot serialize (e.g. an object column mixing ints and
+        strings) are run through the same kernel in this process.
+        """
+        in_flight = in_flight or self.workers * 2
+        pending = deque()
+        try:
+            for frame in frames:
+                try:
+                    name, size = _write_shared(frame)
+                except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                    print(f"Running {operation} in this process: frame not serializable by Arrow ({e})")
+                    pending.append((None, _KERNELS[operation](frame, **options)))
+                else:
+                    pending.append((name, self._executor().submit(_run_partition, operation, name, size, options)))
+                if len(pending) >= in_flight:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+        finally:
+            for name, future in pending:
+                if name is None:
+                    continue
+                future.cancel()
+                if not future.cancelled() and future.exception() is None:
+                    _release(future.result()[0])
+                _release(name)
+
+    @staticmethod
+    def _collect(name: str, future) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        if name is None:
+            # Computed in this process
+            return future
+        try:
+            result_name, result_size, stats = future.result()
+        finally:
+            _release(name)
+        return _take_shared(result_name, result_size), stats
+
+    def _map_partitions(self, operation: str, df: pd.DataFrame, options: Dict[str, Any], key,
+                        keep_positions: bool = True) -> List[Tuple[pd.DataFrame, Dict[str, Any]]]:
+        """Run a kernel over the hash partitions of a frame"""
+        source = df.assign(**{_ROW_POSITION: np.arange(len(df))}) if keep_positions else df
+        parts = (source.take(positions) for positions in partition_positions(df, key, self.partitions))
+        return list(self._map_frames(operation, parts, options, in_flight=self.partitions))
+
+    @staticmethod
+    def _restore_order(results: List[pd.DataFrame], index: pd.Index, attrs: Dict[str, Any]) -> pd.DataFrame:
+        """Concatenate partition results back into the original row order and index"""
+        combined = pd.concat(results, ignore_index=True)
+        positions = combined.pop(_ROW_POSITION).to_numpy()
+        order = np.argsort(positions, kind='stable')
+        combined = combined.take(order)
+        combined.index = index[positions[order]]
+        combined.attrs = dict(attrs)
+        return combined
+
+    def _log(self, operation: str, rows: int, started: float, **details):
+        entry = {
+            'operation': operation,
+            'timestamp': datetime.now(),
+            'parallel': True,
+            'workers': self.workers,
+            'rows': rows,
+            'duration_seconds': round(time.perf_counter() - started, 4),
+        }
+        entry.update(details)
+        self.transformer.transformation_log.append(entry)
+
+    # -- steps --------------------------------------------------------------
+
+    @instrument_stage()
+    def clean_data(self, df: FrameOrStream, config: Dict[str, Any] = None) -> FrameOrStream:
+        """
+        Parallel DataTransformer.clean_data (same output and log entry)
+
+        Args:
+            df: Input DataFrame or stream of DataFrame chunks
+            config: Configuration for cleaning operations (fill_na, dedup_columns)
+
+        Returns:
+            Cleaned DataFrame (or a lazy stream of cleaned chunks)
+        """
+        options = {'fill_na': (config or {}).get('fill_na'),
+                   'dedup_columns': (config or {}).get('dedup_columns')}
+        if is_chunk_stream(df):
+            return self._clean_data_stream(df, options)
+        if self._runs_serially(df):
+            return self.transformer.clean_data(df, config)
+        key = self._key_for(df)
+        # Duplicates only meet in one partition when they share the partition key
+        if options['dedup_columns'] and not set(key or []) <= set(options['dedup_columns']):
+            key = list(options['dedup_columns'])
+
+        started = time.perf_counter()
+        print(f"Starting parallel data cleaning ({self.partitions} partitions, {self.workers} workers)...")
+        results = self._map_partitions('clean', df, options, key)
+        df_clean = self._restore_order([result for result, _ in results], df.index, df.attrs)
+
+        duplicates_removed = sum(stats['duplicates_removed'] for _, stats in results)
+        missing_before = sum(stats['missing_before'] for _, stats in results)
+        missing_after = sum(stats['missing_after'] for _, stats in results)
+        if duplicates_removed > 0:
+            print(f"Removed {duplicates_removed} duplicate rows")
+        print(f"Missing values: {missing_before} -> {missing_after}")
+
+        self._log('clean_data', len(df), started, partitions=self.partitions,
+                  duplicates_removed=duplicates_removed, missing_values_handled=missing_before - missing_after)
+        return df_clean
+
+    def _clean_data_stream(self, chunks: Iterable[pd.DataFrame], options: Dict[str, Any]) -> Iterator[pd.DataFrame]:
+        """
+        Clean chunks on the pool; rows are deduplicated across chunks through
+        the 64-bit keys computed by the workers (see StreamDeduplicator)
+        """
+        started = time.perf_counter()
+        print("Starting parallel streamed data cleaning...")
+        deduplicator = StreamDeduplicator(options['dedup_columns'])
+        rows = duplicates_removed = missing_before = missing_after = 0
+        indexes = deque()
+
+        def tasks():
+            for chunk in chunks:
+                indexes.append((chunk.index, chunk.attrs))
+                yield chunk.assign(**{_ROW_POSITION: np.arange(len(chunk))})
+
+        for (cleaned, stats), (index, attrs) in zip(
+                self._map_frames('clean', tasks(), dict(options, row_hashes=True)),
+                iter(indexes.popleft, None)):
+            keep = deduplicator.keep_mask(cleaned[_ROW_HASH].to_numpy())
+            rows += len(index)
+            duplicates_removed += len(index) - int(keep.sum())
+            missing_before += int(cleaned[_MISSING_BEFORE].to_numpy()[keep].sum())
+            missing_after += int(cleaned[_MISSING_AFTER].to_numpy()[keep].sum())
+            kept = cleaned[keep].drop(columns=[_ROW_HASH, _MISSING_BEFORE, _MISSING_AFTER])
+            yield self._restore_order([kept], index, attrs)
+
+        if duplicates_removed > 0:
+            print(f"Removed {duplicates_removed} duplicate rows")
+        print(f"Missing values: {missing_before} -> {missing_after}")
+        self._log('clean_data', rows, started, streamed=True, duplicates_removed=duplicates_removed,
+                  missing_values_handled=missing_before - missing_after)
+
+    @instrument_stage()
+    def apply_business_rules(self, df: FrameOrStream, rules: List[Dict[str, Any]]) -> FrameOrStream:
+        """
+        Parallel DataTransformer.apply_business_rules
+
+        The rules are validated in this process first; workers compile and
+        cache their own plan.
+
+        Args:
+            df: Input DataFrame or stream of DataFrame chunks
+            rules: List of business rules to apply
+
+        Returns:
+            Transformed DataFrame (or a lazy stream of chunks)
+        """
+        self.transformer.compile_rules(rules)
+        if is_chunk_stream(df):
+            return self._apply_rules_stream(df, rules)
+        if self._runs_serially(df):
+            return self.transformer.apply_business_rules(df, rules)
+
+        started = time.perf_counter()
+        # Rules are row-local, so contiguous slices balance better than hashing
+        source = df.assign(**{_ROW_POSITION: np.arange(len(df))})
+        parts = (source.iloc[positions] for positions in np.array_split(np.arange(len(df)), self.partitions))
+        results = list(self._map_frames('rules', parts, {'rules': rules}, in_flight=self.partitions))
+        df_transformed = self._restore_order([result for result, _ in results], df.index, df.attrs)
+
+        print(f"Applied {len(rules)} business rules on {self.partitions} partitions")
+        self._log('apply_business_rules', len(df), started, partitions=self.partitions)
+        return df_transformed
+
+    def _apply_rules_stream(self, chunks: Iterable[pd.DataFrame], rules: List[Dict[str, Any]]) -> Iterator[pd.DataFrame]:
+        """Apply the rules to each chunk on the pool, keeping chunk order"""
+        indexes = deque()
+
+        def tasks():
+            for chunk in chunks:
+                indexes.append((chunk.index, chunk.attrs))
+                yield chunk.assign(**{_ROW_POSITION: np.arange(len(chunk))})
+
+        for (result, _), (index, attrs) in zip(self._map_frames('rules', tasks(), {'rules': rules}),
+                                               iter(indexes.popleft, None)):
+            yield self._restore_order([result], index, attrs)
+
+    @instrument_stage()
+    def aggregate_data(self, df: FrameOrStream, group_by: List[str], aggregations: Dict[str, str]) -> pd.DataFrame:
+        """
+        Parallel DataTransformer.aggregate_data
+
+        When the partition key is one of the group columns each group lives
+        in one partition and any aggregation works; otherwise partial
+        aggregates are combined (sum, count, size, min, max or mean).
+
+        Args:
+            df: Input DataFrame or stream of DataFrame chunks
+            group_by: Columns to group by
+            aggregations: Dictionary of column -> aggregation function
+
+        Returns:
+            Aggregated DataFrame
+        """
+        streamed = is_chunk_stream(df)
+        if not streamed and self._runs_serially(df):
+            return self.transformer.aggregate_data(df, group_by, aggregations)
+
+        started = time.perf_counter()
+        key = None if streamed else self._key_for(df)
+        if key is not None and set(key) <= set(group_by):
+            results = self._map_partitions('aggregate', df, {'group_by': group_by, 'aggregations': aggregations},
+                                           key, keep_positions=False)
+            df_agg = pd.concat([result for result, _ in results], ignore_index=True)
+            df_agg = df_agg.set_index(group_by).sort_index().reset_index()
+            rows_in = len(df)
+        else:
+            partial_specs = DataTransformer._partial_aggregation_specs(aggregations)
+            options = {'group_by': group_by,
+                       'aggregations': {name: (column, func) for name, (column, func, _) in partial_specs.items()}}
+            if streamed:
+                frames = df
+            else:
+                frames = (df.iloc[positions] for positions in np.array_split(np.arange(len(df)), self.partitions))
+
+            partials = []
+            rows_in = 0
+            for result, stats in self._map_frames('aggregate', frames, options):
+                rows_in += stats['rows_in']
+                partials.append(result.set_index(group_by))
+                if len(partials) >= _PARTIALS_BEFORE_COMPACT:
+                    partials = [DataTransformer._combine_partial_aggregates(partials, partial_specs)]
+            if not partials:
+                return pd.DataFrame(columns=group_by + list(aggregations))
+            combined = DataTransformer._combine_partial_aggregates(partials, partial_specs)
+            df_agg = DataTransformer._finalize_partial_aggregates(combined, aggregations).reset_index()
+
+        print(f"Aggregated {rows_in} rows into {len(df_agg)} rows on {self.workers} workers")
+        self._log('aggregate_data', rows_in, started, streamed=streamed)
+        return df_agg
+
+    def close(self):
+        """Shut the worker pool down"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+if __name__ == "__main__":
+    # Example usage
+    # with ParallelTransformer(DataTransformer(), workers=8) as parallel:
+    #     detalle = parallel.clean_data(detalle, {'fill_na': {'descuento': 0}})
+    #     detalle = parallel.apply_business_rules(detalle, rules)
+    #     ventas_mes = parallel.aggregate_data(detalle, ['id_producto'], {'importe': 'sum', 'cantidad': 'sum'})
+    print("Parallel transform module loaded successfully")
@@ -0,0 +1,317 @@
+"""
+Partitioned Load Module - ETL Pipeline
+Concurrent per-partition fact loading with retries and restartable checkpoints
+"""
+
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Any, Set
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect
+from sqlalchemy.exc import DBAPIError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.engine import Connection
+from src.etl.load import DataLoader
+from src.utils.db_connection import DatabaseConnection
+
+
+# Control table recording the partitions each load has committed
+CHECKPOINT_TABLE = 'etl_load_checkpoint'
+
+# Ways of splitting a fact frame
+PARTITION_MODES = ('month', 'hash')
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Whether a load error is worth retrying (lost connections, lock/deadlock
+    victims, pool timeouts) rather than a data or schema error
+
+    Args:
+        error: Exception raised by the load
+
+    Returns:
+        True for transient errors
+    """
+    if isinstance(error, PoolTimeoutError):
+        return True
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    if isinstance(error, OperationalError):
+        message = str(error.orig if error.orig is not None else error).lower()
+        return any(marker in message for marker in (
+            'locked', 'deadlock', 'timeout', 'timed out', 'connection', 'busy', 'try again',
+        ))
+    return False
+
+
+class LoadCheckpointStore:
+    """
+    Reads and writes the committed partitions of each load in the DW control table
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, table_name: str = CHECKPOINT_TABLE):
+        """
+        Initialize the store, creating the control table if needed
+
+        Args:
+            db_connection: Connection to the data warehouse
+            table_name: Name of the control table
+        """
+        self.db_connection = db_connection
+        self.table = Table(
+            table_name, MetaData(),
+            Column('load_id', String(100), primary_key=True),
+            Column('tabla', String(128), primary_key=True),
+            Column('particion', String(64), primary_key=True),
+            Column('filas', Integer, nullable=False),
+            Column('intentos', Integer, nullable=False),
+            Column('completado_en', DateTime, nullable=False),
+        )
+        self.table.create(self.db_connection.get_engine(), checkfirst=True)
+
+    def completed(self, load_id: str, table_name: str) -> Set[str]:
+        """
+        Partitions of a load already committed
+
+        Args:
+            load_id: Load identifier
+            table_name: Target table
+
+        Returns:
+            Set of partition labels
+        """
+        with self.db_connection.checkout() as connection:
+            rows = connection.execute(
+                self.table.select().where(self.table.c.load_id == load_id)
+                .where(self.table.c.tabla == table_name)
+            ).mappings().all()
+        return {row['particion'] for row in rows}
+
+    def record(self, connection: Connection, load_id: str, table_name: str, partition: str,
+               rows: int, attempts: int):
+        """
+        Record a partition inside the transaction that loaded it, so data and
+        checkpoint commit (or roll back) together
+
+        Args:
+            connection: Connection of the partition transaction
+            load_id: Load identifier
+            table_name: Target table
+            partition: Partition label
+            rows: Rows loaded
+            attempts: Attempts used
+        """
+        connection.execute(self.table.insert().values(
+            load_id=load_id,
+            tabla=table_name,
+            particion=partition,
+            filas=int(rows),
+            intentos=int(attempts),
+            completado_en=datetime.now(),
+        ))
+
+    def clear(self, load_id: str):
+        """
+        Forget the checkpoints of a load
+
+        Args:
+            load_id: Load identifier
+        """
+        with self.db_connection.get_engine().begin() as connection:
+            connection.execute(self.table.delete().where(self.table.c.load_id == load_id))
+
+
+class PartitionedFactLoader:
+    """
+    Splits a fact frame into partitions and loads them concurrently
+
+    Every partition is loaded on its own pooled connection, in its own
+    transaction, together with its checkpoint row. A failed partition is
+    retried on transient errors and never affects the others; rerunning a
+    load with the same load_id skips the partitions already committed.
+    """
+
+    def __init__(self, loader: DataLoader, table_name: str, partition_by: str = 'month',
+                 date_key_column: str = 'sk_fecha', hash_column: str = 'id_venta', num_partitions: int = 8,
+                 date_table: str = 'DimFecha', max_workers: int = 4, max_retries: int = 3,
+                 retry_backoff: float = 0.5, checkpoint_table: str = CHECKPOINT_TABLE):
+        """
+        Initialize the scheduler
+
+        Args:
+            loader: DataLoader of the data warehouse (engine, bulk engine, hooks)
+            table_name: Target fact table
+            partition_by: 'month' (month of the date key) or 'hash' (of hash_column)
+            date_key_column: Date surrogate key of the fact rows
+            hash_column: Column hashed into buckets in 'hash' mode
+            num_partitions: Buckets in 'hash' mode
+            date_table: Date dimension mapping the date key to its fecha
+            max_workers: Partitions loaded concurrently (keep within the pool size)
+            max_retries: Retries of a partition after a transient error
+            retry_backoff: Seconds before the first retry (doubled on each retry)
+            checkpoint_table: Control table of committed partitions
+        """
+        if partition_by not in PARTITION_MODES:
+            raise ValueError(f"Unknown partition mode '{partition_by}'. Available: {', '.join(PARTITION_MODES)}")
+        self.loader = loader
+        self.table_name = table_name
+        self.partition_by = partition_by
+        self.date_key_column = date_key_column
+        self.hash_column = hash_column
+        self.num_partitions = num_partitions
+        self.date_table = date_table
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.checkpoints = LoadCheckpointStore(loader.db_connection, checkpoint_table)
+        self._months = None
+
+    def _month_map(self) -> pd.Series:
+        """Date key -> 'YYYY-MM', read once from the date dimension"""
+        if self._months is None:
+            quote = self.loader.db_connection.get_engine().dialect.identifier_preparer.quote
+            dates = self.loader.db_connection.execute_query(
+                f"SELECT {quote(self.date_key_column)}, fecha FROM {quote(self.date_table)}"
+            )
+            self._months = pd.Series(
+                pd.to_datetime(dates['fecha']).dt.strftime('%Y-%m').to_numpy(),
+                index=dates[self.date_key_column].to_numpy()
+            )
+        return self._months
+
+    def partition_labels(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Partition label of every row
+
+        Args:
+            df: Fact rows
+
+        Returns:
+            Array of labels ('YYYY-MM' or 'hNN'; unknown dates go to 'sin_fecha')
+        """
+        if self.partition_by == 'month':
+            months = df[self.date_key_column].map(self._month_map())
+            return months.fillna('sin_fecha').to_numpy()
+        buckets = pd.util.hash_array(df[self.hash_column].to_numpy()) % np.uint64(self.num_partitions)
+        width = len(str(self.num_partitions - 1))
+        return np.char.add('h', np.char.zfill(buckets.astype(str), width))
+
+    def partition(self, df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        Split a fact frame into partitions
+
+        Args:
+            df: Fact rows
+
+        Returns:
+            Dictionary of partition label -> rows, in label order
+        """
+        labels = self.partition_labels(df)
+        return {label: part for label, part in sorted(df.groupby(labels, sort=False), key=lambda item: item[0])}
+
+    def load(self, df: pd.DataFrame, load_id: str = None) -> Dict[str, Any]:
+        """
+        Load every pending partition of a fact frame
+
+        Args:
+            df: Fact rows
+            load_id: Identifier of the load; pass the id of an interrupted run
+                to resume it (default: a new id)
+
+        Returns:
+            Summary with the loaded, skipped and failed partitions
+        """
+        load_id = load_id or f"{self.table_name}-{uuid.uuid4().hex[:12]}"
+        started = time.perf_counter()
+        partitions = self.partition(df)
+        done = self.checkpoints.completed(load_id, self.table_name)
+        pending = {label: part for label, part in partitions.items() if label not in done}
+
+        print(f"Partitioned load {load_id} into {self.table_name}: {len(pending)} pending of "
+              f"{len(partitions)} partitions ({self.partition_by}, {self.max_workers} workers)")
+
+        engine = self.loader.db_connection.get_engine()
+        if pending and not inspect(engine).has_table(self.table_name):
+            # Create the table once, so concurrent partitions do not race on CREATE TABLE
+            self.loader.bulk_engine.load(df.head(0), self.table_name, engine)
+
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers), thread_name_prefix='partition') as executor:
+            futures = {executor.submit(self._load_partition, load_id, label, part): label
+                       for label, part in pending.items()}
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if result['status'] == 'success':
+                    # Hooks run on the scheduler thread, one committed partition at a time
+                    self.loader._run_post_load_hooks(self.table_name, pending[result['partition']])
+
+        loaded = sorted(r['partition'] for r in results if r['status'] == 'success')
+        failed = {r['partition']: r['error'] for r in results if r['status'] == 'failed'}
+        summary = {
+            'load_id': load_id,
+            'table': self.table_name,
+            'partitions': len(partitions),
+            'loaded': loaded,
+            'skipped': sorted(done & partitions.keys()),
+            'failed': failed,
+            'rows_loaded': sum(r['rows'] for r in results if r['status'] == 'success'),
+            'retries': sum(r['attempts'] - 1 for r in results),
+            'duration_seconds': round(time.perf_counter() - started, 4),
+        }
+        print(f"Loaded {len(loaded)} partitions ({summary['rows_loaded']} rows), skipped "
+              f"{len(summary['skipped'])}, failed {len(failed)} in {summary['duration_seconds']}s")
+        return summary
+
+    def _load_partition(self, load_id: str, label: str, df: pd.DataFrame) -> Dict[str, Any]:
+        """Load one partition and its checkpoint in one transaction, retrying transient errors"""
+        engine = self.loader.db_connection.get_engine()
+        attempts = 0
+        started = time.perf_counter()
+        while True:
+            attempts += 1
+            try:
+                with engine.begin() as connection:
+                    rows = self.loader.bulk_engine.load(df, self.table_name, connection)
+                    self.checkpoints.record(connection, load_id, self.table_name, label, rows, attempts)
+                status, error = 'success', None
+                break
+            except Exception as e:
+                if attempts <= self.max_retries and is_transient_error(e):
+                    wait = self.retry_backoff * 2 ** (attempts - 1)
+                    print(f"Partition {label} of {self.table_name} failed ({str(e).splitlines()[0]}); "
+                          f"retry {attempts}/{self.max_retries} in {wait:.1f}s")
+                    time.sleep(wait)
+                    continue
+                print(f"Error loading partition {label} of {self.table_name}: {str(e)}")
+                rows, status, error = 0, 'failed', str(e)
+                break
+
+        duration = time.perf_counter() - started
+        entry = {
+            'table': self.table_name,
+            'partition': label,
+            'rows_loaded': rows,
+            'status': status,
+            'mode': 'partitioned',
+            'attempts': attempts,
+            'engine': self.loader.bulk_engine.name,
+            'duration_seconds': round(duration, 4),
+        }
+        if error is not None:
+            entry['error'] = error
+        else:
+            self.loader.db_connection.mark_table_changed(self.table_name)
+        self.loader.load_log.append(entry)
+        return {'partition': label, 'rows': rows, 'status': status, 'attempts': attempts, 'error': error}
+
+
+if __name__ == "__main__":
+    # Example usage
+    # loader = DataLoader(dw_params)
+    # scheduler = PartitionedFactLoader(loader, 'FactVentas', partition_by='month', max_workers=4)
+    # summary = scheduler.load(facts_df, load_id='FactVentas-2024')
+    print("Partitioned load module loaded successfully")
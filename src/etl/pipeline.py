@@ -0,0 +1,819 @@
+"""
+Pipeline Module - ETL Pipeline
+Dependency-aware stage scheduler for the DW build: independent stages run
+concurrently, streamed stages exchange chunks through bounded queues and
+completed stages are checkpointed so a failed build resumes where it stopped
+"""
+
+import json
+import queue
+import threading
+import time
+import uuid
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List
+from sqlalchemy import Column, DateTime, Float, MetaData, String, Table, Text
+from src.etl.dim_generators import DateDimensionLoader
+from src.etl.dimension_sync import DIMENSION_SYNC_SPECS, DimensionSynchronizer
+from src.etl.incremental import FACT_VENTAS_KEY, IncrementalFactLoader
+from src.etl.load import DataLoader
+from src.etl.scd import DIM_VENDEDOR_SCD2, SCD2Merger
+from src.utils.db_connection import DatabaseConnection
+from src.utils.metrics import get_registry
+from src.utils.streaming import DEFAULT_CHUNKSIZE
+
+
+# Control table holding the stages completed by the last unfinished run
+CHECKPOINT_TABLE = 'etl_pipeline_checkpoint'
+
+# Stage groups run at the same time
+DEFAULT_MAX_WORKERS = 4
+
+# Chunks buffered between a streamed stage and each consumer
+DEFAULT_QUEUE_SIZE = 4
+
+# Seconds between checks of the cancel flag while blocked on a queue
+_POLL_SECONDS = 0.1
+
+# DW_Celulares dimensions loaded before FactVentas, with their DIMENSION_SYNC_SPECS entry
+DW_SYNC_STAGES = {
+    'DimCliente': 'cliente',
+    'DimProducto': 'producto',
+    'DimLocal': 'local',
+    'DimFormaPago': 'forma_pago',
+    'DimCanal': 'canal',
+}
+
+DW_DIMENSION_STAGES = list(DW_SYNC_STAGES) + ['DimVendedor', 'DimFecha', 'DimExchangeRate']
+
+# fecha_inicio of first DimVendedor versions (default of 03_ddl_dw.sql)
+VENDEDOR_FECHA_INICIO = date(1900, 1, 1)
+VENDEDOR_CATEGORIA_INICIAL = 'Inicial'
+
+
+class StageCancelled(RuntimeError):
+    """Raised inside a streamed stage when another stage of its group failed"""
+
+
+class PipelineError(RuntimeError):
+    """A pipeline run stopped because a stage failed"""
+
+    def __init__(self, pipeline: str, stage: str, error: BaseException):
+        super().__init__(f"Pipeline {pipeline} failed at stage {stage}: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class PipelineStage:
+    """
+    One node of the pipeline DAG
+
+    The function receives a dictionary with the result of every stage in
+    depends_on. A streamed stage (stream_from) runs at the same time as its
+    source and also receives, under the source's name, an iterator over the
+    chunks the source produces; a stage feeding others returns an iterable
+    of DataFrames.
+    """
+
+    def __init__(self, name: str, function: Callable[[Dict[str, Any]], Any], depends_on: List[str] = None,
+                 stream_from: str = None, checkpoint: bool = True, description: str = None):
+        """
+        Initialize the stage
+
+        Args:
+            name: Unique stage name
+            function: Callable receiving the inputs dictionary
+            depends_on: Stages that must finish before this one starts
+            stream_from: Stage whose chunks this one consumes while it runs
+            checkpoint: Record the stage as completed so a resumed run skips it
+            description: Free text shown by describe()
+        """
+        self.name = name
+        self.function = function
+        self.depends_on = [dependency for dependency in (depends_on or []) if dependency != stream_from]
+        self.stream_from = stream_from
+        self.checkpoint = checkpoint
+        self.description = description or name
+
+    @property
+    def upstream(self) -> List[str]:
+        """Every stage this one waits for or reads from"""
+        return self.depends_on + ([self.stream_from] if self.stream_from else [])
+
+
+class CheckpointStore:
+    """
+    Reads and writes completed stages in the DW control table
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, table_name: str = CHECKPOINT_TABLE):
+        """
+        Initialize the store, creating the control table if needed
+
+        Args:
+            db_connection: Connection to the data warehouse
+            table_name: Name of the control table
+        """
+        self.db_connection = db_connection
+        self.table = Table(
+            table_name, MetaData(),
+            Column('pipeline', String(100), primary_key=True),
+            Column('etapa', String(100), primary_key=True),
+            Column('ejecucion', String(32), nullable=False),
+            Column('resultado', Text, nullable=True),
+            Column('duracion_segundos', Float, nullable=True),
+            Column('finalizado_en', DateTime, nullable=False),
+        )
+        self.table.create(self.db_connection.get_engine(), checkfirst=True)
+
+    def completed(self, pipeline: str) -> Dict[str, Any]:
+        """
+        Get the checkpointed stages of a pipeline
+
+        Args:
+            pipeline: Pipeline name
+
+        Returns:
+            Dictionary mapping each completed stage to its stored result
+        """
+        with self.db_connection.checkout() as connection:
+            rows = connection.execute(
+                self.table.select().where(self.table.c.pipeline == pipeline)
+            ).mappings().all()
+        return {row['etapa']: json.loads(row['resultado']) if row['resultado'] else None for row in rows}
+
+    def save(self, pipeline: str, etapa: str, ejecucion: str, resultado: Any, duracion_segundos: float = None):
+        """
+        Record a completed stage (replace in one transaction)
+
+        Args:
+            pipeline: Pipeline name
+            etapa: Stage name
+            ejecucion: Identifier of the run
+            resultado: Stage result (stored as JSON)
+            duracion_segundos: Stage wall time
+        """
+        with self.db_connection.get_engine().begin() as connection:
+            connection.execute(self.table.delete().where(
+                (self.table.c.pipeline == pipeline) & (self.table.c.etapa == etapa)
+            ))
+            connection.execute(self.table.insert().values(
+                pipeline=pipeline,
+                etapa=etapa,
+                ejecucion=ejecucion,
+                resultado=json.dumps(resultado, default=str),
+                duracion_segundos=duracion_segundos,
+                finalizado_en=datetime.now(),
+            ))
+
+    def clear(self, pipeline: str) -> int:
+        """
+        Forget the checkpoints of a pipeline (the next run starts from scratch)
+
+        Args:
+            pipeline: Pipeline name
+
+        Returns:
+            Number of checkpoints removed
+        """
+        with self.db_connection.get_engine().begin() as connection:
+            result = connection.execute(self.table.delete().where(self.table.c.pipeline == pipeline))
+        return max(result.rowcount or 0, 0)
+
+
+class _EndOfStream:
+    """Queue marker closing a stream (error set when the source failed)"""
+
+    def __init__(self, source: str, error: BaseException = None):
+        self.source = source
+        self.error = error
+
+
+class _ChunkChannel:
+    """
+    Bounded queue between a streamed stage and one consumer
+
+    put() blocks while the queue is full, so a fast source waits for its
+    slowest consumer instead of buffering the whole stream in memory.
+    """
+
+    def __init__(self, source: str, maxsize: int, cancel: threading.Event):
+        self.source = source
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.cancel = cancel
+        self.detached = False
+        self.blocked_seconds = 0.0
+
+    def put(self, item):
+        """Enqueue an item, waiting for room (dropped once the consumer stopped reading)"""
+        started = time.perf_counter()
+        try:
+            while not self.detached:
+                if self.cancel.is_set():
+                    raise StageCancelled("stream cancelled by a failed stage")
+                try:
+                    self.queue.put(item, timeout=_POLL_SECONDS)
+                    return
+                except queue.Full:
+                    continue
+        finally:
+            self.blocked_seconds += time.perf_counter() - started
+
+    def close(self, error: BaseException = None):
+        """Signal the end of the stream to the consumer"""
+        try:
+            self.put(_EndOfStream(self.source, error))
+        except StageCancelled:
+            pass
+
+    def detach(self):
+        """Called when the consumer finished: later chunks are discarded"""
+        self.detached = True
+
+    def __iter__(self) -> Iterator[Any]:
+        while True:
+            try:
+                item = self.queue.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                if self.cancel.is_set():
+                    raise StageCancelled(f"stream from {self.source} cancelled")
+                continue
+            if isinstance(item, _EndOfStream):
+                if item.error is not None:
+                    raise StageCancelled(f"upstream stage {self.source} failed: {item.error}")
+                return
+            yield item
+
+
+class Pipeline:
+    """
+    Runs a DAG of stages on a thread pool
+
+    A stage starts as soon as every stage it depends on has finished, up to
+    max_workers at a time. Stages linked by stream_from form a group that
+    starts together (one worker slot, one thread per member) and passes
+    chunks through bounded queues. After a failure no new stage starts; the
+    completed stages stay checkpointed and the next run(resume=True) skips
+    them. Each run ends with a timing report marking the critical path.
+    """
+
+    def __init__(self, name: str, max_workers: int = DEFAULT_MAX_WORKERS,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, checkpoints: CheckpointStore = None):
+        """
+        Initialize the pipeline
+
+        Args:
+            name: Pipeline name (key of its checkpoints)
+            max_workers: Stage groups run at the same time
+            queue_size: Chunks buffered per streamed edge
+            checkpoints: Store of completed stages (None: no resume)
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.checkpoints = checkpoints
+        self.stages: Dict[str, PipelineStage] = {}
+        self.timings: Dict[str, Dict[str, Any]] = {}
+        self.run_log = []
+        self.registry = get_registry()
+        self._run_started = None
+
+    def add_stage(self, name: str, function: Callable[[Dict[str, Any]], Any], depends_on: List[str] = None,
+                  stream_from: str = None, checkpoint: bool = True, description: str = None) -> PipelineStage:
+        """
+        Add a stage (see PipelineStage for the arguments)
+
+        Returns:
+            The new PipelineStage
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage {name} already defined in pipeline {self.name}")
+        stage = PipelineStage(name, function, depends_on, stream_from, checkpoint, description)
+        self.stages[name] = stage
+        return stage
+
+    def describe(self) -> pd.DataFrame:
+        """
+        Get the stages of the DAG
+
+        Returns:
+            DataFrame with one row per stage in dependency order
+        """
+        return pd.DataFrame([{
+            'stage': name,
+            'depends_on': ', '.join(self.stages[name].depends_on),
+            'stream_from': self.stages[name].stream_from or '',
+            'checkpoint': self.stages[name].checkpoint,
+            'description': self.stages[name].description,
+        } for name in self.validate()])
+
+    def validate(self) -> List[str]:
+        """
+        Check the DAG and get its stages in dependency order
+
+        Returns:
+            Stage names in topological order
+
+        Raises:
+            ValueError: On unknown stages, cycles or a stage depending on a
+                member of its own stream group
+        """
+        for stage in self.stages.values():
+            unknown = [name for name in stage.upstream if name not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} references unknown stages: {unknown}")
+
+        order, remaining = [], {name: set(stage.upstream) for name, stage in self.stages.items()}
+        while remaining:
+            ready = [name for name, upstream in remaining.items() if not upstream]
+            if not ready:
+                raise ValueError(f"Cycle between stages: {sorted(remaining)}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for upstream in remaining.values():
+                upstream.difference_update(ready)
+
+        for members in self._groups(order):
+            inside = [(name, dependency) for name in members
+                      for dependency in self.stages[name].depends_on if dependency in members]
+            if inside:
+                name, dependency = inside[0]
+                raise ValueError(f"Stage {name} depends on {dependency}, which streams in the same group")
+        return order
+
+    def _groups(self, order: List[str]) -> List[List[str]]:
+        """Connected components of the stream_from edges, members in order"""
+        group_of = {name: name for name in order}
+
+        def find(name):
+            while group_of[name] != name:
+                group_of[name] = group_of[group_of[name]]
+                name = group_of[name]
+            return name
+
+        for stage in self.stages.values():
+            if stage.stream_from:
+                group_of[find(stage.name)] = find(stage.stream_from)
+
+        groups: Dict[str, List[str]] = {}
+        for name in order:
+            groups.setdefault(find(name), []).append(name)
+        return list(groups.values())
+
+    def _external_dependencies(self, members: List[str]) -> List[str]:
+        """Stages outside a group that must finish before the group starts"""
+        return sorted({dependency for name in members for dependency in self.stages[name].depends_on}
+                      - set(members))
+
+    def run(self, resume: bool = True, clear_checkpoints: bool = True) -> Dict[str, Any]:
+        """
+        Run every stage not checkpointed yet
+
+        Args:
+            resume: Skip the stages checkpointed by a previous failed run
+            clear_checkpoints: Remove the checkpoints once the whole DAG succeeded
+
+        Returns:
+            Run summary with the result of each stage
+
+        Raises:
+            PipelineError: When a stage failed (after the running stages ended)
+        """
+        order = self.validate()
+        groups = self._groups(order)
+        run_id = uuid.uuid4().hex[:12]
+        completed = self.checkpoints.completed(self.name) if self.checkpoints and resume else {}
+        print(f"=== Pipeline {self.name}: {len(order)} stages in {len(groups)} groups "
+              f"(max_workers={self.max_workers}, run {run_id}) ===")
+
+        self.timings = {}
+        self._run_started = time.perf_counter()
+        results: Dict[str, Any] = {}
+        pending = []
+        for members in groups:
+            if all(name in completed for name in members):
+                for name in members:
+                    results[name] = completed[name]
+                    self.timings[name] = {'status': 'skipped'}
+            else:
+                pending.append(members)
+        skipped = len(order) - sum(len(members) for members in pending)
+        if skipped:
+            print(f"Resuming: {skipped} checkpointed stages skipped")
+
+        failure = None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"pipeline-{self.name}") as executor:
+            running = {}
+            while pending or running:
+                if failure is None:
+                    for members in list(pending):
+                        if all(name in results for name in self._external_dependencies(members)):
+                            pending.remove(members)
+                            inputs = {name: results[name] for name in self._external_dependencies(members)}
+                            running[executor.submit(self._run_group, members, inputs)] = members
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    members = running.pop(future)
+                    try:
+                        outcomes = future.result()
+                    except PipelineError as e:
+                        failure = failure or e
+                        continue
+                    results.update(outcomes)
+                    if self.checkpoints:
+                        for name in members:
+                            if self.stages[name].checkpoint:
+                                self.checkpoints.save(self.name, name, run_id, outcomes[name],
+                                                      self.timings[name]['seconds'])
+
+        for members in pending:
+            for name in members:
+                self.timings[name] = {'status': 'not_run'}
+
+        path = self.critical_path()
+        timed = [timing for timing in self.timings.values() if 'seconds' in timing]
+        summary = {
+            'pipeline': self.name,
+            'run_id': run_id,
+            'status': 'failed' if failure else 'success',
+            'stages': len(order),
+            'skipped': skipped,
+            'wall_seconds': round(time.perf_counter() - self._run_started, 4),
+            'stage_seconds': round(sum(timing['seconds'] for timing in timed), 4),
+            'critical_path': path,
+            'critical_path_seconds': round(self.timings[path[-1]]['end'], 4) if path else 0.0,
+            'failed_stage': failure.stage if failure else None,
+        }
+        self.run_log.append(summary)
+        self.print_report(summary)
+
+        if failure:
+            raise failure
+        if self.checkpoints and clear_checkpoints:
+            self.checkpoints.clear(self.name)
+        summary['results'] = results
+        return summary
+
+    def _run_group(self, members: List[str], external_results: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a stream group, one thread per member (the last one on the calling worker)"""
+        cancel = threading.Event()
+        outputs = {name: [] for name in members}
+        inputs = {}
+        for name in members:
+            stage = self.stages[name]
+            inputs[name] = {dependency: external_results[dependency] for dependency in stage.depends_on}
+            if stage.stream_from:
+                channel = _ChunkChannel(stage.stream_from, self.queue_size, cancel)
+                outputs[stage.stream_from].append(channel)
+                inputs[name][stage.stream_from] = channel
+
+        outcomes, errors = {}, {}
+
+        def target(name):
+            try:
+                outcomes[name] = self._run_stage(self.stages[name], inputs[name], outputs[name])
+            except BaseException as e:
+                errors[name] = e
+                cancel.set()
+
+        threads = [threading.Thread(target=target, args=(name,), name=f"pipeline-{name}", daemon=True)
+                   for name in members[:-1]]
+        for thread in threads:
+            thread.start()
+        target(members[-1])
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            # Report the stage that failed, not the ones cancelled because of it
+            causes = [name for name in members if name in errors and not isinstance(errors[name], StageCancelled)]
+            stage = causes[0] if causes else next(name for name in members if name in errors)
+            raise PipelineError(self.name, stage, errors[stage]) from errors[stage]
+        return outcomes
+
+    def _run_stage(self, stage: PipelineStage, inputs: Dict[str, Any], outputs: List[_ChunkChannel]) -> Any:
+        """Run one stage, pumping its chunks to the consumers when it streams"""
+        started = time.perf_counter()
+        timing = {'status': 'running', 'start': started - self._run_started}
+        self.timings[stage.name] = timing
+        print(f"[{self.name}] {stage.name} started")
+        status, error, rows, chunks = 'success', None, None, None
+        try:
+            result = stage.function(inputs)
+            if outputs:
+                rows = chunks = 0
+                for chunk in result:
+                    for channel in outputs:
+                        channel.put(chunk)
+                    chunks += 1
+                    rows += len(chunk) if isinstance(chunk, pd.DataFrame) else 0
+                result = {'rows': rows, 'chunks': chunks}
+                for channel in outputs:
+                    channel.close()
+            elif isinstance(result, dict) and isinstance(result.get('rows'), int):
+                rows, chunks = result['rows'], result.get('chunks')
+            return result
+        except BaseException as e:
+            status, error = ('cancelled' if isinstance(e, StageCancelled) else 'failed'), e
+            for channel in outputs:
+                channel.close(e)
+            raise
+        finally:
+            if status == 'success':
+                # A consumer may stop reading early: let its source run to the end
+                for value in inputs.values():
+                    if isinstance(value, _ChunkChannel):
+                        value.detach()
+            finished = time.perf_counter()
+            timing.update({
+                'status': status,
+                'end': finished - self._run_started,
+                'seconds': finished - started,
+                'rows': rows,
+                'chunks': chunks,
+                'blocked_seconds': sum(channel.blocked_seconds for channel in outputs) if outputs else None,
+                'error': str(error) if error else None,
+            })
+            self.registry.record_stage(
+                stage=stage.name, component='pipeline', seconds=finished - started, rows_out=rows,
+                chunks=chunks, status='success' if status == 'success' else 'failed',
+                error=str(error) if error else None,
+            )
+            if status == 'success':
+                print(f"[{self.name}] {stage.name} finished in {finished - started:.2f}s")
+            else:
+                print(f"[{self.name}] {stage.name} {status}: {error}")
+
+    def critical_path(self) -> List[str]:
+        """
+        Get the chain of stages that determined the wall time of the last run
+
+        Walks back from the stage that finished last, each time through the
+        predecessor (dependency, stream source or dependency of its stream
+        group) that finished last.
+
+        Returns:
+            Stage names from the first to the last of the chain
+        """
+        ended = {name: timing for name, timing in self.timings.items() if 'end' in timing}
+        if not ended:
+            return []
+        group_dependencies = {}
+        for members in self._groups(self.validate()):
+            external = self._external_dependencies(members)
+            for name in members:
+                group_dependencies[name] = external
+
+        path = [max(ended, key=lambda name: ended[name]['end'])]
+        while True:
+            predecessors = [name for name in set(self.stages[path[-1]].upstream) | set(group_dependencies[path[-1]])
+                            if name in ended and name not in path]
+            if not predecessors:
+                break
+            path.append(max(predecessors, key=lambda name: ended[name]['end']))
+        return path[::-1]
+
+    def timing_report(self) -> pd.DataFrame:
+        """
+        Get the timing of every stage of the last run
+
+        Returns:
+            DataFrame with one row per stage (times relative to the run start)
+        """
+        path = set(self.critical_path())
+        rows = []
+        for name in self.stages:
+            timing = self.timings.get(name, {'status': 'not_run'})
+            rows.append({
+                'stage': name,
+                'status': timing['status'],
+                'start': timing.get('start'),
+                'end': timing.get('end'),
+                'seconds': timing.get('seconds'),
+                'rows': timing.get('rows'),
+                'blocked_seconds': timing.get('blocked_seconds'),
+                'critical': name in path,
+            })
+        report = pd.DataFrame(rows)
+        return report.sort_values(['start', 'stage'], na_position='last').reset_index(drop=True)
+
+    def print_report(self, summary: Dict[str, Any] = None):
+        """
+        Print the timing report and the critical path of the last run
+
+        Args:
+            summary: Run summary (default: last entry of run_log)
+        """
+        summary = summary or (self.run_log[-1] if self.run_log else None)
+        if summary is None:
+            print(f"Pipeline {self.name} has not run yet")
+            return
+        report = self.timing_report()
+        report['critical'] = report['critical'].map({True: '*', False: ''})
+        for column in ['start', 'end', 'seconds', 'blocked_seconds']:
+            report[column] = report[column].map(lambda value: '' if pd.isna(value) else f"{value:.2f}")
+        report['rows'] = report['rows'].map(lambda value: '' if pd.isna(value) else str(int(value)))
+
+        print(f"\n=== Pipeline {self.name} {summary['status']} in {summary['wall_seconds']:.2f}s ===")
+        print(report.to_string(index=False))
+        if summary['critical_path']:
+            print(f"Critical path ({summary['critical_path_seconds']:.2f}s): "
+                  f"{' -> '.join(summary['critical_path'])}")
+        if summary['wall_seconds'] > 0:
+            print(f"Stage time {summary['stage_seconds']:.2f}s over {summary['wall_seconds']:.2f}s wall "
+                  f"({summary['stage_seconds'] / summary['wall_seconds']:.1f}x parallelism)")
+
+    def get_run_log(self) -> List[Dict[str, Any]]:
+        """
+        Get the summary of every run
+
+        Returns:
+            List of run summaries
+        """
+        return self.run_log
+
+
+def build_dw_pipeline(oltp_params: Dict[str, Any], dw_params: Dict[str, Any],
+                      fecha_desde: date = None, fecha_hasta: date = None,
+                      chunksize: int = DEFAULT_CHUNKSIZE, generate_keys: bool = False,
+                      max_workers: int = DEFAULT_MAX_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE,
+                      checkpoints: bool = True, name: str = 'dw_celulares') -> Pipeline:
+    """
+    Build the DW_Celulares load as a pipeline (replaces running the daily
+    steps of 05_reproceso_diario.sql one after the other)
+
+    The eight dimension stages run concurrently; FactVentas is streamed
+    extract -> transform -> upsert once all of them finished, and the
+    watermark only advances after the last chunk is loaded. DimMoneda is a
+    static catalog and must already be loaded.
+
+    Args:
+        oltp_params: OLTP connection parameters
+        dw_params: DW connection parameters
+        fecha_desde, fecha_hasta: Calendar range of DimFecha/DimExchangeRate
+            (default: first and last fecha_venta of the OLTP)
+        chunksize: Rows per streamed FactVentas chunk
+        generate_keys: Assign surrogate keys (for targets without IDENTITY)
+        max_workers: Stage groups run at the same time
+        queue_size: Chunks buffered between the FactVentas stages
+        checkpoints: Checkpoint completed stages in the DW
+        name: Pipeline name
+
+    Returns:
+        Pipeline ready to run()
+    """
+    reader = IncrementalFactLoader(oltp_params, dw_params, chunksize=chunksize)
+    pipeline = Pipeline(name, max_workers=max_workers, queue_size=queue_size,
+                        checkpoints=CheckpointStore(reader.loader.db_connection) if checkpoints else None)
+
+    # Each stage opens its own connections: DatabaseConnection is not shared across threads
+    def rango_fechas(inputs):
+        desde, hasta = fecha_desde, fecha_hasta
+        if desde is None or hasta is None:
+            oltp = DatabaseConnection(oltp_params)
+            try:
+                rango = oltp.execute_query(
+                    f"SELECT MIN(fecha_venta) AS desde, MAX(fecha_venta) AS hasta "
+                    f"FROM {reader.source_tables['ventas']}"
+                ).iloc[0]
+            finally:
+                oltp.close()
+            desde = desde or pd.Timestamp(rango['desde']).date()
+            hasta = hasta or pd.Timestamp(rango['hasta']).date()
+        return {'desde': pd.Timestamp(desde).date().isoformat(), 'hasta': pd.Timestamp(hasta).date().isoformat()}
+
+    def sync_stage(spec_name):
+        def run(inputs):
+            oltp, loader = DatabaseConnection(oltp_params), DataLoader(dw_params)
+            try:
+                source = oltp.execute_query(DIMENSION_SYNC_SPECS[spec_name]['source_query'])
+                synchronizer = DimensionSynchronizer.from_spec(
+                    loader.db_connection, spec_name, bulk_engine=loader.bulk_engine, generate_keys=generate_keys
+                )
+                return synchronizer.sync(source)
+            finally:
+                oltp.close()
+                loader.close()
+        return run
+
+    def dim_vendedor(inputs):
+        # Only base data is synced here: current members keep their
+        # categoria_vendedor (versioned by the monthly classification)
+        oltp, loader = DatabaseConnection(oltp_params), DataLoader(dw_params)
+        try:
+            vendedores = oltp.execute_query(
+                "SELECT id_vendedor AS id_vendedor_fuente, nombre, apellido, legajo FROM Vendedores"
+            )
+            merger = SCD2Merger(loader.db_connection, 'DimVendedor', bulk_engine=loader.bulk_engine,
+                                **DIM_VENDEDOR_SCD2)
+            with loader.db_connection.checkout() as connection:
+                current = merger.read_current(connection)
+            categorias = current.set_index('id_vendedor_fuente')['categoria_vendedor']
+            vendedores['categoria_vendedor'] = (vendedores['id_vendedor_fuente'].map(categorias)
+                                                .fillna(VENDEDOR_CATEGORIA_INICIAL))
+            return merger.merge(vendedores, effective_date=VENDEDOR_FECHA_INICIO)
+        finally:
+            oltp.close()
+            loader.close()
+
+    def calendar_stage(method):
+        def run(inputs):
+            rango = inputs['rango_fechas']
+            loader = DataLoader(dw_params)
+            try:
+                dates = DateDimensionLoader(loader)
+                if method == 'load_dim_fecha':
+                    return dates.load_dim_fecha(rango['desde'], rango['hasta'], generate_keys=generate_keys)
+                return dates.load_exchange_rates(rango['desde'], rango['hasta'])
+            finally:
+                loader.close()
+        return run
+
+    progress = {}
+
+    def extract_ventas(inputs):
+        watermark = reader.watermarks.get(reader.proceso)
+        progress['ultimo_id_venta'] = watermark['ultimo_id_venta'] if watermark else 0
+        print(f"Streaming {reader.dw_tables['fact']} delta from id_venta > {progress['ultimo_id_venta']}")
+        return reader.extractor.extract_from_database_chunks(
+            reader._delta_query("v.id_venta > :ultimo_id_venta"), oltp_params,
+            chunksize=chunksize, params={'ultimo_id_venta': progress['ultimo_id_venta']}
+        )
+
+    def transform_ventas(inputs):
+        key_cache = reader.get_key_cache()
+        for chunk in inputs['extract_ventas']:
+            if chunk.empty:
+                continue
+            last = chunk.iloc[-1]
+            progress['max_fecha_venta'] = pd.to_datetime(last['fecha_venta']).date()
+            yield reader.transform_chunk(chunk, key_cache)
+
+    def load_ventas(inputs):
+        loader = DataLoader(dw_params)
+        summary = {'rows': 0, 'chunks': 0, 'max_id_venta': None, 'max_fecha_venta': None}
+        try:
+            for facts in inputs['transform_ventas']:
+                if not loader.upsert_to_database(facts, reader.dw_tables['fact'], FACT_VENTAS_KEY):
+                    raise RuntimeError(f"Upsert into {reader.dw_tables['fact']} failed; watermark not advanced")
+                summary['rows'] += len(facts)
+                summary['chunks'] += 1
+                summary['max_id_venta'] = int(facts['id_venta'].max())
+        finally:
+            loader.close()
+        if summary['rows'] > 0:
+            summary['max_fecha_venta'] = progress.get('max_fecha_venta')
+            reader.watermarks.update(reader.proceso, summary['max_id_venta'],
+                                     summary['max_fecha_venta'], summary['rows'])
+            print(f"Watermark advanced to id_venta={summary['max_id_venta']}")
+        return summary
+
+    pipeline.add_stage('rango_fechas', rango_fechas, description="Calendar range of the load")
+    for stage_name, spec_name in DW_SYNC_STAGES.items():
+        pipeline.add_stage(stage_name, sync_stage(spec_name), description=f"SCD1 sync of {stage_name}")
+    pipeline.add_stage('DimVendedor', dim_vendedor, description="SCD2 base data of DimVendedor")
+    pipeline.add_stage('DimFecha', calendar_stage('load_dim_fecha'), depends_on=['rango_fechas'],
+                       description="Missing DimFecha rows")
+    pipeline.add_stage('DimExchangeRate', calendar_stage('load_exchange_rates'), depends_on=['rango_fechas'],
+                       description="Missing monthly exchange rates")
+    pipeline.add_stage('extract_ventas', extract_ventas, depends_on=DW_DIMENSION_STAGES,
+                       description="Delta of Ventas/DetalleVenta after the watermark")
+    pipeline.add_stage('transform_ventas', transform_ventas, stream_from='extract_ventas',
+                       description="Measures and surrogate keys of FactVentas")
+    pipeline.add_stage('load_ventas', load_ventas, stream_from='transform_ventas',
+                       description="Upsert into FactVentas and advance the watermark")
+    return pipeline
+
+
+if __name__ == "__main__":
+    # Example usage
+    # pipeline = build_dw_pipeline(oltp_params, dw_params, max_workers=4)
+    # pipeline.run()              # after a failure, run() again resumes from the checkpoints
+
+    def pause(seconds, value=None):
+        def run(inputs):
+            time.sleep(seconds)
+            return value if value is not None else {'inputs': sorted(inputs)}
+        return run
+
+    def numbers(inputs):
+        for start in range(0, 1000, 100):
+            time.sleep(0.01)
+            yield pd.DataFrame({'n': range(start, start + 100)})
+
+    def total(inputs):
+        return {'rows': sum(len(chunk) for chunk in inputs['numbers']), 'chunks': 10}
+
+    demo = Pipeline('demo', max_workers=3)
+    demo.add_stage('dim_a', pause(0.2))
+    demo.add_stage('dim_b', pause(0.4))
+    demo.add_stage('dim_c', pause(0.1), depends_on=['dim_a'])
+    demo.add_stage('numbers', numbers, depends_on=['dim_a', 'dim_b'])
+    demo.add_stage('total', total, stream_from='numbers', depends_on=['dim_c'])
+    demo.run()
@@ -0,0 +1,542 @@
+"""
+Rules Module - ETL Pipeline
+Compiles business rule lists into cached, fused execution plans
+"""
+
+import ast
+import io
+import json
+import threading
+import tokenize
+import warnings
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Set, Tuple
+
+try:
+    import numexpr
+except ImportError:  # pragma: no cover - optional dependency
+    numexpr = None
+
+
+# Rule types understood by the compiler and their required keys
+RULE_SCHEMA = {
+    'calculate': ('target_column', 'formula'),
+    'filter': ('condition',),
+    'categorize': ('target_column', 'source_column', 'bins', 'labels'),
+}
+
+# Functions allowed in compiled formulas (names shared by pandas.eval and numexpr)
+FORMULA_FUNCTIONS = {
+    'abs': np.abs,
+    'sqrt': np.sqrt,
+    'log': np.log,
+    'log10': np.log10,
+    'exp': np.exp,
+    'where': np.where,
+}
+
+# AST nodes a formula may contain to be compiled (anything else runs through pandas)
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.Name, ast.Load,
+    ast.Constant, ast.Call, ast.List, ast.Tuple,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.USub, ast.UAdd, ast.Not, ast.Invert, ast.And, ast.Or, ast.BitAnd, ast.BitOr,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+)
+
+# Operators numexpr cannot evaluate
+_NUMEXPR_UNSUPPORTED = (ast.FloorDiv, ast.In, ast.NotIn, ast.List, ast.Tuple)
+
+
+def _pandas_booleans(source: str) -> str:
+    """
+    Rewrite & and | as and/or the way pandas.eval does before parsing, so
+    they bind looser than comparisons ('a > 0 & b < 3' is '(a > 0) & (b < 3)')
+    """
+    lines = source.splitlines(keepends=True)
+    line_offsets = np.cumsum([0] + [len(line) for line in lines]).tolist()
+    operators = [token for token in tokenize.generate_tokens(io.StringIO(source).readline)
+                 if token.type == tokenize.OP and token.string in ('&', '|')]
+    for token in reversed(operators):
+        offset = line_offsets[token.start[0] - 1] + token.start[1]
+        keyword = ' and ' if token.string == '&' else ' or '
+        source = source[:offset] + keyword + source[offset + 1:]
+    return source
+
+
+class _VectorizeBooleans(ast.NodeTransformer):
+    """Rewrite pandas.eval boolean syntax (and/or/not/in) into array operators"""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        operator = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = ast.BinOp(left=result, op=operator, right=value)
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1 and isinstance(node.ops[0], (ast.In, ast.NotIn)):
+            call = ast.Call(func=ast.Name(id='_isin', ctx=ast.Load()),
+                            args=[node.left, node.comparators[0]], keywords=[])
+            return call if isinstance(node.ops[0], ast.In) else ast.UnaryOp(op=ast.Invert(), operand=call)
+        if len(node.ops) > 1:
+            # a < b < c -> (a < b) & (b < c)
+            operands = [node.left] + node.comparators
+            parts = [ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]])
+                     for i, op in enumerate(node.ops)]
+            result = parts[0]
+            for part in parts[1:]:
+                result = ast.BinOp(left=result, op=ast.BitAnd(), right=part)
+            return result
+        return node
+
+
+class CompiledExpression:
+    """
+    A formula parsed and compiled once
+
+    Runs through numexpr when available and the expression only uses
+    arithmetic/comparisons, otherwise as NumPy array operations. Formulas
+    outside the supported subset keep the pandas eval/query behaviour.
+    """
+
+    def __init__(self, source: str):
+        """
+        Parse and compile a formula
+
+        Args:
+            source: pandas.eval style expression
+        """
+        self.source = source
+        self.columns: Set[str] = set()
+        self.code = None
+        self.numexpr_source = None
+        self.floor_division = False
+        self._result_dtypes: Dict[Tuple, Any] = {}
+
+        try:
+            tree = ast.parse(_pandas_booleans(source.strip()), mode='eval')
+        except (SyntaxError, tokenize.TokenError):
+            # e.g. backtick-quoted column names: leave the parsing to pandas
+            return
+        if not all(isinstance(node, _ALLOWED_NODES) for node in ast.walk(tree)):
+            return
+        calls = [node for node in ast.walk(tree) if isinstance(node, ast.Call)]
+        if any(not isinstance(call.func, ast.Name) or call.func.id not in FORMULA_FUNCTIONS for call in calls):
+            return
+
+        self.floor_division = any(isinstance(node, ast.FloorDiv) for node in ast.walk(tree))
+        function_names = {call.func.id for call in calls}
+        self.columns = {node.id for node in ast.walk(tree)
+                        if isinstance(node, ast.Name) and node.id not in function_names}
+
+        vectorized = ast.fix_missing_locations(_VectorizeBooleans().visit(tree))
+        self.code = compile(vectorized, f"<rule: {source}>", 'eval')
+        if numexpr is not None and not any(isinstance(node, _NUMEXPR_UNSUPPORTED) for node in ast.walk(tree)):
+            self.numexpr_source = ast.unparse(vectorized)
+
+    @property
+    def compiled(self) -> bool:
+        """Whether the formula runs without pandas eval"""
+        return self.code is not None
+
+    def evaluate(self, namespace: Dict[str, Any]) -> np.ndarray:
+        """
+        Evaluate over a namespace of column arrays
+
+        Args:
+            namespace: Column name -> NumPy array
+
+        Returns:
+            Result array
+        """
+        if self.numexpr_source is not None:
+            try:
+                return numexpr.evaluate(self.numexpr_source, local_dict=namespace)
+            except (TypeError, ValueError, KeyError, NotImplementedError):
+                # Object/string columns: NumPy handles them, numexpr does not
+                self.numexpr_source = None
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return eval(self.code, {'__builtins__': {}, '_isin': _isin, **FORMULA_FUNCTIONS}, namespace)
+
+    def result_dtype(self, dtypes: Dict[str, Any]):
+        """
+        dtype pandas.eval gives the formula for some input dtypes (cached)
+
+        Args:
+            dtypes: Column name -> dtype of every column the formula reads
+
+        Returns:
+            Result dtype
+        """
+        key = tuple(sorted((column, str(dtypes[column])) for column in self.columns))
+        if key not in self._result_dtypes:
+            empty = pd.DataFrame({column: pd.Series(dtype=dtypes[column]) for column in self.columns})
+            with warnings.catch_warnings():
+                # Nullable columns make pandas switch engines, which it reports as a warning
+                warnings.simplefilter('ignore', RuntimeWarning)
+                self._result_dtypes[key] = empty.eval(self.source).dtype
+        return self._result_dtypes[key]
+
+    def cast_like_pandas(self, values, dtypes: Dict[str, Any]):
+        """
+        Cast a result to the dtype pandas.eval would return
+
+        NumPy keeps narrow integers (int8 // 2 stays int8) and turns nullable
+        integers into floats, while pandas gives int64 / Int64; '//' is the
+        operator where the difference shows in the values.
+
+        Args:
+            values: Result of evaluate()
+            dtypes: Column name -> dtype of the input columns
+
+        Returns:
+            Values with the pandas dtype (unchanged if they cannot be cast,
+            e.g. infinities of a division by zero)
+        """
+        dtype = self.result_dtype(dtypes)
+        if getattr(values, 'dtype', None) == dtype:
+            return values
+        try:
+            if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+                return pd.array(values, dtype=dtype)
+            return np.asarray(values).astype(dtype)
+        except (TypeError, ValueError, OverflowError):
+            return values
+
+
+def _isin(values, candidates) -> np.ndarray:
+    """Array membership used for 'x in [...]' conditions"""
+    return np.asarray(pd.Series(values).isin(list(candidates)))
+
+
+class PlanStep(ABC):
+    """One step of a compiled rule plan"""
+
+    kind = ''
+
+    def inputs(self) -> Set[str]:
+        """Columns read by the step"""
+        return set()
+
+    def outputs(self) -> Set[str]:
+        """Columns written by the step"""
+        return set()
+
+    def describe(self) -> str:
+        """One-line description for logs"""
+        return self.kind
+
+    @abstractmethod
+    def execute(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Apply the step"""
+
+
+class CalculateStep(PlanStep):
+    """
+    Consecutive calculate rules fused into one pass
+
+    Every formula reads the input columns (and targets computed earlier in
+    the same step) as arrays; all new columns are attached at once.
+    """
+
+    kind = 'calculate'
+
+    def __init__(self):
+        self.targets: List[str] = []
+        self.expressions: List[CompiledExpression] = []
+
+    def add(self, target: str, expression: CompiledExpression):
+        self.targets.append(target)
+        self.expressions.append(expression)
+
+    def inputs(self) -> Set[str]:
+        columns = set()
+        produced = set()
+        for target, expression in zip(self.targets, self.expressions):
+            columns |= expression.columns - produced
+            produced.add(target)
+        return columns
+
+    def outputs(self) -> Set[str]:
+        return set(self.targets)
+
+    def describe(self) -> str:
+        engine = 'numexpr' if any(e.numexpr_source for e in self.expressions) else 'numpy'
+        return f"calculate[{engine}]({', '.join(self.targets)})"
+
+    def execute(self, df: pd.DataFrame) -> pd.DataFrame:
+        namespace = {}
+        dtypes = {}
+        results = {}
+        cast = set()
+        for target, expression in zip(self.targets, self.expressions):
+            for column in expression.columns:
+                if column not in namespace:
+                    if column not in df.columns:
+                        raise KeyError(f"Rule formula '{expression.source}' references unknown column '{column}'")
+                    namespace[column] = df[column].to_numpy()
+                    dtypes[column] = df[column].dtype
+            value = expression.evaluate(namespace)
+            if expression.floor_division:
+                value = expression.cast_like_pandas(value, dtypes)
+                cast.add(target)
+            namespace[target] = value
+            dtypes[target] = getattr(value, 'dtype', np.asarray(value).dtype)
+            results[target] = value
+        if len(df) == 0:
+            results = {target: pd.Series(value, index=df.index, dtype=None if target in cast else 'float64')
+                       if np.ndim(value) else value
+                       for target, value in results.items()}
+        return df.assign(**results)
+
+
+class PandasCalculateStep(PlanStep):
+    """Calculate rule outside the compiled subset, evaluated by pandas"""
+
+    kind = 'calculate'
+
+    def __init__(self, target: str, formula: str):
+        self.target = target
+        self.formula = formula
+
+    def describe(self) -> str:
+        return f"calculate[pandas]({self.target})"
+
+    def execute(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.assign(**{self.target: df.eval(self.formula)})
+
+
+class FilterStep(PlanStep):
+    """
+    Filter rules (adjacent ones combined) applied as a single row mask
+    """
+
+    kind = 'filter'
+
+    def __init__(self, condition: str):
+        self.conditions = [condition]
+        self.expressions = [CompiledExpression(condition)]
+
+    def merge(self, other: 'FilterStep'):
+        self.conditions += other.conditions
+        self.expressions += other.expressions
+
+    def inputs(self) -> Set[str]:
+        if not all(e.compiled for e in self.expressions):
+            return {'*'}
+        return set().union(*(e.columns for e in self.expressions))
+
+    def describe(self) -> str:
+        return f"filter({' & '.join(self.conditions)})"
+
+    def execute(self, df: pd.DataFrame) -> pd.DataFrame:
+        mask = np.ones(len(df), dtype=bool)
+        for condition, expression in zip(self.conditions, self.expressions):
+            if expression.compiled:
+                namespace = {column: df[column].to_numpy() for column in expression.columns}
+                result = expression.evaluate(namespace)
+            else:
+                result = df.eval(condition)
+            mask &= np.asarray(result, dtype=bool)
+        return df if mask.all() else df[mask]
+
+
+class CategorizeStep(PlanStep):
+    """Bin a column into labelled categories"""
+
+    kind = 'categorize'
+
+    def __init__(self, target: str, source: str, bins, labels):
+        self.target = target
+        self.source = source
+        self.bins = bins
+        self.labels = labels
+
+    def inputs(self) -> Set[str]:
+        return {self.source}
+
+    def outputs(self) -> Set[str]:
+        return {self.target}
+
+    def describe(self) -> str:
+        return f"categorize({self.target})"
+
+    def execute(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.assign(**{self.target: pd.cut(df[self.source], bins=self.bins, labels=self.labels)})
+
+
+class RulePlan:
+    """
+    Executable plan of a validated rule list
+
+    Reusable across DataFrames and chunks; the input frame is never modified.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], steps: List[PlanStep]):
+        self.rules = rules
+        self.steps = steps
+
+    def execute(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Apply the plan
+
+        Args:
+            df: Input DataFrame
+
+        Returns:
+            Transformed DataFrame
+        """
+        result = df
+        for step in self.steps:
+            result = step.execute(result)
+        # Never hand the caller's own frame back (callers add columns to the result)
+        return result.copy(deep=False) if result is df else result
+
+    __call__ = execute
+
+    def describe(self) -> List[str]:
+        """
+        Describe the steps in execution order
+
+        Returns:
+            List of step descriptions
+        """
+        return [step.describe() for step in self.steps]
+
+
+class RuleCompiler:
+    """
+    Validates rule lists and compiles them into cached RulePlans
+
+    Compilation parses each formula once, fuses consecutive calculate rules
+    into one step, combines adjacent filters and moves filters ahead of the
+    steps whose outputs they do not read, so later calculations touch only
+    the surviving rows. Plans are cached by the rule list contents.
+    """
+
+    def __init__(self, push_down_filters: bool = True, max_cached_plans: int = 128):
+        """
+        Initialize the compiler
+
+        Args:
+            push_down_filters: Reorder filters ahead of independent steps
+            max_cached_plans: Plans kept in the cache
+        """
+        self.push_down_filters = push_down_filters
+        self.max_cached_plans = max_cached_plans
+        self._plans: Dict[str, RulePlan] = {}
+        self._lock = threading.Lock()
+        self.statistics = {'compiled': 0, 'cache_hits': 0}
+
+    @staticmethod
+    def _cache_key(rules: List[Dict[str, Any]]) -> str:
+        return json.dumps(rules, sort_keys=True, default=str)
+
+    def compile(self, rules: List[Dict[str, Any]]) -> RulePlan:
+        """
+        Get the plan of a rule list, compiling it on first use
+
+        Args:
+            rules: Business rules (see DataTransformer.apply_business_rules)
+
+        Returns:
+            RulePlan
+        """
+        key = self._cache_key(rules)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self.statistics['cache_hits'] += 1
+                return plan
+
+        plan = RulePlan(rules, self._optimize(self._build_steps(rules)))
+        with self._lock:
+            if len(self._plans) >= self.max_cached_plans:
+                self._plans.pop(next(iter(self._plans)))
+            self._plans[key] = plan
+            self.statistics['compiled'] += 1
+        return plan
+
+    def validate(self, rules: List[Dict[str, Any]]):
+        """
+        Check rule types and required keys
+
+        Args:
+            rules: Business rules
+
+        Raises:
+            ValueError: If a rule is malformed
+        """
+        for position, rule in enumerate(rules):
+            rule_type = rule.get('type')
+            if rule_type not in RULE_SCHEMA:
+                raise ValueError(f"Rule {position}: unknown rule type '{rule_type}'. "
+                                 f"Available: {', '.join(RULE_SCHEMA)}")
+            missing = [key for key in RULE_SCHEMA[rule_type] if key not in rule]
+            if missing:
+                raise ValueError(f"Rule {position} ({rule_type}): missing {', '.join(missing)}")
+
+    def _build_steps(self, rules: List[Dict[str, Any]]) -> List[PlanStep]:
+        """Translate rules into steps, fusing consecutive compiled calculations"""
+        self.validate(rules)
+        steps: List[PlanStep] = []
+        for rule in rules:
+            rule_type = rule['type']
+            if rule_type == 'calculate':
+                expression = CompiledExpression(rule['formula'])
+                if not expression.compiled:
+                    steps.append(PandasCalculateStep(rule['target_column'], rule['formula']))
+                    continue
+                if not steps or not isinstance(steps[-1], CalculateStep):
+                    steps.append(CalculateStep())
+                steps[-1].add(rule['target_column'], expression)
+            elif rule_type == 'filter':
+                steps.append(FilterStep(rule['condition']))
+            elif rule_type == 'categorize':
+                steps.append(CategorizeStep(rule['target_column'], rule['source_column'],
+                                            rule['bins'], rule['labels']))
+        return steps
+
+    def _optimize(self, steps: List[PlanStep]) -> List[PlanStep]:
+        """Push filters ahead of independent steps and merge adjacent filters"""
+        if self.push_down_filters:
+            ordered: List[PlanStep] = []
+            for step in steps:
+                position = len(ordered)
+                if isinstance(step, FilterStep) and '*' not in step.inputs():
+                    while (position > 0 and not isinstance(ordered[position - 1], FilterStep)
+                           and not isinstance(ordered[position - 1], PandasCalculateStep)
+                           and not (ordered[position - 1].outputs() & step.inputs())):
+                        position -= 1
+                ordered.insert(position, step)
+            steps = ordered
+
+        merged: List[PlanStep] = []
+        for step in steps:
+            if isinstance(step, FilterStep) and merged and isinstance(merged[-1], FilterStep):
+                merged[-1].merge(step)
+            else:
+                merged.append(step)
+        return merged
+
+
+if __name__ == "__main__":
+    # Example usage
+    compiler = RuleCompiler()
+    plan = compiler.compile([
+        {'type': 'calculate', 'target_column': 'importe', 'formula': 'cantidad * precio_unitario'},
+        {'type': 'calculate', 'target_column': 'margen', 'formula': 'cantidad * (precio_unitario - costo_unitario)'},
+        {'type': 'filter', 'condition': 'cantidad > 0'},
+    ])
+    print(plan.describe())
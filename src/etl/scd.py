@@ -0,0 +1,291 @@
+"""
+SCD Module - ETL Pipeline
+Vectorized Slowly Changing Dimension Type 2 merge engine
+"""
+
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from src.utils.db_connection import DatabaseConnection
+
+
+# Settings reproducing the DimVendedor versioning of 05_reproceso_diario.sql:
+# categoria_vendedor is versioned, nombre/apellido/legajo are updated in place
+DIM_VENDEDOR_SCD2 = {
+    'natural_key': ['id_vendedor_fuente'],
+    'tracked_columns': ['categoria_vendedor'],
+    'type1_columns': ['nombre', 'apellido', 'legajo'],
+    'valid_from_column': 'fecha_inicio',
+    'valid_to_column': 'fecha_fin',
+    'current_flag_column': 'es_actual',
+    'version_column': 'version',
+    'open_end': None,
+    'close_offset_days': 1,
+}
+
+
+def _normalize_for_hash(series: pd.Series) -> pd.Series:
+    """
+    Normalize a column so equal values hash equally regardless of source dtype
+
+    Numbers are compared as float64 (8 and 8.0 match) and missing values as
+    empty strings, like the ISNULL(x, '') comparisons in the SQL scripts.
+    """
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64').astype(str).where(series.notna(), '')
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime('%Y-%m-%d %H:%M:%S').fillna('')
+    return series.astype(object).where(series.notna(), '').astype(str)
+
+
+def compute_row_hash(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    Compute a 64-bit content hash per row over a set of attribute columns
+
+    Args:
+        df: Input DataFrame
+        columns: Attribute columns included in the hash
+
+    Returns:
+        uint64 array with one hash per row
+    """
+    if not columns:
+        return np.zeros(len(df), dtype='uint64')
+    normalized = pd.DataFrame({column: _normalize_for_hash(df[column]) for column in columns})
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+class SCD2Merger:
+    """
+    Diffs incoming dimension rows against the current versions and applies
+    the expire/insert batches in one set-based transaction
+
+    A changed member whose current version already starts on (or after) the
+    effective date is updated in place instead of versioned, like the
+    same-month rerun of 05_reproceso_diario.sql.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, table_name: str, natural_key: List[str],
+                 tracked_columns: List[str], type1_columns: List[str] = None,
+                 valid_from_column: str = 'valid_from', valid_to_column: str = 'valid_to',
+                 current_flag_column: str = 'is_current', version_column: str = None,
+                 open_end: Optional[pd.Timestamp] = pd.Timestamp('2999-12-31'),
+                 close_offset_days: int = 0, bulk_engine=None):
+        """
+        Initialize the merger
+
+        Args:
+            db_connection: Connection to the data warehouse
+            table_name: Dimension table name
+            natural_key: Columns identifying a member in the source
+            tracked_columns: Columns whose change opens a new version
+            type1_columns: Columns overwritten in place on the current version
+            valid_from_column: Version start column
+            valid_to_column: Version end column
+            current_flag_column: Current-version flag column
+            version_column: Optional version number column
+            open_end: valid_to of current versions (None stores NULL)
+            close_offset_days: Days subtracted from the effective date when
+                closing a version (1 gives fecha_fin = day before the change)
+            bulk_engine: Bulk-load engine used for the staging/insert batches
+        """
+        self.db_connection = db_connection
+        self.table_name = table_name
+        self.natural_key = list(natural_key)
+        self.tracked_columns = list(tracked_columns)
+        self.type1_columns = list(type1_columns or [])
+        self.valid_from_column = valid_from_column
+        self.valid_to_column = valid_to_column
+        self.current_flag_column = current_flag_column
+        self.version_column = version_column
+        self.open_end = open_end
+        self.close_offset_days = close_offset_days
+        self.bulk_engine = bulk_engine
+
+    def read_current(self, connection: Connection) -> pd.DataFrame:
+        """
+        Read the key, attribute and version columns of the current versions
+
+        Args:
+            connection: Open connection to the data warehouse
+
+        Returns:
+            DataFrame of current versions (empty if the table does not exist)
+        """
+        columns = self.natural_key + self.tracked_columns + self.type1_columns + [self.valid_from_column]
+        if self.version_column:
+            columns.append(self.version_column)
+        if not inspect(connection).has_table(self.table_name):
+            return pd.DataFrame(columns=columns)
+
+        quote = connection.dialect.identifier_preparer.quote
+        query = (f"SELECT {', '.join(quote(c) for c in columns)} FROM {quote(self.table_name)} "
+                 f"WHERE {quote(self.current_flag_column)} = 1")
+        return pd.read_sql_query(text(query), connection)
+
+    def diff(self, incoming: pd.DataFrame, current: pd.DataFrame,
+             effective_date: date) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """
+        Compare incoming rows with the current versions by hashed attributes
+
+        Args:
+            incoming: Source rows (one per member)
+            current: Current versions from the dimension
+            effective_date: Start date of the new versions
+
+        Returns:
+            Tuple (keys to expire, type 1 updates, in-place updates of the
+            versions starting on effective_date, rows to insert)
+        """
+        incoming = incoming.drop_duplicates(self.natural_key, keep='last').reset_index(drop=True)
+        incoming_keys = incoming[self.natural_key].copy()
+        incoming_keys['_tracked_hash'] = compute_row_hash(incoming, self.tracked_columns)
+        incoming_keys['_type1_hash'] = compute_row_hash(incoming, self.type1_columns)
+        incoming_keys['_row'] = np.arange(len(incoming))
+
+        current_keys = current[self.natural_key].copy()
+        current_keys['_current_tracked_hash'] = compute_row_hash(current, self.tracked_columns)
+        current_keys['_current_type1_hash'] = compute_row_hash(current, self.type1_columns)
+        if self.version_column:
+            current_keys['_current_version'] = current[self.version_column].to_numpy()
+        if self.valid_from_column in current.columns:
+            current_keys['_current_valid_from'] = pd.to_datetime(current[self.valid_from_column]).to_numpy()
+        else:
+            current_keys['_current_valid_from'] = pd.NaT
+
+        compared = incoming_keys.merge(current_keys, on=self.natural_key, how='left', indicator=True)
+        is_new = (compared['_merge'] == 'left_only').to_numpy()
+        is_changed = ~is_new & (compared['_tracked_hash'] != compared['_current_tracked_hash']).to_numpy()
+        # Closing a version that starts on effective_date would end it before its own start
+        is_restated = is_changed & (compared['_current_valid_from'] >= pd.Timestamp(effective_date)).to_numpy()
+        is_changed &= ~is_restated
+        is_type1 = (~is_new & ~is_changed & ~is_restated
+                    & (compared['_type1_hash'] != compared['_current_type1_hash']).to_numpy())
+
+        expire = compared.loc[is_changed, self.natural_key].reset_index(drop=True)
+        type1_updates = incoming.iloc[compared.loc[is_type1, '_row'].to_numpy()][
+            self.natural_key + self.type1_columns
+        ].reset_index(drop=True)
+        restated = incoming.iloc[compared.loc[is_restated, '_row'].to_numpy()][
+            self.natural_key + self.tracked_columns + self.type1_columns
+        ].reset_index(drop=True)
+
+        inserted = compared[is_new | is_changed]
+        inserts = incoming.iloc[inserted['_row'].to_numpy()].reset_index(drop=True)
+        inserts[self.valid_from_column] = pd.Timestamp(effective_date)
+        inserts[self.valid_to_column] = self.open_end
+        inserts[self.current_flag_column] = 1
+        if self.version_column:
+            previous = pd.to_numeric(inserted['_current_version'], errors='coerce').fillna(0).to_numpy()
+            inserts[self.version_column] = previous.astype('int64') + 1
+
+        return expire, type1_updates, restated, inserts
+
+    def merge(self, incoming: pd.DataFrame, effective_date: date = None) -> Dict[str, Any]:
+        """
+        Apply SCD Type 2 to the dimension in one transaction
+
+        Args:
+            incoming: Source rows with the natural key, tracked and type 1 columns
+            effective_date: Start date of new versions (default: today)
+
+        Returns:
+            Summary with the number of expired, updated, restated and inserted rows
+        """
+        effective_date = effective_date or date.today()
+        started = time.perf_counter()
+
+        with self.db_connection.get_engine().begin() as connection:
+            current = self.read_current(connection)
+            expire, type1_updates, restated, inserts = self.diff(incoming, current, effective_date)
+
+            if len(expire):
+                self._expire(connection, expire, effective_date)
+            if len(type1_updates):
+                self._update_in_place(connection, type1_updates, self.type1_columns, 'type1')
+            if len(restated):
+                self._update_in_place(connection, restated, self.tracked_columns + self.type1_columns, 'restate')
+            if len(inserts):
+                self._load(inserts, self.table_name, connection)
+        if len(expire) or len(type1_updates) or len(restated) or len(inserts):
+            self.db_connection.mark_table_changed(self.table_name)
+
+        summary = {
+            'table': self.table_name,
+            'incoming': len(incoming),
+            'expired': len(expire),
+            'type1_updated': len(type1_updates),
+            'restated': len(restated),
+            'inserted': len(inserts),
+            'duration_seconds': round(time.perf_counter() - started, 4),
+        }
+        print(f"SCD2 merge on {self.table_name}: {summary['inserted']} inserted "
+              f"({summary['expired']} new versions), {summary['type1_updated'] + summary['restated']} "
+              f"updated in place")
+        return summary
+
+    def _load(self, df: pd.DataFrame, table_name: str, connection: Connection, if_exists: str = 'append'):
+        """Bulk-load a batch on the merge connection"""
+        if self.bulk_engine is not None:
+            self.bulk_engine.load(df, table_name, connection, if_exists=if_exists)
+        else:
+            df.to_sql(table_name, connection, if_exists=if_exists, index=False)
+
+    def _stage(self, connection: Connection, df: pd.DataFrame, kind: str) -> str:
+        """Load a batch into an indexed staging table and return its name"""
+        quote = connection.dialect.identifier_preparer.quote
+        staging = f"stg_{self.table_name}_{kind}_{uuid.uuid4().hex[:8]}"
+        self._load(df, staging, connection, if_exists='replace')
+        # Index the natural key so the correlated EXISTS/subqueries are lookups, not scans
+        connection.execute(text(
+            f"CREATE INDEX {quote('ix_' + staging)} ON {quote(staging)} "
+            f"({', '.join(quote(k) for k in self.natural_key)})"
+        ))
+        return staging
+
+    def _staging_match(self, connection: Connection, staging: str) -> str:
+        """Correlated predicate matching the dimension to a staging table on the natural key"""
+        quote = connection.dialect.identifier_preparer.quote
+        target = quote(self.table_name)
+        return ' AND '.join(f"s.{quote(k)} = {target}.{quote(k)}" for k in self.natural_key)
+
+    def _expire(self, connection: Connection, expire: pd.DataFrame, effective_date: date):
+        """Close the current version (started before effective_date) of every changed member with one UPDATE"""
+        quote = connection.dialect.identifier_preparer.quote
+        close_date = pd.Timestamp(effective_date) - pd.Timedelta(days=self.close_offset_days)
+        staging = self._stage(connection, expire, 'expire')
+        connection.execute(text(
+            f"UPDATE {quote(self.table_name)} "
+            f"SET {quote(self.valid_to_column)} = :close_date, {quote(self.current_flag_column)} = 0 "
+            f"WHERE {quote(self.current_flag_column)} = 1 AND {quote(self.valid_from_column)} < :effective_date "
+            f"AND EXISTS (SELECT 1 FROM {quote(staging)} s WHERE {self._staging_match(connection, staging)})"
+        ), {'close_date': close_date.to_pydatetime(), 'effective_date': pd.Timestamp(effective_date).date()})
+        connection.execute(text(f"DROP TABLE {quote(staging)}"))
+
+    def _update_in_place(self, connection: Connection, updates: pd.DataFrame, columns: List[str], kind: str):
+        """Overwrite columns of the current versions with one UPDATE"""
+        quote = connection.dialect.identifier_preparer.quote
+        staging = self._stage(connection, updates, kind)
+        match = self._staging_match(connection, staging)
+        assignments = ', '.join(
+            f"{quote(c)} = (SELECT s.{quote(c)} FROM {quote(staging)} s WHERE {match})"
+            for c in columns
+        )
+        connection.execute(text(
+            f"UPDATE {quote(self.table_name)} SET {assignments} "
+            f"WHERE {quote(self.current_flag_column)} = 1 AND EXISTS "
+            f"(SELECT 1 FROM {quote(staging)} s WHERE {match})"
+        ))
+        connection.execute(text(f"DROP TABLE {quote(staging)}"))
+
+
+if __name__ == "__main__":
+    # Example usage
+    # merger = SCD2Merger(db, 'DimVendedor', **DIM_VENDEDOR_SCD2)
+    # merger.merge(vendedores_df, effective_date=date(2024, 11, 1))
+    print("SCD module loaded successfully")
@@ -0,0 +1,741 @@
+"""
+Sketches Module - ETL Pipeline
+Mergeable HyperLogLog and quantile sketches of FactVentas per day/store/product,
+maintained at load time so approximate distinct counts and ticket percentiles
+over any date range come from merging sketches instead of rescanning facts
+"""
+
+import math
+import struct
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, MetaData, String, Table, select, text
+from src.etl.bulk_load import ExecuteManyEngine
+from src.etl.load import DataLoader
+
+
+# Table holding one serialized sketch per metric and grain cell
+SKETCH_TABLE = 'agg_sketch_ventas'
+
+# Finest grain stored; grain columns a metric does not use are stored as 0
+SKETCH_GRAIN = ['sk_fecha', 'sk_local', 'sk_producto']
+
+# Sketched metrics: 'hll' estimates COUNT(DISTINCT column), 'quantile'
+# the distribution of column (summed per 'per' first, e.g. ticket totals)
+SKETCH_METRICS = {
+    'clientes': {'kind': 'hll', 'column': 'sk_cliente', 'grain': SKETCH_GRAIN},
+    'ventas': {'kind': 'hll', 'column': 'id_venta', 'grain': SKETCH_GRAIN},
+    'ticket': {'kind': 'quantile', 'column': 'importe', 'per': 'id_venta', 'grain': ['sk_fecha', 'sk_local']},
+}
+
+# HyperLogLog registers = 2 ** precision (14: 16 KB dense, ~0.8% error)
+DEFAULT_PRECISION = 14
+
+# Relative error of the quantile sketch values
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Values closer to zero than this fall in the quantile sketch zero bucket
+_MIN_INDEXABLE = 1e-9
+_KEY_OFFSET = 2 ** 31
+
+
+def _hash_values(values: Iterable) -> np.ndarray:
+    """Stable 64-bit hashes (the same number hashes alike whatever its dtype)"""
+    series = pd.Series(values).dropna()
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        numbers = series.to_numpy(dtype=np.float64)
+        if np.all(np.mod(numbers, 1) == 0):
+            return pd.util.hash_array(numbers.astype(np.int64))
+        return pd.util.hash_array(numbers)
+    return pd.util.hash_array(series.astype(str).to_numpy(dtype=object))
+
+
+def _hll_positions(hashes: np.ndarray, precision: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Register index (first bits) and rank (leading zeros of the rest + 1) of each hash"""
+    rest_bits = 64 - precision
+    index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+    rest = hashes & np.uint64((1 << rest_bits) - 1)
+    # rest has <= 53 bits, so the float exponent is its exact bit length
+    bit_length = np.frexp(rest.astype(np.float64))[1]
+    return index, (rest_bits - bit_length + 1).astype(np.uint8)
+
+
+def _hll_estimate(registers: np.ndarray) -> np.ndarray:
+    """Cardinality estimates of a 2-D array of registers (one row per sketch)"""
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)), axis=1)
+    zeros = np.count_nonzero(registers == 0, axis=1)
+    # Linear counting is more accurate while many registers are empty
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+def _hll_to_bytes(precision: int, index: np.ndarray, rank: np.ndarray) -> bytes:
+    """Serialize: b'H', precision, layout (0 sparse / 1 dense), payload"""
+    if len(index) * 4 >= 1 << precision:
+        registers = np.zeros(1 << precision, dtype=np.uint8)
+        np.maximum.at(registers, index, rank)
+        return b'H' + bytes([precision, 1]) + registers.tobytes()
+    packed = (index.astype(np.uint32) << np.uint32(6)) | rank.astype(np.uint32)
+    return b'H' + bytes([precision, 0]) + packed.astype('<u4').tobytes()
+
+
+def _hll_from_bytes(data: bytes) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Precision and non-empty registers (index, rank) of a serialized HyperLogLog"""
+    if data[:1] != b'H':
+        raise ValueError("Not a serialized HyperLogLog sketch")
+    if data[2] == 1:
+        registers = np.frombuffer(data, dtype=np.uint8, offset=3)
+        index = np.flatnonzero(registers)
+        return data[1], index, registers[index]
+    packed = np.frombuffer(data, dtype='<u4', offset=3)
+    return data[1], (packed >> np.uint32(6)).astype(np.int64), (packed & np.uint32(63)).astype(np.uint8)
+
+
+def _quantile_to_bytes(relative_accuracy: float, codes: np.ndarray, counts: np.ndarray) -> bytes:
+    """Serialize: b'Q', relative accuracy, bucket count, codes, counts"""
+    return (b'Q' + struct.pack('<dI', relative_accuracy, len(codes))
+            + codes.astype('<i8').tobytes() + counts.astype('<i8').tobytes())
+
+
+def _quantile_from_bytes(data: bytes) -> Tuple[float, np.ndarray, np.ndarray]:
+    """Relative accuracy and buckets (codes, counts) of a serialized quantile sketch"""
+    if data[:1] != b'Q':
+        raise ValueError("Not a serialized quantile sketch")
+    relative_accuracy, buckets = struct.unpack_from('<dI', data, 1)
+    offset = 1 + struct.calcsize('<dI')
+    codes = np.frombuffer(data, dtype='<i8', count=buckets, offset=offset).astype(np.int64)
+    counts = np.frombuffer(data, dtype='<i8', count=buckets, offset=offset + 8 * buckets).astype(np.int64)
+    return relative_accuracy, codes, counts
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count sketch
+
+    Small sketches keep only their non-empty registers (sparse) and switch
+    to the dense register array once that is smaller. Merging takes the
+    register-wise maximum, so merged sketches estimate the distinct count
+    of the union of their inputs.
+    """
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        """
+        Initialize an empty sketch
+
+        Args:
+            precision: Bits of the register index (11-18); the standard
+                error is about 1.04 / sqrt(2 ** precision)
+        """
+        if not 11 <= precision <= 18:
+            raise ValueError(f"HyperLogLog precision must be between 11 and 18, got {precision}")
+        self.precision = precision
+        self._index = np.empty(0, dtype=np.int64)
+        self._rank = np.empty(0, dtype=np.uint8)
+        self._registers: Optional[np.ndarray] = None
+
+    @property
+    def m(self) -> int:
+        """Number of registers"""
+        return 1 << self.precision
+
+    @classmethod
+    def from_entries(cls, precision: int, index: np.ndarray, rank: np.ndarray) -> 'HyperLogLog':
+        """Build a sketch from (register index, rank) pairs, duplicates allowed"""
+        sketch = cls(precision)
+        sketch._set_entries(np.asarray(index, dtype=np.int64), np.asarray(rank, dtype=np.uint8))
+        return sketch
+
+    def entries(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Non-empty registers as (index, rank) arrays"""
+        if self._registers is None:
+            return self._index, self._rank
+        index = np.flatnonzero(self._registers)
+        return index, self._registers[index]
+
+    def registers(self) -> np.ndarray:
+        """Dense register array"""
+        if self._registers is not None:
+            return self._registers
+        registers = np.zeros(self.m, dtype=np.uint8)
+        registers[self._index] = self._rank
+        return registers
+
+    def _set_entries(self, index: np.ndarray, rank: np.ndarray):
+        if self._registers is not None or len(index) * 4 >= self.m:
+            registers = self.registers() if self._registers is None else self._registers
+            np.maximum.at(registers, index, rank)
+            self._registers = registers
+            return
+        if len(index) == 0:
+            self._index, self._rank = index, rank
+            return
+        # Sparse: keep the highest rank per register
+        order = np.lexsort((rank, index))
+        index, rank = index[order], rank[order]
+        last = np.append(index[1:] != index[:-1], True)
+        self._index, self._rank = index[last], rank[last]
+        if len(self._index) * 4 >= self.m:
+            self._set_entries(self._index, self._rank)
+
+    def add(self, values: Iterable) -> 'HyperLogLog':
+        """
+        Add values (NULLs are ignored)
+
+        Args:
+            values: Values to count
+
+        Returns:
+            The sketch itself
+        """
+        index, rank = _hll_positions(_hash_values(values), self.precision)
+        own_index, own_rank = self.entries()
+        self._set_entries(np.concatenate([own_index, index]), np.concatenate([own_rank, rank]))
+        return self
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """
+        Merge another sketch into this one
+
+        Args:
+            other: Sketch with the same precision
+
+        Returns:
+            The sketch itself
+        """
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog sketches of precision {self.precision} "
+                             f"and {other.precision}")
+        own_index, own_rank = self.entries()
+        index, rank = other.entries()
+        self._set_entries(np.concatenate([own_index, index]), np.concatenate([own_rank, rank]))
+        return self
+
+    def cardinality(self) -> float:
+        """Estimated number of distinct values added"""
+        return float(_hll_estimate(self.registers()[np.newaxis, :])[0])
+
+    def to_bytes(self) -> bytes:
+        """Serialize the sketch (sparse or dense, whichever is smaller)"""
+        return _hll_to_bytes(self.precision, *self.entries())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'HyperLogLog':
+        """Deserialize a sketch written by to_bytes"""
+        precision, index, rank = _hll_from_bytes(data)
+        return cls.from_entries(precision, index, rank)
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative-error guarantees (DDSketch)
+
+    Values fall in logarithmic buckets gamma ** (k - 1) < |x| <= gamma ** k,
+    so any quantile is returned within relative_accuracy of the true value.
+    Buckets are counts, so merging sketches just adds them up.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        """
+        Initialize an empty sketch
+
+        Args:
+            relative_accuracy: Maximum relative error of returned quantiles
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be between 0 and 1, got {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        # Bucket code: (sign + 1) * 2**32 + key + 2**31, sorted and unique
+        self._codes = np.empty(0, dtype=np.int64)
+        self._counts = np.empty(0, dtype=np.int64)
+
+    @property
+    def count(self) -> int:
+        """Number of values added"""
+        return int(self._counts.sum())
+
+    def bucket_codes(self, values: Iterable) -> np.ndarray:
+        """Bucket code of each (non-NULL) value"""
+        numbers = pd.to_numeric(pd.Series(values), errors='coerce').dropna().to_numpy(dtype=np.float64)
+        magnitude = np.abs(numbers)
+        sign = np.where(magnitude < _MIN_INDEXABLE, 0, np.sign(numbers)).astype(np.int64)
+        with np.errstate(divide='ignore'):
+            key = np.ceil(np.log(np.maximum(magnitude, _MIN_INDEXABLE)) / math.log(self.gamma))
+        key = np.where(sign == 0, 0, key).astype(np.int64)
+        return (sign + 1) * (1 << 32) + key + _KEY_OFFSET
+
+    @classmethod
+    def from_buckets(cls, relative_accuracy: float, codes: np.ndarray, counts: np.ndarray) -> 'QuantileSketch':
+        """Build a sketch from bucket codes and counts, duplicates allowed"""
+        sketch = cls(relative_accuracy)
+        sketch._set_buckets(np.asarray(codes, dtype=np.int64), np.asarray(counts, dtype=np.int64))
+        return sketch
+
+    def _set_buckets(self, codes: np.ndarray, counts: np.ndarray):
+        self._codes, inverse = np.unique(codes, return_inverse=True)
+        self._counts = np.bincount(inverse, weights=counts, minlength=len(self._codes)).astype(np.int64)
+
+    def add(self, values: Iterable) -> 'QuantileSketch':
+        """
+        Add values (NULLs are ignored)
+
+        Args:
+            values: Numeric values
+
+        Returns:
+            The sketch itself
+        """
+        codes = self.bucket_codes(values)
+        self._set_buckets(np.concatenate([self._codes, codes]),
+                          np.concatenate([self._counts, np.ones(len(codes), dtype=np.int64)]))
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """
+        Merge another sketch into this one
+
+        Args:
+            other: Sketch with the same relative accuracy
+
+        Returns:
+            The sketch itself
+        """
+        if not math.isclose(other.relative_accuracy, self.relative_accuracy):
+            raise ValueError("Cannot merge quantile sketches with different relative accuracy")
+        self._set_buckets(np.concatenate([self._codes, other._codes]),
+                          np.concatenate([self._counts, other._counts]))
+        return self
+
+    def _bucket_values(self) -> np.ndarray:
+        sign = self._codes // (1 << 32) - 1
+        key = self._codes % (1 << 32) - _KEY_OFFSET
+        return sign * 2 * np.power(self.gamma, key.astype(np.float64)) / (self.gamma + 1)
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """
+        Estimated quantiles
+
+        Args:
+            qs: Quantiles between 0 and 1 (e.g. [0.5, 0.9, 0.99])
+
+        Returns:
+            Estimated value of each quantile (NaN when the sketch is empty)
+        """
+        if not len(self._counts):
+            return [float('nan')] * len(qs)
+        values = self._bucket_values()
+        order = np.argsort(values, kind='stable')
+        values, cumulative = values[order], np.cumsum(self._counts[order])
+        ranks = np.clip(np.asarray(qs, dtype=np.float64), 0, 1) * (cumulative[-1] - 1)
+        return values[np.searchsorted(cumulative, ranks, side='right')].tolist()
+
+    def quantile(self, q: float) -> float:
+        """Estimated value of one quantile"""
+        return self.quantiles([q])[0]
+
+    def to_bytes(self) -> bytes:
+        """Serialize the sketch"""
+        return _quantile_to_bytes(self.relative_accuracy, self._codes, self._counts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'QuantileSketch':
+        """Deserialize a sketch written by to_bytes"""
+        return cls.from_buckets(*_quantile_from_bytes(data))
+
+
+def _decode_many(kind: str, blobs: Sequence[bytes]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Flatten serialized sketches into (owner, key, value) entries, owner
+    being the position of the sketch: register index and rank for 'hll',
+    bucket code and count for 'quantile'
+
+    Payloads are joined and decoded with one frombuffer per array instead
+    of one per sketch (a date range may span tens of thousands of cells).
+    """
+    blobs = [bytes(blob) for blob in blobs]
+    if any(blob[:1] != (b'H' if kind == 'hll' else b'Q') for blob in blobs):
+        raise ValueError(f"Not a serialized {'HyperLogLog' if kind == 'hll' else 'quantile'} sketch")
+
+    if kind == 'hll':
+        sparse = [position for position, blob in enumerate(blobs) if blob[2] == 0]
+        packed = np.frombuffer(b''.join(blobs[position][3:] for position in sparse), dtype='<u4')
+        owners = [np.repeat(np.asarray(sparse, dtype=np.int64), [(len(blobs[p]) - 3) // 4 for p in sparse])]
+        keys = [(packed >> np.uint32(6)).astype(np.int64)]
+        values = [(packed & np.uint32(63)).astype(np.uint8)]
+        for position, blob in enumerate(blobs):
+            if blob[2] == 1:
+                _, index, rank = _hll_from_bytes(blob)
+                owners.append(np.full(len(index), position, dtype=np.int64))
+                keys.append(index)
+                values.append(rank)
+        return np.concatenate(owners), np.concatenate(keys), np.concatenate(values)
+
+    header = 1 + struct.calcsize('<dI')
+    buckets = [struct.unpack_from('<I', blob, header - 4)[0] for blob in blobs]
+    codes = np.frombuffer(b''.join(blob[header:header + 8 * n] for blob, n in zip(blobs, buckets)), dtype='<i8')
+    counts = np.frombuffer(b''.join(blob[header + 8 * n:] for blob, n in zip(blobs, buckets)), dtype='<i8')
+    return (np.repeat(np.arange(len(blobs), dtype=np.int64), buckets),
+            codes.astype(np.int64), counts.astype(np.int64))
+
+
+def _reduce_entries(kind: str, owner: np.ndarray, keys: np.ndarray,
+                    values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Collapse duplicate (owner, key) entries, sorted by owner and key: max rank or summed counts"""
+    order = np.lexsort((keys, owner))
+    owner, keys, values = owner[order], keys[order], values[order]
+    if not len(owner):
+        return owner, keys, values
+    starts = np.flatnonzero(np.r_[True, (owner[1:] != owner[:-1]) | (keys[1:] != keys[:-1])])
+    reduce = np.maximum if kind == 'hll' else np.add
+    return owner[starts], keys[starts], reduce.reduceat(values, starts)
+
+
+class SketchManager:
+    """
+    Maintains approximate-analytics sketches of the fact table
+
+    Every DataLoader.load_fact merges the sketches of the loaded rows into
+    the stored ones (one row per metric and day/store/product cell), so
+    COUNT(DISTINCT) and ticket percentiles over any range are answered by
+    merging a few thousand small sketches. Distinct counts are idempotent
+    (reloading rows changes nothing); quantile sketches count every row
+    loaded, and a sale split across two loads counts as two tickets.
+    """
+
+    def __init__(self, loader: DataLoader, fact_table: str = 'fact_ventas',
+                 metrics: Dict[str, Dict[str, Any]] = None, precision: int = DEFAULT_PRECISION,
+                 relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, table_name: str = SKETCH_TABLE,
+                 date_table: str = 'DimFecha'):
+        """
+        Initialize the manager and register its post-load hook
+
+        Args:
+            loader: DataLoader writing the fact table
+            fact_table: Fact table the sketches summarize (load_fact(df, 'ventas')
+                writes fact_ventas)
+            metrics: Metric specs (default: SKETCH_METRICS)
+            precision: HyperLogLog precision
+            relative_accuracy: Quantile sketch relative accuracy
+            table_name: Table storing the sketches
+            date_table: Date dimension used to resolve date bounds (sk_fecha, fecha)
+        """
+        self.loader = loader
+        self.db_connection = loader.db_connection
+        self.fact_table = fact_table
+        self.metrics = metrics or SKETCH_METRICS
+        self.precision = precision
+        self.relative_accuracy = relative_accuracy
+        self.date_table = date_table
+        self.table = Table(
+            table_name, MetaData(),
+            Column('metrica', String(50), primary_key=True),
+            Column('sk_fecha', Integer, primary_key=True),
+            Column('sk_local', Integer, primary_key=True),
+            Column('sk_producto', Integer, primary_key=True),
+            Column('sketch', LargeBinary, nullable=False),
+            Column('filas', Integer, nullable=False),
+            Column('actualizado_en', DateTime, nullable=False),
+        )
+        self.table.create(self.db_connection.get_engine(), checkfirst=True)
+        self.update_log = []
+        loader.add_post_load_hook(self.on_fact_loaded)
+
+    def _select_cells(self):
+        return select(*[self.table.c[column] for column in SKETCH_GRAIN + ['sketch', 'filas']])
+
+    def _entries(self, df: pd.DataFrame, metric: str) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Grain cells of fact rows and their flat sketch entries
+
+        Returns:
+            (cells with SKETCH_GRAIN columns and filas, owner cell of each
+            entry, keys, values) - see _decode_many
+        """
+        spec = self.metrics[metric]
+        grain, column = spec['grain'], spec['column']
+        rows = df[grain + [column] + ([spec['per']] if spec.get('per') else [])]
+        if spec['kind'] == 'quantile':
+            rows = rows.assign(**{column: pd.to_numeric(rows[column], errors='coerce')})
+        rows = rows.dropna(subset=[column])
+        if spec.get('per'):
+            rows = rows.groupby(grain + [spec['per']], sort=False, observed=True)[column].sum().reset_index()
+
+        owner, cells = pd.MultiIndex.from_frame(rows[grain].astype(np.int64)).factorize()
+        cells = cells.to_frame(index=False, name=grain)
+        for grain_column in SKETCH_GRAIN:
+            if grain_column not in cells:
+                cells[grain_column] = 0
+        cells = cells[SKETCH_GRAIN].assign(filas=np.bincount(owner, minlength=len(cells)))
+
+        if spec['kind'] == 'hll':
+            keys, values = _hll_positions(_hash_values(rows[column]), self.precision)
+        else:
+            keys = QuantileSketch(self.relative_accuracy).bucket_codes(rows[column])
+            values = np.ones(len(keys), dtype=np.int64)
+        return cells, owner.astype(np.int64), keys, values
+
+    def _stored_entries(self, kind: str, stored: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray, np.ndarray]:
+        """Flat entries of stored sketch rows (same layout as _entries)"""
+        return (stored[SKETCH_GRAIN + ['filas']], *_decode_many(kind, stored['sketch']))
+
+    def _combine(self, kind: str, parts: List[tuple]) -> pd.DataFrame:
+        """
+        Merge the flat entries of several sets of cells into one sketch per cell
+
+        Returns:
+            DataFrame with the SKETCH_GRAIN columns, sketch (bytes) and filas
+        """
+        cells = pd.concat([part[0] for part in parts], ignore_index=True)
+        offsets = np.cumsum([0] + [len(part[0]) for part in parts[:-1]])
+        codes, unique = pd.MultiIndex.from_frame(cells[SKETCH_GRAIN].astype(np.int64)).factorize()
+        owner = codes[np.concatenate([part[1] + offset for part, offset in zip(parts, offsets)])]
+        owner, keys, values = _reduce_entries(kind, owner, np.concatenate([part[2] for part in parts]),
+                                              np.concatenate([part[3] for part in parts]))
+
+        bounds = np.searchsorted(owner, np.arange(len(unique) + 1))
+        if kind == 'hll':
+            sketches = [_hll_to_bytes(self.precision, keys[lo:hi], values[lo:hi])
+                        for lo, hi in zip(bounds[:-1], bounds[1:])]
+        else:
+            sketches = [_quantile_to_bytes(self.relative_accuracy, keys[lo:hi], values[lo:hi])
+                        for lo, hi in zip(bounds[:-1], bounds[1:])]
+        filas = np.bincount(codes, weights=cells['filas'].to_numpy(dtype=np.float64), minlength=len(unique))
+        return unique.to_frame(index=False, name=SKETCH_GRAIN).assign(sketch=sketches, filas=filas.astype(np.int64))
+
+    def build_cells(self, df: pd.DataFrame, metric: str) -> pd.DataFrame:
+        """
+        Sketch fact rows per grain cell of a metric
+
+        Args:
+            df: Fact rows (grain columns plus the metric columns)
+            metric: Metric name (see SKETCH_METRICS)
+
+        Returns:
+            DataFrame with the SKETCH_GRAIN columns, sketch (serialized) and filas
+        """
+        return self._combine(self.metrics[metric]['kind'], [self._entries(df, metric)])
+
+    def update(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Merge the sketches of newly loaded fact rows into the stored ones
+
+        Args:
+            df: Fact rows just loaded
+
+        Returns:
+            Cells touched per metric
+        """
+        started = time.perf_counter()
+        touched = {}
+        engine = self.db_connection.get_engine()
+        with engine.begin() as connection:
+            for metric, spec in self.metrics.items():
+                needed = spec['grain'] + [spec['column']] + ([spec['per']] if spec.get('per') else [])
+                if df.empty or not set(needed) <= set(df.columns):
+                    continue
+                new = self._entries(df, metric)
+                if new[0].empty:
+                    continue
+                low, high = int(new[0]['sk_fecha'].min()), int(new[0]['sk_fecha'].max())
+                in_range = (self.table.c.metrica == metric) & self.table.c.sk_fecha.between(low, high)
+                stored = pd.DataFrame(connection.execute(self._select_cells().where(in_range)).all(),
+                                      columns=SKETCH_GRAIN + ['sketch', 'filas'])
+                # The whole date range is rewritten; untouched cells come back unchanged
+                merged = self._combine(spec['kind'], [self._stored_entries(spec['kind'], stored), new])
+                connection.execute(self.table.delete().where(in_range))
+                self._insert(connection, metric, merged)
+                touched[metric] = len(new[0])
+
+        if touched:
+            self.db_connection.mark_table_changed(self.table.name)
+        summary = {'touched': touched, 'rows': len(df), 'duration_seconds': round(time.perf_counter() - started, 4)}
+        self.update_log.append(summary)
+        if touched:
+            print(f"Updated sketches: {', '.join(f'{k}={v} cells' for k, v in touched.items())} "
+                  f"({summary['duration_seconds']}s)")
+        return summary
+
+    def _insert(self, connection, metric: str, cells: pd.DataFrame):
+        """Write cell sketches with DBAPI executemany (COPY cannot carry binary values)"""
+        rows = cells[SKETCH_GRAIN + ['sketch', 'filas']].assign(metrica=metric, actualizado_en=datetime.now())
+        ExecuteManyEngine().load(rows, self.table.name, connection, if_exists='append')
+
+    def rebuild(self, metrics: List[str] = None, chunksize: int = 200_000) -> Dict[str, int]:
+        """
+        Rebuild sketches from the whole fact table (initial backfill)
+
+        Distinct values and per-sale totals are computed by the database,
+        then streamed in chunks and sketched.
+
+        Args:
+            metrics: Metrics to rebuild (default: all)
+            chunksize: Rows read per chunk
+
+        Returns:
+            Cells stored per metric
+        """
+        counts = {}
+        engine = self.db_connection.get_engine()
+        for metric in metrics or list(self.metrics):
+            spec = self.metrics[metric]
+            started = time.perf_counter()
+            grain = ', '.join(spec['grain'])
+            if spec.get('per'):
+                sql = (f"SELECT {grain}, {spec['per']}, SUM({spec['column']}) AS {spec['column']} "
+                       f"FROM {self.fact_table} GROUP BY {grain}, {spec['per']}")
+            elif spec['kind'] == 'hll':
+                sql = f"SELECT DISTINCT {grain}, {spec['column']} FROM {self.fact_table}"
+            else:
+                sql = f"SELECT {grain}, {spec['column']} FROM {self.fact_table}"
+
+            with engine.connect() as connection:
+                parts = [self._entries(chunk, metric)
+                         for chunk in pd.read_sql_query(text(sql), connection, chunksize=chunksize)]
+            cells = self._combine(spec['kind'], parts) if parts else pd.DataFrame()
+            with engine.begin() as connection:
+                connection.execute(self.table.delete().where(self.table.c.metrica == metric))
+                if len(cells):
+                    self._insert(connection, metric, cells)
+            counts[metric] = len(cells)
+            print(f"Rebuilt {metric} sketches: {len(cells)} cells ({time.perf_counter() - started:.2f}s)")
+        self.db_connection.mark_table_changed(self.table.name)
+        return counts
+
+    def on_fact_loaded(self, table_name: str, df: pd.DataFrame):
+        """
+        DataLoader post-load hook: merge the loaded rows into the sketches
+
+        Args:
+            table_name: Table just loaded
+            df: Rows loaded
+        """
+        if table_name == self.fact_table:
+            self.update(df)
+
+    def _date_keys(self, start, end) -> Optional[Tuple[int, int, Optional[np.ndarray]]]:
+        """sk_fecha bounds of a date range (ints are taken as sk_fecha, anything else as dates)"""
+        if start is None and end is None:
+            return None
+        if all(bound is None or isinstance(bound, (int, np.integer)) for bound in (start, end)):
+            return (start if start is not None else -2 ** 31, end if end is not None else 2 ** 31 - 1, None)
+        conditions, params = [], {}
+        if start is not None:
+            conditions.append("fecha >= :start")
+            params['start'] = pd.Timestamp(start).date()
+        if end is not None:
+            conditions.append("fecha <= :end")
+            params['end'] = pd.Timestamp(end).date()
+        keys = self.db_connection.execute_query(
+            f"SELECT sk_fecha FROM {self.date_table} WHERE {' AND '.join(conditions)}", params
+        )['sk_fecha'].to_numpy(dtype=np.int64)
+        if not len(keys):
+            return (0, -1, keys)
+        return (int(keys.min()), int(keys.max()), keys)
+
+    def _load(self, metric: str, start, end, filters: Dict[str, Sequence[int]],
+              group_by: List[str]) -> pd.DataFrame:
+        """Stored sketches of a metric within a date range and filters"""
+        if metric not in self.metrics:
+            raise ValueError(f"Unknown sketch metric: {metric}. Available: {', '.join(self.metrics)}")
+        grain = self.metrics[metric]['grain']
+        for column in list(group_by) + list(filters):
+            if column not in grain:
+                raise ValueError(f"Metric {metric} is sketched by {', '.join(grain)}; cannot use {column}")
+
+        condition = self.table.c.metrica == metric
+        dates = self._date_keys(start, end)
+        if dates is not None:
+            condition &= self.table.c.sk_fecha.between(dates[0], dates[1])
+        for column, values in filters.items():
+            condition &= self.table.c[column].in_([int(value) for value in values])
+        with self.db_connection.checkout() as connection:
+            rows = pd.DataFrame(
+                connection.execute(self._select_cells().where(condition)).all(),
+                columns=SKETCH_GRAIN + ['sketch', 'filas']
+            )
+        if dates is not None and dates[2] is not None:
+            rows = rows[rows['sk_fecha'].isin(dates[2])]
+        return rows
+
+    def _merge_groups(self, metric: str, start, end, group_by: List[str],
+                      filters: Dict[str, Sequence[int]]) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray, np.ndarray]:
+        """Flat entries of the stored sketches, owned by their group_by group"""
+        rows = self._load(metric, start, end, filters, group_by)
+        if group_by:
+            codes, groups = pd.MultiIndex.from_frame(rows[group_by]).factorize(sort=True)
+            groups = groups.to_frame(index=False, name=group_by) if len(rows) else pd.DataFrame(columns=group_by)
+        else:
+            codes, groups = np.zeros(len(rows), dtype=np.int64), pd.DataFrame(index=[0])
+        owner, keys, values = _decode_many(self.metrics[metric]['kind'], rows['sketch'])
+        return groups, np.asarray(codes, dtype=np.int64)[owner], keys, values
+
+    def distinct_count(self, metric: str = 'clientes', start=None, end=None, group_by: List[str] = None,
+                       filters: Dict[str, Sequence[int]] = None) -> pd.DataFrame:
+        """
+        Approximate COUNT(DISTINCT) over a date range by merging sketches
+
+        Args:
+            metric: HyperLogLog metric ('clientes', 'ventas', ...)
+            start: First date (date/str) or sk_fecha (int); None = unbounded
+            end: Last date (date/str) or sk_fecha (int); None = unbounded
+            group_by: Grain columns to group by (e.g. ['sk_local'])
+            filters: Grain column -> allowed keys (e.g. {'sk_producto': [3, 5]})
+
+        Returns:
+            DataFrame with the group_by columns and the estimated count
+        """
+        groups, owner, index, rank = self._merge_groups(metric, start, end, group_by or [], filters or {})
+        registers = np.zeros((len(groups), 1 << self.precision), dtype=np.uint8)
+        np.maximum.at(registers, (owner, index), rank)
+        return groups.assign(**{metric: np.round(_hll_estimate(registers)).astype(np.int64)})
+
+    def quantiles(self, metric: str = 'ticket', qs: Sequence[float] = (0.5, 0.9, 0.99), start=None, end=None,
+                  group_by: List[str] = None, filters: Dict[str, Sequence[int]] = None) -> pd.DataFrame:
+        """
+        Approximate percentiles over a date range by merging sketches
+
+        Args:
+            metric: Quantile metric ('ticket', ...)
+            qs: Quantiles between 0 and 1
+            start: First date (date/str) or sk_fecha (int); None = unbounded
+            end: Last date (date/str) or sk_fecha (int); None = unbounded
+            group_by: Grain columns to group by (e.g. ['sk_local'])
+            filters: Grain column -> allowed keys
+
+        Returns:
+            DataFrame with the group_by columns, n (values sketched) and one
+            p<NN> column per quantile
+        """
+        groups, owner, codes, counts = self._merge_groups(metric, start, end, group_by or [], filters or {})
+        owner, codes, counts = _reduce_entries('quantile', owner, codes, counts)
+        bounds = np.searchsorted(owner, np.arange(len(groups) + 1))
+        merged = [QuantileSketch.from_buckets(self.relative_accuracy, codes[lo:hi], counts[lo:hi])
+                  for lo, hi in zip(bounds[:-1], bounds[1:])]
+        result = groups.assign(n=[sketch.count for sketch in merged])
+        values = np.array([sketch.quantiles(qs) for sketch in merged]).reshape(len(groups), len(qs))
+        for position, q in enumerate(qs):
+            result[f"p{round(q * 100):02d}"] = values[:, position]
+        return result
+
+
+if __name__ == "__main__":
+    # Example usage
+    # loader = DataLoader(connection_params)
+    # sketches = SketchManager(loader)
+    # sketches.rebuild()                             # backfill from fact_ventas
+    # loader.load_fact(new_sales_df, 'ventas')       # merges the new rows into the sketches
+    # sketches.distinct_count('clientes', '2024-01-01', '2024-03-31', group_by=['sk_local'])
+    # sketches.quantiles('ticket', [0.5, 0.9], '2024-01-01', '2024-12-31')
+    rng = np.random.default_rng(0)
+    customers = rng.integers(0, 50_000, 200_000)
+    hll = HyperLogLog().add(customers[:100_000]).merge(HyperLogLog().add(customers[100_000:]))
+    print(f"Distinct customers: exact {len(np.unique(customers))}, estimated {hll.cardinality():.0f}")
+    tickets = rng.lognormal(7, 0.5, 100_000)
+    sketch = QuantileSketch().add(tickets)
+    print(f"Ticket p50/p90: exact {np.quantile(tickets, [0.5, 0.9]).round(2)}, "
+          f"estimated {np.round(sketch.quantiles([0.5, 0.9]), 2)}")
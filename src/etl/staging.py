@@ -0,0 +1,393 @@
+"""
+Staging Module - ETL Pipeline
+Partitioned Parquet staging area between extract, transform and load
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+import pandas as pd
+from datetime import datetime
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Union
+from src.utils.streaming import DEFAULT_CHUNKSIZE, is_chunk_stream
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = ds = pq = None
+
+
+# Staging areas relative to the data directory
+STAGING_AREAS = {
+    'raw': 'raw',
+    'processed': 'processed',
+}
+
+# Default partition columns derived from a date column
+DATE_PARTITIONS = ['anio', 'mes']
+
+# Marker written once a dataset has been completely staged
+MANIFEST_FILE = '_manifest.json'
+
+
+def _require_pyarrow():
+    """Fail with an actionable message when pyarrow is missing"""
+    if pq is None:
+        raise ImportError("Parquet staging requires pyarrow: pip install pyarrow")
+
+
+def add_date_partitions(df: pd.DataFrame, date_column: str,
+                        partition_cols: List[str] = None) -> pd.DataFrame:
+    """
+    Add anio/mes partition columns derived from a date column
+
+    Args:
+        df: Input DataFrame
+        date_column: Date column the partitions come from (e.g. fecha_venta)
+        partition_cols: Names of the year and month columns
+
+    Returns:
+        DataFrame with the partition columns
+    """
+    anio, mes = partition_cols or DATE_PARTITIONS
+    dates = pd.to_datetime(df[date_column])
+    return df.assign(**{anio: dates.dt.year.astype('int16'), mes: dates.dt.month.astype('int8')})
+
+
+class ParquetStaging:
+    """
+    Writes and reads staged batches as hive-partitioned Parquet datasets
+
+    Extracted batches go to data/raw/<name>/anio=YYYY/mes=M/*.parquet and
+    transformed ones to data/processed/<name>/... A manifest marks complete
+    datasets, so reruns can skip the OLTP extraction and loads can be
+    replayed from disk; reads only touch the requested columns/partitions.
+    """
+
+    def __init__(self, base_dir: str = 'data', compression: str = 'zstd', memory_map: bool = False,
+                 row_group_size: int = DEFAULT_CHUNKSIZE * 2):
+        """
+        Initialize the staging area
+
+        Args:
+            base_dir: Data directory containing the raw/processed areas
+            compression: Parquet codec ('zstd', 'snappy', 'gzip', 'none')
+            memory_map: Memory-map files on read by default
+            row_group_size: Maximum rows per Parquet row group
+        """
+        _require_pyarrow()
+        self.base_dir = base_dir
+        self.compression = compression
+        self.memory_map = memory_map
+        self.row_group_size = row_group_size
+        self.staging_log = []
+
+    def dataset_path(self, name: str, area: str = 'raw') -> str:
+        """
+        Directory of a staged dataset
+
+        Args:
+            name: Dataset name
+            area: Staging area ('raw' or 'processed')
+
+        Returns:
+            Dataset directory path
+        """
+        if area not in STAGING_AREAS:
+            raise ValueError(f"Unknown staging area: {area}. Available: {', '.join(STAGING_AREAS)}")
+        return os.path.join(self.base_dir, STAGING_AREAS[area], name)
+
+    def exists(self, name: str, area: str = 'raw') -> bool:
+        """
+        Check whether a dataset was completely staged
+
+        Args:
+            name: Dataset name
+            area: Staging area
+
+        Returns:
+            True if the dataset has a manifest
+        """
+        return os.path.exists(os.path.join(self.dataset_path(name, area), MANIFEST_FILE))
+
+    def manifest(self, name: str, area: str = 'raw') -> Optional[Dict[str, Any]]:
+        """
+        Read the manifest of a staged dataset
+
+        Args:
+            name: Dataset name
+            area: Staging area
+
+        Returns:
+            Manifest dictionary, or None if the dataset is not complete
+        """
+        path = os.path.join(self.dataset_path(name, area), MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def write(self, df: Union[pd.DataFrame, Iterable[pd.DataFrame]], name: str, area: str = 'raw',
+              partition_cols: List[str] = None, date_column: str = None,
+              mode: str = 'overwrite_partitions') -> Dict[str, Any]:
+        """
+        Stage a DataFrame or a stream of chunks as a partitioned Parquet dataset
+
+        Args:
+            df: DataFrame or stream of DataFrame chunks
+            name: Dataset name
+            area: Staging area ('raw' or 'processed')
+            partition_cols: Partition columns (default: anio/mes when date_column is given)
+            date_column: Date column used to derive anio/mes
+            mode: 'overwrite_partitions' replaces only the partitions present in
+                the data, 'overwrite' replaces the dataset, 'append' adds files
+
+        Returns:
+            Manifest of the staged dataset
+        """
+        if mode not in ('overwrite_partitions', 'overwrite', 'append'):
+            raise ValueError(f"Unknown staging mode: {mode}")
+        if date_column and not partition_cols:
+            partition_cols = DATE_PARTITIONS
+
+        path = self.dataset_path(name, area)
+        if mode == 'overwrite' and os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        # Columns added by add_date_partitions (not part of the source data)
+        derived_cols = list(partition_cols) if date_column else []
+        if os.path.exists(manifest_path):
+            if mode != 'overwrite':
+                previous = self.manifest(name, area)
+                derived_cols += [column for column in previous.get('derived_cols', [])
+                                 if column in (partition_cols or []) and column not in derived_cols]
+            # Incomplete until this write finishes
+            os.remove(manifest_path)
+
+        started = time.perf_counter()
+        run_id = uuid.uuid4().hex[:8]
+        cleared = set()
+        rows = 0
+        chunks = df if is_chunk_stream(df) else [df]
+
+        for number, chunk in enumerate(chunks):
+            if chunk.empty:
+                continue
+            if date_column:
+                chunk = add_date_partitions(chunk, date_column, partition_cols)
+            if mode == 'overwrite_partitions':
+                self._clear_partitions(path, chunk, partition_cols, cleared)
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            pq.write_to_dataset(
+                table, root_path=path,
+                partition_cols=partition_cols or None,
+                compression=self.compression,
+                row_group_size=self.row_group_size,
+                basename_template=f"part-{run_id}-{number}-{{i}}.parquet",
+                existing_data_behavior='overwrite_or_ignore',
+            )
+            rows += len(chunk)
+
+        manifest = {
+            'name': name,
+            'area': area,
+            'rows_written': rows,
+            'partition_cols': partition_cols or [],
+            'derived_cols': derived_cols,
+            'partitions': self.list_partitions(name, area, partition_cols),
+            'compression': self.compression,
+            'written_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, default=str)
+
+        duration = time.perf_counter() - started
+        self.staging_log.append({'operation': 'write', 'dataset': f"{area}/{name}", 'rows': rows,
+                                 'duration_seconds': round(duration, 4)})
+        print(f"Staged {rows} rows to {path} ({duration:.2f}s)")
+        return manifest
+
+    def _clear_partitions(self, path: str, chunk: pd.DataFrame, partition_cols: List[str], cleared: set):
+        """Remove the files of partitions about to be rewritten (once per write)"""
+        if not partition_cols:
+            if '' not in cleared:
+                for entry in os.listdir(path):
+                    if entry.endswith('.parquet'):
+                        os.remove(os.path.join(path, entry))
+                cleared.add('')
+            return
+
+        for values in chunk[partition_cols].drop_duplicates().itertuples(index=False):
+            partition = os.path.join(path, *(f"{c}={v}" for c, v in zip(partition_cols, values)))
+            if partition not in cleared:
+                if os.path.exists(partition):
+                    shutil.rmtree(partition)
+                cleared.add(partition)
+
+    def list_partitions(self, name: str, area: str = 'raw', partition_cols: List[str] = None) -> List[Dict[str, str]]:
+        """
+        List the partitions of a staged dataset
+
+        Args:
+            name: Dataset name
+            area: Staging area
+            partition_cols: Partition columns (default: read from the manifest)
+
+        Returns:
+            List of {column: value} dictionaries
+        """
+        if partition_cols is None:
+            partition_cols = (self.manifest(name, area) or {}).get('partition_cols', [])
+        if not partition_cols:
+            return []
+
+        partitions = []
+        root = self.dataset_path(name, area)
+        for directory, _, files in os.walk(root):
+            relative = os.path.relpath(directory, root)
+            parts = [] if relative == '.' else relative.split(os.sep)
+            if len(parts) == len(partition_cols) and any(f.endswith('.parquet') for f in files):
+                partitions.append(dict(part.split('=', 1) for part in parts))
+        return sorted(partitions, key=lambda p: [int(v) if v.isdigit() else v for v in p.values()])
+
+    @staticmethod
+    def _filters(partitions: Dict[str, Any] = None, filters: List[tuple] = None) -> Optional[List[tuple]]:
+        """Combine partition equality filters with explicit (column, op, value) filters"""
+        combined = [(column, '=', value) for column, value in (partitions or {}).items()]
+        combined += list(filters or [])
+        return combined or None
+
+    def read(self, name: str, area: str = 'raw', columns: List[str] = None,
+             partitions: Dict[str, Any] = None, filters: List[tuple] = None,
+             memory_map: bool = None) -> pd.DataFrame:
+        """
+        Read a staged dataset, pruning partitions and columns
+
+        Args:
+            name: Dataset name
+            area: Staging area
+            columns: Columns to read (default: all)
+            partitions: Partition values to keep, e.g. {'anio': 2024, 'mes': 3}
+            filters: Extra (column, op, value) filters pushed into the scan
+            memory_map: Memory-map the files (default: the staging setting)
+
+        Returns:
+            DataFrame with the requested columns and rows
+        """
+        started = time.perf_counter()
+        table = pq.read_table(
+            self.dataset_path(name, area),
+            columns=columns,
+            filters=self._filters(partitions, filters),
+            memory_map=self.memory_map if memory_map is None else memory_map,
+            partitioning='hive',
+        )
+        df = table.to_pandas()
+        self.staging_log.append({'operation': 'read', 'dataset': f"{area}/{name}", 'rows': len(df),
+                                 'duration_seconds': round(time.perf_counter() - started, 4)})
+        return df
+
+    def iter_batches(self, name: str, area: str = 'raw', columns: List[str] = None,
+                     partitions: Dict[str, Any] = None, filters: List[tuple] = None,
+                     batch_size: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+        """
+        Stream a staged dataset as DataFrame chunks
+
+        Args:
+            name: Dataset name
+            area: Staging area
+            columns: Columns to read (default: all)
+            partitions: Partition values to keep
+            filters: Extra (column, op, value) filters
+            batch_size: Maximum rows per chunk
+
+        Returns:
+            Iterator of DataFrame chunks
+        """
+        dataset = ds.dataset(self.dataset_path(name, area), format='parquet', partitioning='hive')
+        expression = self._filters(partitions, filters)
+        scanner = dataset.scanner(
+            columns=columns,
+            filter=pq.filters_to_expression(expression) if expression else None,
+            batch_size=batch_size,
+        )
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def stage_extract(self, name: str, extract: Callable[[], Union[pd.DataFrame, Iterable[pd.DataFrame]]],
+                      date_column: str = None, partition_cols: List[str] = None,
+                      force: bool = False, **read_options) -> pd.DataFrame:
+        """
+        Return a staged extract, running the extraction only if it is not staged yet
+
+        Args:
+            name: Dataset name in the raw area
+            extract: Callable returning the extracted DataFrame or chunk stream
+            date_column: Date column used to derive anio/mes
+            partition_cols: Partition columns
+            force: Re-extract even if the dataset is already staged
+            **read_options: columns/partitions/filters for the returned frame
+
+        Returns:
+            DataFrame read back from the staging area
+        """
+        if force or not self.exists(name, 'raw'):
+            self.write(extract(), name, 'raw', partition_cols=partition_cols, date_column=date_column,
+                       mode='overwrite')
+        else:
+            print(f"Using staged extract {self.dataset_path(name, 'raw')} (skipping extraction)")
+        return self.read(name, 'raw', **read_options)
+
+    def replay_load(self, loader, name: str, table_name: str, area: str = 'processed',
+                    if_exists: str = 'append', partitions: Dict[str, Any] = None,
+                    drop_partition_columns: bool = True, batch_size: int = DEFAULT_CHUNKSIZE) -> bool:
+        """
+        Load a staged dataset into the data warehouse again, chunk by chunk
+
+        Args:
+            loader: DataLoader of the target database
+            name: Dataset name
+            table_name: Target table
+            area: Staging area
+            if_exists: Behaviour for the first chunk ('fail', 'replace', 'append')
+            partitions: Partition values to replay (default: all)
+            drop_partition_columns: Drop the anio/mes columns derived from
+                date_column when the dataset was staged (partition columns
+                of the source data are always loaded)
+            batch_size: Rows per chunk
+
+        Returns:
+            True if successful
+        """
+        derived_cols = (self.manifest(name, area) or {}).get('derived_cols', [])
+        chunks = self.iter_batches(name, area, partitions=partitions, batch_size=batch_size)
+        if drop_partition_columns and derived_cols:
+            chunks = (chunk.drop(columns=derived_cols, errors='ignore') for chunk in chunks)
+        return loader.load_to_database(chunks, table_name, if_exists=if_exists)
+
+    def get_staging_log(self) -> List[Dict[str, Any]]:
+        """
+        Get the log of staging reads and writes
+
+        Returns:
+            List of staging records
+        """
+        return self.staging_log
+
+
+if __name__ == "__main__":
+    # Example usage
+    # staging = ParquetStaging()
+    # ventas = staging.stage_extract('ventas', lambda: extractor.extract_from_database(query, params),
+    #                                date_column='fecha_venta')
+    # staging.write(facts, 'fact_ventas', area='processed', date_column='fecha_venta')
+    # staging.read('fact_ventas', 'processed', columns=['importe'], partitions={'anio': 2024, 'mes': 3})
+    # staging.replay_load(loader, 'fact_ventas', 'FactVentas')
+    print("Staging module loaded successfully")
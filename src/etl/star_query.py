@@ -0,0 +1,531 @@
+"""
+Star Query Module - ETL Pipeline
+In-memory star-join engine over resident DW dimensions and a columnar FactVentas cache
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+from src.etl.staging import ParquetStaging
+from src.utils.db_connection import DatabaseConnection
+from src.utils.streaming import DEFAULT_CHUNKSIZE
+from src.utils.query_cache import TABLE_VERSIONS
+
+
+# Dimensions of FactVentas: surrogate key and attributes kept in memory
+STAR_DIMENSIONS = {
+    'fecha': {'table': 'DimFecha', 'key': 'sk_fecha',
+              'columns': ['fecha', 'anio', 'trimestre', 'mes', 'nombre_mes', 'dia_semana', 'es_fin_semana']},
+    'cliente': {'table': 'DimCliente', 'key': 'sk_cliente', 'columns': ['nombre', 'apellido', 'genero']},
+    'producto': {'table': 'DimProducto', 'key': 'sk_producto',
+                 'columns': ['marca', 'modelo', 'almacenamiento_gb', 'ram_gb']},
+    'local': {'table': 'DimLocal', 'key': 'sk_local', 'columns': ['provincia', 'ciudad', 'local']},
+    'vendedor': {'table': 'DimVendedor', 'key': 'sk_vendedor',
+                 'columns': ['nombre', 'apellido', 'legajo', 'categoria_vendedor']},
+    'forma_pago': {'table': 'DimFormaPago', 'key': 'sk_forma_pago', 'columns': ['forma_pago']},
+    'canal': {'table': 'DimCanal', 'key': 'sk_canal', 'columns': ['canal']},
+    'moneda': {'table': 'DimMoneda', 'key': 'sk_moneda', 'columns': ['codigo_moneda']},
+}
+
+# FactVentas columns kept in the columnar cache
+STAR_FACT_COLUMNS = [
+    'id_venta', 'sk_fecha', 'sk_cliente', 'sk_producto', 'sk_local', 'sk_vendedor', 'sk_forma_pago',
+    'sk_canal', 'sk_moneda', 'cantidad', 'importe', 'margen',
+]
+
+# Measures of the sql/views scripts: fact column and aggregation
+# (sum, nunique = COUNT(DISTINCT), count = COUNT(column), size = COUNT(*))
+STAR_MEASURES = {
+    'ventas': ('id_venta', 'nunique'),
+    'transacciones': (None, 'size'),
+    'unidades': ('cantidad', 'sum'),
+    'importe': ('importe', 'sum'),
+    'margen': ('margen', 'sum'),
+}
+
+# Ratios of stored measures: numerator, denominator, factor
+DERIVED_STAR_MEASURES = {
+    'ticket_promedio': ('importe', 'ventas', 1),
+    'margen_porcentaje': ('margen', 'importe', 100),
+}
+
+# KPIs of sql/views 01-07 in ARS (the scripts also convert through DimExchangeRate)
+STAR_ANALYSES = {
+    'marca_mas_vendida': {'group_by': ['producto.marca'], 'measures': ['ventas', 'unidades', 'importe'],
+                          'order_by': 'unidades', 'top': 1},
+    'vendedor_mas_ventas': {'group_by': ['vendedor.nombre', 'vendedor.apellido', 'vendedor.legajo'],
+                            'measures': ['ventas', 'unidades', 'importe'], 'order_by': 'ventas', 'top': 1},
+    'local_mas_ganancia': {'group_by': ['local.provincia', 'local.ciudad', 'local.local'],
+                           'measures': ['ventas', 'importe', 'margen'], 'order_by': 'margen', 'top': 1},
+    'metodo_pago_mas_usado': {'group_by': ['forma_pago.forma_pago'], 'measures': ['transacciones', 'importe'],
+                              'order_by': 'transacciones', 'top': 1},
+    'trimestre_mas_bajo': {'group_by': ['fecha.anio', 'fecha.trimestre'], 'measures': ['importe', 'ventas', 'unidades'],
+                           'order_by': 'importe', 'ascending': True, 'top': 1},
+    'trimestre_mas_alto': {'group_by': ['fecha.anio', 'fecha.trimestre'], 'measures': ['importe', 'ventas', 'unidades'],
+                           'order_by': 'importe', 'top': 1},
+    'modelo_mas_vendido': {'group_by': ['producto.marca', 'producto.modelo'], 'measures': ['unidades'],
+                           'order_by': 'unidades', 'top': 1},
+}
+
+# Staged dataset holding the fact columns
+FACT_CACHE_DATASET = 'star_factventas'
+
+# Surrogate keys up to this many times the member count use a direct-address table
+DENSE_KEY_RATIO = 4
+
+# Largest groups x distinct values bitmap used for COUNT(DISTINCT)
+DISTINCT_BITMAP_LIMIT = 2 ** 26
+
+FilterSpec = Union[Dict[str, Any], List[Tuple[str, str, Any]]]
+
+
+def _compare(values: pd.Series, op: str, value: Any) -> np.ndarray:
+    """Vectorized predicate of one filter"""
+    if op in ('=', '=='):
+        result = values == value
+    elif op in ('!=', '<>'):
+        result = values != value
+    elif op == '<':
+        result = values < value
+    elif op == '<=':
+        result = values <= value
+    elif op == '>':
+        result = values > value
+    elif op == '>=':
+        result = values >= value
+    elif op == 'in':
+        result = values.isin(list(value))
+    elif op == 'not in':
+        result = ~values.isin(list(value))
+    elif op == 'between':
+        result = values.between(*value)
+    else:
+        raise ValueError(f"Unsupported filter operator: {op}")
+    return np.asarray(result, dtype=bool)
+
+
+class DimensionTable:
+    """
+    One resident dimension: its members plus a surrogate key -> member row lookup
+    """
+
+    def __init__(self, name: str, key: str, members: pd.DataFrame):
+        """
+        Index a dimension
+
+        Args:
+            name: Dimension name (see STAR_DIMENSIONS)
+            key: Surrogate key column
+            members: Dimension rows
+        """
+        self.name = name
+        self.key = key
+        self.members = members.reset_index(drop=True)
+        keys = self.members[key].to_numpy(dtype=np.int64)
+        self._dense = None
+        self._index = None
+        if len(keys) and keys.min() >= 0 and keys.max() <= DENSE_KEY_RATIO * len(keys) + 1024:
+            # Perfect hash: the surrogate key is the slot
+            self._dense = np.full(keys.max() + 1, -1, dtype=np.int64)
+            self._dense[keys] = np.arange(len(keys))
+        else:
+            self._index = pd.Index(keys)
+        self._codes = {}
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def rows_for(self, keys) -> np.ndarray:
+        """
+        Member row of each surrogate key (-1 when the key is not a member)
+
+        Args:
+            keys: Surrogate keys (e.g. a FactVentas key column)
+
+        Returns:
+            Array of member row positions
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        if self._dense is None:
+            return self._index.get_indexer(keys)
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        valid = (keys >= 0) & (keys < len(self._dense))
+        rows[valid] = self._dense[keys[valid]]
+        return rows
+
+    def codes(self, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Factorized attribute (member codes, distinct values), NULL kept as a value"""
+        if column not in self._codes:
+            codes, uniques = pd.factorize(self.members[column], use_na_sentinel=False)
+            self._codes[column] = (codes, np.asarray(uniques, dtype=object))
+        return self._codes[column]
+
+
+class StarQueryEngine:
+    """
+    Answers group-by / filter / top-N questions over the FactVentas star in memory
+
+    Dimensions are read once and kept resident; fact columns are read from
+    a columnar Parquet cache (ParquetStaging) as queries need them. Facts
+    join their dimensions through the surrogate keys with vectorized
+    lookups whose results are reused by every query, and groups are
+    aggregated with bincount over factorized codes, so repeated analyses
+    take milliseconds and do not touch the warehouse. Loads that bump the
+    table versions (see utils.query_cache) mark the cached tables stale.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection = None, staging: ParquetStaging = None,
+                 fact_table: str = 'FactVentas', dimensions: Dict[str, Dict[str, Any]] = None,
+                 measures: Dict[str, Tuple[Optional[str], str]] = None, auto_refresh: bool = False):
+        """
+        Initialize the engine
+
+        Args:
+            db_connection: Connection to the data warehouse (needed to build
+                or refresh the caches)
+            staging: Staging area holding the fact cache (default: data/)
+            fact_table: Fact table name
+            dimensions: Dimension specs (default: STAR_DIMENSIONS)
+            measures: Extra measures, name -> (fact column, aggregation)
+            auto_refresh: Reload stale tables before answering a query
+        """
+        self.db_connection = db_connection
+        self.staging = staging or ParquetStaging()
+        self.fact_table = fact_table
+        self.dimension_specs = dimensions or STAR_DIMENSIONS
+        self.measures = {**STAR_MEASURES, **(measures or {})}
+        self.auto_refresh = auto_refresh
+        self.dimensions: Dict[str, DimensionTable] = {}
+        self.facts = pd.DataFrame()
+        self.query_log = []
+        self._fact_rows: Dict[str, np.ndarray] = {}
+        self._fact_codes: Dict[str, Tuple[np.ndarray, int]] = {}
+        self._versions: Dict[str, tuple] = {}
+
+    # -- caches -------------------------------------------------------------
+
+    def _table_version(self, table: str) -> tuple:
+        """Process and shared version of a DW table (see utils.query_cache)"""
+        if self.db_connection is None:
+            return (0, 0)
+        store = self.db_connection.version_store
+        shared = store.versions().get(table.lower(), 0) if store is not None else 0
+        return (TABLE_VERSIONS.get(self.db_connection.database_id, table), shared)
+
+    def _require_connection(self):
+        if self.db_connection is None:
+            raise ValueError("A DatabaseConnection is required to read the data warehouse")
+
+    def load_dimensions(self, names: List[str] = None) -> Dict[str, int]:
+        """
+        Read dimensions from the warehouse into memory
+
+        Args:
+            names: Dimensions to load (default: all)
+
+        Returns:
+            Members per loaded dimension
+        """
+        self._require_connection()
+        loaded = {}
+        for name in names or list(self.dimension_specs):
+            spec = self.dimension_specs[name]
+            version = self._table_version(spec['table'])
+            columns = ', '.join([spec['key']] + spec['columns'])
+            members = self.db_connection.execute_query(f"SELECT {columns} FROM {spec['table']}")
+            self.dimensions[name] = DimensionTable(name, spec['key'], members)
+            self._fact_rows.pop(name, None)
+            self._versions[spec['table']] = version
+            loaded[name] = len(members)
+        print(f"Loaded dimensions: {', '.join(f'{k}={v}' for k, v in loaded.items())}")
+        return loaded
+
+    def refresh_facts(self, chunksize: int = DEFAULT_CHUNKSIZE) -> Dict[str, Any]:
+        """
+        Rebuild the columnar fact cache from the warehouse (streamed in chunks)
+
+        Args:
+            chunksize: Rows per extracted chunk
+
+        Returns:
+            Manifest of the staged dataset
+        """
+        self._require_connection()
+        version = self._table_version(self.fact_table)
+        query = f"SELECT {', '.join(STAR_FACT_COLUMNS)} FROM {self.fact_table}"
+        chunks = self.db_connection.execute_query_chunks(query, chunksize=chunksize)
+        manifest = self.staging.write(chunks, FACT_CACHE_DATASET, area='processed', mode='overwrite')
+        self.facts = pd.DataFrame()
+        self._fact_rows.clear()
+        self._fact_codes.clear()
+        self._versions[self.fact_table] = version
+        return manifest
+
+    def _fact_columns(self, columns: List[str]) -> pd.DataFrame:
+        """Fact frame holding at least the given columns (read from the cache on demand)"""
+        missing = [column for column in columns if column not in self.facts.columns]
+        if missing:
+            if not self.staging.exists(FACT_CACHE_DATASET, 'processed'):
+                self.refresh_facts()
+            read = self.staging.read(FACT_CACHE_DATASET, 'processed', columns=missing, memory_map=True)
+            for column in missing:
+                values = read[column]
+                if values.dtype == object:
+                    # DECIMAL amounts arrive as Decimal objects; aggregate them as floats
+                    values = pd.to_numeric(values).astype('float64')
+                self.facts[column] = values.to_numpy()
+        return self.facts
+
+    def _rows(self, name: str) -> np.ndarray:
+        """Member row of each fact row in a dimension (the cached join)"""
+        if name not in self.dimensions:
+            self.load_dimensions([name])
+        if name not in self._fact_rows:
+            key = self.dimension_specs[name]['key']
+            self._fact_rows[name] = self.dimensions[name].rows_for(self._fact_columns([key])[key].to_numpy())
+        return self._fact_rows[name]
+
+    def _codes_of(self, column: str) -> Tuple[np.ndarray, int]:
+        """Factorized fact column (NULL -> -1) and its distinct count, computed once"""
+        if column not in self._fact_codes:
+            codes, uniques = pd.factorize(self._fact_columns([column])[column].to_numpy())
+            self._fact_codes[column] = (codes, len(uniques))
+        return self._fact_codes[column]
+
+    def stale_tables(self) -> List[str]:
+        """Cached tables whose version changed since they were read"""
+        return [table for table, version in self._versions.items() if self._table_version(table) != version]
+
+    def refresh(self, tables: List[str] = None):
+        """
+        Reload stale (or the given) tables
+
+        Args:
+            tables: DW tables to reload (default: the stale ones)
+        """
+        tables = self.stale_tables() if tables is None else tables
+        if self.fact_table in tables:
+            self.refresh_facts()
+        names = [name for name, spec in self.dimension_specs.items() if spec['table'] in tables]
+        if names:
+            self.load_dimensions(names)
+
+    # -- queries ------------------------------------------------------------
+
+    def _resolve(self, attribute: str) -> Tuple[Optional[str], str]:
+        """(dimension, column) of 'dimension.column', a unique dimension column or a fact column"""
+        if '.' in attribute:
+            name, column = attribute.split('.', 1)
+            if name not in self.dimension_specs or column not in self.dimension_specs[name]['columns']:
+                raise ValueError(f"Unknown attribute: {attribute}")
+            return name, column
+        owners = [name for name, spec in self.dimension_specs.items() if attribute in spec['columns']]
+        if len(owners) == 1:
+            return owners[0], attribute
+        if len(owners) > 1:
+            raise ValueError(f"Ambiguous attribute '{attribute}': use one of "
+                             f"{', '.join(f'{owner}.{attribute}' for owner in owners)}")
+        return None, attribute
+
+    @staticmethod
+    def _filters(filters: FilterSpec = None) -> List[Tuple[str, str, Any]]:
+        if not filters:
+            return []
+        if isinstance(filters, dict):
+            return [(attribute, 'in' if isinstance(value, (list, tuple, set)) else '=', value)
+                    for attribute, value in filters.items()]
+        return list(filters)
+
+    def query(self, group_by: List[str], measures: List[str], filters: FilterSpec = None,
+              order_by: str = None, ascending: bool = False, top: int = None) -> pd.DataFrame:
+        """
+        Aggregate FactVentas by dimension attributes
+
+        Args:
+            group_by: Attributes ('producto.marca', 'fecha.trimestre', or an
+                unambiguous column name / fact column)
+            measures: Measure names (see STAR_MEASURES, DERIVED_STAR_MEASURES)
+            filters: {attribute: value or list} or [(attribute, op, value)]
+                with op in =, !=, <, <=, >, >=, in, not in, between
+            order_by: Measure or attribute to sort by (default: the group columns)
+            ascending: Sort direction of order_by
+            top: Keep the first N groups
+
+        Returns:
+            DataFrame with one row per group
+        """
+        started = time.perf_counter()
+        if self.auto_refresh and self.stale_tables():
+            self.refresh()
+
+        attributes = [self._resolve(attribute) for attribute in group_by]
+        conditions = [(self._resolve(attribute), op, value) for attribute, op, value in self._filters(filters)]
+        base = self._base_measures(measures)
+
+        fact_columns = {column for name, column in attributes + [c for c, _, _ in conditions] if name is None}
+        fact_columns |= {self.measures[measure][0] for measure in base if self.measures[measure][0]}
+        facts = self._fact_columns(sorted(fact_columns) or [STAR_FACT_COLUMNS[0]])
+
+        # Inner joins: fact rows need a member in every dimension used
+        mask = np.ones(len(facts), dtype=bool)
+        for name in {name for name, _ in attributes + [c for c, _, _ in conditions] if name is not None}:
+            mask &= self._rows(name) >= 0
+        for (name, column), op, value in conditions:
+            if name is None:
+                mask &= _compare(facts[column], op, value)
+            else:
+                member_mask = _compare(self.dimensions[name].members[column], op, value)
+                mask &= member_mask[self._rows(name)]
+        selected = np.flatnonzero(mask)
+
+        group_ids, first_rows, groups = self._group(attributes, selected, facts)
+        result = pd.DataFrame({self._label(attributes, position): values
+                               for position, values in enumerate(self._group_values(attributes, selected[first_rows], facts))})
+        for measure in base:
+            result[measure] = self._aggregate(measure, group_ids, groups, selected, facts)
+        for measure in measures:
+            if measure in DERIVED_STAR_MEASURES:
+                numerator, denominator, factor = DERIVED_STAR_MEASURES[measure]
+                result[measure] = result[numerator] * factor / result[denominator].replace(0, np.nan)
+        result = result[[self._label(attributes, p) for p in range(len(attributes))] + list(measures)]
+
+        if order_by is not None:
+            result = result.sort_values(order_by, ascending=ascending, kind='stable')
+        elif attributes:
+            result = result.sort_values(list(result.columns[:len(attributes)]), kind='stable')
+        if top is not None:
+            result = result.head(top)
+        result = result.reset_index(drop=True)
+
+        duration = time.perf_counter() - started
+        self.query_log.append({
+            'timestamp': datetime.now(),
+            'group_by': group_by,
+            'measures': measures,
+            'rows_scanned': len(facts),
+            'rows_matched': len(selected),
+            'groups': groups,
+            'duration_ms': round(duration * 1000, 3),
+        })
+        return result
+
+    def _base_measures(self, measures: List[str]) -> List[str]:
+        """Stored measures needed by a measure list (derived ones expanded)"""
+        base = []
+        for measure in measures:
+            if measure in DERIVED_STAR_MEASURES:
+                needed = DERIVED_STAR_MEASURES[measure][:2]
+            elif measure in self.measures:
+                needed = (measure,)
+            else:
+                raise ValueError(f"Unknown measure '{measure}'. Available: "
+                                 f"{', '.join(sorted(list(self.measures) + list(DERIVED_STAR_MEASURES)))}")
+            base += [name for name in needed if name not in base]
+        return base
+
+    @staticmethod
+    def _label(attributes: List[Tuple[Optional[str], str]], position: int) -> str:
+        """Output column of a group attribute (dimension-prefixed when names clash)"""
+        name, column = attributes[position]
+        if sum(other == column for _, other in attributes) > 1:
+            return f"{name}_{column}"
+        return column
+
+    def _codes(self, attribute: Tuple[Optional[str], str], selected: np.ndarray, facts: pd.DataFrame):
+        """Group codes of the selected fact rows for one attribute, and their cardinality"""
+        name, column = attribute
+        if name is None:
+            codes, uniques = pd.factorize(facts[column].to_numpy()[selected], use_na_sentinel=False)
+            return codes.astype(np.int64), len(uniques)
+        member_codes, uniques = self.dimensions[name].codes(column)
+        return member_codes[self._rows(name)[selected]].astype(np.int64), len(uniques)
+
+    def _group(self, attributes, selected: np.ndarray, facts: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Dense group id of each selected row, the first row of each group and the group count"""
+        key = np.zeros(len(selected), dtype=np.int64)
+        cardinality = 1
+        for attribute in attributes:
+            codes, size = self._codes(attribute, selected, facts)
+            if cardinality * max(size, 1) >= 2 ** 62:
+                # Re-number the combined key before it overflows
+                key, uniques = pd.factorize(key)
+                cardinality = len(uniques)
+            key = key * max(size, 1) + codes
+            cardinality *= max(size, 1)
+        group_ids, uniques = pd.factorize(key)
+        first_rows = np.zeros(len(uniques), dtype=np.int64)
+        first_rows[group_ids[::-1]] = np.arange(len(group_ids))[::-1]
+        return group_ids, first_rows, len(uniques)
+
+    def _group_values(self, attributes, rows: np.ndarray, facts: pd.DataFrame) -> List[np.ndarray]:
+        """Attribute values of the given fact rows"""
+        values = []
+        for name, column in attributes:
+            if name is None:
+                values.append(facts[column].to_numpy()[rows])
+            else:
+                values.append(self.dimensions[name].members[column].to_numpy()[self._rows(name)[rows]])
+        return values
+
+    def _aggregate(self, measure: str, group_ids: np.ndarray, groups: int, selected: np.ndarray,
+                   facts: pd.DataFrame) -> np.ndarray:
+        """One stored measure per group"""
+        column, func = self.measures[measure]
+        if func == 'size':
+            return np.bincount(group_ids, minlength=groups)
+        if func != 'nunique':
+            values = facts[column].to_numpy()[selected]
+        if func == 'sum':
+            present = ~pd.isna(values)
+            totals = np.bincount(group_ids[present], weights=values[present].astype('float64'), minlength=groups)
+            return np.rint(totals).astype(np.int64) if np.issubdtype(values.dtype, np.integer) else totals
+        if func == 'count':
+            return np.bincount(group_ids, weights=~pd.isna(values), minlength=groups).astype(np.int64)
+        if func == 'nunique':
+            codes, distinct = self._codes_of(column)
+            codes = codes[selected]
+            present = codes >= 0
+            distinct = max(distinct, 1)
+            pairs = group_ids[present].astype(np.int64) * distinct + codes[present]
+            if groups * distinct <= DISTINCT_BITMAP_LIMIT:
+                seen = np.zeros(groups * distinct, dtype=bool)
+                seen[pairs] = True
+                return seen.reshape(groups, distinct).sum(axis=1)
+            return np.bincount(pd.unique(pairs) // distinct, minlength=groups)
+        raise ValueError(f"Unsupported aggregation '{func}' for measure '{measure}'")
+
+    def run_analysis(self, name: str, **overrides) -> pd.DataFrame:
+        """
+        Answer one of the sql/views KPIs (see STAR_ANALYSES)
+
+        Args:
+            name: Analysis name, e.g. 'marca_mas_vendida'
+            **overrides: Query arguments replacing the preset ones (filters, top...)
+
+        Returns:
+            Query result
+        """
+        if name not in STAR_ANALYSES:
+            raise ValueError(f"Unknown analysis '{name}'. Available: {', '.join(STAR_ANALYSES)}")
+        return self.query(**{**STAR_ANALYSES[name], **overrides})
+
+    def get_query_log(self) -> List[Dict[str, Any]]:
+        """
+        Get the log of all queries answered
+
+        Returns:
+            List of query log entries
+        """
+        return self.query_log
+
+
+if __name__ == "__main__":
+    # Example usage
+    # engine = StarQueryEngine(DatabaseConnection(dw_params), ParquetStaging('data'))
+    # engine.load_dimensions()
+    # print(engine.run_analysis('marca_mas_vendida'))
+    # print(engine.query(['fecha.anio', 'fecha.trimestre'], ['importe', 'ticket_promedio'],
+    #                    filters={'producto.marca': 'Samsung'}))
+    print("Star query module loaded successfully")
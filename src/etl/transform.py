@@ -5,8 +5,118 @@ Handles data transformation, cleaning, and business logic
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Iterator, Union
 from datetime import datetime
+from src.utils.metrics import instrument_stage
+from src.utils.streaming import is_chunk_stream
+from src.etl.rules import RuleCompiler, RulePlan
+from src.etl.memory import MemoryOptimizer, frame_memory_mb
+
+
+# A single DataFrame or a stream of DataFrame chunks
+FrameOrStream = Union[pd.DataFrame, Iterable[pd.DataFrame]]
+
+# Aggregations that can be computed per chunk and combined afterwards
+# (partial function, function used to combine the partials)
+COMBINABLE_AGGREGATIONS = {
+    'sum': ('sum', 'sum'),
+    'count': ('count', 'sum'),
+    'size': ('size', 'sum'),
+    'min': ('min', 'min'),
+    'max': ('max', 'max'),
+}
+
+# Partial-aggregate compaction threshold for streamed aggregations
+_PARTIALS_BEFORE_COMPACT = 32
+
+
+class StreamDeduplicator:
+    """
+    Remembers the rows of a chunk stream so later repeats can be dropped
+
+    Rows are identified by the 64-bit pandas hash of their key columns.
+    Keys are kept as sorted uint64 runs merged geometrically, so membership
+    is one searchsorted per run and no Python object is kept per row.
+
+    Memory grows by 8 bytes per distinct row (about 800 MB for 100M rows)
+    and is never released while the stream runs; pass the natural key as
+    key_columns so that only what identifies a row is compared. Two
+    distinct rows collide with probability about n^2 / 2^65 (3e-4 for 100M
+    rows), in which case the later one is dropped as a duplicate.
+    """
+
+    def __init__(self, key_columns: List[str] = None):
+        """
+        Initialize the deduplicator
+
+        Args:
+            key_columns: Columns identifying a row (default: all columns)
+        """
+        self.key_columns = list(key_columns) if key_columns else None
+        self._runs: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self._runs)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the remembered keys"""
+        return sum(run.nbytes for run in self._runs)
+
+    def row_keys(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        64-bit key of every row of a chunk
+
+        Args:
+            df: Chunk
+
+        Returns:
+            uint64 array with one key per row
+        """
+        data = df[self.key_columns] if self.key_columns else df
+        return pd.util.hash_pandas_object(data, index=False).to_numpy()
+
+    def seen(self, keys: np.ndarray) -> np.ndarray:
+        """Mask of the keys already remembered"""
+        found = np.zeros(len(keys), dtype=bool)
+        for run in self._runs:
+            positions = np.minimum(np.searchsorted(run, keys), len(run) - 1)
+            found |= run[positions] == keys
+        return found
+
+    def keep_mask(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Mask of the first occurrence of each key not seen in earlier chunks;
+        the kept keys are remembered
+
+        Args:
+            keys: Keys of a chunk (see row_keys)
+
+        Returns:
+            Boolean mask of the rows to keep
+        """
+        keys = np.asarray(keys, dtype='uint64')
+        unique, first = np.unique(keys, return_index=True)
+        new = ~self.seen(unique)
+        keep = np.zeros(len(keys), dtype=bool)
+        keep[first[new]] = True
+        self._add(unique[new])
+        return keep
+
+    def _add(self, sorted_keys: np.ndarray):
+        """Append a sorted run, merging runs while the newest is not much smaller"""
+        if not len(sorted_keys):
+            return
+        self._runs.append(sorted_keys)
+        while len(self._runs) > 1 and len(self._runs[-1]) * 2 >= len(self._runs[-2]):
+            newest = self._runs.pop()
+            self._runs[-1] = np.union1d(self._runs[-1], newest)
+
+
+# How transform methods treat their input frame:
+# 'copy' deep-copies it, 'cow' takes a shallow copy (columns are only added,
+# renamed or replaced, so the input is never written) and 'inplace' modifies it
+COPY_MODES = ('copy', 'cow', 'inplace')
 
 
 class DataTransformer:
@@ -14,28 +124,120 @@ class DataTransformer:
     Class responsible for transforming and cleaning data
     """
     
-    def __init__(self):
-        """Initialize the DataTransformer"""
+    def __init__(self, copy_mode: str = 'copy', track_memory: bool = False,
+                 memory_optimizer: MemoryOptimizer = None):
+        """
+        Initialize the DataTransformer
+
+        Args:
+            copy_mode: Input handling of the transform methods (see COPY_MODES)
+            track_memory: Record the memory usage before and after each step
+            memory_optimizer: Dtype optimizer used by optimize_memory
+        """
+        if copy_mode not in COPY_MODES:
+            raise ValueError(f"Unknown copy mode '{copy_mode}'. Available: {', '.join(COPY_MODES)}")
+        self.copy_mode = copy_mode
+        self.track_memory = track_memory
+        self.memory_optimizer = memory_optimizer or MemoryOptimizer()
         self.transformation_log = []
+        self.memory_log = []
+        self.rule_compiler = RuleCompiler()
+
+    def _working_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Frame a transform method works on, according to copy_mode"""
+        if self.copy_mode == 'inplace':
+            return df
+        return df.copy(deep=self.copy_mode == 'copy')
+
+    def _record_memory(self, operation: str, before: pd.DataFrame, after: pd.DataFrame):
+        """Log the memory usage of a step when track_memory is enabled"""
+        if not self.track_memory:
+            return
+        entry = {
+            'operation': operation,
+            'timestamp': datetime.now(),
+            'rows_before': len(before),
+            'rows_after': len(after),
+            'memory_before_mb': frame_memory_mb(before),
+            'memory_after_mb': frame_memory_mb(after),
+        }
+        self.memory_log.append(entry)
+        print(f"[memory] {operation}: {entry['memory_before_mb']:.2f} MB -> {entry['memory_after_mb']:.2f} MB")
+
+    @instrument_stage()
+    def optimize_memory(self, df: FrameOrStream) -> FrameOrStream:
+        """
+        Convert an extracted frame to compact dtypes (int32 keys, categorical
+        attributes); see MemoryOptimizer
+
+        Args:
+            df: Input DataFrame or stream of DataFrame chunks
+
+        Returns:
+            Optimized DataFrame (or a lazy stream of chunks)
+        """
+        if is_chunk_stream(df):
+            return (self.memory_optimizer.optimize(chunk) for chunk in df)
+
+        df_optimized = self.memory_optimizer.optimize(df)
+        before_mb, after_mb = frame_memory_mb(df), frame_memory_mb(df_optimized)
+        print(f"Optimized dtypes: {before_mb:.2f} MB -> {after_mb:.2f} MB")
+
+        self.transformation_log.append({
+            'operation': 'optimize_memory',
+            'timestamp': datetime.now(),
+            'memory_before_mb': before_mb,
+            'memory_after_mb': after_mb
+        })
+        if self.track_memory:
+            self.memory_log.append({
+                'operation': 'optimize_memory',
+                'timestamp': datetime.now(),
+                'rows_before': len(df),
+                'rows_after': len(df_optimized),
+                'memory_before_mb': before_mb,
+                'memory_after_mb': after_mb,
+            })
+
+        return df_optimized
+
+    def get_memory_report(self) -> pd.DataFrame:
+        """
+        Memory usage before and after each tracked step
+
+        Returns:
+            DataFrame with one row per step (empty unless track_memory is on)
+        """
+        return pd.DataFrame(self.memory_log, columns=['operation', 'timestamp', 'rows_before', 'rows_after',
+                                                      'memory_before_mb', 'memory_after_mb'])
     
-    def clean_data(self, df: pd.DataFrame, config: Dict[str, Any] = None) -> pd.DataFrame:
+    @instrument_stage()
+    def clean_data(self, df: FrameOrStream, config: Dict[str, Any] = None) -> FrameOrStream:
         """
         Clean data by handling missing values, duplicates, and data types
         
         Args:
-            df: Input DataFrame
+            df: Input DataFrame or stream of DataFrame chunks
             config: Configuration for cleaning operations
             
         Returns:
-            Cleaned DataFrame
+            Cleaned DataFrame (or a lazy stream of cleaned chunks)
         """
-        df_clean = df.copy()
+        if is_chunk_stream(df):
+            return self._clean_data_stream(df, config)
+
+        df_clean = self._working_frame(df)
+        inplace = self.copy_mode == 'inplace'
         
         print("Starting data cleaning...")
         
         # Remove duplicates
         initial_rows = len(df_clean)
-        df_clean = df_clean.drop_duplicates()
+        subset = (config or {}).get('dedup_columns')
+        if inplace:
+            df_clean.drop_duplicates(subset=subset, inplace=True)
+        else:
+            df_clean = df_clean.drop_duplicates(subset=subset)
         duplicates_removed = initial_rows - len(df_clean)
         
         if duplicates_removed > 0:
@@ -44,7 +246,10 @@ class DataTransformer:
         # Handle missing values
         missing_before = df_clean.isnull().sum().sum()
         if config and 'fill_na' in config:
-            df_clean = df_clean.fillna(config['fill_na'])
+            if inplace:
+                df_clean.fillna(config['fill_na'], inplace=True)
+            else:
+                df_clean = df_clean.fillna(config['fill_na'])
         
         missing_after = df_clean.isnull().sum().sum()
         print(f"Missing values: {missing_before} -> {missing_after}")
@@ -55,109 +260,322 @@ class DataTransformer:
             'duplicates_removed': duplicates_removed,
             'missing_values_handled': missing_before - missing_after
         })
+        self._record_memory('clean_data', df, df_clean)
         
         return df_clean
+
+    def _clean_data_stream(self, chunks: Iterable[pd.DataFrame],
+                           config: Dict[str, Any] = None) -> Iterator[pd.DataFrame]:
+        """
+        Clean a stream of chunks, removing duplicates across chunk boundaries
+
+        Only a 64-bit key per distinct row is kept in memory, not the rows
+        (see StreamDeduplicator); config['dedup_columns'] restricts the
+        comparison to the natural key of the rows.
+
+        Args:
+            chunks: Stream of DataFrame chunks
+            config: Configuration for cleaning operations
+
+        Returns:
+            Iterator of cleaned chunks
+        """
+        print("Starting streamed data cleaning...")
+        deduplicator = StreamDeduplicator((config or {}).get('dedup_columns'))
+        duplicates_removed = 0
+        missing_before = 0
+        missing_after = 0
+
+        for chunk in chunks:
+            keep = deduplicator.keep_mask(deduplicator.row_keys(chunk))
+            chunk_clean = chunk[keep]
+            duplicates_removed += len(chunk) - len(chunk_clean)
+
+            missing_before += int(chunk_clean.isnull().sum().sum())
+            if config and 'fill_na' in config:
+                chunk_clean = chunk_clean.fillna(config['fill_na'])
+            missing_after += int(chunk_clean.isnull().sum().sum())
+
+            yield chunk_clean
+
+        if duplicates_removed > 0:
+            print(f"Removed {duplicates_removed} duplicate rows")
+        print(f"Missing values: {missing_before} -> {missing_after}")
+
+        self.transformation_log.append({
+            'operation': 'clean_data',
+            'timestamp': datetime.now(),
+            'streamed': True,
+            'duplicates_removed': duplicates_removed,
+            'missing_values_handled': missing_before - missing_after
+        })
     
-    def standardize_columns(self, df: pd.DataFrame, column_mapping: Dict[str, str] = None) -> pd.DataFrame:
+    @instrument_stage()
+    def standardize_columns(self, df: FrameOrStream, column_mapping: Dict[str, str] = None) -> FrameOrStream:
         """
         Standardize column names
         
         Args:
-            df: Input DataFrame
+            df: Input DataFrame or stream of DataFrame chunks
             column_mapping: Dictionary mapping old names to new names
             
         Returns:
-            DataFrame with standardized columns
+            DataFrame with standardized columns (or a lazy stream of chunks)
         """
-        df_transformed = df.copy()
+        if is_chunk_stream(df):
+            return (self._standardize_columns(chunk, column_mapping) for chunk in df)
+
+        df_transformed = self._standardize_columns(df, column_mapping)
+        
+        print(f"Standardized {len(df_transformed.columns)} columns")
+        self._record_memory('standardize_columns', df, df_transformed)
+        
+        return df_transformed
+
+    def _standardize_columns(self, df: pd.DataFrame, column_mapping: Dict[str, str] = None) -> pd.DataFrame:
+        """Lowercase/underscore column names and apply the optional mapping"""
+        df_transformed = self._working_frame(df)
         
         # Convert to lowercase and replace spaces with underscores
         df_transformed.columns = df_transformed.columns.str.lower().str.replace(' ', '_')
         
         # Apply custom mapping if provided
         if column_mapping:
-            df_transformed = df_transformed.rename(columns=column_mapping)
-        
-        print(f"Standardized {len(df_transformed.columns)} columns")
-        
+            df_transformed.rename(columns=column_mapping, inplace=True)
+
         return df_transformed
     
-    def apply_business_rules(self, df: pd.DataFrame, rules: List[Dict[str, Any]]) -> pd.DataFrame:
+    def compile_rules(self, rules: List[Dict[str, Any]]) -> RulePlan:
+        """
+        Validate and compile business rules into a reusable execution plan
+
+        Args:
+            rules: List of business rules
+
+        Returns:
+            Cached RulePlan for the rule list
+        """
+        return self.rule_compiler.compile(rules)
+
+    @instrument_stage()
+    def apply_business_rules(self, df: FrameOrStream, rules: List[Dict[str, Any]]) -> FrameOrStream:
         """
         Apply business rules and calculations
         
+        The rule list is compiled once (see RuleCompiler) and the plan is
+        reused for every call and chunk with the same rules.
+
         Args:
-            df: Input DataFrame
+            df: Input DataFrame or stream of DataFrame chunks
             rules: List of business rules to apply
             
         Returns:
-            Transformed DataFrame
+            Transformed DataFrame (or a lazy stream of chunks)
         """
-        df_transformed = df.copy()
-        
-        for rule in rules:
-            rule_type = rule.get('type')
-            
-            if rule_type == 'calculate':
-                # Create calculated columns
-                df_transformed[rule['target_column']] = df_transformed.eval(rule['formula'])
-            
-            elif rule_type == 'filter':
-                # Apply filters
-                df_transformed = df_transformed.query(rule['condition'])
-            
-            elif rule_type == 'categorize':
-                # Create categories
-                df_transformed[rule['target_column']] = pd.cut(
-                    df_transformed[rule['source_column']],
-                    bins=rule['bins'],
-                    labels=rule['labels']
-                )
-        
+        plan = self.compile_rules(rules)
+
+        if is_chunk_stream(df):
+            return (plan.execute(chunk) for chunk in df)
+
+        df_transformed = plan.execute(df)
+
         print(f"Applied {len(rules)} business rules")
+        self._record_memory('apply_business_rules', df, df_transformed)
         
         return df_transformed
+
+    def _apply_business_rules(self, df: pd.DataFrame, rules: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Apply the rule list to a single DataFrame"""
+        return self.compile_rules(rules).execute(df)
     
-    def create_dimension_keys(self, df: pd.DataFrame, dimension_columns: List[str], 
-                             key_column: str = 'dimension_key') -> pd.DataFrame:
+    @instrument_stage()
+    def create_dimension_keys(self, df: FrameOrStream, dimension_columns: List[str], 
+                             key_column: str = 'dimension_key') -> FrameOrStream:
         """
         Create surrogate keys for dimension tables
         
         Args:
-            df: Input DataFrame
+            df: Input DataFrame or stream of DataFrame chunks
             dimension_columns: Columns that define the dimension
             key_column: Name for the surrogate key column
             
         Returns:
-            DataFrame with surrogate keys
+            DataFrame with surrogate keys (or a lazy stream of chunks)
         """
-        df_transformed = df.copy()
+        if is_chunk_stream(df):
+            return self._create_dimension_keys_stream(df, dimension_columns, key_column)
+
+        df_transformed = self._working_frame(df)
         
         # Create a unique key based on dimension columns
-        df_transformed[key_column] = df_transformed.groupby(dimension_columns).ngroup() + 1
+        df_transformed[key_column] = df_transformed.groupby(dimension_columns, observed=True).ngroup() + 1
         
         print(f"Created {key_column} with {df_transformed[key_column].nunique()} unique values")
+        self._record_memory('create_dimension_keys', df, df_transformed)
         
         return df_transformed
+
+    @instrument_stage()
+    def resolve_dimension_keys(self, df: FrameOrStream, key_cache, names: List[str] = None) -> FrameOrStream:
+        """
+        Replace natural keys with the real dimension surrogate keys
+        
+        Args:
+            df: Input DataFrame or stream of DataFrame chunks
+            key_cache: SurrogateKeyCache (see key_lookup.py) with the dimension maps
+            names: Lookups to apply (default: all)
+            
+        Returns:
+            DataFrame with sk_* columns (or a lazy stream of chunks)
+        """
+        if is_chunk_stream(df):
+            return (key_cache.resolve(chunk, names) for chunk in df)
+
+        return key_cache.resolve(df, names)
+
+    def _create_dimension_keys_stream(self, chunks: Iterable[pd.DataFrame], dimension_columns: List[str],
+                                      key_column: str) -> Iterator[pd.DataFrame]:
+        """
+        Assign surrogate keys across a stream of chunks
+
+        Keys are numbered in order of first appearance and stay stable for
+        the whole stream (a member seen in chunk 1 keeps its key in chunk 50).
+
+        Args:
+            chunks: Stream of DataFrame chunks
+            dimension_columns: Columns that define the dimension
+            key_column: Name for the surrogate key column
+
+        Returns:
+            Iterator of chunks with surrogate keys
+        """
+        key_map = None
+        next_key = 1
+
+        for chunk in chunks:
+            new_members = chunk[dimension_columns].drop_duplicates()
+            if key_map is not None:
+                new_members = new_members.merge(key_map, on=dimension_columns, how='left', indicator=True)
+                new_members = new_members[new_members['_merge'] == 'left_only'][dimension_columns]
+
+            if len(new_members) > 0:
+                new_members = new_members.assign(
+                    **{key_column: np.arange(next_key, next_key + len(new_members), dtype='int64')}
+                )
+                next_key += len(new_members)
+                key_map = new_members if key_map is None else pd.concat([key_map, new_members], ignore_index=True)
+
+            yield chunk.merge(key_map, on=dimension_columns, how='left')
+
+        print(f"Created {key_column} with {next_key - 1} unique values")
     
-    def aggregate_data(self, df: pd.DataFrame, group_by: List[str], 
+    @instrument_stage()
+    def aggregate_data(self, df: FrameOrStream, group_by: List[str], 
                       aggregations: Dict[str, str]) -> pd.DataFrame:
         """
         Aggregate data by specified columns
         
         Args:
-            df: Input DataFrame
+            df: Input DataFrame or stream of DataFrame chunks
             group_by: Columns to group by
             aggregations: Dictionary of column -> aggregation function
             
         Returns:
             Aggregated DataFrame
         """
-        df_agg = df.groupby(group_by).agg(aggregations).reset_index()
+        if is_chunk_stream(df):
+            return self._aggregate_stream(df, group_by, aggregations)
+
+        df_agg = df.groupby(group_by, observed=True).agg(aggregations).reset_index()
         
         print(f"Aggregated {len(df)} rows into {len(df_agg)} rows")
+        self._record_memory('aggregate_data', df, df_agg)
         
         return df_agg
+
+    def _aggregate_stream(self, chunks: Iterable[pd.DataFrame], group_by: List[str],
+                          aggregations: Dict[str, str]) -> pd.DataFrame:
+        """
+        Aggregate a stream of chunks with a partial-then-combine strategy
+
+        Each chunk is reduced to partial aggregates which are periodically
+        compacted, so memory is bounded by the number of groups.
+
+        Args:
+            chunks: Stream of DataFrame chunks
+            group_by: Columns to group by
+            aggregations: Dictionary of column -> aggregation function
+                (sum, count, size, min, max or mean)
+
+        Returns:
+            Aggregated DataFrame
+        """
+        partial_specs = self._partial_aggregation_specs(aggregations)
+
+        partials = []
+        rows_in = 0
+        for chunk in chunks:
+            rows_in += len(chunk)
+            partials.append(
+                chunk.groupby(group_by, observed=True).agg(
+                    **{name: (column, func) for name, (column, func, _) in partial_specs.items()}
+                )
+            )
+            if len(partials) >= _PARTIALS_BEFORE_COMPACT:
+                partials = [self._combine_partial_aggregates(partials, partial_specs)]
+
+        if not partials:
+            return pd.DataFrame(columns=group_by + list(aggregations))
+
+        combined = self._combine_partial_aggregates(partials, partial_specs)
+        df_agg = self._finalize_partial_aggregates(combined, aggregations).reset_index()
+
+        print(f"Aggregated {rows_in} streamed rows into {len(df_agg)} rows")
+
+        return df_agg
+
+    @staticmethod
+    def _partial_aggregation_specs(aggregations: Dict[str, str]) -> Dict[str, tuple]:
+        """
+        Build the partial aggregations needed for a combinable aggregation set
+
+        Returns:
+            Dictionary partial column -> (source column, partial func, combine func)
+        """
+        specs = {}
+        for column, func in aggregations.items():
+            if func == 'mean':
+                specs[f"{column}__sum"] = (column, 'sum', 'sum')
+                specs[f"{column}__count"] = (column, 'count', 'sum')
+            elif func in COMBINABLE_AGGREGATIONS:
+                partial_func, combine_func = COMBINABLE_AGGREGATIONS[func]
+                specs[f"{column}__{func}"] = (column, partial_func, combine_func)
+            else:
+                raise ValueError(
+                    f"Aggregation '{func}' on '{column}' cannot be combined across chunks; "
+                    f"use one of {sorted(list(COMBINABLE_AGGREGATIONS) + ['mean'])}"
+                )
+        return specs
+
+    @staticmethod
+    def _combine_partial_aggregates(partials: List[pd.DataFrame], partial_specs: Dict[str, tuple]) -> pd.DataFrame:
+        """Combine partial aggregates (indexed by the group keys) into one frame"""
+        stacked = pd.concat(partials)
+        group_levels = list(range(stacked.index.nlevels))
+        return stacked.groupby(level=group_levels).agg(
+            {name: combine_func for name, (_, _, combine_func) in partial_specs.items()}
+        )
+
+    @staticmethod
+    def _finalize_partial_aggregates(combined: pd.DataFrame, aggregations: Dict[str, str]) -> pd.DataFrame:
+        """Turn combined partial aggregates into the requested output columns"""
+        result = pd.DataFrame(index=combined.index)
+        for column, func in aggregations.items():
+            if func == 'mean':
+                result[column] = combined[f"{column}__sum"] / combined[f"{column}__count"].replace(0, np.nan)
+            else:
+                result[column] = combined[f"{column}__{func}"]
+        return result
     
     def get_transformation_log(self) -> List[Dict[str, Any]]:
         """
@@ -0,0 +1,392 @@
+"""
+Async Database Utility
+asyncio counterpart of DatabaseConnection for running independent
+analytical queries concurrently
+"""
+
+import asyncio
+import os
+import re
+import time
+import pandas as pd
+from typing import Any, Dict, Iterable, List, Optional, Union
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from src.utils.db_connection import (
+    _attach_query_listeners, _pool_settings, build_connection_string, load_connection_params_from_env
+)
+from src.utils.metrics import get_registry
+from src.utils.query_cache import TABLE_VERSIONS, referenced_tables, written_tables
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+except ImportError:  # pragma: no cover - optional dependency
+    AsyncEngine = create_async_engine = None
+
+
+# Async DBAPI driver of each supported db_type
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+# Concurrent queries when neither max_concurrency nor pool_size is given
+DEFAULT_MAX_CONCURRENCY = 5
+
+_GO_SEPARATOR = re.compile(r'^\s*GO\s*;?\s*$', re.I | re.M)
+_PRINT_STATEMENT = re.compile(r'^\s*PRINT\s+[^\n]*$', re.I | re.M)
+_STATEMENT_TOKENS = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/|[();]", re.S)
+_COMMENT = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_VARIABLE_STATEMENT = re.compile(r'^(?:DECLARE|SET)\s+@', re.I)
+
+QuerySpec = Union[str, tuple]
+
+
+def build_async_connection_string(connection_params: Dict[str, Any]) -> str:
+    """
+    Connection string of the async driver for a set of connection parameters
+
+    Args:
+        connection_params: Same parameters as DatabaseConnection
+
+    Returns:
+        Connection string using the async driver (see ASYNC_DRIVERS)
+    """
+    db_type = connection_params['db_type']
+    if db_type not in ASYNC_DRIVERS:
+        raise ValueError(f"Unsupported database type for async access: {db_type}")
+    url = make_url(build_connection_string(connection_params))
+    return url.set(drivername=ASYNC_DRIVERS[db_type]).render_as_string(hide_password=False)
+
+
+def split_statements(batch: str) -> List[str]:
+    """
+    Split a batch on the semicolons ending its top-level statements
+
+    Args:
+        batch: SQL batch
+
+    Returns:
+        Non-empty statements (without the semicolons)
+    """
+    statements, depth, start = [], 0, 0
+    for match in _STATEMENT_TOKENS.finditer(batch):
+        token = match.group()
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif token == ';' and depth == 0:
+            statements.append(batch[start:match.start()])
+            start = match.end()
+    statements.append(batch[start:])
+    return [statement.strip() for statement in statements if _COMMENT.sub('', statement).strip()]
+
+
+def load_query_files(paths: Iterable[str]) -> Dict[str, str]:
+    """
+    Read the queries of SQL script files (e.g. sql/views/0*.sql)
+
+    Scripts are split on GO batch separators and their PRINT lines dropped,
+    then each batch into its statements, so every query returns one result
+    set; statements that read no table or write one (USE, DDL, DML) are
+    skipped. DECLARE/SET of variables are kept in front of the queries of
+    their batch that use them. A file with several queries yields
+    <file>_1, <file>_2, ...
+
+    Args:
+        paths: SQL script paths
+
+    Returns:
+        Dictionary mapping query name to SQL
+    """
+    queries = {}
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding='utf-8') as handle:
+            batches = [_PRINT_STATEMENT.sub('', batch) for batch in _GO_SEPARATOR.split(handle.read())]
+        selects = []
+        for batch in batches:
+            variables = []
+            for statement in split_statements(batch):
+                if _VARIABLE_STATEMENT.match(_COMMENT.sub('', statement).strip()):
+                    variables.append(statement)
+                elif referenced_tables(statement) and not written_tables(statement):
+                    uses_variables = variables and '@' in _COMMENT.sub('', statement)
+                    selects.append(';\n'.join(variables + [statement]) if uses_variables else statement)
+        if len(selects) == 1:
+            queries[name] = selects[0]
+        else:
+            for number, batch in enumerate(selects, start=1):
+                queries[f"{name}_{number}"] = batch
+    return queries
+
+
+class AsyncDatabaseConnection:
+    """
+    Manages an SQLAlchemy async engine with bounded query concurrency
+
+    Each query runs on its own pooled connection; a semaphore caps how many
+    run at once so a batch cannot exhaust the pool or the server. Use one
+    instance per event loop and close it (or use ``async with``) when done.
+    """
+
+    def __init__(self, connection_params: Dict[str, Any] = None, max_concurrency: int = None,
+                 default_timeout: Optional[float] = None):
+        """
+        Initialize the async connection
+
+        Args:
+            connection_params: Same parameters as DatabaseConnection
+                (default: environment variables)
+            max_concurrency: Queries allowed to run at the same time
+                (default: the pool_size of the parameters)
+            default_timeout: Seconds after which a query is cancelled
+                (None: no limit)
+        """
+        if create_async_engine is None:
+            raise ImportError("SQLAlchemy asyncio support is required: pip install 'sqlalchemy[asyncio]'")
+
+        self.connection_params = connection_params or load_connection_params_from_env()
+        self.max_concurrency = (max_concurrency or self.connection_params.get('pool_size')
+                                or DEFAULT_MAX_CONCURRENCY)
+        self.default_timeout = default_timeout
+        self.query_log = []
+        self.registry = get_registry()
+
+        connection_string = build_async_connection_string(self.connection_params)
+        settings = _pool_settings(self.connection_params, build_connection_string(self.connection_params))
+        if 'pool_size' in settings:
+            # Leave room for every permitted query without waiting on the pool
+            settings['pool_size'] = max(settings['pool_size'], self.max_concurrency)
+        self.engine: AsyncEngine = create_async_engine(connection_string, echo=False, **settings)
+        _attach_query_listeners(self.engine.sync_engine)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight = 0
+        # Queries cancelled by a batch timeout that the driver has not released yet
+        self._abandoned = set()
+
+    @property
+    def database_id(self) -> str:
+        """Identity of the database in table versions (same as DatabaseConnection)"""
+        return make_url(build_connection_string(self.connection_params)).render_as_string(hide_password=True)
+
+    async def __aenter__(self) -> 'AsyncDatabaseConnection':
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def _bounded(self, name: str, operation, timeout: Optional[float]):
+        """Run one operation under the semaphore and timeout, logging its outcome"""
+        timeout = self.default_timeout if timeout is None else timeout
+        queued = time.perf_counter()
+        status, rows = 'success', None
+        async with self._semaphore:
+            started = time.perf_counter()
+            self._in_flight += 1
+            self.registry.set_gauge('etl_async_queries_in_flight', self._in_flight)
+            try:
+                result = await asyncio.wait_for(operation(), timeout)
+                rows = len(result) if isinstance(result, pd.DataFrame) else result
+                return result
+            except asyncio.TimeoutError:
+                status = 'timeout'
+                print(f"Query {name} cancelled after {timeout}s timeout")
+                raise
+            except asyncio.CancelledError:
+                status = 'cancelled'
+                raise
+            except Exception as e:
+                status = 'failed'
+                print(f"Error executing query {name}: {str(e)}")
+                raise
+            finally:
+                finished = time.perf_counter()
+                self._in_flight -= 1
+                self.registry.set_gauge('etl_async_queries_in_flight', self._in_flight)
+                self.registry.inc('etl_async_queries_total', status=status)
+                self.query_log.append({
+                    'query': name,
+                    'status': status,
+                    'rows': rows,
+                    'wait_seconds': round(started - queued, 4),
+                    'duration_seconds': round(finished - started, 4),
+                })
+
+    async def execute_query(self, query: str, params: Dict[str, Any] = None, timeout: float = None,
+                            name: str = None) -> pd.DataFrame:
+        """
+        Execute a SELECT query and return results as DataFrame
+
+        Args:
+            query: SQL query string
+            params: Optional query parameters
+            timeout: Seconds before the query is cancelled (default: default_timeout)
+            name: Label of the query in query_log
+
+        Returns:
+            DataFrame with query results
+        """
+        async def run():
+            async with self.engine.connect() as connection:
+                return await connection.run_sync(
+                    lambda sync_connection: pd.read_sql_query(text(query), sync_connection, params=params)
+                )
+
+        return await self._bounded(name or query.split(None, 1)[0].upper(), run, timeout)
+
+    async def execute_sql(self, sql: str, params: Dict[str, Any] = None, timeout: float = None,
+                          name: str = None) -> int:
+        """
+        Execute an SQL statement (INSERT, UPDATE, DELETE, etc.) in its own transaction
+
+        Args:
+            sql: SQL statement
+            params: Optional parameters
+            timeout: Seconds before the statement is cancelled (and rolled back)
+            name: Label of the statement in query_log
+
+        Returns:
+            Number of rows affected
+        """
+        async def run():
+            async with self.engine.begin() as connection:
+                result = await connection.execute(text(sql), params or {})
+            for table_name in written_tables(sql):
+                TABLE_VERSIONS.bump(self.database_id, table_name)
+            return result.rowcount
+
+        return await self._bounded(name or sql.split(None, 1)[0].upper(), run, timeout)
+
+    async def execute_many(self, queries: Dict[str, QuerySpec], timeout: float = None,
+                           batch_timeout: float = None, return_exceptions: bool = True) -> Dict[str, Any]:
+        """
+        Run independent queries concurrently (at most max_concurrency at a time)
+
+        Args:
+            queries: Dictionary mapping a name to SQL or to (SQL, params)
+            timeout: Per-query timeout in seconds (default: default_timeout)
+            batch_timeout: Seconds after which the queries still running or
+                queued are cancelled
+            return_exceptions: Return failures as exception values instead of
+                raising the first one (and cancelling the rest)
+
+        Returns:
+            Dictionary mapping each name to its DataFrame (or exception)
+
+        Note:
+            Cancelled queries are not awaited, so the batch returns at
+            batch_timeout. A query already inside the driver (e.g. aiosqlite's
+            worker thread) cannot be interrupted: it keeps its connection until
+            the database answers and is then logged as 'cancelled'; close()
+            waits for it before disposing the engine.
+        """
+        started = time.perf_counter()
+        tasks = {}
+        for name, spec in queries.items():
+            query, params = spec if isinstance(spec, tuple) else (spec, None)
+            tasks[name] = asyncio.create_task(self.execute_query(query, params, timeout=timeout, name=name))
+
+        done, pending = await asyncio.wait(tasks.values(), timeout=batch_timeout,
+                                           return_when=asyncio.ALL_COMPLETED if return_exceptions
+                                           else asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+            self._abandoned.add(task)
+            task.add_done_callback(self._abandoned.discard)
+
+        results = {}
+        for name, task in tasks.items():
+            if task in pending or task.cancelled():
+                results[name] = asyncio.TimeoutError(f"batch timeout of {batch_timeout}s")
+            elif task.exception() is not None:
+                results[name] = task.exception()
+            else:
+                results[name] = task.result()
+
+        if not return_exceptions:
+            for task in tasks.values():
+                if task in done and not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+            if pending:
+                raise asyncio.TimeoutError(f"{len(pending)} queries still running after {batch_timeout}s")
+
+        failed = sum(isinstance(result, BaseException) for result in results.values())
+        print(f"Executed {len(results) - failed}/{len(results)} queries concurrently "
+              f"in {time.perf_counter() - started:.2f}s (max {self.max_concurrency} at a time)")
+        return results
+
+    def get_query_log(self) -> List[Dict[str, Any]]:
+        """
+        Get the outcome and timing of every query run
+
+        Returns:
+            List of query log entries
+        """
+        return self.query_log
+
+    async def test_connection(self) -> bool:
+        """
+        Test if the database is reachable
+
+        Returns:
+            True if connection is alive
+        """
+        try:
+            async with self.engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        """Dispose the async engine and its pooled connections"""
+        # Disposing under a query still inside the driver would leave it hanging
+        await asyncio.gather(*self._abandoned, return_exceptions=True)
+        await self.engine.dispose()
+        print("Async database connection closed")
+
+
+def run_queries(queries: Dict[str, QuerySpec], connection_params: Dict[str, Any] = None,
+                max_concurrency: int = None, timeout: float = None,
+                batch_timeout: float = None) -> Dict[str, Any]:
+    """
+    Synchronous entry point: run a batch of queries concurrently and return
+    when all finished (for scripts; inside a running loop await
+    AsyncDatabaseConnection.execute_many instead)
+
+    Args:
+        queries: Dictionary mapping a name to SQL or to (SQL, params)
+        connection_params: Same parameters as DatabaseConnection
+        max_concurrency: Queries allowed to run at the same time
+        timeout: Per-query timeout in seconds
+        batch_timeout: Timeout of the whole batch in seconds
+
+    Returns:
+        Dictionary mapping each name to its DataFrame (or exception)
+    """
+    async def run():
+        async with AsyncDatabaseConnection(connection_params, max_concurrency, timeout) as db:
+            return await db.execute_many(queries, batch_timeout=batch_timeout)
+
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Run the analysis queries of SQL scripts concurrently")
+    parser.add_argument('paths', nargs='*', default=sorted(glob.glob('sql/views/[01]*.sql')),
+                        help="SQL scripts (default: sql/views/NN_*.sql)")
+    parser.add_argument('--concurrency', type=int, default=None, help="Queries run at the same time")
+    parser.add_argument('--timeout', type=float, default=None, help="Per-query timeout in seconds")
+    args = parser.parse_args()
+
+    # Connection parameters come from the DB_* environment variables
+    results = run_queries(load_query_files(args.paths), max_concurrency=args.concurrency, timeout=args.timeout)
+    for name, result in results.items():
+        outcome = f"{len(result)} rows" if isinstance(result, pd.DataFrame) else f"{type(result).__name__}: {result}"
+        print(f"  {name}: {outcome}")
@@ -4,21 +4,265 @@ Handles database connections and query execution
 """
 
 import pandas as pd
-from sqlalchemy import create_engine, text
-from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Connection, Engine
+from typing import Dict, Any, Iterator, Optional, Tuple
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from src.utils.metrics import get_registry
+from src.utils.query_cache import (
+    TABLE_VERSIONS, QueryCache, TableVersionStore, get_default_cache, is_cacheable, written_tables
+)
+from src.utils.streaming import DEFAULT_CHUNKSIZE
 
 # Load environment variables
 load_dotenv()
 
+# Pool settings used when the connection parameters do not override them
+DEFAULT_POOL_SETTINGS = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_timeout': 30,
+    'pool_recycle': 1800,
+    'pool_pre_ping': True,
+}
+
+# Process-wide engine registry keyed by connection string + pool settings
+_ENGINE_REGISTRY: Dict[Tuple, Engine] = {}
+_POOL_STATISTICS: Dict[Tuple, 'PoolStatistics'] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+class PoolStatistics:
+    """
+    Counters for one pooled engine (fed by SQLAlchemy pool events)
+    """
+
+    def __init__(self):
+        """Initialize the counters"""
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_overflow_seen = 0
+
+    def increment(self, counter: str, amount: float = 1):
+        """Thread-safe counter increment"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def record_overflow(self, overflow: int):
+        """Keep the highest overflow observed"""
+        with self._lock:
+            self.max_overflow_seen = max(self.max_overflow_seen, overflow)
+
+    def snapshot(self, engine: Engine) -> Dict[str, Any]:
+        """
+        Current counters plus the live pool state
+
+        Args:
+            engine: Engine the counters belong to
+
+        Returns:
+            Dictionary with the pool statistics
+        """
+        pool = engine.pool
+        with self._lock:
+            stats = {
+                'url': engine.url.render_as_string(hide_password=True),
+                'pool_class': type(pool).__name__,
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'waits': self.waits,
+                'wait_seconds': round(self.wait_seconds, 4),
+                'max_overflow_seen': self.max_overflow_seen,
+            }
+        for name in ('size', 'checkedout', 'checkedin', 'overflow'):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        return stats
+
+
+def _pool_settings(connection_params: Dict[str, Any], connection_string: str) -> Dict[str, Any]:
+    """
+    Resolve the create_engine pool arguments for a set of connection parameters
+
+    In-memory SQLite uses a single-connection pool that takes no sizing
+    arguments, so only pre-ping and recycle apply there.
+    """
+    settings = {key: connection_params.get(key, default) for key, default in DEFAULT_POOL_SETTINGS.items()}
+    if connection_string in ('sqlite://', 'sqlite:///', 'sqlite:///:memory:'):
+        settings = {key: settings[key] for key in ('pool_recycle', 'pool_pre_ping')}
+    return settings
+
+
+def get_shared_engine(connection_string: str, pool_settings: Dict[str, Any] = None) -> Engine:
+    """
+    Get (or create) the process-wide pooled engine for a connection string
+
+    Args:
+        connection_string: SQLAlchemy connection string
+        pool_settings: create_engine pool arguments (pool_size, max_overflow, ...)
+
+    Returns:
+        Shared SQLAlchemy engine
+    """
+    pool_settings = pool_settings or {}
+    key = (connection_string, tuple(sorted(pool_settings.items())))
+
+    with _REGISTRY_LOCK:
+        engine = _ENGINE_REGISTRY.get(key)
+        if engine is None:
+            engine = create_engine(connection_string, echo=False, **pool_settings)
+            statistics = PoolStatistics()
+            _attach_pool_listeners(engine, statistics)
+            _attach_query_listeners(engine)
+            _ENGINE_REGISTRY[key] = engine
+            _POOL_STATISTICS[key] = statistics
+        return engine
+
+
+def _attach_pool_listeners(engine: Engine, statistics: PoolStatistics):
+    """Wire SQLAlchemy pool events to the engine's statistics"""
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        statistics.increment('connects')
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        statistics.increment('checkouts')
+        if hasattr(engine.pool, 'overflow'):
+            statistics.record_overflow(engine.pool.overflow())
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        statistics.increment('checkins')
+
+    @event.listens_for(engine, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        statistics.increment('invalidations')
+
+
+def _attach_query_listeners(engine: Engine):
+    """Record the latency of every statement in the metrics registry"""
+    registry = get_registry()
+    database = os.path.basename(engine.url.database or '') or engine.url.get_backend_name()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def on_before_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def on_after_execute(connection, cursor, statement, parameters, context, executemany):
+        started = connection.info.get('query_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'EMPTY'
+        registry.observe('etl_query_seconds', elapsed, database=database, statement=kind)
+
+    @event.listens_for(engine, 'handle_error')
+    def on_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started'):
+            connection.info['query_started'].pop()
+        registry.inc('etl_query_errors_total', database=database)
+
+
+def _statistics_for(engine: Engine) -> Optional[PoolStatistics]:
+    """Find the statistics object of a registered engine"""
+    with _REGISTRY_LOCK:
+        for key, registered in _ENGINE_REGISTRY.items():
+            if registered is engine:
+                return _POOL_STATISTICS[key]
+    return None
+
+
+def get_pool_statistics() -> Dict[str, Dict[str, Any]]:
+    """
+    Pool statistics of every engine in the registry (for monitoring)
+
+    Returns:
+        Dictionary mapping the (password-masked) URL to its statistics
+    """
+    with _REGISTRY_LOCK:
+        items = [(engine, _POOL_STATISTICS[key]) for key, engine in _ENGINE_REGISTRY.items()]
+    return {engine.url.render_as_string(hide_password=True): stats.snapshot(engine)
+            for engine, stats in items}
+
+
+def dispose_engines():
+    """Dispose every pooled engine and clear the registry (e.g. at process exit or after fork)"""
+    with _REGISTRY_LOCK:
+        for engine in _ENGINE_REGISTRY.values():
+            engine.dispose()
+        _ENGINE_REGISTRY.clear()
+        _POOL_STATISTICS.clear()
+
+
+def load_connection_params_from_env() -> Dict[str, Any]:
+    """
+    Load connection parameters from environment variables
+
+    Returns:
+        Dictionary with connection parameters
+    """
+    return {
+        'db_type': os.getenv('DB_TYPE', 'postgresql'),
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': os.getenv('DB_PORT', '5432'),
+        'database': os.getenv('DB_NAME', 'datawarehouse'),
+        'username': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', ''),
+        'pool_size': int(os.getenv('DB_POOL_SIZE', DEFAULT_POOL_SETTINGS['pool_size'])),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', DEFAULT_POOL_SETTINGS['max_overflow'])),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', DEFAULT_POOL_SETTINGS['pool_recycle']))
+    }
+
+
+def build_connection_string(connection_params: Dict[str, Any]) -> str:
+    """
+    Build the SQLAlchemy connection string of a set of connection parameters
+
+    Args:
+        connection_params: Dictionary with db_type, host, port, database,
+            username and password
+
+    Returns:
+        Connection string
+    """
+    db_type = connection_params['db_type']
+    username = connection_params['username']
+    password = connection_params['password']
+    host = connection_params['host']
+    port = connection_params['port']
+    database = connection_params['database']
+
+    if db_type == 'sqlite':
+        return f"sqlite:///{database}"
+    elif db_type == 'postgresql':
+        return f"postgresql://{username}:{password}@{host}:{port}/{database}"
+    elif db_type == 'mysql':
+        return f"mysql+pymysql://{username}:{password}@{host}:{port}/{database}"
+    else:
+        raise ValueError(f"Unsupported database type: {db_type}")
+
 
 class DatabaseConnection:
     """
     Manages database connections using SQLAlchemy
     """
     
-    def __init__(self, connection_params: Dict[str, Any] = None):
+    def __init__(self, connection_params: Dict[str, Any] = None, query_cache: QueryCache = None):
         """
         Initialize database connection
         
@@ -30,6 +274,14 @@ class DatabaseConnection:
                 - database: Database name
                 - username: Database user
                 - password: Database password
+                - pool_size, max_overflow, pool_timeout, pool_recycle,
+                  pool_pre_ping: Optional pool settings (see DEFAULT_POOL_SETTINGS)
+            query_cache: Optional result cache for execute_query (caching is
+                off unless a cache is given or enable_query_cache is called)
+
+        The engine comes from a process-wide registry, so every
+        DatabaseConnection with the same parameters shares one warm pool.
+        No connection is opened until the first query.
         """
         if connection_params is None:
             # Try to load from environment variables
@@ -37,8 +289,77 @@ class DatabaseConnection:
         
         self.connection_params = connection_params
         self.engine = None
-        self.connection = None
+        self._connection = None
+        self.query_cache = query_cache
+        self.version_store = None
         self._connect()
+
+    @property
+    def database_id(self) -> str:
+        """Identity of the database in cache keys and table versions (password masked)"""
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def enable_query_cache(self, cache: QueryCache = None, shared_versions: bool = False) -> QueryCache:
+        """
+        Turn on result caching for execute_query
+
+        Args:
+            cache: Cache to use (default: the process-wide cache)
+            shared_versions: Also honour table versions published by other
+                processes in the etl_table_version control table
+
+        Returns:
+            The cache in use
+        """
+        self.query_cache = cache or get_default_cache()
+        if shared_versions:
+            self.share_table_versions()
+        return self.query_cache
+
+    def disable_query_cache(self):
+        """Turn off result caching (the cache itself is kept intact)"""
+        self.query_cache = None
+
+    def share_table_versions(self) -> TableVersionStore:
+        """
+        Read and publish table versions through the etl_table_version
+        control table, so loads of one process invalidate the caches of others
+
+        Returns:
+            The version store of this connection
+        """
+        if self.version_store is None:
+            self.version_store = TableVersionStore(self.engine)
+        return self.version_store
+
+    def mark_table_changed(self, table_name: str):
+        """
+        Bump the version of a table after it was written, invalidating the
+        cached results that read it
+
+        Args:
+            table_name: Name of the table written
+        """
+        TABLE_VERSIONS.bump(self.database_id, table_name)
+        if self.version_store is not None:
+            self.version_store.bump(table_name)
+
+    def get_query_cache_statistics(self) -> Dict[str, Any]:
+        """
+        Hit/miss statistics of the query cache
+
+        Returns:
+            Dictionary with the cache statistics (empty when caching is off)
+        """
+        return self.query_cache.statistics() if self.query_cache else {}
+
+    @property
+    def connection(self) -> Connection:
+        """Connection of this object, checked out from the pool on first use"""
+        if self._connection is None or self._connection.closed:
+            self._connection = self._acquire()
+            print(f"Connected to {self.connection_params['db_type']} database")
+        return self._connection
     
     def _load_from_env(self) -> Dict[str, Any]:
         """
@@ -47,14 +368,7 @@ class DatabaseConnection:
         Returns:
             Dictionary with connection parameters
         """
-        return {
-            'db_type': os.getenv('DB_TYPE', 'postgresql'),
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'port': os.getenv('DB_PORT', '5432'),
-            'database': os.getenv('DB_NAME', 'datawarehouse'),
-            'username': os.getenv('DB_USER', 'postgres'),
-            'password': os.getenv('DB_PASSWORD', '')
-        }
+        return load_connection_params_from_env()
     
     def _build_connection_string(self) -> str:
         """
@@ -63,54 +377,117 @@ class DatabaseConnection:
         Returns:
             Connection string
         """
-        db_type = self.connection_params['db_type']
-        username = self.connection_params['username']
-        password = self.connection_params['password']
-        host = self.connection_params['host']
-        port = self.connection_params['port']
-        database = self.connection_params['database']
-        
-        if db_type == 'sqlite':
-            return f"sqlite:///{database}"
-        elif db_type == 'postgresql':
-            return f"postgresql://{username}:{password}@{host}:{port}/{database}"
-        elif db_type == 'mysql':
-            return f"mysql+pymysql://{username}:{password}@{host}:{port}/{database}"
-        else:
-            raise ValueError(f"Unsupported database type: {db_type}")
+        return build_connection_string(self.connection_params)
     
     def _connect(self):
-        """Create database connection"""
+        """Resolve the shared pooled engine (connections are opened lazily)"""
         try:
             connection_string = self._build_connection_string()
-            self.engine = create_engine(connection_string, echo=False)
-            self.connection = self.engine.connect()
-            print(f"Connected to {self.connection_params['db_type']} database")
+            self.engine = get_shared_engine(
+                connection_string, _pool_settings(self.connection_params, connection_string)
+            )
+        except Exception as e:
+            print(f"Error connecting to database: {str(e)}")
+            raise
+
+    def _acquire(self) -> Connection:
+        """Check a connection out of the pool, recording time spent waiting for it"""
+        pool = self.engine.pool
+        exhausted = (
+            hasattr(pool, 'checkedout') and hasattr(pool, '_max_overflow')
+            and pool.checkedout() >= pool.size() + max(pool._max_overflow, 0)
+        )
+        started = time.perf_counter()
+        try:
+            return self.engine.connect()
         except Exception as e:
             print(f"Error connecting to database: {str(e)}")
             raise
+        finally:
+            statistics = _statistics_for(self.engine)
+            if statistics and exhausted:
+                statistics.increment('waits')
+                statistics.increment('wait_seconds', time.perf_counter() - started)
+
+    @contextmanager
+    def checkout(self) -> Iterator[Connection]:
+        """
+        Check out a pooled connection for the duration of a with-block
+
+        Independent of this object's own connection, so it can be used from
+        worker threads; the connection goes back to the pool on exit.
+
+        Yields:
+            SQLAlchemy connection
+        """
+        connection = self._acquire()
+        try:
+            yield connection
+        finally:
+            connection.close()
     
-    def execute_query(self, query: str, params: Dict[str, Any] = None) -> pd.DataFrame:
+    def execute_query(self, query: str, params: Dict[str, Any] = None, use_cache: bool = True,
+                      ttl: Optional[float] = None) -> pd.DataFrame:
         """
         Execute a SELECT query and return results as DataFrame
         
         Args:
             query: SQL query string
             params: Optional query parameters
+            use_cache: Serve/store the result through the query cache (when enabled)
+            ttl: Time to live of the cached result (default: the cache TTL)
             
         Returns:
             DataFrame with query results
         """
+        cache = self.query_cache if use_cache and is_cacheable(query) else None
+        if cache is not None:
+            key = cache.make_key(self.database_id, query, params)
+            # Versions are read before the query so a concurrent load makes the entry stale
+            versions = cache.versions_for(self.database_id, query, self.version_store)
+            cached = cache.get(key, versions)
+            if cached is not None:
+                return cached
         try:
             if params:
                 df = pd.read_sql_query(text(query), self.connection, params=params)
             else:
                 df = pd.read_sql_query(query, self.connection)
+            if cache is not None:
+                cache.put(key, df, versions, ttl=ttl, sql=query)
             return df
         except Exception as e:
             print(f"Error executing query: {str(e)}")
             raise
-    
+
+    def execute_query_chunks(self, query: str, params: Dict[str, Any] = None,
+                             chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+        """
+        Execute a SELECT query and yield results as fixed-size DataFrame chunks
+
+        Uses a dedicated connection with a server-side cursor (stream_results)
+        so rows are fetched from the database as the chunks are consumed.
+
+        Args:
+            query: SQL query string
+            params: Optional query parameters
+            chunksize: Number of rows per chunk
+
+        Returns:
+            Iterator of DataFrames with at most chunksize rows each
+        """
+        try:
+            with self.checkout() as stream_connection:
+                stream_connection = stream_connection.execution_options(
+                    stream_results=True, max_row_buffer=chunksize
+                )
+                for chunk in pd.read_sql_query(text(query), stream_connection,
+                                               params=params, chunksize=chunksize):
+                    yield chunk
+        except Exception as e:
+            print(f"Error streaming query: {str(e)}")
+            raise
+
     def execute_sql(self, sql: str, params: Dict[str, Any] = None) -> Any:
         """
         Execute an SQL statement (INSERT, UPDATE, DELETE, etc.)
@@ -128,6 +505,8 @@ class DatabaseConnection:
             else:
                 result = self.connection.execute(text(sql))
             self.connection.commit()
+            for table_name in written_tables(sql):
+                self.mark_table_changed(table_name)
             return result
         except Exception as e:
             self.connection.rollback()
@@ -142,6 +521,16 @@ class DatabaseConnection:
             SQLAlchemy engine
         """
         return self.engine
+
+    def get_pool_statistics(self) -> Dict[str, Any]:
+        """
+        Get statistics of this connection's pool (checkouts, waits, overflow...)
+
+        Returns:
+            Dictionary with the pool statistics
+        """
+        statistics = _statistics_for(self.engine)
+        return statistics.snapshot(self.engine) if statistics else {}
     
     def test_connection(self) -> bool:
         """
@@ -157,11 +546,10 @@ class DatabaseConnection:
             return False
     
     def close(self):
-        """Close database connection"""
-        if self.connection:
-            self.connection.close()
-        if self.engine:
-            self.engine.dispose()
+        """Close database connection (returns it to the shared pool)"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
         print("Database connection closed")
 
 
@@ -0,0 +1,795 @@
+"""
+Metrics Utility
+Stage timing, throughput/memory metrics, pluggable sinks and a sampling profiler
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import pandas as pd
+from src.utils.streaming import is_chunk_stream
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - optional dependency
+    psutil = None
+
+
+# Latency buckets (seconds) of the stage and query histograms
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Stage events kept in memory for summaries
+MAX_STAGE_EVENTS = 10000
+
+# Environment variable switching the sampling profiler on for a run
+PROFILE_ENV_VAR = 'ETL_PROFILE'
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def frame_bytes(df: Any) -> int:
+    """
+    Approximate bytes held by a DataFrame (shallow, so it stays cheap per chunk)
+
+    Args:
+        df: DataFrame (anything else counts as 0)
+
+    Returns:
+        Size in bytes
+    """
+    if isinstance(df, pd.DataFrame):
+        return int(df.memory_usage(index=False).sum())
+    return 0
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident memory of the current process
+
+    Returns:
+        Peak RSS in MB, or None if the platform does not report it
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def current_rss_mb() -> Optional[float]:
+    """Current resident memory in MB (needs psutil)"""
+    if psutil is None:
+        return None
+    return round(psutil.Process().memory_info().rss / 1024 ** 2, 1)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram (Prometheus semantics)
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Record one observation"""
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding quantile q (None when empty)"""
+        if self.count == 0:
+            return None
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return float('inf')
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(upper bound, cumulative count) pairs including +Inf"""
+        pairs = []
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            pairs.append((bound, running))
+        return pairs
+
+
+class StageTimer:
+    """
+    Measures one execution of an ETL stage; used through MetricsRegistry.stage
+    """
+
+    def __init__(self, registry: 'MetricsRegistry', stage: str, component: str, rows_in: int = None,
+                 bytes_in: int = None):
+        self.registry = registry
+        self.stage = stage
+        self.component = component
+        self.rows_in = rows_in
+        self.bytes_in = bytes_in
+        self.rows_out = None
+        self.bytes_out = None
+        self.chunks = None
+        self.started = None
+
+    def set_output(self, result: Any):
+        """Take rows/bytes out from a DataFrame result"""
+        if isinstance(result, pd.DataFrame):
+            self.rows_out = len(result)
+            self.bytes_out = frame_bytes(result)
+
+    def __enter__(self) -> 'StageTimer':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        # A stream closed before exhaustion (GeneratorExit) is a partial read, not a failure
+        failed = exc_type is not None and not issubclass(exc_type, GeneratorExit)
+        self.registry.record_stage(
+            stage=self.stage,
+            component=self.component,
+            seconds=time.perf_counter() - self.started,
+            rows_in=self.rows_in,
+            rows_out=self.rows_out,
+            bytes_in=self.bytes_in,
+            bytes_out=self.bytes_out,
+            chunks=self.chunks,
+            status='failed' if failed else 'success',
+            error=str(exc) if failed else None,
+        )
+        return False
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of counters, gauges, histograms and stage events
+
+    Every finished stage is forwarded to the registered sinks; flush()
+    asks the sinks to write the aggregated metrics.
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize the registry
+
+        Args:
+            enabled: Record metrics (disabled registries make stages no-ops)
+        """
+        self.enabled = enabled
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+        self.gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self.histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self.stage_events = deque(maxlen=MAX_STAGE_EVENTS)
+        self.sinks = []
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        """Register a sink (an object with emit(event) and flush(registry))"""
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        """Unregister a sink"""
+        self.sinks.remove(sink)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increase a counter"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Set a gauge"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name: str, value: float, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS, **labels):
+        """Add an observation to a histogram"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def stage(self, stage: str, component: str = 'etl', rows_in: int = None, bytes_in: int = None) -> StageTimer:
+        """
+        Context manager timing one execution of a stage
+
+        Args:
+            stage: Stage name (e.g. 'extract_from_database')
+            component: Component name (e.g. 'DataExtractor')
+            rows_in: Input rows, if known
+            bytes_in: Input bytes, if known
+
+        Returns:
+            StageTimer (call set_output or set rows_out/bytes_out inside the block)
+        """
+        return StageTimer(self, stage, component, rows_in, bytes_in)
+
+    def record_stage(self, stage: str, component: str, seconds: float, rows_in: int = None,
+                     rows_out: int = None, bytes_in: int = None, bytes_out: int = None,
+                     chunks: int = None, status: str = 'success', error: str = None):
+        """
+        Record a finished stage and forward it to the sinks
+
+        Args:
+            stage: Stage name
+            component: Component name
+            seconds: Wall time
+            rows_in, rows_out: Rows consumed and produced
+            bytes_in, bytes_out: Bytes consumed and produced
+            chunks: Chunks processed (streams)
+            status: 'success' or 'failed'
+            error: Error message of a failed stage
+        """
+        if not self.enabled:
+            return
+        rows = rows_out if rows_out is not None else rows_in
+        event = {
+            'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+            'component': component,
+            'stage': stage,
+            'status': status,
+            'seconds': round(seconds, 6),
+            'rows_in': rows_in,
+            'rows_out': rows_out,
+            'rows_per_second': round(rows / seconds, 1) if rows and seconds > 0 else None,
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+            'chunks': chunks,
+            'peak_rss_mb': peak_rss_mb(),
+            'thread': threading.current_thread().name,
+        }
+        if error is not None:
+            event['error'] = error
+
+        labels = {'component': component, 'stage': stage}
+        self.inc('etl_stage_runs_total', status=status, **labels)
+        self.observe('etl_stage_seconds', seconds, **labels)
+        for field in ('rows_in', 'rows_out', 'bytes_in', 'bytes_out'):
+            if event[field] is not None:
+                self.inc(f'etl_stage_{field}_total', event[field], **labels)
+        if event['peak_rss_mb'] is not None:
+            self.set_gauge('etl_peak_rss_bytes', event['peak_rss_mb'] * 1024 ** 2)
+
+        with self._lock:
+            self.stage_events.append(event)
+        for sink in list(self.sinks):
+            try:
+                sink.emit(event)
+            except Exception as e:
+                print(f"Metrics sink {type(sink).__name__} failed: {str(e)}")
+
+    def track_stream(self, chunks: Iterable[pd.DataFrame], stage: str, component: str = 'etl',
+                     direction: str = 'out', source: 'ChunkCounter' = None) -> Iterator[pd.DataFrame]:
+        """
+        Pass a chunk stream through, recording the stage once it is exhausted
+
+        Producer and consumer run interleaved, so the time is split: an
+        'out' stage (the stream producer) is charged only the time spent
+        producing chunks, an 'in' stage (the consumer) everything but it.
+
+        Args:
+            chunks: Stream of DataFrame chunks
+            stage: Stage name
+            component: Component name
+            direction: 'out' counts the chunks as produced rows, 'in' as consumed
+            source: Counter of the stream an 'out' stage reads (gives rows/bytes
+                in; the time spent waiting on it is not charged to the stage)
+
+        Returns:
+            Iterator over the same chunks
+        """
+        iterator = iter(chunks)
+        rows = bytes_moved = count = 0
+        producing = 0.0
+        status, error = 'success', None
+        started = time.perf_counter()
+        try:
+            while True:
+                pulled = time.perf_counter()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    producing += time.perf_counter() - pulled
+                rows += len(chunk)
+                bytes_moved += frame_bytes(chunk)
+                count += 1
+                yield chunk
+        except GeneratorExit:
+            # Closed before exhaustion: a partial read, not a failure
+            raise
+        except Exception as e:
+            status, error = 'failed', str(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            moved = {'rows_out': rows, 'bytes_out': bytes_moved} if direction == 'out' else \
+                {'rows_in': rows, 'bytes_in': bytes_moved}
+            if source is not None:
+                moved.update(rows_in=source.rows, bytes_in=source.bytes)
+                producing = max(producing - source.seconds, 0.0)
+            self.record_stage(stage, component, producing if direction == 'out' else max(elapsed - producing, 0.0),
+                              chunks=count, status=status, error=error, **moved)
+
+    def flush(self):
+        """Ask every sink to write the aggregated metrics"""
+        for sink in list(self.sinks):
+            try:
+                sink.flush(self)
+            except Exception as e:
+                print(f"Metrics sink {type(sink).__name__} failed: {str(e)}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Copy of the aggregated metrics
+
+        Returns:
+            Dictionary with counters, gauges and histogram summaries
+        """
+        def render(key):
+            name, labels = key
+            return name + ('{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}' if labels else '')
+
+        with self._lock:
+            return {
+                'counters': {render(key): value for key, value in self.counters.items()},
+                'gauges': {render(key): value for key, value in self.gauges.items()},
+                'histograms': {
+                    render(key): {'count': h.count, 'sum': round(h.sum, 6),
+                                  'p50': h.quantile(0.5), 'p95': h.quantile(0.95), 'p99': h.quantile(0.99)}
+                    for key, h in self.histograms.items()
+                },
+            }
+
+    def stage_summary(self) -> pd.DataFrame:
+        """
+        Wall time, rows and throughput per stage over the recorded events
+
+        Returns:
+            DataFrame indexed by component and stage
+        """
+        with self._lock:
+            events = pd.DataFrame(list(self.stage_events))
+        if events.empty:
+            return events
+        summary = events.groupby(['component', 'stage']).agg(
+            runs=('seconds', 'size'),
+            seconds=('seconds', 'sum'),
+            max_seconds=('seconds', 'max'),
+            rows_in=('rows_in', 'sum'),
+            rows_out=('rows_out', 'sum'),
+            bytes_out=('bytes_out', 'sum'),
+            peak_rss_mb=('peak_rss_mb', 'max'),
+        )
+        rows = summary['rows_out'].where(summary['rows_out'] > 0, summary['rows_in'])
+        summary['rows_per_second'] = (rows / summary['seconds'].where(summary['seconds'] > 0)).round(1)
+        return summary.sort_values('seconds', ascending=False)
+
+    def reset(self):
+        """Drop every metric and event (sinks stay registered)"""
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.stage_events.clear()
+
+
+class JsonLogSink:
+    """
+    Writes one JSON line per finished stage (and a metrics snapshot on flush)
+    """
+
+    def __init__(self, path: str = None, stream=None):
+        """
+        Initialize the sink
+
+        Args:
+            path: JSON-lines file appended to
+            stream: Text stream written instead of a file (default: stdout)
+        """
+        self.path = path
+        self.stream = stream if stream is not None or path else sys.stdout
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _write(self, record: Dict[str, Any]):
+        line = json.dumps(record, default=str, ensure_ascii=False)
+        with self._lock:
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as handle:
+                    handle.write(line + '\n')
+            else:
+                self.stream.write(line + '\n')
+
+    def emit(self, event: Dict[str, Any]):
+        self._write({'type': 'stage', **event})
+
+    def flush(self, registry: MetricsRegistry):
+        self._write({'type': 'metrics', 'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+                     **registry.snapshot()})
+
+
+class PrometheusTextSink:
+    """
+    Writes the registry in Prometheus text exposition format on flush
+    (e.g. for the node_exporter textfile collector)
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the sink
+
+        Args:
+            path: .prom file rewritten atomically on every flush
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def emit(self, event: Dict[str, Any]):
+        """Stage events are aggregated by the registry; nothing to do per event"""
+
+    @staticmethod
+    def _labels(labels: LabelKey, extra: Dict[str, str] = None) -> str:
+        pairs = list(labels) + list((extra or {}).items())
+        if not pairs:
+            return ''
+        escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                   for k, v in pairs)
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self, registry: MetricsRegistry) -> str:
+        """
+        Render the registry as exposition text
+
+        Args:
+            registry: Metrics registry
+
+        Returns:
+            Text in Prometheus exposition format
+        """
+        lines = []
+        with registry._lock:
+            counters = sorted(registry.counters.items())
+            gauges = sorted(registry.gauges.items())
+            histograms = sorted(registry.histograms.items(), key=lambda item: item[0])
+            histograms = [(key, h.cumulative(), h.sum, h.count) for key, h in histograms]
+
+        for kind, items in (('counter', counters), ('gauge', gauges)):
+            declared = set()
+            for (name, labels), value in items:
+                if name not in declared:
+                    lines.append(f"# TYPE {name} {kind}")
+                    declared.add(name)
+                lines.append(f"{name}{self._labels(labels)} {value}")
+
+        declared = set()
+        for (name, labels), buckets, total, count in histograms:
+            if name not in declared:
+                lines.append(f"# TYPE {name} histogram")
+                declared.add(name)
+            for bound, cumulative in buckets:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{self._labels(labels, {'le': le})} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{name}_count{self._labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def flush(self, registry: MetricsRegistry):
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as handle:
+            handle.write(self.render(registry))
+        os.replace(temporary, self.path)
+
+
+# Process-wide registry used by the instrumented ETL classes
+REGISTRY = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Process-wide metrics registry"""
+    return REGISTRY
+
+
+class ChunkCounter:
+    """
+    Passes a chunk stream through, counting rows, bytes and the time spent
+    waiting on it (the input side of a stage reading a stream)
+    """
+
+    def __init__(self, chunks: Iterable[pd.DataFrame]):
+        self.chunks = chunks
+        self.rows = self.bytes = self.count = 0
+        self.seconds = 0.0
+
+    @classmethod
+    def of_frame(cls, df: pd.DataFrame) -> 'ChunkCounter':
+        """Counter already holding a whole DataFrame argument"""
+        counter = cls([df])
+        counter.rows, counter.bytes, counter.count = len(df), frame_bytes(df), 1
+        return counter
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        iterator = iter(self.chunks)
+        while True:
+            pulled = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.seconds += time.perf_counter() - pulled
+            self.rows += len(chunk)
+            self.bytes += frame_bytes(chunk)
+            self.count += 1
+            yield chunk
+
+
+def _is_lazy_stream(obj: Any) -> bool:
+    """Generators/iterators of chunks (materialized lists are not timed lazily)"""
+    return is_chunk_stream(obj) and not isinstance(obj, (list, tuple, set))
+
+
+def _first_frame(args: tuple, kwargs: Dict[str, Any]):
+    """First DataFrame or lazy chunk stream among a call's arguments"""
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, pd.DataFrame) or _is_lazy_stream(value):
+            return value
+    return None
+
+
+def instrument_stage(stage: str = None, component: str = None):
+    """
+    Decorator recording a method call as an ETL stage in the process registry
+
+    DataFrame arguments/results give rows and bytes in/out. When the method
+    returns a chunk stream the stage is recorded once the stream is
+    exhausted, with the rows counted as the stream is consumed; chunks of a
+    stream argument are counted as they are read.
+
+    Args:
+        stage: Stage name (default: the function name)
+        component: Component name (default: the class name of self)
+
+    Returns:
+        Decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        stage_name = stage or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            registry = REGISTRY
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            owner = component or (type(args[0]).__name__ if args else func.__module__)
+            source = _first_frame(args[1:], kwargs)
+
+            streamed = source is not None and not isinstance(source, pd.DataFrame)
+            counter = None
+            if streamed:
+                # Streamed input: count the chunks as they are read
+                counter = ChunkCounter(source)
+                tracked = iter(counter)
+                args = tuple(tracked if value is source else value for value in args)
+                kwargs = {key: tracked if value is source else value for key, value in kwargs.items()}
+            elif source is not None:
+                counter = ChunkCounter.of_frame(source)
+
+            def consumed():
+                if counter is None:
+                    return {}
+                moved = {'rows_in': counter.rows, 'bytes_in': counter.bytes}
+                return dict(moved, chunks=counter.count) if streamed else moved
+
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                registry.record_stage(stage_name, owner, time.perf_counter() - started, status='failed',
+                                      error=str(e), **consumed())
+                raise
+            if _is_lazy_stream(result):
+                # Lazy result: the stage is the production of the stream
+                return registry.track_stream(result, stage_name, owner, direction='out', source=counter)
+            # Eager result: time spent waiting on a streamed input belongs to its producer
+            waited = counter.seconds if counter is not None else 0.0
+            is_frame = isinstance(result, pd.DataFrame)
+            registry.record_stage(stage_name, owner, max(time.perf_counter() - started - waited, 0.0),
+                                  rows_out=len(result) if is_frame else None,
+                                  bytes_out=frame_bytes(result) if is_frame else None, **consumed())
+            return result
+
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler:
+    """
+    Low-overhead statistical profiler sampling every thread's stack
+
+    A background thread reads sys._current_frames() at a fixed interval and
+    counts the collapsed stacks, so hot spots show up without tracing every
+    call. Output is a top-functions table or a collapsed-stack file for
+    flame graph tools.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        """
+        Initialize the profiler
+
+        Args:
+            interval: Seconds between samples
+            max_depth: Frames kept per stack
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.started_at = None
+        self.duration = 0.0
+
+    def start(self):
+        """Start sampling in a daemon thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.duration += time.perf_counter() - self.started_at
+
+    def __enter__(self) -> 'SamplingProfiler':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+        return False
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top_functions(self, limit: int = 20, inclusive: bool = False) -> pd.DataFrame:
+        """
+        Functions with the most samples
+
+        Args:
+            limit: Rows returned
+            inclusive: Count samples anywhere in the stack (cumulative)
+                instead of only at the top of the stack (self time)
+
+        Returns:
+            DataFrame with samples, share of samples and estimated seconds
+        """
+        counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if not frames:
+                continue
+            if inclusive:
+                for function in set(frames):
+                    counts[function] += count
+            else:
+                counts[frames[-1]] += count
+        total = sum(self.stacks.values()) or 1
+        rows = [{'function': function, 'samples': count, 'share': round(count / total, 4),
+                 'seconds': round(count * self.interval, 3)} for function, count in counts.most_common(limit)]
+        return pd.DataFrame(rows, columns=['function', 'samples', 'share', 'seconds'])
+
+    def write_collapsed(self, path: str):
+        """
+        Write the stacks in collapsed format ("frame;frame;frame count")
+
+        Args:
+            path: Output file (input for flamegraph.pl / speedscope)
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as handle:
+            for stack, count in self.stacks.most_common():
+                handle.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile_run(enabled: bool = None, output: str = None, interval: float = 0.005, top: int = 15):
+    """
+    Profile a single run with the sampling profiler
+
+    Args:
+        enabled: Switch the profiler on (default: the ETL_PROFILE variable)
+        output: Collapsed-stack file written at the end (optional)
+        interval: Seconds between samples
+        top: Functions printed at the end
+
+    Returns:
+        Context manager yielding the SamplingProfiler, or None when disabled
+    """
+    if enabled is None:
+        enabled = os.getenv(PROFILE_ENV_VAR, '').lower() in ('1', 'true', 'yes')
+    if not enabled:
+        yield None
+        return
+
+    profiler = SamplingProfiler(interval=interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        print(f"Sampling profiler: {profiler.samples} samples over {profiler.duration:.2f}s")
+        if top:
+            print(profiler.top_functions(top).to_string(index=False))
+        if output:
+            profiler.write_collapsed(output)
+            print(f"Collapsed stacks written to {output}")
+
+
+if __name__ == "__main__":
+    # Example usage
+    registry = get_registry()
+    registry.add_sink(JsonLogSink())
+    with registry.stage('example', 'metrics', rows_in=3) as timer:
+        timer.set_output(pd.DataFrame({'a': [1, 2, 3]}))
+    print(PrometheusTextSink('metrics/etl.prom').render(registry))
@@ -0,0 +1,554 @@
+"""
+Query Cache Utility
+Result cache for DatabaseConnection.execute_query with memory/Parquet tiers,
+TTLs and table-version invalidation
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import pandas as pd
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select, update
+from sqlalchemy.engine import Engine
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+
+# Control table sharing the table versions between processes
+TABLE_VERSION_TABLE = 'etl_table_version'
+
+# Relations whose results depend on other tables: a load of any of them
+# invalidates the cached queries of the view (sql/views/create_views.sql and
+# the rollups of src/etl/aggregates.py)
+VIEW_DEPENDENCIES = {
+    'view_sales_summary': ['fact_sales', 'dim_date', 'dim_product', 'dim_customer', 'dim_store'],
+    'view_monthly_sales_trend': ['fact_sales', 'dim_date'],
+    'view_product_performance': ['fact_sales', 'dim_product'],
+    'view_customer_rfm': ['fact_sales', 'dim_customer', 'dim_date'],
+    'view_store_performance': ['fact_sales', 'dim_store'],
+    'view_daily_dashboard': ['fact_sales', 'dim_date'],
+    'agg_sales_summary': ['fact_sales', 'dim_date', 'dim_product', 'dim_customer', 'dim_store'],
+    'agg_sales_daily': ['fact_sales', 'dim_date'],
+    'agg_sales_monthly': ['fact_sales', 'dim_date'],
+    'agg_sales_product': ['fact_sales', 'dim_product'],
+    'agg_sales_store': ['fact_sales', 'dim_store'],
+}
+
+DEFAULT_MEMORY_BYTES = 256 * 1024 ** 2
+DEFAULT_TTL_SECONDS = 3600
+
+# Schema metadata key of the Parquet tier files
+_PARQUET_METADATA_KEY = b'query_cache'
+
+_QUOTED_OR_COMMENT = re.compile(r"('(?:[^']|'')*')|(--[^\n]*)|(/\*.*?\*/)", re.S)
+_RELATION = re.compile(
+    r'\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+((?:[\w\[\]"`]+\.)*[\w\[\]"`]+)', re.I
+)
+_WRITE_TARGET = re.compile(
+    r'\b(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|MERGE\s+INTO|MERGE|TRUNCATE\s+TABLE|ALTER\s+TABLE|'
+    r'DROP\s+TABLE(?:\s+IF\s+EXISTS)?|CREATE\s+(?:UNIQUE\s+)?(?:CLUSTERED\s+|NONCLUSTERED\s+)?INDEX\s+\S+\s+ON)'
+    r'\s+((?:[\w\[\]"`]+\.)*[\w\[\]"`]+)', re.I
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Canonical form of a statement for cache keys: comments removed and
+    whitespace collapsed outside string literals, trailing ';' dropped
+
+    Args:
+        sql: SQL text
+
+    Returns:
+        Normalized SQL
+    """
+    parts = []
+    code = []
+    position = 0
+    for match in _QUOTED_OR_COMMENT.finditer(sql):
+        code.append(sql[position:match.start()])
+        if match.group(1):
+            parts.append(re.sub(r'\s+', ' ', ''.join(code)))
+            parts.append(match.group(1))
+            code = []
+        else:
+            code.append(' ')
+        position = match.end()
+    code.append(sql[position:])
+    parts.append(re.sub(r'\s+', ' ', ''.join(code)))
+    normalized = ''.join(parts)
+    return normalized.strip().rstrip(';').rstrip()
+
+
+def _strip_literals(sql: str) -> str:
+    return _QUOTED_OR_COMMENT.sub(' ', sql)
+
+
+def _relation_name(identifier: str) -> str:
+    """Unqualified, unquoted, lowercase relation name (dbo.[FactVentas] -> factventas)"""
+    return identifier.split('.')[-1].strip('[]"`').lower()
+
+
+def referenced_tables(sql: str) -> Set[str]:
+    """
+    Relations read or written by a statement (lowercase, without schema)
+
+    Args:
+        sql: SQL text
+
+    Returns:
+        Set of relation names
+    """
+    return {_relation_name(name) for name in _RELATION.findall(_strip_literals(sql))
+            if not name.startswith('(')}
+
+
+def written_tables(sql: str) -> Set[str]:
+    """
+    Tables modified by a DML/DDL statement
+
+    Args:
+        sql: SQL text
+
+    Returns:
+        Set of relation names (empty for queries)
+    """
+    return {_relation_name(name) for name in _WRITE_TARGET.findall(_strip_literals(sql))}
+
+
+def is_cacheable(sql: str) -> bool:
+    """Only plain queries (SELECT / WITH ... SELECT) are cached"""
+    head = _strip_literals(sql).lstrip().split(None, 1)
+    return bool(head) and head[0].upper() in ('SELECT', 'WITH') and not written_tables(sql)
+
+
+class TableVersions:
+    """
+    Process-wide version counters of the tables of each database
+
+    DataLoader (and DatabaseConnection.execute_sql) bump the version of
+    every table they write; cached results remember the versions they were
+    computed from and are discarded once any of them moves.
+    """
+
+    def __init__(self):
+        self._versions: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, database: str, table: str) -> int:
+        """Current version of a table (0 if never written)"""
+        return self._versions.get((database, table.lower()), 0)
+
+    def bump(self, database: str, table: str) -> int:
+        """
+        Mark a table as changed
+
+        Args:
+            database: Database identity (masked connection URL)
+            table: Table name
+
+        Returns:
+            New version
+        """
+        key = (database, _relation_name(table))
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return self._versions[key]
+
+
+# Versions bumped by the loaders of this process
+TABLE_VERSIONS = TableVersions()
+
+
+class TableVersionStore:
+    """
+    Table versions persisted in a DW control table, so loads made by one
+    process invalidate the caches of the others (notebooks, dashboards)
+    """
+
+    def __init__(self, engine: Engine, table_name: str = TABLE_VERSION_TABLE, refresh_seconds: float = 5.0):
+        """
+        Initialize the store, creating the control table if needed
+
+        Args:
+            engine: Engine of the data warehouse
+            table_name: Name of the control table
+            refresh_seconds: How long the versions read are reused before
+                querying the control table again
+        """
+        self.engine = engine
+        self.refresh_seconds = refresh_seconds
+        self.table = Table(
+            table_name, MetaData(),
+            Column('tabla', String(128), primary_key=True),
+            Column('version', Integer, nullable=False),
+            Column('actualizado_en', DateTime, nullable=False),
+        )
+        self.table.create(engine, checkfirst=True)
+        self._versions: Dict[str, int] = {}
+        self._read_at = None
+        self._lock = threading.Lock()
+
+    def versions(self) -> Dict[str, int]:
+        """Versions of every table, re-read at most every refresh_seconds"""
+        with self._lock:
+            if self._read_at is None or time.monotonic() - self._read_at >= self.refresh_seconds:
+                with self.engine.connect() as connection:
+                    rows = connection.execute(select(self.table.c.tabla, self.table.c.version)).all()
+                self._versions = {tabla: version for tabla, version in rows}
+                self._read_at = time.monotonic()
+            return self._versions
+
+    def bump(self, table: str) -> int:
+        """
+        Increment the stored version of a table
+
+        Args:
+            table: Table name
+
+        Returns:
+            New version
+        """
+        name = _relation_name(table)
+        with self.engine.begin() as connection:
+            updated = connection.execute(
+                update(self.table).where(self.table.c.tabla == name)
+                .values(version=self.table.c.version + 1, actualizado_en=datetime.now())
+            ).rowcount
+            if not updated:
+                connection.execute(self.table.insert().values(tabla=name, version=1, actualizado_en=datetime.now()))
+            version = connection.execute(
+                select(self.table.c.version).where(self.table.c.tabla == name)
+            ).scalar()
+        with self._lock:
+            self._versions[name] = version
+        return version
+
+
+def _size_of(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _private_copy(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy handed to callers so their changes never reach the cached frame"""
+    # Under copy-on-write a shallow copy is already isolated
+    if int(pd.__version__.split('.')[0]) >= 3 or pd.get_option('mode.copy_on_write') is True:
+        return df.copy(deep=False)
+    return df.copy()
+
+
+class QueryCache:
+    """
+    Two-tier cache of query results
+
+    - memory: LRU bounded by a byte budget (deep DataFrame size)
+    - disk (optional, needs pyarrow): Parquet files reused across processes
+      and restarts; disk hits are promoted to memory
+
+    Entries expire after their TTL and are discarded as soon as a table
+    they read (or a table a view they read depends on) changes version.
+    """
+
+    def __init__(self, max_memory_bytes: int = DEFAULT_MEMORY_BYTES, disk_dir: str = None,
+                 max_disk_bytes: int = None, ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+                 dependencies: Dict[str, List[str]] = None):
+        """
+        Initialize the cache
+
+        Args:
+            max_memory_bytes: Byte budget of the memory tier (0 disables it)
+            disk_dir: Directory of the Parquet tier (None disables it)
+            max_disk_bytes: Byte budget of the Parquet tier (None: unbounded)
+            ttl_seconds: Default time to live (None: until invalidated)
+            dependencies: Extra view -> tables dependencies
+                (merged with VIEW_DEPENDENCIES)
+        """
+        if disk_dir and pa is None:
+            raise ImportError("pyarrow is required for the Parquet tier: pip install pyarrow")
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.dependencies = {name.lower(): [t.lower() for t in tables]
+                             for name, tables in {**VIEW_DEPENDENCIES, **(dependencies or {})}.items()}
+        self._memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self.stats = {key: 0 for key in (
+            'memory_hits', 'disk_hits', 'misses', 'stores', 'evictions', 'expirations', 'invalidations',
+            'disk_errors',
+        )}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # -- keys and versions -------------------------------------------------
+
+    @staticmethod
+    def make_key(database: str, sql: str, params: Dict[str, Any] = None) -> str:
+        """
+        Cache key of a query: database, normalized SQL and parameters
+
+        Args:
+            database: Database identity (masked connection URL)
+            sql: SQL text
+            params: Query parameters
+
+        Returns:
+            Hex digest
+        """
+        payload = json.dumps([database, normalize_sql(sql), sorted((params or {}).items())], default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def register_dependency(self, view: str, tables: Iterable[str]):
+        """Declare the tables a view (or derived table) is computed from"""
+        self.dependencies[view.lower()] = [table.lower() for table in tables]
+
+    def tables_for(self, sql: str) -> Set[str]:
+        """Relations a query depends on, views expanded to their tables"""
+        tables = referenced_tables(sql)
+        pending = list(tables)
+        while pending:
+            for table in self.dependencies.get(pending.pop(), []):
+                if table not in tables:
+                    tables.add(table)
+                    pending.append(table)
+        return tables
+
+    def versions_for(self, database: str, sql: str, store: TableVersionStore = None) -> Dict[str, List[int]]:
+        """
+        Current versions of the relations a query depends on
+
+        Args:
+            database: Database identity
+            sql: SQL text
+            store: Shared version store of the database (optional)
+
+        Returns:
+            Table -> [process version, shared version]
+        """
+        shared = store.versions() if store is not None else {}
+        return {table: [TABLE_VERSIONS.get(database, table), shared.get(table, 0)]
+                for table in sorted(self.tables_for(sql))}
+
+    # -- lookups -----------------------------------------------------------
+
+    def get(self, key: str, versions: Dict[str, List[int]]) -> Optional[pd.DataFrame]:
+        """
+        Cached result of a key, if still valid
+
+        Args:
+            key: Key from make_key
+            versions: Current versions from versions_for
+
+        Returns:
+            DataFrame, or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._is_valid(entry, versions):
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return _private_copy(entry['df'])
+                self._drop_memory(key)
+                self._remove_file(key)
+
+        if self.disk_dir:
+            entry = self._read_disk(key, versions)
+            if entry is not None:
+                self.stats['disk_hits'] += 1
+                self._store_memory(key, entry)
+                return _private_copy(entry['df'])
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, key: str, df: pd.DataFrame, versions: Dict[str, List[int]], ttl: Optional[float] = None,
+            sql: str = None):
+        """
+        Store a query result
+
+        Args:
+            key: Key from make_key
+            df: Result to cache
+            versions: Versions the result was computed from (read before the query)
+            ttl: Time to live of this entry (default: the cache TTL)
+            sql: Query text kept for inspection
+        """
+        ttl = self.ttl_seconds if ttl is None else ttl
+        entry = {
+            'df': _private_copy(df),
+            'versions': versions,
+            'created': time.time(),
+            'expires': time.time() + ttl if ttl is not None else None,
+            'sql': normalize_sql(sql) if sql else None,
+            'bytes': _size_of(df),
+        }
+        with self._lock:
+            self.stats['stores'] += 1
+        self._store_memory(key, entry)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+
+    def _is_valid(self, entry: Dict[str, Any], versions: Dict[str, List[int]]) -> bool:
+        if entry['expires'] is not None and time.time() >= entry['expires']:
+            self.stats['expirations'] += 1
+            return False
+        if entry['versions'] != versions:
+            self.stats['invalidations'] += 1
+            return False
+        return True
+
+    # -- memory tier -------------------------------------------------------
+
+    def _store_memory(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            if key in self._memory:
+                self._drop_memory(key)
+            if entry['bytes'] > self.max_memory_bytes:
+                return
+            self._memory[key] = entry
+            self._memory_bytes += entry['bytes']
+            while self._memory_bytes > self.max_memory_bytes:
+                oldest = next(iter(self._memory))
+                self._drop_memory(oldest)
+                self.stats['evictions'] += 1
+
+    def _drop_memory(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry['bytes']
+
+    # -- parquet tier ------------------------------------------------------
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.parquet")
+
+    def _read_disk(self, key: str, versions: Dict[str, List[int]]) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            metadata = json.loads(pq.read_schema(path).metadata[_PARQUET_METADATA_KEY])
+            if not self._is_valid(metadata, versions):
+                self._remove_file(key)
+                return None
+            df = pq.read_table(path).to_pandas()
+        except Exception as e:
+            print(f"Query cache: unreadable entry {key[:12]} ({str(e)}); dropping it")
+            self.stats['disk_errors'] += 1
+            self._remove_file(key)
+            return None
+        os.utime(path)
+        return {**metadata, 'df': df, 'bytes': _size_of(df)}
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]):
+        metadata = {name: entry[name] for name in ('versions', 'created', 'expires', 'sql')}
+        path = self._path(key)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            table = pa.Table.from_pandas(entry['df'])
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                _PARQUET_METADATA_KEY: json.dumps(metadata).encode('utf-8'),
+            })
+            pq.write_table(table, temporary)
+            os.replace(temporary, path)
+        except Exception as e:
+            # Results with types Parquet cannot hold stay memory-only
+            print(f"Query cache: could not write {key[:12]} to disk ({str(e)})")
+            self.stats['disk_errors'] += 1
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return
+        if self.max_disk_bytes is not None:
+            self._trim_disk()
+
+    def _disk_files(self) -> List[os.DirEntry]:
+        return [item for item in os.scandir(self.disk_dir) if item.name.endswith('.parquet')]
+
+    def _trim_disk(self):
+        """Remove the least recently used files until the tier fits its budget"""
+        files = sorted(self._disk_files(), key=lambda item: item.stat().st_mtime)
+        total = sum(item.stat().st_size for item in files)
+        for item in files:
+            if total <= self.max_disk_bytes:
+                break
+            total -= item.stat().st_size
+            os.remove(item.path)
+            self.stats['evictions'] += 1
+
+    def _remove_file(self, key: str):
+        if self.disk_dir and os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+    # -- maintenance -------------------------------------------------------
+
+    def clear(self):
+        """Drop every entry of both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self.disk_dir:
+            for item in self._disk_files():
+                os.remove(item.path)
+
+    def statistics(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters and tier usage
+
+        Returns:
+            Dictionary with the counters, hit rate, entries and bytes per tier
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_bytes
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else None
+        if self.disk_dir:
+            files = self._disk_files()
+            stats['disk_entries'] = len(files)
+            stats['disk_bytes'] = sum(item.stat().st_size for item in files)
+        return stats
+
+
+# Cache shared by the connections that enable caching without their own
+_DEFAULT_CACHE: Optional[QueryCache] = None
+_DEFAULT_CACHE_LOCK = threading.Lock()
+
+
+def get_default_cache() -> QueryCache:
+    """
+    Process-wide query cache (memory tier; Parquet tier when the
+    QUERY_CACHE_DIR environment variable is set)
+
+    Returns:
+        Shared QueryCache
+    """
+    global _DEFAULT_CACHE
+    with _DEFAULT_CACHE_LOCK:
+        if _DEFAULT_CACHE is None:
+            _DEFAULT_CACHE = QueryCache(disk_dir=os.getenv('QUERY_CACHE_DIR') or None)
+        return _DEFAULT_CACHE
+
+
+if __name__ == "__main__":
+    # Example usage
+    # db = DatabaseConnection(dw_params)
+    # db.enable_query_cache(QueryCache(disk_dir='data/cache/queries', ttl_seconds=900))
+    # db.execute_query("SELECT * FROM view_product_performance")   # miss
+    # db.execute_query("SELECT * FROM view_product_performance")   # hit
+    # print(db.query_cache.statistics())
+    print(normalize_sql("SELECT *\n  FROM   DimProducto -- catálogo\n WHERE marca = 'Samsung  Galaxy';"))
@@ -0,0 +1,57 @@
+"""
+Streaming Utility
+Helpers shared by the ETL modules to work with chunked DataFrame streams
+"""
+
+import pandas as pd
+from typing import Any, Iterable, Iterator
+
+
+# Default number of rows per chunk in streaming mode
+DEFAULT_CHUNKSIZE = 50000
+
+
+def is_chunk_stream(obj: Any) -> bool:
+    """
+    Check whether an object is a stream of DataFrame chunks
+
+    Args:
+        obj: Object to check (DataFrame, generator, list of DataFrames, ...)
+
+    Returns:
+        True if the object is an iterable of chunks and not a single DataFrame
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series, str, bytes, dict)):
+        return False
+    return hasattr(obj, '__iter__')
+
+
+def iter_chunks(df: pd.DataFrame, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """
+    Split an in-memory DataFrame into fixed-size chunks
+
+    Args:
+        df: DataFrame to split
+        chunksize: Number of rows per chunk
+
+    Returns:
+        Iterator of DataFrame chunks
+    """
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def map_chunks(func, chunks: Iterable[pd.DataFrame], *args, **kwargs) -> Iterator[pd.DataFrame]:
+    """
+    Lazily apply a DataFrame function to every chunk of a stream
+
+    Args:
+        func: Function receiving a DataFrame as first argument
+        chunks: Stream of DataFrame chunks
+        *args, **kwargs: Extra arguments for func
+
+    Returns:
+        Iterator of transformed chunks
+    """
+    for chunk in chunks:
+        yield func(chunk, *args, **kwargs)
@@ -0,0 +1,95 @@
+"""
+Materialized rollups must stay equal to a full recompute after fact loads
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.etl.aggregates import AggregateManager
+from src.etl.load import DataLoader
+
+VIEW_SALES_SUMMARY = """
+SELECT d.year, d.quarter, d.month_name, p.category, p.subcategory, c.customer_segment,
+       s.store_name, s.store_type,
+       COUNT(f.sale_id) AS transaction_count, SUM(f.total_amount) AS total_revenue,
+       AVG(f.total_amount) AS avg_transaction_value
+FROM fact_sales f
+INNER JOIN dim_date d ON f.date_key = d.date_key
+INNER JOIN dim_product p ON f.product_key = p.product_key
+INNER JOIN dim_customer c ON f.customer_key = c.customer_key
+INNER JOIN dim_store s ON f.store_key = s.store_key
+GROUP BY d.year, d.quarter, d.month_name, p.category, p.subcategory, c.customer_segment,
+         s.store_name, s.store_type
+"""
+
+SUMMARY_GRAIN = ['year', 'quarter', 'month_name', 'category', 'subcategory', 'customer_segment',
+                 'store_name', 'store_type']
+
+
+def _sales(first_id, rows, dates, seed):
+    rng = np.random.default_rng(seed)
+    total = rng.integers(10, 500, rows).astype('float64')
+    return pd.DataFrame({
+        'sale_id': range(first_id, first_id + rows), 'date_key': rng.choice(dates, rows),
+        'product_key': rng.integers(1, 5, rows), 'customer_key': rng.integers(1, 4, rows),
+        'store_key': rng.integers(1, 3, rows), 'quantity': rng.integers(1, 4, rows),
+        'total_amount': total, 'discount_amount': 0.0, 'net_amount': total, 'profit': total / 4,
+        'profit_margin': 25.0,
+    })
+
+
+@pytest.fixture
+def aggregates(tmp_path):
+    loader = DataLoader({'db_type': 'sqlite', 'database': str(tmp_path / 'dw.db'), 'host': '', 'port': '',
+                         'username': '', 'password': ''})
+    dates = pd.date_range('2024-01-01', '2024-03-31')
+    tables = {
+        'dim_date': pd.DataFrame({
+            'date_key': dates.strftime('%Y%m%d').astype(int), 'date': dates.date,
+            'day_of_week': dates.day_name(), 'is_weekend': dates.dayofweek >= 5, 'year': dates.year,
+            'quarter': dates.quarter, 'month_number': dates.month, 'month_name': dates.month_name(),
+        }),
+        'dim_product': pd.DataFrame({'product_key': [1, 2, 3, 4], 'product_name': list('abcd'),
+                                     'category': ['Phone', 'Phone', 'Tablet', 'Tablet'],
+                                     'subcategory': ['Android', 'iOS', 'Android', 'iOS'],
+                                     'brand': 'x', 'is_current': True}),
+        'dim_customer': pd.DataFrame({'customer_key': [1, 2, 3], 'customer_segment': ['VIP', 'Regular', 'VIP']}),
+        'dim_store': pd.DataFrame({'store_key': [1, 2], 'store_name': ['Centro', 'Norte'],
+                                   'store_type': ['Mall', 'Street'], 'city': 'BA', 'state': 'BA',
+                                   'region': 'AMBA', 'is_active': True}),
+    }
+    for name, df in tables.items():
+        loader.load_to_database(df, name, if_exists='replace')
+    january = tables['dim_date']['date_key'].to_numpy()[:31]
+    loader.load_to_database(_sales(1, 300, january, seed=1), 'fact_sales', if_exists='replace')
+
+    manager = AggregateManager(loader)
+    manager.materialize()
+    yield manager, tables['dim_date']['date_key'].to_numpy()
+    loader.close()
+
+
+def _sorted(df):
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def test_partition_refresh_matches_full_recompute(aggregates):
+    manager, date_keys = aggregates
+    # Touches January again and February for the first time
+    manager.loader.load_fact(_sales(1000, 120, date_keys[20:45], seed=2), 'sales')
+
+    assert set(manager.refresh_log[-1]['touched']) == set(manager.definitions)
+    for definition in manager.definitions.values():
+        stored = manager.db_connection.execute_query(f"SELECT * FROM {definition.table_name}")
+        expected = manager.db_connection.execute_query(definition.select_sql(manager.fact_table))
+        pd.testing.assert_frame_equal(_sorted(stored[expected.columns]), _sorted(expected), check_dtype=False)
+
+
+def test_sales_summary_served_from_rollup(aggregates):
+    manager, _ = aggregates
+    result = manager.query(SUMMARY_GRAIN, ['transactions', 'revenue', 'avg_order_value'])
+    assert manager.last_source == 'agg_sales_summary'
+
+    view = manager.db_connection.execute_query(VIEW_SALES_SUMMARY).rename(columns={
+        'transaction_count': 'transactions', 'total_revenue': 'revenue', 'avg_transaction_value': 'avg_order_value'})
+    pd.testing.assert_frame_equal(_sorted(result), _sorted(view[result.columns]), check_dtype=False)
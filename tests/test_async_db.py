@@ -0,0 +1,39 @@
+"""
+Query files must yield one query per result set
+"""
+
+from src.utils.async_db import load_query_files, split_statements
+
+
+def test_split_statements_ignores_nested_and_quoted_semicolons():
+    batch = "SELECT ';' AS a FROM t; -- fin; \nSELECT COUNT(*) FROM (SELECT 1 AS x FROM u) s;"
+    assert split_statements(batch) == ["SELECT ';' AS a FROM t", "-- fin; \nSELECT COUNT(*) FROM (SELECT 1 AS x FROM u) s"]
+
+
+def test_batch_with_several_selects_yields_several_queries(tmp_path):
+    path = tmp_path / '07_dataset.sql'
+    path.write_text(
+        "USE DW;\nGO\n"
+        "PRINT 'conteo';\nSELECT COUNT(*) AS total FROM dbo.FactVentas;\n"
+        "SELECT f.cantidad FROM dbo.FactVentas f;\nGO\n",
+        encoding='utf-8',
+    )
+    queries = load_query_files([str(path)])
+
+    assert list(queries) == ['07_dataset_1', '07_dataset_2']
+    assert 'COUNT(*)' in queries['07_dataset_1']
+    assert 'COUNT(*)' not in queries['07_dataset_2']
+
+
+def test_variables_stay_with_the_queries_using_them(tmp_path):
+    path = tmp_path / '10_rfm.sql'
+    path.write_text(
+        "DECLARE @ref DATE = CAST(GETDATE() AS DATE);\n"
+        "SELECT DATEDIFF(DAY, MAX(fecha), @ref) AS dias FROM dbo.DimFecha;\n"
+        "SELECT COUNT(*) AS total FROM dbo.FactVentas;\nGO\n",
+        encoding='utf-8',
+    )
+    queries = load_query_files([str(path)])
+
+    assert queries['10_rfm_1'].startswith('DECLARE @ref DATE')
+    assert 'DECLARE' not in queries['10_rfm_2']
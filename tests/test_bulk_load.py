@@ -0,0 +1,55 @@
+"""
+Bulk-load engines must load the same rows as plain to_sql
+"""
+
+import csv
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, event
+from src.etl.bulk_load import (
+    BULK_LOAD_ENGINES, COPY_NULL, MultiRowInsertEngine, PostgresCopyEngine, copy_csv_buffer
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dw.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def ventas():
+    return pd.DataFrame({
+        'id_venta': range(2500),
+        'importe': [float(i) / 4 for i in range(2500)],
+        'canal': ['Online', '', None, 'Salón', 'a,"b"'] * 500,
+    })
+
+
+@pytest.mark.parametrize('name', [name for name in BULK_LOAD_ENGINES if name != PostgresCopyEngine.name])
+def test_engines_load_every_row(engine, ventas, name):
+    assert BULK_LOAD_ENGINES[name]().load(ventas, 'fact', engine) == len(ventas)
+    loaded = pd.read_sql('SELECT * FROM fact ORDER BY id_venta', engine)
+    pd.testing.assert_frame_equal(loaded, ventas)
+
+
+@pytest.mark.parametrize('columns', [2, 3])
+def test_mssql_statements_respect_row_and_parameter_limits(engine, ventas, columns):
+    statements = []
+    event.listen(engine, 'connect', lambda dbapi_connection, record: dbapi_connection.set_trace_callback(
+        lambda sql: statements.append(sql) if sql.startswith('INSERT') else None))
+
+    MultiRowInsertEngine(dialect='mssql').load(ventas.iloc[:, :columns], 'fact', engine)
+    rows = [sql.count('), (') + 1 for sql in statements]
+    assert sum(rows) == len(ventas)
+    assert max(rows) <= 1000 and max(rows) * columns <= 2099
+
+
+def test_copy_csv_keeps_empty_strings_apart_from_nulls():
+    buffer, rows = copy_csv_buffer([(1, '', None), (2, 'x', 1.5)])
+    assert rows == 2
+    # Quoted fields are text; only the NULL marker (matched through FORCE_NULL) is NULL
+    fields = list(csv.reader(buffer))
+    assert fields == [['1', '', COPY_NULL], ['2', 'x', '1.5']]
+    assert buffer.getvalue().splitlines()[0] == f'1,"","{COPY_NULL}"'
@@ -0,0 +1,28 @@
+"""
+Chunk writers must accept chunks whose inferred types differ
+"""
+
+import pandas as pd
+import pytest
+from src.etl.export_flat import ChunkWriter, ParquetChunkWriter
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def test_parquet_writer_promotes_all_null_first_chunk(tmp_path):
+    path = tmp_path / 'plano.parquet'
+    writer = ParquetChunkWriter(str(path))
+    writer.write(pd.DataFrame({'cantidad': [1, 2], 'genero_cliente': [None, None], 'margen': [None, None]}))
+    writer.write(pd.DataFrame({'cantidad': [3], 'genero_cliente': ['F'], 'margen': [None]}))
+    writer.write(pd.DataFrame({'cantidad': [4], 'genero_cliente': [None], 'margen': [1.5]}))
+    writer.close()
+
+    table = pq.read_table(path)
+    assert writer.rows == table.num_rows == 4
+    assert str(table.schema.field('margen').type) == 'double'
+    assert table.column('genero_cliente').to_pylist() == [None, None, 'F', None]
+
+
+def test_chunk_writer_is_abstract():
+    with pytest.raises(TypeError):
+        ChunkWriter('plano.csv')
@@ -0,0 +1,72 @@
+"""
+Incremental FactVentas load against small SQLite OLTP and DW databases
+"""
+
+import pandas as pd
+import pytest
+from datetime import date
+from sqlalchemy import create_engine, text
+from src.etl.incremental import IncrementalFactLoader
+
+
+def _params(path):
+    return {'db_type': 'sqlite', 'database': str(path), 'host': '', 'port': '', 'username': '', 'password': ''}
+
+
+@pytest.fixture
+def databases(tmp_path):
+    oltp, dw = tmp_path / 'oltp.db', tmp_path / 'dw.db'
+    with create_engine(f"sqlite:///{oltp}").begin() as connection:
+        pd.DataFrame({
+            'id_venta': [1, 2, 3], 'fecha_venta': [date(2024, 3, 1), date(2024, 3, 2), date(2024, 3, 3)],
+            'id_local': 1, 'id_cliente': [1, 2, 1], 'id_vendedor': 1, 'id_forma_pago': 1, 'canal': 'Online',
+        }).to_sql('Ventas', connection, index=False)
+        pd.DataFrame({
+            'id_venta': [1, 1, 2, 3], 'id_detalle': [1, 2, 3, 4], 'id_modelo': 1, 'cantidad': [1, 2, 1, 3],
+            'precio_unitario': [300.0, 0.0, 150.0, 90.0], 'costo_unitario': [200.0, 50.0, 100.0, 60.0],
+        }).to_sql('DetalleVenta', connection, index=False)
+    with create_engine(f"sqlite:///{dw}").begin() as connection:
+        fechas = pd.date_range('2024-01-01', '2024-12-31').date
+        pd.DataFrame({'sk_fecha': range(1, len(fechas) + 1), 'fecha': fechas}).to_sql('DimFecha', connection, index=False)
+        pd.DataFrame({'sk_cliente': [1, 2], 'id_cliente_fuente': [1, 2]}).to_sql('DimCliente', connection, index=False)
+        pd.DataFrame({'sk_producto': [1], 'id_modelo_fuente': [1]}).to_sql('DimProducto', connection, index=False)
+        pd.DataFrame({'sk_local': [1], 'id_local_fuente': [1]}).to_sql('DimLocal', connection, index=False)
+        pd.DataFrame({'sk_vendedor': [1], 'id_vendedor_fuente': [1], 'fecha_inicio': [date(1900, 1, 1)],
+                      'fecha_fin': [None]}).to_sql('DimVendedor', connection, index=False)
+        pd.DataFrame({'sk_forma_pago': [1], 'id_forma_pago_fuente': [1]}).to_sql('DimFormaPago', connection, index=False)
+        pd.DataFrame({'sk_canal': [1], 'canal': ['Online']}).to_sql('DimCanal', connection, index=False)
+        pd.DataFrame({'sk_moneda': [1], 'codigo_moneda': ['ARS']}).to_sql('DimMoneda', connection, index=False)
+    return _params(oltp), _params(dw), create_engine(f"sqlite:///{oltp}"), create_engine(f"sqlite:///{dw}")
+
+
+def _facts(engine):
+    return pd.read_sql("SELECT * FROM FactVentas ORDER BY id_detalle", engine).set_index('id_detalle')
+
+
+def test_margen_porcentaje_matches_reproceso_diario(databases):
+    source, target, _, dw = databases
+    IncrementalFactLoader(source, target, chunksize=2).run_incremental()
+    facts = _facts(dw)
+    # CASE WHEN precio_unitario > 0 THEN ROUND(..., 2) ELSE 0 END
+    assert facts['margen_porcentaje'].tolist() == [33.33, 0.0, 33.33, 33.33]
+    assert facts.loc[2, 'margen'] == -100.0
+
+
+def test_upsert_replaces_changed_rows_and_advances_watermark(databases):
+    source, target, oltp, dw = databases
+    loader = IncrementalFactLoader(source, target, chunksize=2)
+    assert loader.run_incremental()['max_id_venta'] == 3
+    with oltp.begin() as connection:
+        connection.execute(text("UPDATE DetalleVenta SET cantidad = 5 WHERE id_detalle = 1"))
+        connection.execute(text("INSERT INTO Ventas VALUES (4, '2024-03-04', 1, 2, 1, 1, 'Online')"))
+        connection.execute(text("INSERT INTO DetalleVenta VALUES (4, 5, 1, 1, 10.0, 5.0)"))
+        connection.execute(text("DELETE FROM DetalleVenta WHERE id_venta = 2"))
+        connection.execute(text("DELETE FROM Ventas WHERE id_venta = 2"))
+
+    assert loader.run_incremental()['rows'] == 1
+    summary = loader.backfill(date(2024, 3, 1), date(2024, 3, 31))
+    facts = _facts(dw)
+    assert summary['deleted'] == 1
+    assert facts.index.tolist() == [1, 2, 4, 5]
+    assert facts.loc[1, 'cantidad'] == 5 and facts.loc[1, 'importe'] == 1500.0
+    assert loader.watermarks.get('FactVentas')['ultimo_id_venta'] == 4
@@ -0,0 +1,38 @@
+"""
+Instrumented stages must count rows of streamed inputs and outputs
+"""
+
+import pandas as pd
+import pytest
+from src.utils.metrics import get_registry, instrument_stage
+
+
+class Stage:
+    @instrument_stage()
+    def positives(self, df):
+        if isinstance(df, pd.DataFrame):
+            return (chunk for chunk in [df[df['a'] > 0]])
+        return (chunk[chunk['a'] > 0] for chunk in df)
+
+
+@pytest.fixture
+def registry():
+    registry = get_registry()
+    registry.reset()
+    yield registry
+    registry.reset()
+
+
+def test_streamed_stage_counts_rows_in_and_out(registry):
+    chunks = [pd.DataFrame({'a': [1, -1, 2]}), pd.DataFrame({'a': [-3, 4]})]
+    result = Stage().positives(iter(chunks))
+    assert not registry.stage_events
+    assert sum(len(chunk) for chunk in result) == 3
+    event = list(registry.stage_events)[-1]
+    assert (event['rows_in'], event['rows_out'], event['chunks']) == (5, 3, 2)
+
+
+def test_frame_to_stream_stage_counts_rows_in_and_out(registry):
+    list(Stage().positives(pd.DataFrame({'a': [1, -1, 2]})))
+    event = list(registry.stage_events)[-1]
+    assert (event['rows_in'], event['rows_out']) == (3, 2)
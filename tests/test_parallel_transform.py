@@ -0,0 +1,38 @@
+"""
+Parallel transform steps must give the single-process results
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.etl.parallel_transform import ParallelTransformer
+from src.etl.transform import DataTransformer
+
+
+@pytest.fixture(scope='module')
+def parallel():
+    with ParallelTransformer(workers=2, min_rows_per_worker=100) as transformer:
+        yield transformer
+
+
+@pytest.fixture
+def mixed():
+    # 'referencia' mixes ints and strings: Arrow cannot ship it to the workers
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({
+        'id_venta': rng.integers(0, 3000, 4000), 'cantidad': rng.integers(1, 4, 4000),
+        'referencia': pd.Series([1, 'a'] * 2000, dtype=object),
+    })
+
+
+def test_clean_data_with_mixed_object_column(parallel, mixed):
+    expected = DataTransformer().clean_data(mixed.copy(), {})
+    pd.testing.assert_frame_equal(parallel.clean_data(mixed, {}), expected)
+    streamed = pd.concat(parallel.clean_data(iter([mixed.iloc[:1500], mixed.iloc[1500:]]), {}))
+    pd.testing.assert_frame_equal(streamed, expected)
+
+
+def test_business_rules_with_mixed_object_column(parallel, mixed):
+    rules = [{'type': 'calculate', 'target_column': 'doble', 'formula': 'cantidad * 2'}]
+    expected = DataTransformer().apply_business_rules(mixed.copy(), rules)
+    pd.testing.assert_frame_equal(parallel.apply_business_rules(mixed, rules), expected)
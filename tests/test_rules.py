@@ -0,0 +1,86 @@
+"""
+Compiled business rules must give the same rows and values as pandas
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.etl.rules import CompiledExpression, PlanStep, RuleCompiler
+
+
+@pytest.fixture
+def ventas():
+    return pd.DataFrame({
+        'cantidad': np.array([0, 1, 2, 3, 4, 5], dtype='int64'),
+        'unidades': np.array([0, 1, 2, 3, 4, 5], dtype='int8'),
+        'stock': pd.array([5, None, 9, 2, None, 7], dtype='Int64'),
+        'precio_unitario': [0.0, 10.5, 20.25, -1.0, 300.0, 45.0],
+        'costo_unitario': [0.0, 7.0, 15.0, 1.0, 200.0, np.nan],
+        'canal': ['Salón', 'Online', 'Salón', 'Online', 'Salón', 'Online'],
+    })
+
+
+CONDITIONS = [
+    'cantidad > 0',
+    'cantidad > 0 & cantidad < 3',
+    'cantidad > 0 | cantidad < 3',
+    'cantidad < 1 | cantidad > 3',
+    'cantidad > 0 & precio_unitario > 0',
+    'cantidad > 0 & precio_unitario > 0 | canal == "Online"',
+    '(cantidad > 0) & (precio_unitario > 20)',
+    'cantidad > 0 and precio_unitario < 100 or cantidad == 0',
+    '~(cantidad > 2) & canal == "Salón"',
+    'not cantidad > 2',
+    '1 < cantidad < 4',
+    'canal in ["Online"] & cantidad >= 3',
+    'canal not in ["Online"]',
+    'precio_unitario > costo_unitario',
+    'cantidad * precio_unitario > 100 | costo_unitario != costo_unitario',
+]
+
+FORMULAS = [
+    'cantidad * precio_unitario',
+    'cantidad * (precio_unitario - costo_unitario)',
+    '(precio_unitario - costo_unitario) / precio_unitario * 100',
+    'cantidad // 2',
+    'unidades // 2',
+    '-unidades // 2',
+    'unidades ** 2 // 3',
+    'stock // 2',
+    'cantidad // precio_unitario',
+    'precio_unitario // 2',
+    'cantidad % 3',
+]
+
+
+@pytest.mark.parametrize('condition', CONDITIONS)
+def test_filter_matches_query(ventas, condition):
+    plan = RuleCompiler().compile([{'type': 'filter', 'condition': condition}])
+    assert plan.steps[0].expressions[0].compiled
+    pd.testing.assert_frame_equal(plan.execute(ventas), ventas.query(condition))
+
+
+@pytest.mark.parametrize('formula', FORMULAS)
+def test_calculate_matches_eval(ventas, formula):
+    plan = RuleCompiler().compile([{'type': 'calculate', 'target_column': 'resultado', 'formula': formula}])
+    assert plan.steps[0].expressions[0].compiled
+    pd.testing.assert_series_equal(plan.execute(ventas)['resultado'], ventas.eval(formula), check_names=False)
+
+
+@pytest.mark.parametrize('formula', ['cantidad // 2', 'unidades // 2', 'stock // 2'])
+def test_floor_division_dtype_on_empty_chunk(ventas, formula):
+    empty = ventas.iloc[:0]
+    plan = RuleCompiler().compile([{'type': 'calculate', 'target_column': 'resultado', 'formula': formula}])
+    assert plan.execute(empty)['resultado'].dtype == empty.eval(formula).dtype
+
+
+def test_bitwise_operators_bind_looser_than_comparisons():
+    expression = CompiledExpression('cantidad > 0 & cantidad < 3')
+    assert expression.numexpr_source in (None, '(cantidad > 0) & (cantidad < 3)')
+    result = expression.evaluate({'cantidad': np.array([0, 1, 2, 3])})
+    assert result.tolist() == [False, True, True, False]
+
+
+def test_plan_step_is_abstract():
+    with pytest.raises(TypeError):
+        PlanStep()
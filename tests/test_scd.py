@@ -0,0 +1,62 @@
+"""
+SCD Type 2 merges must version DimVendedor like 05_reproceso_diario.sql
+"""
+
+import pandas as pd
+import pytest
+from datetime import date
+from src.etl.scd import DIM_VENDEDOR_SCD2, SCD2Merger
+from src.utils.db_connection import DatabaseConnection
+
+
+@pytest.fixture
+def merger(tmp_path):
+    db = DatabaseConnection({'db_type': 'sqlite', 'database': str(tmp_path / 'dw.db'), 'host': '', 'port': '',
+                             'username': '', 'password': ''})
+    yield SCD2Merger(db, 'DimVendedor', **DIM_VENDEDOR_SCD2)
+    db.close()
+
+
+def _vendedor(categoria, nombre='Ana'):
+    return pd.DataFrame({'id_vendedor_fuente': [1], 'nombre': [nombre], 'apellido': ['Paz'], 'legajo': ['L1'],
+                         'categoria_vendedor': [categoria]})
+
+
+def _versions(merger):
+    versions = merger.db_connection.execute_query(
+        "SELECT version, categoria_vendedor, nombre, fecha_inicio, fecha_fin, es_actual "
+        "FROM DimVendedor ORDER BY version"
+    )
+    for column in ('fecha_inicio', 'fecha_fin'):
+        versions[column] = pd.to_datetime(versions[column]).dt.date
+    return versions
+
+
+def test_new_month_expires_previous_version(merger):
+    merger.merge(_vendedor('Bronce'), effective_date=date(2024, 10, 1))
+    summary = merger.merge(_vendedor('Plata'), effective_date=date(2024, 11, 1))
+    versions = _versions(merger)
+    assert (summary['expired'], summary['inserted']) == (1, 1)
+    assert versions['categoria_vendedor'].tolist() == ['Bronce', 'Plata']
+    assert versions['fecha_fin'].tolist()[0] == date(2024, 10, 31)
+    assert versions['es_actual'].tolist() == [0, 1]
+
+
+def test_same_month_rerun_updates_current_version_in_place(merger):
+    for categoria in ('Bronce', 'Plata', 'Oro'):
+        summary = merger.merge(_vendedor(categoria, nombre=f'Ana {categoria}'), effective_date=date(2024, 11, 1))
+    versions = _versions(merger)
+    assert (summary['expired'], summary['restated'], summary['inserted']) == (0, 1, 0)
+    assert len(versions) == 1
+    assert versions.iloc[0][['version', 'categoria_vendedor', 'nombre', 'fecha_inicio', 'es_actual']].tolist() == \
+        [1, 'Oro', 'Ana Oro', date(2024, 11, 1), 1]
+    assert pd.isna(versions.iloc[0]['fecha_fin'])
+
+
+def test_rerun_after_new_month_keeps_one_closed_version(merger):
+    merger.merge(_vendedor('Bronce'), effective_date=date(2024, 10, 1))
+    merger.merge(_vendedor('Plata'), effective_date=date(2024, 11, 1))
+    merger.merge(_vendedor('Oro'), effective_date=date(2024, 11, 1))
+    versions = _versions(merger)
+    assert versions['categoria_vendedor'].tolist() == ['Bronce', 'Oro']
+    assert (versions['fecha_inicio'] <= versions['fecha_fin'].fillna(date.max)).all()
@@ -0,0 +1,25 @@
+"""
+Sketches must accept empty and all-NULL input
+"""
+
+import pytest
+from src.etl.sketches import HyperLogLog, QuantileSketch
+
+
+@pytest.mark.parametrize('values', [[], [None, None]])
+def test_hyperloglog_empty_input(values):
+    sketch = HyperLogLog().add(values)
+    assert sketch.cardinality() == 0
+    assert sketch.add(range(100)).cardinality() == pytest.approx(100, rel=0.05)
+
+
+def test_hyperloglog_empty_merge_and_round_trip():
+    assert HyperLogLog().merge(HyperLogLog()).cardinality() == 0
+    assert HyperLogLog.from_bytes(HyperLogLog().to_bytes()).cardinality() == 0
+
+
+@pytest.mark.parametrize('values', [[], [None, None]])
+def test_quantile_sketch_empty_input(values):
+    sketch = QuantileSketch().add(values)
+    assert sketch.count == 0
+    assert QuantileSketch.from_bytes(sketch.merge(QuantileSketch()).to_bytes()).count == 0
@@ -0,0 +1,39 @@
+"""
+Streamed cleaning must drop the same rows as pandas on the whole frame
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.etl.transform import DataTransformer, StreamDeduplicator
+
+
+@pytest.fixture
+def ventas():
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        'id_venta': rng.integers(0, 500, 3000),
+        'cantidad': rng.integers(0, 3, 3000).astype('float64'),
+    })
+    df.loc[::11, 'cantidad'] = np.nan
+    return df
+
+
+def _chunks(df, size=211):
+    return iter([df.iloc[start:start + size] for start in range(0, len(df), size)])
+
+
+@pytest.mark.parametrize('subset', [None, ['id_venta']])
+def test_stream_dedup_matches_drop_duplicates(ventas, subset):
+    config = {'dedup_columns': subset} if subset else {}
+    streamed = pd.concat(DataTransformer().clean_data(_chunks(ventas), config))
+    pd.testing.assert_frame_equal(streamed, ventas.drop_duplicates(subset=subset))
+
+
+def test_deduplicator_keeps_one_key_per_distinct_row(ventas):
+    deduplicator = StreamDeduplicator(['id_venta'])
+    for chunk in _chunks(ventas):
+        deduplicator.keep_mask(deduplicator.row_keys(chunk))
+    assert len(deduplicator) == ventas['id_venta'].nunique()
+    assert deduplicator.nbytes == 8 * len(deduplicator)
+    assert deduplicator.keep_mask(np.array([], dtype='uint64')).shape == (0,)